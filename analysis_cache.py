@@ -0,0 +1,371 @@
+"""
+動画解析結果のキャッシュ
+
+動画ファイルの内容のハッシュ、モデル名、プロンプトのハッシュをキーとして、
+モデルの出力（raw）と後処理後のテキスト（processed）を data/output/cache に保存する。
+時間窓ごとに解析する場合は、切り出した窓の動画の内容をキーにして窓単位で保存するため、
+動画の一部だけが変わった場合は変わった窓だけを解析し直す。
+キャッシュの合計サイズが上限を超えたら、最後に使われた時刻の古いものから削除する。
+
+使い方:
+    # キャッシュの一覧と合計サイズを表示する
+    python analysis_cache.py list
+    python analysis_cache.py stats
+
+    # キャッシュを削除する（動画・モデル・経過日数で絞り込み可能）
+    python analysis_cache.py purge --all
+    python analysis_cache.py purge --video data/video/python_basic_guidance.mp4
+    python analysis_cache.py purge --older-than-days 30
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_CACHE_DIR = os.path.join("data", "output", "cache")
+DEFAULT_MAX_BYTES = int(float(os.getenv("ANALYSIS_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def sha256_text(text: str) -> str:
+    """文字列のSHA-256"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def sha256_file(path: str) -> str:
+    """ファイルを少しずつ読み込んでSHA-256を計算する"""
+    digest = hashlib.sha256()
+    buffer = bytearray(_HASH_BLOCK_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb") as f:
+        while True:
+            length = f.readinto(buffer)
+            if not length:
+                break
+            digest.update(view[:length])
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    内容のハッシュをキーにした解析結果のキャッシュ
+    Args:
+        cache_dir: キャッシュを保存するディレクトリ
+        max_bytes: キャッシュの合計サイズの上限（バイト）
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.entries_dir = os.path.join(cache_dir, "entries")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.entries_dir, exist_ok=True)
+
+    # --- 動画のハッシュ ---
+
+    def _hash_index_path(self) -> str:
+        return os.path.join(self.cache_dir, "file_hashes.json")
+
+    def _load_hash_index(self) -> Dict[str, dict]:
+        try:
+            with open(self._hash_index_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def file_hash(self, path: str) -> str:
+        """
+        ファイルの内容のハッシュを返す
+        大きな動画を毎回読み直さないよう、パス・サイズ・更新時刻が同じなら前回の値を使う
+        """
+        stat = os.stat(path)
+        abs_path = os.path.abspath(path)
+        with self._lock:
+            index = self._load_hash_index()
+            known = index.get(abs_path)
+            if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+                return known["sha256"]
+        digest = sha256_file(path)
+        with self._lock:
+            index = self._load_hash_index()
+            index[abs_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}
+            self._write_json(self._hash_index_path(), index)
+        return digest
+
+    # --- エントリの読み書き ---
+
+    @staticmethod
+    def make_key(content_hash: str, model: str, prompt: str, **params) -> str:
+        """
+        キャッシュのキーを作る
+        Args:
+            content_hash: 動画（または窓の動画）の内容のハッシュ
+            model: モデル名
+            prompt: プロンプト
+            params: 結果に影響するその他の設定（時間窓の長さなど）
+        """
+        material = {"content": content_hash, "model": model, "prompt": sha256_text(prompt), "params": params}
+        return sha256_text(json.dumps(material, sort_keys=True))
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.entries_dir, f"{key}.json")
+
+    def _write_json(self, path: str, data) -> None:
+        """一時ファイルに書いてから置き換え、読み込み途中のファイルが見えないようにする"""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, key: str) -> Optional[dict]:
+        """キャッシュを取得する。見つからない場合は None"""
+        path = self._entry_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        # 最後に使われた時刻として更新時刻を更新する（削除の順番に使う）
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry
+
+    def put(self, key: str, raw: str, processed: Optional[str] = None, **meta) -> dict:
+        """
+        キャッシュを保存する
+        Args:
+            key: make_keyで作ったキー
+            raw: モデルの出力
+            processed: 後処理後のテキスト
+            meta: 一覧表示用の情報（動画のパス、モデル名など）
+        """
+        entry = dict(meta, key=key, raw=raw, processed=processed, created_at=time.time())
+        self._write_json(self._entry_path(key), entry)
+        self.evict()
+        return entry
+
+    # --- 一覧・削除 ---
+
+    def entries(self) -> List[dict]:
+        """キャッシュの一覧（本文を除く）を最後に使われた順で返す"""
+        result = []
+        for name in os.listdir(self.entries_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.entries_dir, name)
+            try:
+                stat = os.stat(path)
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            entry.pop("raw", None)
+            entry.pop("processed", None)
+            entry.update(size=stat.st_size, last_used=stat.st_mtime)
+            result.append(entry)
+        return sorted(result, key=lambda e: e["last_used"], reverse=True)
+
+    def total_bytes(self) -> int:
+        total = 0
+        for name in os.listdir(self.entries_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                total += os.path.getsize(os.path.join(self.entries_dir, name))
+            except FileNotFoundError:
+                continue
+        return total
+
+    def remove(self, key: str) -> bool:
+        try:
+            os.remove(self._entry_path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """
+        合計サイズが上限を超えている場合、最後に使われた時刻の古いものから削除する
+        Returns:
+            削除したエントリの数
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        with self._lock:
+            files = []
+            for name in os.listdir(self.entries_dir):
+                if not name.endswith(".json"):
+                    continue  # 書き込み中の一時ファイルは対象外
+                path = os.path.join(self.entries_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in files)
+            removed = 0
+            for _, size, path in sorted(files):
+                if total <= limit:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        return removed
+
+    def purge(self, video_hash: Optional[str] = None, model: Optional[str] = None,
+              older_than: Optional[float] = None) -> int:
+        """
+        条件に合うキャッシュを削除する（条件を指定しない場合はすべて削除）
+        Args:
+            video_hash: この動画から作られたエントリ（窓単位のものを含む）だけを削除する
+            model: このモデルのエントリだけを削除する
+            older_than: 最後に使われてからこの秒数以上経ったエントリだけを削除する
+        Returns:
+            削除したエントリの数
+        """
+        now = time.time()
+        removed = 0
+        for entry in self.entries():
+            if video_hash and video_hash not in (entry.get("video_sha256"), entry.get("source_sha256")):
+                continue
+            if model and entry.get("model") != model:
+                continue
+            if older_than is not None and now - entry["last_used"] < older_than:
+                continue
+            removed += self.remove(entry["key"])
+        return removed
+
+    # --- 解析関数への組み込み ---
+
+    def analyze(self, video_path: str, generate: Callable[[str], Optional[str]], model: str, prompt: str,
+                postprocess: Optional[Callable[[str], str]] = None, **params) -> Optional[str]:
+        """
+        キャッシュがあればそれを使い、なければ解析して結果を保存する
+        Args:
+            video_path: 動画ファイルのパス
+            generate: 動画のパスを受け取り、モデルの出力を返す関数
+            model: モデル名
+            prompt: プロンプト
+            postprocess: モデルの出力に適用する後処理（省略時はそのまま）
+            params: 結果に影響するその他の設定（時間窓の長さなど）
+        Returns:
+            後処理後のテキスト（解析に失敗した場合は None）
+        """
+        video_hash = self.file_hash(video_path)
+        key = self.make_key(video_hash, model, prompt, **params)
+        entry = self.get(key)
+        if entry is not None:
+            print(f"キャッシュを使用します: {key[:12]}")
+            raw = entry["raw"]
+        else:
+            raw = generate(video_path)
+            if not raw:
+                return None
+        # 後処理は軽いので、処理内容の変更が反映されるよう毎回やり直す
+        processed = postprocess(raw) if postprocess else raw
+        if entry is None or entry.get("processed") != processed:
+            self.put(key, raw, processed, kind=params.get("kind", "full"), model=model,
+                     video=video_path, video_sha256=video_hash, params=params)
+        return processed
+
+    def cached_window_analyzer(self, analyze_window: Callable[[str], Optional[str]], model: str,
+                               prompt: str, source_path: Optional[str] = None) -> Callable[[str], Optional[str]]:
+        """
+        時間窓の解析関数をキャッシュ付きにする
+        窓の動画は同じ区間からは同じバイト列になるため、その内容のハッシュをキーにする
+        Args:
+            analyze_window: 窓の動画のパスを受け取り、解析結果を返す関数
+            model: モデル名
+            prompt: プロンプト
+            source_path: 元の動画のパス（一覧表示と削除の絞り込みに使う）
+        Returns:
+            analyze_windowと同じ引数・戻り値の関数
+        """
+        source_hash = self.file_hash(source_path) if source_path else None
+
+        def analyze(clip_path: str) -> Optional[str]:
+            clip_hash = sha256_file(clip_path)
+            key = self.make_key(clip_hash, model, prompt, kind="window")
+            entry = self.get(key)
+            if entry is not None:
+                print(f"キャッシュを使用します（時間窓）: {key[:12]}")
+                return entry["raw"]
+            raw = analyze_window(clip_path)
+            if raw:
+                self.put(key, raw, kind="window", model=model, video_sha256=clip_hash,
+                         source=source_path, source_sha256=source_hash)
+            return raw
+
+        return analyze
+
+
+def _format_size(size: float) -> str:
+    if size < 1024:
+        return f"{int(size)}B"
+    for unit in ("KB", "MB", "GB"):
+        size /= 1024
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f}{unit}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="動画解析結果のキャッシュを管理する")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="キャッシュのディレクトリ")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("list", help="キャッシュの一覧を表示する")
+    subparsers.add_parser("stats", help="キャッシュの件数と合計サイズを表示する")
+    purge_parser = subparsers.add_parser("purge", help="キャッシュを削除する")
+    purge_parser.add_argument("--all", action="store_true", help="すべて削除する")
+    purge_parser.add_argument("--video", help="この動画のキャッシュを削除する")
+    purge_parser.add_argument("--model", help="このモデルのキャッシュを削除する")
+    purge_parser.add_argument("--older-than-days", type=float, help="指定日数以上使われていないものを削除する")
+    evict_parser = subparsers.add_parser("evict", help="合計サイズが上限を超えた分を古い順に削除する")
+    evict_parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 2,
+                              help="合計サイズの上限（MB）")
+    args = parser.parse_args()
+
+    cache = AnalysisCache(args.cache_dir)
+    if args.command == "list":
+        for entry in cache.entries():
+            used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_used"]))
+            source = entry.get("source") or entry.get("video") or ""
+            print(f"{entry['key'][:12]}  {entry.get('kind', ''):<6}  {entry.get('model', ''):<18}  "
+                  f"{_format_size(entry['size']):>8}  {used}  {source}")
+    elif args.command == "stats":
+        entries = cache.entries()
+        kinds = {}
+        for entry in entries:
+            kinds[entry.get("kind", "")] = kinds.get(entry.get("kind", ""), 0) + 1
+        print(f"キャッシュ: {args.cache_dir}")
+        print(f"件数: {len(entries)} ({', '.join(f'{k}: {v}' for k, v in sorted(kinds.items()))})")
+        print(f"合計サイズ: {_format_size(cache.total_bytes())} / 上限 {_format_size(cache.max_bytes)}")
+    elif args.command == "purge":
+        if not (args.all or args.video or args.model or args.older_than_days is not None):
+            purge_parser.error("--all, --video, --model, --older-than-days のいずれかを指定してください")
+        video_hash = cache.file_hash(args.video) if args.video else None
+        older_than = args.older_than_days * 86400 if args.older_than_days is not None else None
+        removed = cache.purge(video_hash=video_hash, model=args.model, older_than=older_than)
+        print(f"{removed}件のキャッシュを削除しました")
+    elif args.command == "evict":
+        removed = cache.evict(int(args.max_mb * 1024 * 1024))
+        print(f"{removed}件のキャッシュを削除しました")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 import os
+import argparse
 import google.generativeai as genai
 from dotenv import load_dotenv
 from pathlib import Path
+from typing import Optional
+
+from video_windows import analyze_in_windows
+from analysis_cache import AnalysisCache
 
 # 環境変数の読み込み
 load_dotenv()
@@ -14,25 +19,10 @@ if not GOOGLE_API_KEY:
 # Gemini APIの設定
 genai.configure(api_key=GOOGLE_API_KEY)
 
-def analyze_video(video_path: str) -> str:
-    """
-    動画ファイルを解析し、スライドの内容と音声を理解して文字起こしを行う
-    Args:
-        video_path: 動画ファイルのパス
-    Returns:
-        解析結果のテキスト
-    """
-    try:
-        # 動画ファイルの読み込み
-        video_file = Path(video_path)
-        if not video_file.exists():
-            raise FileNotFoundError(f"動画ファイルが見つかりません: {video_path}")
+MODEL_NAME = 'gemini-pro-vision'
 
-        # Gemini Pro Visionモデルの設定
-        model = genai.GenerativeModel('gemini-pro-vision')
-
-        # プロンプトの設定
-        prompt = """
+# プロンプトの設定
+ANALYSIS_PROMPT = """
         この動画は教育用のスライドプレゼンテーションです。
         以下の点に注意して解析してください：
         1. スライドに表示されている内容を正確に読み取る
@@ -50,24 +40,98 @@ def analyze_video(video_path: str) -> str:
         [音声の文字起こし]
         """
 
-        # 動画の解析
-        response = model.generate_content([prompt, video_file])
-        
-        return response.text
+def generate_analysis(video_path: str) -> str:
+    """
+    動画ファイルを解析し、スライドの内容と音声を理解して文字起こしを行う
+    Args:
+        video_path: 動画ファイルのパス
+    Returns:
+        解析結果のテキスト
+    """
+    # 動画ファイルの読み込み
+    video_file = Path(video_path)
+    if not video_file.exists():
+        raise FileNotFoundError(f"動画ファイルが見つかりません: {video_path}")
+
+    # Gemini Pro Visionモデルの設定
+    model = genai.GenerativeModel(MODEL_NAME)
+
+    # 動画の解析
+    response = model.generate_content([ANALYSIS_PROMPT, video_file])
+    
+    return response.text
 
+def analyze_video(video_path: str, cache: AnalysisCache = None) -> str:
+    """
+    動画ファイルを解析し、スライドの内容と音声を理解して文字起こしを行う
+    Args:
+        video_path: 動画ファイルのパス
+        cache: 解析結果のキャッシュ（指定した場合、同じ動画・モデル・プロンプトの結果を再利用する）
+    Returns:
+        解析結果のテキスト
+    """
+    try:
+        if cache:
+            return cache.analyze(video_path, generate_analysis, MODEL_NAME, ANALYSIS_PROMPT)
+        return generate_analysis(video_path)
+
+    except Exception as e:
+        print(f"エラーが発生しました: {str(e)}")
+        return None
+
+def analyze_video_windowed(video_path: str, window_minutes: float = 10, overlap_seconds: float = 30,
+                           max_workers: int = 4, cache: AnalysisCache = None) -> str:
+    """
+    動画を時間窓に分割して並列に解析し、スライドごとの結果をまとめる
+    Args:
+        video_path: 動画ファイルのパス
+        window_minutes: 1つの時間窓の長さ（分）
+        overlap_seconds: 前の時間窓と重ねる長さ（秒）
+        max_workers: 同時に解析する時間窓の数
+        cache: 解析結果のキャッシュ（指定した場合、内容の変わっていない時間窓は解析し直さない）
+    Returns:
+        解析結果のテキスト（解析に失敗した時間窓がある場合は None）
+    """
+    try:
+        analyze_window = analyze_video
+        if cache:
+            analyze_window = cache.cached_window_analyzer(analyze_video, MODEL_NAME, ANALYSIS_PROMPT,
+                                                          source_path=video_path)
+
+        def generate(path: str) -> Optional[str]:
+            return analyze_in_windows(path, analyze_window, window_minutes * 60, overlap_seconds, max_workers)
+
+        if cache:
+            return cache.analyze(video_path, generate, MODEL_NAME, ANALYSIS_PROMPT, kind="windowed",
+                                 window_minutes=window_minutes, overlap_seconds=overlap_seconds)
+        return generate(video_path)
     except Exception as e:
         print(f"エラーが発生しました: {str(e)}")
         return None
 
 def main():
+    parser = argparse.ArgumentParser(description="講義動画を解析して文字起こしを行う")
     # 入力動画ファイルのパス
-    video_path = "data/video/python_basic_guidance.mp4"
-    
+    parser.add_argument("--video", default="data/video/python_basic_guidance.mp4", help="入力動画ファイル")
     # 出力テキストファイルのパス
-    output_path = "data/output/video_analysis.txt"
+    parser.add_argument("--output", default="data/output/video_analysis.txt", help="出力テキストファイル")
+    parser.add_argument("--window-minutes", type=float, default=0,
+                        help="指定すると動画をこの長さ（分）の時間窓に分割して並列に解析する")
+    parser.add_argument("--overlap-seconds", type=float, default=30, help="時間窓どうしを重ねる長さ（秒）")
+    parser.add_argument("--workers", type=int, default=4, help="同時に解析する時間窓の数")
+    parser.add_argument("--cache-dir", default="data/output/cache", help="解析結果のキャッシュのディレクトリ")
+    parser.add_argument("--no-cache", action="store_true", help="キャッシュを使わずに解析し直す")
+    args = parser.parse_args()
+    video_path = args.video
+    output_path = args.output
+    cache = None if args.no_cache else AnalysisCache(args.cache_dir)
     
     # 動画の解析
-    result = analyze_video(video_path)
+    if args.window_minutes > 0:
+        result = analyze_video_windowed(video_path, args.window_minutes, args.overlap_seconds, args.workers,
+                                        cache=cache)
+    else:
+        result = analyze_video(video_path, cache=cache)
     
     if result:
         # 出力ディレクトリの作成
@@ -0,0 +1,475 @@
+"""
+AssemblyAI による複数の音声の並行文字起こし（アップロード → ジョブ登録 → 状態の確認）
+
+AssemblyAI の SDK の `Transcriber().transcribe()` は、1つのファイルの文字起こしが終わるまで待つ。
+ここでは REST API を非同期に使い、全てのファイルのアップロードとジョブ登録を並行に進めてから、
+各ジョブの状態を間隔を広げながら確認し、終わったものから結果を受け取る。
+文字起こし自体はサーバー側で並行に進むため、N本の講義の処理時間は最も長い1本の処理時間に近づく。
+
+- アップロードとジョブ登録は同時実行数を制限する（状態の確認は待つだけなので制限しない）
+- レート制限（429）・サーバーエラー（5xx）・通信エラーは指数バックオフで再試行する
+- 文字起こしに失敗したジョブは status="error" の結果として返し、他のファイルの処理は続ける
+
+動作確認・計測用に、同じ手順（/v2/upload, /v2/transcript）に応答するローカルのサーバー FakeAssemblyAI を用意した。
+
+使い方:
+    # 複数の音声を並行に文字起こしする（APIキーは環境変数 ASSEMBLYAI_API_KEY）
+    python assemblyai_transcribe.py data/audio/day1.mp3 data/audio/day2.mp3 --output-dir data/output
+
+    # ローカルのサーバーで、1本ずつ待つ場合と並行に処理する場合の時間を比べる
+    python assemblyai_transcribe.py --benchmark
+"""
+import argparse
+import asyncio
+import email.utils
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+
+BASE_URL = "https://api.assemblyai.com"
+DEFAULT_CONFIG = {"language_code": "ja"}
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 5
+# 状態を確認する間隔（秒）。確認するごとに POLL_BACKOFF 倍にし、MAX_POLL_INTERVAL で止める
+POLL_INTERVAL = 3.0
+MAX_POLL_INTERVAL = 30.0
+POLL_BACKOFF = 1.5
+# アップロードで1回に送る大きさ（ファイル全体をメモリに読み込まない）
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+TRANSIENT_STATUS = {429, 500, 502, 503, 504}
+
+
+class TranscriptResult(NamedTuple):
+    """1つの音声の文字起こしの結果"""
+    audio_path: str
+    transcript_id: Optional[str]
+    status: str  # completed, error
+    text: Optional[str]
+    error: Optional[str]
+    seconds: float  # アップロードを始めてから結果を受け取るまで
+    polls: int  # 状態を確認した回数
+
+
+class AssemblyAIError(Exception):
+    """再試行しても成功しなかったリクエスト、または形式の正しくない応答のエラー"""
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Retry-After ヘッダー（秒数または HTTP の日時）を待つ秒数にする（解釈できない場合は None）"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+        return max(0.0, seconds) if math.isfinite(seconds) else None
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _field(result: dict, key: str, request: str) -> str:
+    """応答から必要な項目を取り出す（ない場合は AssemblyAIError）"""
+    value = result.get(key)
+    if value is None:
+        raise AssemblyAIError(f"{request}: 応答に {key} がありません: {json.dumps(result, ensure_ascii=False)[:200]}")
+    return value
+
+
+class AsyncAssemblyAI:
+    """
+    AssemblyAI の REST API の非同期クライアント
+    Args:
+        api_key: APIキー
+        base_url: API の URL（ローカルのサーバーで試す場合はその URL）
+        concurrency: 同時に行うアップロード・ジョブ登録の数
+        poll_interval: 最初に状態を確認するまでの間隔（秒）
+        max_poll_interval: 状態を確認する間隔の上限（秒）
+        max_retries: 一時的なエラーで再試行する回数
+        backoff: 再試行の待ち時間の基準（秒。回数ごとに倍にし、ランダムに短くする）
+        timeout: 1回のリクエストのタイムアウト（秒）
+    """
+
+    def __init__(self, api_key: str, base_url: str = BASE_URL, concurrency: int = DEFAULT_CONCURRENCY,
+                 poll_interval: float = POLL_INTERVAL, max_poll_interval: float = MAX_POLL_INTERVAL,
+                 max_retries: int = DEFAULT_MAX_RETRIES, backoff: float = 1.0, timeout: float = 60.0):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.retries = 0
+
+    async def _request(self, client: httpx.AsyncClient, method: str, path: str,
+                       body: Optional[Callable[[], object]] = None, **kwargs) -> dict:
+        """
+        リクエストを送り、応答の JSON を返す（一時的なエラーは再試行する）
+        応答が JSON のオブジェクトでない場合は AssemblyAIError を送出する
+        Args:
+            body: 送る内容を作る関数（再試行のたびに作り直す。ファイルの読み込みを最初からやり直すため）
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                if body is not None:
+                    kwargs["content"] = body()
+                response = await client.request(method, self.base_url + path, **kwargs)
+                if response.status_code not in TRANSIENT_STATUS:
+                    if response.is_error:
+                        raise AssemblyAIError(f"{method} {path}: {response.status_code} {response.text}")
+                    try:
+                        result = response.json()
+                    except ValueError:
+                        result = None
+                    if not isinstance(result, dict):
+                        raise AssemblyAIError(f"{method} {path}: 応答が JSON のオブジェクトではありません: "
+                                              f"{response.text[:200]}")
+                    return result
+                error = f"{response.status_code} {response.text}"
+                retry_after = retry_after_seconds(response.headers.get("retry-after"))
+            except httpx.TransportError as e:
+                error, retry_after = f"{type(e).__name__}: {e}", None
+            except httpx.HTTPError as e:
+                raise AssemblyAIError(f"{method} {path}: {type(e).__name__}: {e}") from e
+            if attempt > self.max_retries:
+                raise AssemblyAIError(f"{method} {path}: {error}")
+            self.retries += 1
+            # Retry-After を解釈できない場合は指数バックオフで待つ
+            delay = retry_after if retry_after is not None else \
+                self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.0)
+            print(f"警告: AssemblyAIの一時的なエラーのため{delay:.1f}秒後に再試行します（{attempt}回目）: {error}")
+            await asyncio.sleep(delay)
+
+    async def upload(self, client: httpx.AsyncClient, audio_path: str) -> str:
+        """音声ファイルを少しずつ読みながらアップロードし、アップロード先の URL を返す"""
+        async def read_chunks() -> AsyncIterator[bytes]:
+            with open(audio_path, "rb") as f:
+                while True:
+                    chunk = await asyncio.get_running_loop().run_in_executor(None, f.read, UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        result = await self._request(client, "POST", "/v2/upload", body=read_chunks,
+                                     headers={"content-length": str(os.path.getsize(audio_path))})
+        return _field(result, "upload_url", "POST /v2/upload")
+
+    async def submit(self, client: httpx.AsyncClient, audio_url: str, config: Optional[dict] = None) -> str:
+        """文字起こしのジョブを登録し、ジョブのIDを返す"""
+        result = await self._request(client, "POST", "/v2/transcript", json=dict(config or {}, audio_url=audio_url))
+        return _field(result, "id", "POST /v2/transcript")
+
+    async def wait(self, client: httpx.AsyncClient, transcript_id: str) -> Tuple[dict, int]:
+        """
+        ジョブが終わるまで間隔を広げながら状態を確認する
+        Returns:
+            (最後の応答, 確認した回数)
+        """
+        interval = self.poll_interval
+        polls = 0
+        while True:
+            await asyncio.sleep(interval)
+            polls += 1
+            result = await self._request(client, "GET", f"/v2/transcript/{transcript_id}")
+            if _field(result, "status", f"GET /v2/transcript/{transcript_id}") in ("completed", "error"):
+                return result, polls
+            interval = min(interval * POLL_BACKOFF, self.max_poll_interval)
+
+    async def transcribe(self, client: httpx.AsyncClient, audio_path: str, semaphore: asyncio.Semaphore,
+                         config: Optional[dict] = None) -> TranscriptResult:
+        """1つの音声を文字起こしする（URL の場合はアップロードしない）。失敗しても例外は送出しない"""
+        started = time.perf_counter()
+        transcript_id = None
+        try:
+            async with semaphore:
+                if audio_path.startswith(("http://", "https://")):
+                    audio_url = audio_path
+                else:
+                    audio_url = await self.upload(client, audio_path)
+                transcript_id = await self.submit(client, audio_url, config)
+            result, polls = await self.wait(client, transcript_id)
+        except (AssemblyAIError, OSError) as e:
+            return TranscriptResult(audio_path, transcript_id, "error", None, str(e),
+                                    time.perf_counter() - started, 0)
+        return TranscriptResult(audio_path, transcript_id, result["status"], result.get("text"), result.get("error"),
+                                time.perf_counter() - started, polls)
+
+    async def transcribe_many(self, audio_paths: List[str], config: Optional[dict] = None,
+                              on_result: Optional[Callable[[TranscriptResult], None]] = None) -> List[TranscriptResult]:
+        """
+        複数の音声を並行に文字起こしする
+        Args:
+            audio_paths: 音声ファイルのパス（または URL）のリスト
+            config: ジョブの設定（省略時は日本語）
+            on_result: 終わった順に結果を受け取る関数
+        Returns:
+            audio_paths と同じ順の結果のリスト
+        """
+        config = DEFAULT_CONFIG if config is None else config
+        semaphore = asyncio.Semaphore(self.concurrency)
+        headers = {"authorization": self.api_key}
+        limits = httpx.Limits(max_connections=self.concurrency * 2)
+        async with httpx.AsyncClient(headers=headers, timeout=self.timeout, limits=limits) as client:
+            tasks = [asyncio.ensure_future(self.transcribe(client, path, semaphore, config)) for path in audio_paths]
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                if on_result:
+                    on_result(result)
+            return [task.result() for task in tasks]
+
+
+def transcribe_files(audio_paths: List[str], api_key: str, config: Optional[dict] = None,
+                     on_result: Optional[Callable[[TranscriptResult], None]] = None,
+                     **options) -> List[TranscriptResult]:
+    """
+    複数の音声を並行に文字起こしする（同期版）
+    Args:
+        audio_paths: 音声ファイルのパス（または URL）のリスト
+        api_key: APIキー
+        config: ジョブの設定（省略時は日本語）
+        on_result: 終わった順に結果を受け取る関数
+        options: AsyncAssemblyAI の引数
+    Returns:
+        audio_paths と同じ順の結果のリスト
+    """
+    client = AsyncAssemblyAI(api_key, **options)
+    return asyncio.run(client.transcribe_many(audio_paths, config, on_result))
+
+
+# --- 動作確認・計測用のローカルのサーバー ---
+
+class FakeAssemblyAI:
+    """
+    AssemblyAI と同じ手順に応答するローカルのサーバー（別スレッドで動かす）
+    文字起こしは登録から「アップロードされた大きさ(MB)×seconds_per_mb + base_seconds」秒後に終わり、
+    テキストは「<アップロードの番号> の文字起こし（<バイト数> bytes）」になる。音声として短すぎるファイルは error にする
+    Args:
+        api_key: 受け付けるAPIキー
+        base_seconds: 文字起こしにかかる時間の固定部分（秒）
+        seconds_per_mb: 1MBあたりの文字起こしの時間（秒）
+        failure_rate: 一時的なエラー（503）を返す割合
+        seed: 乱数の種
+    """
+
+    MIN_AUDIO_BYTES = 44  # WAV のヘッダーの大きさ
+
+    def __init__(self, api_key: str = "test-key", base_seconds: float = 0.2, seconds_per_mb: float = 0.0,
+                 failure_rate: float = 0.0, seed: int = 0):
+        self.api_key = api_key
+        self.base_seconds = base_seconds
+        self.seconds_per_mb = seconds_per_mb
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.uploads: Dict[str, int] = {}
+        self.jobs: Dict[str, dict] = {}
+        self.requests = 0
+        self.failures = 0
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAssemblyAI":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                fake._handle(self)
+
+            def do_GET(self) -> None:
+                fake._handle(self)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fake-assemblyai", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self) -> "FakeAssemblyAI":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _reply(self, handler: BaseHTTPRequestHandler, status: int, body: dict) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("content-type", "application/json")
+        handler.send_header("content-length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _read_body(self, handler: BaseHTTPRequestHandler) -> bytes:
+        if "chunked" in handler.headers.get("transfer-encoding", ""):
+            parts = []
+            while True:
+                size = int(handler.rfile.readline().strip(), 16)
+                parts.append(handler.rfile.read(size))
+                handler.rfile.readline()
+                if size == 0:
+                    return b"".join(parts)
+        return handler.rfile.read(int(handler.headers.get("content-length", 0)))
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        body = self._read_body(handler) if handler.command == "POST" else b""
+        with self.lock:
+            self.requests += 1
+            transient = self.random.random() < self.failure_rate
+            if transient:
+                self.failures += 1
+        if handler.headers.get("authorization") != self.api_key:
+            return self._reply(handler, 401, {"error": "Authentication error, API token missing/invalid"})
+        if transient:
+            return self._reply(handler, 503, {"error": "Service temporarily unavailable"})
+
+        path = handler.path
+        if handler.command == "POST" and path == "/v2/upload":
+            upload_id = uuid.uuid4().hex
+            with self.lock:
+                self.uploads[upload_id] = len(body)
+            return self._reply(handler, 200, {"upload_url": f"{self.base_url}/files/{upload_id}"})
+
+        if handler.command == "POST" and path == "/v2/transcript":
+            request = json.loads(body or b"{}")
+            size = self.uploads.get(request.get("audio_url", "").rsplit("/", 1)[-1])
+            if size is None:
+                return self._reply(handler, 400, {"error": "audio_url is not a valid upload"})
+            job = {"id": uuid.uuid4().hex, "size": size, "submitted": time.monotonic(),
+                   "seconds": self.base_seconds + size / (1 << 20) * self.seconds_per_mb,
+                   "language_code": request.get("language_code")}
+            with self.lock:
+                self.jobs[job["id"]] = job
+                number = len(self.jobs)
+            job["text"] = f"{number} の文字起こし（{size} bytes）"
+            return self._reply(handler, 200, {"id": job["id"], "status": "queued"})
+
+        if handler.command == "GET" and path.startswith("/v2/transcript/"):
+            job = self.jobs.get(path.rsplit("/", 1)[-1])
+            if job is None:
+                return self._reply(handler, 404, {"error": "Transcript not found"})
+            elapsed = time.monotonic() - job["submitted"]
+            response = {"id": job["id"], "language_code": job["language_code"]}
+            if elapsed < job["seconds"]:
+                response["status"] = "queued" if elapsed < job["seconds"] / 10 else "processing"
+            elif job["size"] < self.MIN_AUDIO_BYTES:
+                response.update(status="error", error="File does not appear to contain audio.")
+            else:
+                response.update(status="completed", text=job["text"])
+            return self._reply(handler, 200, response)
+
+        self._reply(handler, 404, {"error": f"Not found: {handler.command} {path}"})
+
+
+# --- ベンチマーク ---
+
+def benchmark(lectures: int = 8, seconds_per_mb: float = 2.0, concurrency: int = 4) -> None:
+    """
+    ローカルのサーバーで、1本ずつ文字起こしを待つ場合と並行に処理する場合の時間を比べる
+    Args:
+        lectures: 講義の数（音声の長さを 10〜40秒 の間で変える）
+        seconds_per_mb: 1MBあたりのサーバー側の文字起こしの時間（秒）
+        concurrency: 同時に行うアップロード・ジョブ登録の数
+    """
+    from transcribe_audio import make_sample_audio
+
+    with tempfile.TemporaryDirectory() as tmp, FakeAssemblyAI(seconds_per_mb=seconds_per_mb) as server:
+        paths = [make_sample_audio(os.path.join(tmp, f"lecture{i}.wav"), 10 + 30 * i / max(lectures - 1, 1))
+                 for i in range(lectures)]
+        job_seconds = [0.2 + os.path.getsize(p) / (1 << 20) * seconds_per_mb for p in paths]
+        print(f"講義 {lectures}本, サーバー側の文字起こし {min(job_seconds):.1f}〜{max(job_seconds):.1f}秒"
+              f"（合計 {sum(job_seconds):.1f}秒）")
+        options = {"base_url": server.base_url, "poll_interval": 0.1, "max_poll_interval": 0.5}
+
+        start = time.perf_counter()
+        for path in paths:
+            transcribe_files([path], server.api_key, concurrency=1, **options)
+        sequential = time.perf_counter() - start
+        print(f"1本ずつ: {sequential:.2f}秒")
+
+        start = time.perf_counter()
+        results = transcribe_files(paths, server.api_key, concurrency=concurrency, **options)
+        parallel = time.perf_counter() - start
+        assert all(r.status == "completed" for r in results)
+        print(f"並行（同時アップロード {concurrency}）: {parallel:.2f}秒"
+              f"（最も長いジョブの {parallel / max(job_seconds):.2f}倍, 1本ずつの {sequential / parallel:.1f}倍速）, "
+              f"状態の確認 {sum(r.polls for r in results)}回")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AssemblyAIで複数の音声を並行に文字起こしする")
+    parser.add_argument("audio", nargs="*", help="音声ファイルのパス（または URL）")
+    parser.add_argument("--output-dir", default="data/output", help="文字起こし結果の出力ディレクトリ")
+    parser.add_argument("--language", default="ja", help="言語コード")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="同時に行うアップロードの数")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL, help="状態を確認する最初の間隔（秒）")
+    parser.add_argument("--base-url", default=BASE_URL, help="API の URL")
+    parser.add_argument("--benchmark", action="store_true", help="1本ずつ待つ場合と並行に処理する場合の時間を比べる")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(concurrency=args.concurrency)
+        return
+    if not args.audio:
+        parser.print_help()
+        return
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    api_key = os.getenv("ASSEMBLYAI_API_KEY")
+    if not api_key:
+        parser.error("環境変数 ASSEMBLYAI_API_KEY を設定してください")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    def save(result: TranscriptResult) -> None:
+        name = os.path.splitext(os.path.basename(result.audio_path.split("?", 1)[0]))[0]
+        if result.status != "completed":
+            print(f"{name}: 失敗: {result.error}")
+            return
+        output_path = os.path.join(args.output_dir, f"{name}.txt")
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(result.text or "")
+        print(f"{name}: {result.seconds:.1f}秒 → {output_path}")
+
+    start = time.perf_counter()
+    results = transcribe_files(args.audio, api_key, {"language_code": args.language}, on_result=save,
+                               base_url=args.base_url, concurrency=args.concurrency,
+                               poll_interval=args.poll_interval)
+    done = sum(r.status == "completed" for r in results)
+    print(f"完了: {done}件, 失敗: {len(results) - done}件 / 経過 {time.perf_counter() - start:.1f}秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,19 @@
 import os
 import torch
-from transformers import pipeline
+from transformers import pipeline, AutoModelForCausalLM, AutoTokenizer
 import time
 import traceback
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+import shutil
+import threading
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional
 import uvicorn
 import nest_asyncio
 from pyngrok import ngrok
+from generation_cache import GenerationCache
 
 # --- 設定 ---
 # モデル名を設定
@@ -23,6 +27,16 @@ class Config:
 
 config = Config(MODEL_NAME)
 
+# --- 生成結果キャッシュの設定 ---
+# 決定的な生成（do_sample=False）の結果をサーバー側でキャッシュする
+CACHE_MAX_ENTRIES = int(os.environ.get("GENERATION_CACHE_SIZE", "256"))  # メモリ上に保持する件数
+CACHE_DIR = os.environ.get("GENERATION_CACHE_DIR")  # 設定した場合のみディスクにも保存
+
+# --- モデルスナップショットの設定 ---
+# 設定した場合、初回読み込み後にモデル(safetensors)とトークナイザー(tokenizer.json)を保存し、
+# 次回以降の起動ではそこからメモリマップで高速に読み込む
+MODEL_SNAPSHOT_DIR = os.environ.get("MODEL_SNAPSHOT_DIR")
+
 # --- FastAPIアプリケーション定義 ---
 app = FastAPI(
     title="ローカルLLM APIサービス",
@@ -56,31 +70,156 @@ class GenerationResponse(BaseModel):
     generated_text: str
     response_time: float
 
+# --- 生成結果キャッシュ ---
+generation_cache = GenerationCache(CACHE_MAX_ENTRIES, CACHE_DIR, model_name=config.MODEL_NAME)
+
 # --- モデル関連の関数 ---
 # モデルのグローバル変数
 model = None
 
+class ModelLoadState:
+    """モデル読み込みの進行状況とフェーズごとの所要時間を記録する"""
+
+    # フェーズ名と完了時点の進捗率
+    PHASES = {
+        "tokenizer": 0.1,
+        "weights": 0.8,
+        "pipeline": 0.9,
+        "snapshot_save": 1.0,
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.status = "idle"  # idle / loading / ready / error
+        self.phase = None
+        self.progress = 0.0
+        self.source = None  # "snapshot" または "hub"
+        self.started_at = None
+        self.timings = {}
+        self.error = None
+
+    def start(self, source):
+        with self._lock:
+            self.status = "loading"
+            self.source = source
+            self.phase = None
+            self.progress = 0.0
+            self.started_at = time.time()
+            self.timings = {}
+            self.error = None
+
+    def run_phase(self, name, fn):
+        """フェーズを実行し、所要時間と進捗を記録する"""
+        with self._lock:
+            self.phase = name
+        phase_start = time.time()
+        result = fn()
+        elapsed = time.time() - phase_start
+        with self._lock:
+            self.timings[name] = round(elapsed, 3)
+            self.progress = self.PHASES[name]
+        print(f"起動フェーズ '{name}' が完了しました: {elapsed:.2f}秒")
+        return result
+
+    def finish(self, error=None):
+        with self._lock:
+            self.timings["total"] = round(time.time() - self.started_at, 3)
+            self.phase = None
+            if error is None:
+                self.status = "ready"
+                self.progress = 1.0
+            else:
+                self.status = "error"
+                self.error = str(error)
+
+    def snapshot(self):
+        with self._lock:
+            info = {
+                "status": self.status,
+                "phase": self.phase,
+                "progress": self.progress,
+                "source": self.source,
+                "timings": dict(self.timings),
+            }
+            if self.status == "loading":
+                info["elapsed"] = round(time.time() - self.started_at, 3)
+            if self.error:
+                info["error"] = self.error
+            return info
+
+load_state = ModelLoadState()
+# 読み込みの多重実行を防ぐためのロック
+model_load_lock = threading.Lock()
+
+def snapshot_exists(snapshot_dir):
+    """スナップショットに必要なファイルが揃っているか"""
+    if not snapshot_dir or not os.path.isdir(snapshot_dir):
+        return False
+    files = os.listdir(snapshot_dir)
+    return ("config.json" in files and "tokenizer.json" in files
+            and any(name.endswith(".safetensors") for name in files))
+
 def load_model():
     """推論用のLLMモデルを読み込む"""
     global model  # グローバル変数を更新するために必要
+    use_snapshot = snapshot_exists(MODEL_SNAPSHOT_DIR)
+    load_state.start("snapshot" if use_snapshot else "hub")
     try:
         device = "cuda" if torch.cuda.is_available() else "cpu"
         print(f"使用デバイス: {device}")
-        pipe = pipeline(
-            "text-generation",
-            model=config.MODEL_NAME,
-            model_kwargs={"torch_dtype": torch.bfloat16},
-            device=device
+        source = MODEL_SNAPSHOT_DIR if use_snapshot else config.MODEL_NAME
+        print(f"モデルの読み込み元: {source}")
+        tokenizer = load_state.run_phase(
+            "tokenizer", lambda: AutoTokenizer.from_pretrained(source, use_fast=True)
         )
+        # safetensorsはメモリマップで読み込まれるため、スナップショットからの読み込みは高速
+        llm = load_state.run_phase(
+            "weights",
+            lambda: AutoModelForCausalLM.from_pretrained(
+                source,
+                torch_dtype=torch.bfloat16,
+                low_cpu_mem_usage=True,
+                use_safetensors=True if use_snapshot else None,
+            ),
+        )
+        pipe = load_state.run_phase(
+            "pipeline",
+            lambda: pipeline("text-generation", model=llm, tokenizer=tokenizer, device=device),
+        )
+        if MODEL_SNAPSHOT_DIR and not use_snapshot:
+            # 保存に失敗しても（ディスク容量・権限など）、読み込んだモデルはそのまま使う
+            try:
+                load_state.run_phase("snapshot_save", lambda: save_snapshot(llm, tokenizer, MODEL_SNAPSHOT_DIR))
+            except Exception as e:
+                print(f"警告: モデルのスナップショットの保存に失敗しました（読み込んだモデルで続行します）: {e}")
+                traceback.print_exc()
         print(f"モデル '{config.MODEL_NAME}' の読み込みに成功しました")
         model = pipe  # グローバル変数を更新
+        load_state.finish()
         return pipe
     except Exception as e:
         error_msg = f"モデル '{config.MODEL_NAME}' の読み込みに失敗: {e}"
         print(error_msg)
         traceback.print_exc()  # 詳細なエラー情報を出力
+        load_state.finish(error=e)
         return None
 
+def save_snapshot(llm, tokenizer, snapshot_dir):
+    """モデルをsafetensors形式、トークナイザーをtokenizer.jsonとして保存する"""
+    tmp_dir = snapshot_dir.rstrip("/") + ".tmp"
+    try:
+        llm.save_pretrained(tmp_dir, safe_serialization=True)
+        tokenizer.save_pretrained(tmp_dir)
+    except BaseException:
+        # 書きかけのファイルを残さない
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    # 保存途中のスナップショットを読み込まないよう、完成してから配置する
+    if os.path.isdir(snapshot_dir):
+        shutil.rmtree(snapshot_dir)
+    os.replace(tmp_dir, snapshot_dir)
+    print(f"モデルのスナップショットを保存しました: {snapshot_dir}")
+
 def extract_assistant_response(outputs, user_prompt):
     """モデルの出力からアシスタントの応答を抽出する"""
     assistant_response = ""
@@ -133,12 +272,10 @@ def extract_assistant_response(outputs, user_prompt):
 # --- FastAPIエンドポイント定義 ---
 @app.on_event("startup")
 async def startup_event():
-    """起動時にモデルを初期化"""
-    load_model_task()  # バックグラウンドではなく同期的に読み込む
-    if model is None:
-        print("警告: 起動時にモデルの初期化に失敗しました")
-    else:
-        print("起動時にモデルの初期化が完了しました。")
+    """起動時にモデルの読み込みをバックグラウンドで開始"""
+    # 読み込み中もサーバーは応答し、/healthは"loading"を返す
+    threading.Thread(target=load_model_task, daemon=True).start()
+    print("起動時にモデルの読み込みをバックグラウンドで開始しました。")
 
 @app.get("/")
 async def root():
@@ -149,20 +286,48 @@ async def root():
 async def health_check():
     """ヘルスチェックエンドポイント"""
     global model
+    startup = load_state.snapshot()
     if model is None:
-        return {"status": "error", "message": "No model loaded"}
-
-    return {"status": "ok", "model": config.MODEL_NAME}
+        if startup["status"] in ("idle", "loading"):
+            return {"status": "loading", "message": "Model is loading",
+                    "startup": startup, "cache": generation_cache.stats()}
+        return {"status": "error", "message": "No model loaded",
+                "startup": startup, "cache": generation_cache.stats()}
+
+    return {"status": "ok", "model": config.MODEL_NAME,
+            "startup": startup, "cache": generation_cache.stats()}
+
+def run_generation(request: SimpleGenerationRequest) -> str:
+    """モデル推論を実行してアシスタントの応答を返す"""
+    print("モデル推論を開始...")
+    outputs = model(
+        request.prompt,
+        max_new_tokens=request.max_new_tokens,
+        do_sample=request.do_sample,
+        temperature=request.temperature,
+        top_p=request.top_p,
+    )
+    print("モデル推論が完了しました。")
+
+    # アシスタント応答を抽出
+    assistant_response = extract_assistant_response(outputs, request.prompt)
+    print(f"抽出されたアシスタント応答: {assistant_response[:100]}...")  # 長い場合は切り捨て
+    return assistant_response
 
 # 簡略化されたエンドポイント
 @app.post("/generate", response_model=GenerationResponse)
-async def generate_simple(request: SimpleGenerationRequest):
+async def generate_simple(request: SimpleGenerationRequest, response: Response):
     """単純なプロンプト入力に基づいてテキストを生成"""
     global model
 
+    if model is None and load_state.status in ("idle", "loading"):
+        print("generateエンドポイント: モデルを読み込み中です。")
+        raise HTTPException(status_code=503, detail="モデルを読み込み中です。しばらくしてからお試しください。",
+                            headers={"Retry-After": "10"})
+
     if model is None:
         print("generateエンドポイント: モデルが読み込まれていません。読み込みを試みます...")
-        load_model_task()  # 再度読み込みを試みる
+        await run_in_threadpool(load_model_task)  # 再度読み込みを試みる
         if model is None:
             print("generateエンドポイント: モデルの読み込みに失敗しました。")
             raise HTTPException(status_code=503, detail="モデルが利用できません。後でもう一度お試しください。")
@@ -171,20 +336,20 @@ async def generate_simple(request: SimpleGenerationRequest):
         start_time = time.time()
         print(f"シンプルなリクエストを受信: prompt={request.prompt[:100]}..., max_new_tokens={request.max_new_tokens}")  # 長いプロンプトは切り捨て
 
-        # プロンプトテキストで直接応答を生成
-        print("モデル推論を開始...")
-        outputs = model(
-            request.prompt,
-            max_new_tokens=request.max_new_tokens,
-            do_sample=request.do_sample,
-            temperature=request.temperature,
-            top_p=request.top_p,
-        )
-        print("モデル推論が完了しました。")
-
-        # アシスタント応答を抽出
-        assistant_response = extract_assistant_response(outputs, request.prompt)
-        print(f"抽出されたアシスタント応答: {assistant_response[:100]}...")  # 長い場合は切り捨て
+        if GenerationCache.is_cacheable(request):
+            # 決定的な生成はキャッシュを利用し、同一リクエストの同時実行は1回の生成にまとめる
+            cache_key = GenerationCache.make_key(config.MODEL_NAME, request)
+            cache_status, assistant_response = await generation_cache.get_or_generate(
+                cache_key, lambda: run_generation(request)
+            )
+            print(f"キャッシュ: {cache_status}")
+            response.headers["X-Cache"] = cache_status
+            # キャッシュはサーバー側で持つため、クライアントや共有プロキシには保存させない
+            response.headers["Cache-Control"] = "no-store"
+        else:
+            assistant_response = await run_in_threadpool(run_generation, request)
+            response.headers["X-Cache"] = "BYPASS"
+            response.headers["Cache-Control"] = "no-store"
 
         end_time = time.time()
         response_time = end_time - start_time
@@ -203,9 +368,13 @@ async def generate_simple(request: SimpleGenerationRequest):
 def load_model_task():
     """モデルを読み込むバックグラウンドタスク"""
     global model
-    print("load_model_task: モデルの読み込みを開始...")
-    # load_model関数を呼び出し、結果をグローバル変数に設定
-    loaded_pipe = load_model()
+    # 他のスレッドで読み込み中の場合はその完了を待つ
+    with model_load_lock:
+        if model is not None:
+            return
+        print("load_model_task: モデルの読み込みを開始...")
+        # load_model関数を呼び出し、結果をグローバル変数に設定
+        loaded_pipe = load_model()
     if loaded_pipe:
         model = loaded_pipe  # グローバル変数を更新
         print("load_model_task: モデルの読み込みが完了しました。")
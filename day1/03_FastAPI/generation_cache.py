@@ -0,0 +1,147 @@
+"""
+生成結果キャッシュ
+
+app.py の /generate で、決定的な生成（do_sample=False）の結果をメモリ(LRU)とディスクに保持する。
+同じキーの生成が実行中の場合は新たに生成せず、その結果を待つ（リクエストの集約）。
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class GenerationCache:
+    """メモリ(LRU)とディスクの2層で生成結果を保持するキャッシュ"""
+
+    def __init__(self, max_entries=256, cache_dir=None, model_name=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.model_name = model_name  # ディスクに保存する結果に記録するモデル名
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # 同一キーで実行中の生成（キー -> asyncio.Future）
+        self._inflight = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def is_cacheable(request):
+        """出力が決定的になるリクエストかどうか（サンプリングする場合は temperature によらず決定的ではない）"""
+        return not request.do_sample
+
+    @staticmethod
+    def make_key(model_name, request):
+        """モデル名・プロンプトのハッシュ・生成パラメータからキーを作成"""
+        prompt_hash = hashlib.sha256(request.prompt.encode("utf-8")).hexdigest()
+        # 貪欲法ではtemperature/top_pは出力に影響しないためキーに含めない
+        key_source = json.dumps({
+            "model": model_name,
+            "prompt": prompt_hash,
+            "max_new_tokens": request.max_new_tokens,
+            "decoding": "greedy",
+        }, sort_keys=True)
+        return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _remember(self, key, text):
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """キャッシュを参照する。見つかった層("memory"/"disk")とテキストを返す"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return "memory", self._entries[key]
+        if self.cache_dir and os.path.exists(self._disk_path(key)):
+            try:
+                with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                    text = json.load(f)["generated_text"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"キャッシュファイルの読み込みに失敗しました: {e}")
+            else:
+                self._remember(key, text)  # メモリ層に昇格
+                with self._lock:
+                    self.disk_hits += 1
+                return "disk", text
+        return None, None
+
+    def put(self, key, text):
+        """生成結果を保存する"""
+        self._remember(key, text)
+        if self.cache_dir:
+            tmp_path = self._disk_path(key) + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "generated_text": text,
+                               "created_at": time.time()}, f, ensure_ascii=False)
+                os.replace(tmp_path, self._disk_path(key))
+            except OSError as e:
+                print(f"キャッシュファイルの書き込みに失敗しました: {e}")
+
+    async def get_or_generate(self, key, generate_fn):
+        """
+        キャッシュを参照し、なければ生成する。
+        同じキーの生成が実行中の場合は新たに生成せず、その結果を待つ
+        Returns:
+            (キャッシュの状態, 生成テキスト)
+        """
+        source, text = self.get(key)
+        if text is not None:
+            return f"HIT-{source.upper()}", text
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            with self._lock:
+                self.coalesced += 1
+            return "COALESCED", await asyncio.shield(inflight)
+
+        with self._lock:
+            self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            text = await asyncio.to_thread(generate_fn)
+            self.put(key, text)
+            future.set_result(text)
+            return "MISS", text
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 待機者がいない場合の未取得例外の警告を防ぐ
+            raise
+        finally:
+            if not future.done():
+                # 生成を待つ間にこのリクエストがキャンセルされた（クライアントの切断など）場合も待機者を解放する
+                future.set_exception(RuntimeError("同じリクエストの生成が中断されました"))
+                future.exception()
+            self._inflight.pop(key, None)
+
+    def stats(self):
+        """ヒット率などの統計情報"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.coalesced + self.misses
+            hits = self.memory_hits + self.disk_hits + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_enabled": bool(self.cache_dir),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "inflight": len(self._inflight),
+            }
@@ -0,0 +1,105 @@
+"""
+テキストの埋め込みベクトル
+
+get_embedder() で名前から埋め込みを作る関数を返す。どの関数もテキストのリストを受け取り、
+長さ1に正規化した float32 の行列（テキスト数 × 次元数）を返す。
+検索の質問文は queries() で埋め込む（質問用のプロンプトを持つモデルではそれを使う）。
+
+    hashing                   文字n-gramを特徴量ハッシュで固定長にしたもの（追加の依存なし・決定的）
+    st:<モデル名>             sentence-transformers のモデル（例: st:intfloat/multilingual-e5-small）
+
+sentence-transformers は使うときに初めて読み込む（インストールされていなくても hashing は使える）。
+"""
+import re
+import zlib
+from typing import Callable, List, Optional
+
+import numpy as np
+
+DEFAULT_EMBEDDER = "hashing"
+# "hashing" と指定した場合の次元数
+HASHING_DIM = 512
+
+
+class HashingEmbedder:
+    """
+    文字の2-gram・3-gramと英単語を特徴量ハッシュで dim 次元に集計した埋め込み
+    学習済みモデルを使わないため意味の近さは捉えられないが、表記の重なりは捉えられる
+    Args:
+        dim: 次元数
+    """
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        text = re.sub(r"\s+", " ", text.lower())
+        features = re.findall(r"[a-z][a-z0-9]+", text)
+        for n in (2, 3):
+            features.extend(text[i:i + n] for i in range(len(text) - n + 1))
+        return features
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = zlib.crc32(feature.encode("utf-8"))
+                # 最上位ビットで符号を決め、衝突による偏りを打ち消す
+                vectors[row, digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return normalize(vectors)
+
+    def queries(self, texts: List[str]) -> np.ndarray:
+        return self(texts)
+
+
+class SentenceTransformerEmbedder:
+    """
+    sentence-transformers のモデルによる埋め込み
+    Args:
+        model_name: モデル名
+        batch_size: 1回に埋め込むテキスト数
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 32):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, trust_remote_code=True)
+        self.batch_size = batch_size
+        self.name = f"st:{model_name}"
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def __call__(self, texts: List[str], **options) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True,
+                                    normalize_embeddings=True, show_progress_bar=False, **options)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def queries(self, texts: List[str]) -> np.ndarray:
+        # inf-retriever など、質問用のプロンプト（prompt_name="query"）を持つモデルではそれを使う
+        if "query" in getattr(self.model, "prompts", {}):
+            return self(texts, prompt_name="query")
+        return self(texts)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """各行を長さ1にする（長さ0の行はそのまま）"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def canonical_embedder_name(name: str) -> str:
+    """埋め込みの名前を、索引に保存する名前（埋め込みの name）にそろえる（hashing → hashing-512）"""
+    return f"hashing-{HASHING_DIM}" if name == "hashing" else name
+
+
+def get_embedder(name: Optional[str] = None) -> Callable[[List[str]], np.ndarray]:
+    """名前から埋め込みを作る関数を返す（hashing, hashing-<次元数>, st:<モデル名>）"""
+    name = name or DEFAULT_EMBEDDER
+    if name.startswith("st:"):
+        return SentenceTransformerEmbedder(name[3:])
+    if name == "hashing":
+        return HashingEmbedder()
+    if name.startswith("hashing-"):
+        return HashingEmbedder(int(name.split("-", 1)[1]))
+    raise ValueError(f"不明な埋め込みです: {name}（hashing, hashing-<次元数>, st:<モデル名> から選んでください）")
@@ -1,44 +1,275 @@
-from moviepy.editor import VideoFileClip
+"""
+動画ファイルからの音声抽出
+
+ffmpeg で音声ストリームだけを取り出す。出力形式が元の音声のコーデックをそのまま格納できる場合は
+再エンコードせずにコピーし、それ以外（サンプリングレートの変更など）は音声ストリームだけをデコードする。
+映像はデコードしないため、VideoFileClip を使う方法より大幅に速い。
+
+使い方:
+    # 1ファイル（既定では data/video/python_basic_guidance.mp4 → data/audio/python_basic_guidance.mp3）
+    python extract_audio.py
+
+    # Whisper向け（16kHzモノラルのWAV）に、10分ごとに分割して書き出す
+    python extract_audio.py data/video/lecture.mp4 -o data/audio/lecture.wav --whisper --chunk-seconds 600
+
+    # ディレクトリ内の動画をまとめて並列に処理する
+    python extract_audio.py data/video -o data/audio --whisper --workers 4
+
+    # moviepy を使う方法と処理時間を比較する
+    python extract_audio.py --benchmark
+"""
+import argparse
 import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import List, Optional
+
+from ffmpeg_utils import make_synthetic_video, probe_media, run_ffmpeg
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".mkv", ".webm", ".avi", ".m4v"}
+
+# 出力形式ごとに、再エンコードせずに格納できる音声コーデック
+COPY_COMPATIBLE = {
+    ".m4a": {"aac", "alac"},
+    ".aac": {"aac"},
+    ".mp3": {"mp3"},
+    ".wav": {"pcm_s16le"},
+    ".flac": {"flac"},
+    ".ogg": {"vorbis", "opus"},
+    ".opus": {"opus"},
+    ".mka": None,  # どのコーデックも格納できる
+}
+
+# 再エンコードする場合のエンコーダ
+ENCODERS = {
+    ".m4a": ["-c:a", "aac", "-b:a", "96k"],
+    ".aac": ["-c:a", "aac", "-b:a", "96k"],
+    ".mp3": ["-c:a", "libmp3lame", "-q:a", "4"],
+    ".wav": ["-c:a", "pcm_s16le"],
+    ".flac": ["-c:a", "flac"],
+    ".ogg": ["-c:a", "libvorbis"],
+    ".opus": ["-c:a", "libopus", "-b:a", "32k"],
+}
+
+# 分割して書き出す場合の segment のフォーマット
+SEGMENT_FORMATS = {".m4a": "ipod", ".aac": "adts", ".mp3": "mp3", ".wav": "wav", ".flac": "flac",
+                   ".ogg": "ogg", ".opus": "ogg", ".mka": "matroska"}
+
+# Whisper は内部で16kHzモノラルに変換するため、最初からその形式で書き出す
+WHISPER_SAMPLE_RATE = 16000
+
+
+def can_stream_copy(audio_codec: Optional[str], output_path: str) -> bool:
+    """元の音声を再エンコードせずに出力ファイルに格納できるかどうか"""
+    extension = Path(output_path).suffix.lower()
+    if extension not in COPY_COMPATIBLE or audio_codec is None:
+        return False
+    compatible = COPY_COMPATIBLE[extension]
+    return compatible is None or audio_codec in compatible
+
 
-def extract_audio_from_video(video_path: str, output_path: str) -> None:
+def extract_audio_from_video(video_path: str, output_path: str, sample_rate: Optional[int] = None,
+                             mono: bool = False, chunk_seconds: Optional[float] = None) -> List[str]:
     """
-    ビデオファイルから音声を抽出してMP3ファイルとして保存
+    ビデオファイルから音声だけを取り出して保存（映像はデコードしない）
     Args:
         video_path: 入力ビデオファイルのパス
-        output_path: 出力音声ファイルのパス
+        output_path: 出力音声ファイルのパス（拡張子で形式を決める）
+        sample_rate: 出力のサンプリングレート（省略時は元のまま）
+        mono: モノラルにするかどうか
+        chunk_seconds: 指定すると、この長さごとに分割して「名前_000.拡張子」の形式で書き出す
+    Returns:
+        書き出したファイルのパスのリスト（失敗した場合は空）
     """
     try:
-        # ビデオファイルを読み込み
-        video = VideoFileClip(video_path)
-        
-        # 音声を抽出
-        audio = video.audio
-        
-        # MP3として保存
-        audio.write_audiofile(output_path)
-        
-        # リソースを解放
-        video.close()
-        audio.close()
-        
-        print(f"音声の抽出が完了しました: {output_path}")
-        
+        media = probe_media(video_path)
+        if media["audio_codec"] is None:
+            raise ValueError(f"音声ストリームがありません: {video_path}")
+
+        output = Path(output_path)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        extension = output.suffix.lower()
+        if extension not in COPY_COMPATIBLE:
+            raise ValueError(f"対応していない出力形式です: {extension}")
+
+        resample = (sample_rate and sample_rate != media["audio_sample_rate"]) or \
+                   (mono and media["audio_channels"] != 1)
+        args = ["-i", video_path, "-map", "0:a:0", "-vn", "-sn", "-dn", "-map_metadata", "-1"]
+        if not resample and can_stream_copy(media["audio_codec"], output_path):
+            args += ["-c:a", "copy"]
+        else:
+            if sample_rate:
+                args += ["-ar", str(sample_rate)]
+            if mono:
+                args += ["-ac", "1"]
+            args += ENCODERS.get(extension, [])
+
+        if chunk_seconds:
+            pattern = str(output.with_name(f"{output.stem}_%03d{output.suffix}"))
+            args += ["-f", "segment", "-segment_time", str(chunk_seconds),
+                     "-segment_format", SEGMENT_FORMATS[extension], "-reset_timestamps", "1", pattern]
+            for old in output.parent.glob(f"{output.stem}_[0-9][0-9][0-9]{output.suffix}"):
+                old.unlink()  # 前回の分割結果が残っていると数が合わなくなる
+            run_ffmpeg(args)
+            outputs = sorted(str(p) for p in output.parent.glob(f"{output.stem}_[0-9][0-9][0-9]{output.suffix}"))
+        else:
+            run_ffmpeg(args + [str(output)])
+            outputs = [str(output)]
+
+        print(f"音声の抽出が完了しました: {output_path}" + (f"（{len(outputs)}分割）" if chunk_seconds else ""))
+        return outputs
+
     except Exception as e:
         print(f"エラーが発生しました: {str(e)}")
+        return []
+
+
+def extract_audio_moviepy(video_path: str, output_path: str) -> None:
+    """
+    VideoFileClip を使って音声を抽出する従来の方法（ベンチマークでの比較用）
+    Args:
+        video_path: 入力ビデオファイルのパス
+        output_path: 出力音声ファイルのパス
+    """
+    from moviepy.editor import VideoFileClip
+
+    # ビデオファイルを読み込み
+    video = VideoFileClip(video_path)
 
-def main():
-    # 入力と出力のパスを設定
-    base_dir = Path("data")
-    video_file = base_dir / "video" / "python_basic_guidance.mp4"
-    output_file = base_dir / "audio" / "python_basic_guidance.mp3"
-    
-    # 出力ディレクトリが存在しない場合は作成
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    
     # 音声を抽出
-    extract_audio_from_video(str(video_file), str(output_file))
+    audio = video.audio
+
+    # MP3として保存
+    audio.write_audiofile(output_path, logger=None)
+
+    # リソースを解放
+    video.close()
+    audio.close()
+
+
+def find_videos(input_dir: str) -> List[Path]:
+    """ディレクトリ内の動画ファイルを名前順に返す（サブディレクトリも含む）"""
+    return sorted(p for p in Path(input_dir).rglob("*") if p.suffix.lower() in VIDEO_EXTENSIONS)
+
+
+def _extract_job(job) -> List[str]:
+    video_path, output_path, options = job
+    return extract_audio_from_video(video_path, output_path, **options)
+
+
+def extract_directory(input_dir: str, output_dir: str, extension: str = ".mp3", workers: int = 4,
+                      **options) -> List[List[str]]:
+    """
+    ディレクトリ内の動画から音声をまとめて抽出する（プロセスプールで並列に処理）
+    Args:
+        input_dir: 動画のディレクトリ
+        output_dir: 音声の出力ディレクトリ（入力と同じ階層構造で書き出す）
+        extension: 出力形式の拡張子
+        workers: 同時に処理するファイル数
+        options: extract_audio_from_video に渡す引数（sample_rate, mono, chunk_seconds）
+    Returns:
+        動画ごとの書き出したファイルのリスト
+    """
+    videos = find_videos(input_dir)
+    jobs = [
+        (str(video), str(Path(output_dir) / video.relative_to(input_dir).with_suffix(extension)), options)
+        for video in videos
+    ]
+    print(f"{len(jobs)}本の動画から音声を抽出します（同時実行数: {workers}）")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_extract_job, jobs))
+
+
+def benchmark(seconds: int = 600, files: int = 4, workers: int = 4) -> None:
+    """
+    合成動画で、moviepy を使う方法とffmpegで音声だけを扱う方法の処理時間を比較する
+    Args:
+        seconds: 合成動画の長さ（秒）
+        files: ディレクトリ処理で使う動画の本数
+        workers: ディレクトリ処理の同時実行数
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_dir = Path(tmp_dir) / "video"
+        video_dir.mkdir()
+        video = make_synthetic_video(str(video_dir / "lecture_00.mp4"), seconds, presenter=True)
+        print(f"合成動画: {seconds}秒, 720p, AAC音声, {os.path.getsize(video) / 1024 ** 2:.1f}MB")
+
+        def timed(label, fn, output):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            size = sum(os.path.getsize(p) for p in Path(tmp_dir).glob(output))
+            print(f"{label:<34} {elapsed:>7.2f}秒  {size / 1024 ** 2:>6.2f}MB")
+            return elapsed
+
+        try:
+            import moviepy  # noqa: F401
+            base = timed("moviepy (VideoFileClip → MP3)",
+                         lambda: extract_audio_moviepy(video, os.path.join(tmp_dir, "moviepy.mp3")), "moviepy.mp3")
+        except ImportError:
+            base = None
+            print("moviepy がインストールされていないため、従来の方法は計測しません")
+
+        results = [
+            ("ffmpeg ストリームコピー (M4A)", "copy.m4a", {}),
+            ("ffmpeg 音声のみデコード (MP3)", "audio.mp3", {}),
+            ("ffmpeg Whisper向け (16kHzモノラルWAV)", "whisper.wav",
+             {"sample_rate": WHISPER_SAMPLE_RATE, "mono": True}),
+            ("ffmpeg Whisper向け 5分ごとに分割", "chunk.wav",
+             {"sample_rate": WHISPER_SAMPLE_RATE, "mono": True, "chunk_seconds": 300}),
+        ]
+        for label, name, options in results:
+            output = os.path.join(tmp_dir, name)
+            glob = f"{Path(name).stem}*{Path(name).suffix}"
+            elapsed = timed(label, lambda: extract_audio_from_video(video, output, **options), glob)
+            if base:
+                print(f"{'':<34} → moviepy比 {base / elapsed:.1f}倍高速")
+
+        for i in range(1, files):
+            os.link(video, video_dir / f"lecture_{i:02d}.mp4")
+        for count in sorted({1, workers}):
+            start = time.perf_counter()
+            extract_directory(str(video_dir), os.path.join(tmp_dir, f"dir_{count}"), ".mp3", workers=count)
+            elapsed = time.perf_counter() - start
+            print(f"==> ディレクトリ処理 {files}本, 同時実行数 {count}: {elapsed:.2f}秒 "
+                  f"({files / elapsed:.2f}本/秒, CPU {os.cpu_count()}コア)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="動画ファイルから音声を抽出する")
+    parser.add_argument("input", nargs="?", default=str(Path("data") / "video" / "python_basic_guidance.mp4"),
+                        help="入力動画ファイル、または動画のディレクトリ")
+    parser.add_argument("-o", "--output", help="出力音声ファイル（入力がディレクトリの場合は出力ディレクトリ）")
+    parser.add_argument("--format", default=None,
+                        help="ディレクトリ処理の出力形式の拡張子（既定: mp3、--whisper 指定時は wav）")
+    parser.add_argument("--sample-rate", type=int, help="出力のサンプリングレート")
+    parser.add_argument("--mono", action="store_true", help="モノラルにする")
+    parser.add_argument("--whisper", action="store_true", help="Whisper向けに16kHzモノラルで書き出す")
+    parser.add_argument("--chunk-seconds", type=float, help="この長さ（秒）ごとに分割して書き出す")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="ディレクトリ処理の同時実行数")
+    parser.add_argument("--benchmark", action="store_true", help="moviepy を使う方法と処理時間を比較する")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(workers=args.workers)
+        return
+
+    options = {
+        "sample_rate": WHISPER_SAMPLE_RATE if args.whisper else args.sample_rate,
+        "mono": args.whisper or args.mono,
+        "chunk_seconds": args.chunk_seconds,
+    }
+    if os.path.isdir(args.input):
+        extension = "." + (args.format or ("wav" if args.whisper else "mp3")).lstrip(".")
+        extract_directory(args.input, args.output or str(Path("data") / "audio"), extension,
+                          workers=args.workers, **options)
+    else:
+        # 出力ディレクトリは extract_audio_from_video の中で作成する
+        output = args.output or str(Path("data") / "audio" / (Path(args.input).stem + ".mp3"))
+        extract_audio_from_video(args.input, output, **options)
+
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
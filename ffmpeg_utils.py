@@ -0,0 +1,159 @@
+"""
+ffmpeg を使った動画・音声処理の共通関数
+
+ffmpeg の実行ファイルは moviepy と同じく imageio-ffmpeg に同梱されたものを使い、
+見つからない場合は PATH 上の ffmpeg を使う。
+"""
+import os
+import re
+import subprocess
+from typing import Dict, List, Optional
+
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d{2}):(\d{2}(?:\.\d+)?)")
+_STREAM_RE = re.compile(r"Stream #\d+:\d+(?:\[\w+\])?(?:\(\w+\))?: (Video|Audio): (\w+)([^\n]*)")
+
+
+class FFmpegError(Exception):
+    """ffmpeg の実行に失敗した場合の例外"""
+
+
+def get_ffmpeg_binary() -> str:
+    """ffmpeg の実行ファイルのパスを返す"""
+    binary = os.environ.get("FFMPEG_BINARY")
+    if binary:
+        return binary
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        return "ffmpeg"
+
+
+def run_ffmpeg(args: List[str], capture_stdout: bool = False) -> bytes:
+    """
+    ffmpeg を実行する
+    Args:
+        args: ffmpeg に渡す引数（実行ファイル名を除く）
+        capture_stdout: 標準出力を返すかどうか
+    Returns:
+        標準出力の内容（capture_stdout が False の場合は空）
+    """
+    command = [get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y"] + args
+    result = subprocess.run(
+        command,
+        stdout=subprocess.PIPE if capture_stdout else subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    if result.returncode != 0:
+        message = result.stderr.decode("utf-8", errors="replace").strip()
+        raise FFmpegError(f"ffmpegの実行に失敗しました: {message}")
+    return result.stdout if capture_stdout else b""
+
+
+def probe_media(path: str) -> Dict[str, Optional[object]]:
+    """
+    動画・音声ファイルの長さとストリームの情報を取得する
+    Returns:
+        duration(秒), video_codec, audio_codec, audio_sample_rate, audio_channels
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"ファイルが見つかりません: {path}")
+    # ffmpeg -i は出力ファイルがないため必ず失敗するが、標準エラーに情報が出力される
+    result = subprocess.run(
+        [get_ffmpeg_binary(), "-hide_banner", "-i", path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    info = result.stderr.decode("utf-8", errors="replace")
+
+    duration = None
+    match = _DURATION_RE.search(info)
+    if match:
+        hours, minutes, seconds = match.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    media = {
+        "duration": duration,
+        "video_codec": None,
+        "audio_codec": None,
+        "audio_sample_rate": None,
+        "audio_channels": None,
+    }
+    for kind, codec, detail in _STREAM_RE.findall(info):
+        if kind == "Video" and media["video_codec"] is None:
+            media["video_codec"] = codec
+        elif kind == "Audio" and media["audio_codec"] is None:
+            media["audio_codec"] = codec
+            rate = re.search(r"(\d+) Hz", detail)
+            media["audio_sample_rate"] = int(rate.group(1)) if rate else None
+            if "mono" in detail:
+                media["audio_channels"] = 1
+            elif "stereo" in detail:
+                media["audio_channels"] = 2
+    return media
+
+
+def cut_clip(input_path: str, output_path: str, start: float, duration: float) -> str:
+    """
+    動画の一部を切り出す
+    再エンコードせずに切り出すと直前のキーフレームから始まり、クリップ内の時刻が開始位置とずれるため、
+    再エンコードしてちょうど開始位置から始まるようにする。
+    同じ入力と区間からは同じバイト列が得られるよう、メタデータを出力しない
+    Args:
+        input_path: 入力ファイル
+        output_path: 出力ファイル
+        start: 開始位置（秒）
+        duration: 長さ（秒）
+    Returns:
+        出力ファイルのパス
+    """
+    run_ffmpeg([
+        "-ss", f"{start:.3f}", "-i", input_path, "-t", f"{duration:.3f}",
+        "-map", "0:v:0?", "-map", "0:a:0?",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-c:a", "aac",
+        "-map_metadata", "-1",
+        "-fflags", "+bitexact", "-flags:v", "+bitexact", "-flags:a", "+bitexact",
+        output_path,
+    ])
+    return output_path
+
+
+def make_synthetic_video(output_path: str, seconds: int, slide_seconds: int = 20,
+                         size: str = "1280x720", fps: int = 10, presenter: bool = False) -> str:
+    """
+    ベンチマーク用に、一定間隔で画面が切り替わるスライド風の動画を作成する
+    Args:
+        output_path: 出力ファイル
+        seconds: 動画の長さ（秒）
+        slide_seconds: 画面が切り替わる間隔（秒）
+        size: 解像度
+        fps: フレームレート
+        presenter: 右下に常に動き続ける小窓（講師のカメラ映像の代わり）を重ねるかどうか
+    Returns:
+        出力ファイルのパス
+    """
+    colors = ["white", "lightblue", "lightyellow", "lightgreen", "pink", "lavender"]
+    slides = max(1, -(-seconds // slide_seconds))
+    inputs = []
+    for i in range(slides):
+        length = min(slide_seconds, seconds - i * slide_seconds)
+        inputs += ["-f", "lavfi", "-i",
+                   f"color=c={colors[i % len(colors)]}:s={size}:r={fps}:d={length}"]
+    filters = "".join(
+        f"[{i}:v]drawbox=x={40 + (i * 97) % 600}:y={60 + (i * 53) % 400}:w=400:h=80:color=black:t=fill[v{i}];"
+        for i in range(slides)
+    )
+    filters += "".join(f"[v{i}]" for i in range(slides)) + f"concat=n={slides}:v=1:a=0"
+    audio_input = slides
+    if presenter:
+        inputs += ["-f", "lavfi", "-i", f"testsrc2=s=256x144:r={fps}:d={seconds}"]
+        filters += f"[slides];[slides][{slides}:v]overlay=W-w-20:H-h-20"
+        audio_input += 1
+    filters += "[v]"
+    run_ffmpeg(inputs + [
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=16000:duration={seconds}",
+        "-filter_complex", filters, "-map", "[v]", "-map", f"{audio_input}:a",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest", output_path,
+    ])
+    return output_path
@@ -0,0 +1,261 @@
+"""
+フィラー除去エンジン
+
+gemini/analyze_video.py の remove_fillers と同じ出力を、コンパイル済みのパターンと
+全パターンをまとめた1パスの照合器で求める。大きなファイルは段落ごとに逐次処理できる。
+
+使い方:
+    python filler_removal.py input.txt -o output.txt
+    python filler_removal.py --benchmark day3/data/LLM2024_day4_raw.txt data/output/video_analysis.txt
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+from text_segmenter import SEPARATOR_RE, TIMESTAMP_RE
+
+# フィラーと不要な表現のパターン（この順に適用した結果が基準となる）
+FILLER_PATTERNS = [
+    # 一般的なフィラー
+    r'えー[と]?', r'あの[ー]?', r'その[ー]?', r'えっと', r'まあ', r'なんか', r'っていうか',
+    # 繰り返し表現
+    r'([、。])\1+',  # 連続する句読点
+    r'([ぁ-んァ-ン])\1{2,}',  # 3回以上続くひらがな/カタカナ
+    # 不要な接続詞
+    r'で[、。]', r'が[、。]', r'けど[、。]', r'から[、。]',
+    # 文末の不要な表現
+    r'[、。]です[、。]', r'[、。]ます[、。]', r'[、。]でした[、。]', r'[、。]ました[、。]',
+    # 余分な空白
+    r'\s+',
+]
+
+# 文頭の不要な表現（他のパターンを除去した後の先頭に対して順に適用する）
+LEADING_PATTERNS = [r'^[、。]', r'^[ぁ-んァ-ン]{1,3}[、。]']
+
+# 上記のうち長さが有限のパターンを展開したリテラル（連続する句読点は先頭2文字）。
+# 共通の接頭辞でまとめたトライ構造の正規表現にすると、1回の走査で全パターンを照合できる
+FILLER_LITERALS = (
+    ['えー', 'えーと', 'あの', 'あのー', 'その', 'そのー', 'えっと', 'まあ', 'なんか', 'っていうか']
+    + [w + p for w in ['で', 'が', 'けど', 'から'] for p in '、。']
+    + [a + w + b for w in ['です', 'ます', 'でした', 'ました'] for a in '、。' for b in '、。']
+)
+PUNCT_RUNS = ['、、', '。。']
+
+SENTENCE_ENDINGS = ('。', '！', '？')
+
+
+def _trie_pattern(words: List[str], runs: List[str]) -> str:
+    """
+    リテラルの集合を共通の接頭辞でまとめた正規表現にする
+    Args:
+        words: リテラルのリスト
+        runs: 末尾の文字を1回以上繰り返すリテラルのリスト
+    """
+    trie = {}
+    for word in words + runs:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = '+' if word in runs else ''
+
+    def build(node) -> str:
+        terminal = node.get('')
+        if terminal == '+':
+            return '+'
+        alternatives = [re.escape(char) + build(child)
+                        for char, child in node.items() if char != '']
+        if not alternatives:
+            return ''
+        body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        return f'(?:{body})?' if terminal is not None else body
+
+    # 先頭の選択肢をすべてリテラルで始めると、正規表現エンジンが先頭文字で候補位置を絞り込める
+    return '|'.join(re.escape(char) + build(child) for char, child in trie.items())
+
+
+class FillerRemover:
+    """
+    フィラー除去エンジン
+
+    パターンは初期化時に1度だけコンパイルする。まず全パターンを1つにまとめた
+    照合器でテキストを1回だけ走査し、除去対象がなければ空白の除去だけで済ませる。
+    除去対象がある場合は、元の実装と同じ順序でパターンを適用するため、
+    出力は常に元の実装と一致する。
+    """
+
+    def __init__(self):
+        self.patterns = [re.compile(p) for p in FILLER_PATTERNS]
+        self.leading_patterns = [re.compile(p) for p in LEADING_PATTERNS]
+        # 長さが有限のパターンと連続する句読点をまとめた照合器
+        self.combined = re.compile(_trie_pattern(FILLER_LITERALS, PUNCT_RUNS))
+        self.repeated_kana = self.patterns[FILLER_PATTERNS.index(r'([ぁ-んァ-ン])\1{2,}')]
+        self.whitespace = self.patterns[FILLER_PATTERNS.index(r'\s+')]
+        self._punct_run = re.compile(r'[、。]+')
+        # 全パターンの適用が必要だった件数（ベンチマーク用）
+        self.full_passes = 0
+
+    def _apply_patterns(self, text: str) -> str:
+        # 空白以外のパターンに一致しなければ、除去によって新たな一致が生じることもない
+        if not self.combined.search(text) and not self.repeated_kana.search(text):
+            return self.whitespace.sub('', text)
+        self.full_passes += 1
+        for pattern in self.patterns:
+            text = pattern.sub('', text)
+        return text
+
+    def remove(self, text: str) -> str:
+        """
+        テキストからフィラーや不要な表現を除去し、自然な文章に整形する
+        Args:
+            text: 処理対象のテキスト
+        Returns:
+            フィラーを除去し、自然な文章に整形したテキスト
+        """
+        removed = self._apply_patterns(text)
+        for pattern in self.leading_patterns:
+            removed = pattern.sub('', removed, count=1)
+
+        # 文の整形
+        # 空白は除去済みのため、文頭の句読点の削除と連続する句読点の統一だけでよい
+        removed = self._punct_run.sub('。', removed.lstrip('、。'))
+        if removed and removed[-1] not in SENTENCE_ENDINGS:
+            removed += '。'
+        return removed.strip()
+
+    def remove_stream(self, paragraphs: Iterable[str]) -> Iterator[str]:
+        """
+        段落ごとにフィラーを除去して順に返す
+        Args:
+            paragraphs: 段落（改行区切りのテキストファイルの各行など）
+        Yields:
+            整形済みの段落。空の段落は出力しない
+        """
+        for paragraph in paragraphs:
+            cleaned = self.remove(paragraph)
+            if cleaned:
+                yield cleaned
+
+    def remove_file_stream(self, input_path: str) -> Iterator[str]:
+        """
+        テキストファイルを1行ずつ読み込みながら、段落（1行）ごとにフィラーを除去して順に返す
+        行頭のタイムスタンプは除去の対象から外し、各行の本文に remove と同じ処理をしてから付け直す。区切り線（---）は出力しない
+        Yields:
+            整形済みの段落。空の段落は出力しない
+        """
+        with open(input_path, encoding='utf-8') as src:
+            for line in src:
+                match = TIMESTAMP_RE.match(line)
+                body = line[match.end():] if match else line
+                if SEPARATOR_RE.fullmatch(body.strip()):
+                    continue
+                cleaned = self.remove(body)
+                if not cleaned:
+                    continue
+                yield f"{match.group(0).rstrip()} {cleaned}" if match else cleaned
+
+    def remove_file(self, input_path: str, output_path: str) -> int:
+        """
+        テキストファイルを少しずつ読み込みながら、段落（1行）ごとにフィラーを除去して書き出す（remove_file_stream）
+        Returns:
+            書き出した段落数
+        """
+        count = 0
+        with open(output_path, 'w', encoding='utf-8') as dst:
+            for cleaned in self.remove_file_stream(input_path):
+                dst.write(cleaned + '\n')
+                count += 1
+        return count
+
+
+_default_remover = FillerRemover()
+
+
+def remove_fillers(text: str) -> str:
+    """
+    テキストからフィラーや不要な表現を除去し、自然な文章に整形する
+    Args:
+        text: 処理対象のテキスト
+    Returns:
+        フィラーを除去し、自然な文章に整形したテキスト
+    """
+    return _default_remover.remove(text)
+
+
+def remove_fillers_reference(text: str) -> str:
+    """パターンを1つずつ適用する従来の実装（ベンチマークの比較対象）"""
+    for pattern in FILLER_PATTERNS + LEADING_PATTERNS:
+        text = re.sub(pattern, '', text)
+
+    text = re.sub(r'[、。]+$', '。', text)
+    text = re.sub(r'^[、。\s]+', '', text)
+    text = re.sub(r'[、。]+', '。', text)
+    text = re.sub(r'。\s*。', '。', text)
+    if text and not text[-1] in ['。', '！', '？']:
+        text += '。'
+
+    return text.strip()
+
+
+def benchmark(path: str, repeat: int = 5) -> None:
+    """
+    従来の実装と比較して処理時間を計測し、出力が一致することを確認する
+    Args:
+        path: 入力テキストファイル
+        repeat: 計測の繰り返し回数
+    """
+    text = Path(path).read_text(encoding='utf-8')
+    paragraphs = [line for line in text.splitlines() if line.strip()]
+    remover = FillerRemover()
+
+    print(f"{path}:")
+    cases = [("段落ごと", paragraphs), ("ファイル全体", [text])]
+    for label, inputs in cases:
+        expected = [remove_fillers_reference(t) for t in inputs]
+        actual = [remover.remove(t) for t in inputs]
+        mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+        if mismatches:
+            raise AssertionError(f"{label}: {mismatches}件の出力が従来の実装と一致しません")
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for t in inputs:
+                remove_fillers_reference(t)
+        reference_time = (time.perf_counter() - start) / repeat
+
+        remover.full_passes = 0
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for t in inputs:
+                remover.remove(t)
+        engine_time = (time.perf_counter() - start) / repeat
+
+        print(f"[{label}] {len(inputs)}件, {sum(map(len, inputs))}文字: 出力は完全に一致")
+        print(f"  従来の実装: {reference_time * 1000:.2f}ms")
+        print(f"  新しい実装: {engine_time * 1000:.2f}ms "
+              f"(x{reference_time / engine_time:.2f}, 全パターンの適用 {remover.full_passes // repeat}件)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="テキストからフィラーを除去する")
+    parser.add_argument("input", nargs="+", help="入力テキストファイル（ベンチマーク時は複数指定可）")
+    parser.add_argument("-o", "--output", help="出力テキストファイル（省略時は標準出力）")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="従来の実装と処理時間・出力を比較する")
+    parser.add_argument("--repeat", type=int, default=5, help="ベンチマークの繰り返し回数")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        for path in args.input:
+            benchmark(path, repeat=args.repeat)
+    elif args.output:
+        count = FillerRemover().remove_file(args.input[0], args.output)
+        print(f"フィラー除去が完了しました: {args.output} ({count}段落)")
+    else:
+        for cleaned in FillerRemover().remove_file_stream(args.input[0]):
+            print(cleaned)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,23 @@
 import os
+import argparse
 import google.generativeai as genai
 from dotenv import load_dotenv
 from pathlib import Path
 import mimetypes
 import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# プロジェクト直下の共通モジュールを読み込めるようにする
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from filler_removal import remove_fillers
+from video_upload import ResumableUploader, print_progress
+from video_windows import SlideSection, analyze_in_windows, format_sections
+from analysis_cache import AnalysisCache, sha256_file
+from slide_detection import SlideAsset, asset_bytes, preprocess_video
 
 # 環境変数の読み込み
 load_dotenv()
@@ -16,78 +30,36 @@ if not GOOGLE_API_KEY:
 # Gemini APIの設定
 genai.configure(api_key=GOOGLE_API_KEY)
 
-def remove_fillers(text: str) -> str:
-    """
-    テキストからフィラーや不要な表現を除去し、自然な文章に整形する
-    Args:
-        text: 処理対象のテキスト
-    Returns:
-        フィラーを除去し、自然な文章に整形したテキスト
-    """
-    # フィラーと不要な表現のパターン
-    patterns = [
-        # 一般的なフィラー
-        r'えー[と]?', r'あの[ー]?', r'その[ー]?', r'えっと', r'まあ', r'なんか', r'っていうか',
-        # 繰り返し表現
-        r'([、。])\1+',  # 連続する句読点
-        r'([ぁ-んァ-ン])\1{2,}',  # 3回以上続くひらがな/カタカナ
-        # 不要な接続詞
-        r'で[、。]', r'が[、。]', r'けど[、。]', r'から[、。]',
-        # 文末の不要な表現
-        r'[、。]です[、。]', r'[、。]ます[、。]', r'[、。]でした[、。]', r'[、。]ました[、。]',
-        # 余分な空白
-        r'\s+',
-        # 文頭の不要な表現
-        r'^[、。]', r'^[ぁ-んァ-ン]{1,3}[、。]'
-    ]
-    
-    # パターンの適用
-    for pattern in patterns:
-        text = re.sub(pattern, '', text)
-    
-    # 文の整形
-    # 1. 文末の句読点を統一
-    text = re.sub(r'[、。]+$', '。', text)
-    # 2. 文頭の不要な文字を削除
-    text = re.sub(r'^[、。\s]+', '', text)
-    # 3. 連続する句読点を1つに
-    text = re.sub(r'[、。]+', '。', text)
-    # 4. 文と文の間の空白を適切に
-    text = re.sub(r'。\s*。', '。', text)
-    # 5. 最後の文末に句点がない場合は追加
-    if text and not text[-1] in ['。', '！', '？']:
-        text += '。'
-    
-    return text.strip()
-
-def analyze_video(video_path: str) -> str:
+def upload_video(video_path: str, mime_type: str, timeout: float = 600):
     """
-    動画ファイルを解析し、スライドの内容と音声を理解して文字起こしを行う
+    動画ファイルを分割してアップロードし、解析に使える状態になるまで待つ
     Args:
         video_path: 動画ファイルのパス
+        mime_type: 動画ファイルのMIMEタイプ
+        timeout: 解析可能になるまで待つ最大秒数
     Returns:
-        解析結果のテキスト
+        generate_contentに渡せるファイル
     """
-    try:
-        # 動画ファイルの読み込み
-        video_file = Path(video_path)
-        if not video_file.exists():
-            raise FileNotFoundError(f"動画ファイルが見つかりません: {video_path}")
+    uploader = ResumableUploader(GOOGLE_API_KEY, progress=print_progress)
+    uploaded = uploader.upload(video_path, mime_type)
+    print(f"動画のアップロードが完了しました: {uploaded['name']}")
 
-        # 動画ファイルのMIMEタイプを取得
-        mime_type, _ = mimetypes.guess_type(video_path)
-        if not mime_type:
-            mime_type = "video/mp4"  # デフォルトのMIMEタイプ
+    # アップロード後、サーバー側で動画の処理が終わるまで待つ
+    video_file = genai.get_file(uploaded["name"])
+    deadline = time.time() + timeout
+    while video_file.state.name == "PROCESSING":
+        if time.time() > deadline:
+            raise TimeoutError(f"動画の処理が時間内に完了しませんでした: {uploaded['name']}")
+        time.sleep(5)
+        video_file = genai.get_file(uploaded["name"])
+    if video_file.state.name != "ACTIVE":
+        raise RuntimeError(f"動画の処理に失敗しました: {video_file.state.name}")
+    return video_file
 
-        # 動画ファイルをバイナリで読み込み
-        with open(video_file, "rb") as f:
-            video_data = f.read()
+MODEL_NAME = 'gemini-2.0-flash'
 
-        # Gemini 2.0 Flashモデルの設定
-        model = genai.GenerativeModel('gemini-2.0-flash')
-
-        # プロンプトの設定
-        prompt = """
+# プロンプトの設定
+ANALYSIS_PROMPT = """
         この動画は教育用のスライドプレゼンテーションです。
         以下の点に注意して解析してください：
         1. スライドに表示されている内容を正確に読み取る
@@ -106,46 +78,109 @@ def analyze_video(video_path: str) -> str:
         [フィラーや言い間違いを除去し、分かりやすく整形した音声の文字起こし]
         """
 
-        # 動画データをBlobとして作成
-        video_blob = {
-            "mime_type": mime_type,
-            "data": video_data
-        }
+# スライド単位で解析する場合のプロンプト（見出しは検出した時刻から付ける）
+SLIDE_PROMPT = """
+        この画像は教育用のスライドプレゼンテーションの1枚で、音声はこのスライドを表示している間の説明です。
+        以下の点に注意して解析してください：
+        1. スライドに表示されている内容を正確に読み取る
+        2. 話者の説明を音声から文字起こしする
+        3. スライドの内容と音声の説明を組み合わせて、より正確な文字起こしを行う
+        4. 文字起こしの際、言い間違いやフィラー（例：「えー」「あのー」「そのー」「えっと」など）、説明の本質に関係ないワードは除去し、分かりやすく簡潔に整形する
 
-        # 動画の解析
-        response = model.generate_content([prompt, video_blob])
+        出力形式：
+        スライドの内容：
+        [スライドの内容を箇条書きで]
         
-        # 結果の後処理
-        result = response.text
-        slides = result.split('---')
-        processed_slides = []
+        説明：
+        [フィラーや言い間違いを除去し、分かりやすく整形した音声の文字起こし]
+        """
+
+def generate_analysis(video_path: str) -> str:
+    """
+    動画ファイルをアップロードしてGeminiで解析し、後処理前の結果を返す
+    Args:
+        video_path: 動画ファイルのパス
+    Returns:
+        モデルの出力テキスト
+    """
+    # 動画ファイルの読み込み
+    video_file = Path(video_path)
+    if not video_file.exists():
+        raise FileNotFoundError(f"動画ファイルが見つかりません: {video_path}")
+
+    # 動画ファイルのMIMEタイプを取得
+    mime_type, _ = mimetypes.guess_type(video_path)
+    if not mime_type:
+        mime_type = "video/mp4"  # デフォルトのMIMEタイプ
+
+    # 動画ファイルをメモリに読み込まず、分割してアップロード
+    uploaded_video = upload_video(str(video_file), mime_type)
+
+    # Gemini 2.0 Flashモデルの設定
+    model = genai.GenerativeModel(MODEL_NAME)
+
+    # 動画の解析
+    response = model.generate_content([ANALYSIS_PROMPT, uploaded_video])
+    return response.text
+
+def postprocess_analysis(result: str) -> str:
+    """
+    解析結果の各スライドの説明からフィラーを除去する
+    Args:
+        result: モデルの出力テキスト
+    Returns:
+        後処理後のテキスト
+    """
+    slides = result.split('---')
+    processed_slides = []
+    
+    for slide in slides:
+        if not slide.strip():
+            continue
         
-        for slide in slides:
-            if not slide.strip():
-                continue
-            
-            # スライドの説明部分を抽出
-            explanation_match = re.search(r'説明：(.*?)(?=\n\n|$)', slide, re.DOTALL)
-            if explanation_match:
-                explanation = explanation_match.group(1).strip()
-                # フィラー除去を適用
-                cleaned_explanation = remove_fillers(explanation)
-                # 元の説明を置き換え
-                slide = slide.replace(explanation_match.group(0), f'説明：{cleaned_explanation}')
-            
-            processed_slides.append(slide)
+        # スライドの説明部分を抽出
+        explanation_match = re.search(r'説明：(.*?)(?=\n\n|$)', slide, re.DOTALL)
+        if explanation_match:
+            explanation = explanation_match.group(1).strip()
+            # フィラー除去を適用
+            cleaned_explanation = remove_fillers(explanation)
+            # 元の説明を置き換え
+            slide = slide.replace(explanation_match.group(0), f'説明：{cleaned_explanation}')
         
-        # 処理済みのスライドを結合
-        final_result = '\n---\n'.join(processed_slides)
+        processed_slides.append(slide)
+    
+    # 処理済みのスライドを結合
+    return '\n---\n'.join(processed_slides)
+
+def save_analysis(video_path: str, final_result: str) -> None:
+    """解析結果を動画ディレクトリと同じ階層の data/output に保存する"""
+    output_path = os.path.join(os.path.dirname(os.path.dirname(video_path)), 'data', 'output', 'video_analysis.txt')
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(final_result)
+    
+    print(f'動画の解析が完了しました: {output_path}')
+
+def analyze_video(video_path: str, cache: AnalysisCache = None) -> str:
+    """
+    動画ファイルを解析し、スライドの内容と音声を理解して文字起こしを行う
+    Args:
+        video_path: 動画ファイルのパス
+        cache: 解析結果のキャッシュ（指定した場合、同じ動画・モデル・プロンプトの結果を再利用する）
+    Returns:
+        解析結果のテキスト
+    """
+    try:
+        # 動画の解析と結果の後処理
+        if cache:
+            final_result = cache.analyze(video_path, generate_analysis, MODEL_NAME, ANALYSIS_PROMPT,
+                                         postprocess=postprocess_analysis)
+        else:
+            final_result = postprocess_analysis(generate_analysis(video_path))
         
         # 結果を保存
-        output_path = os.path.join(os.path.dirname(os.path.dirname(video_path)), 'data', 'output', 'video_analysis.txt')
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(final_result)
-        
-        print(f'動画の解析が完了しました: {output_path}')
+        save_analysis(video_path, final_result)
         
         return final_result
 
@@ -153,15 +188,137 @@ def analyze_video(video_path: str) -> str:
         print(f"エラーが発生しました: {str(e)}")
         return None
 
+def analyze_video_windowed(video_path: str, window_minutes: float = 10, overlap_seconds: float = 30,
+                           max_workers: int = 4, cache: AnalysisCache = None) -> str:
+    """
+    動画を時間窓に分割して並列に解析し、スライドごとの結果をまとめる
+    Args:
+        video_path: 動画ファイルのパス
+        window_minutes: 1つの時間窓の長さ（分）
+        overlap_seconds: 前の時間窓と重ねる長さ（秒）
+        max_workers: 同時に解析する時間窓の数
+        cache: 解析結果のキャッシュ（指定した場合、内容の変わっていない時間窓は解析し直さない）
+    Returns:
+        解析結果のテキスト（解析に失敗した時間窓がある場合は None）
+    """
+    try:
+        analyze_window = generate_analysis
+        if cache:
+            analyze_window = cache.cached_window_analyzer(generate_analysis, MODEL_NAME, ANALYSIS_PROMPT,
+                                                          source_path=video_path)
+
+        def generate(path: str) -> Optional[str]:
+            return analyze_in_windows(path, analyze_window, window_minutes * 60,
+                                      overlap_seconds, max_workers, separator='\n---\n')
+
+        if cache:
+            final_result = cache.analyze(video_path, generate, MODEL_NAME, ANALYSIS_PROMPT,
+                                         postprocess=postprocess_analysis, kind="windowed",
+                                         window_minutes=window_minutes, overlap_seconds=overlap_seconds)
+        else:
+            raw = generate(video_path)
+            final_result = postprocess_analysis(raw) if raw else None
+        if final_result is None:
+            # 解析に失敗した時間窓がある（成功した窓は窓ごとのキャッシュに残るので、次回は失敗した窓だけをやり直す）
+            return None
+        save_analysis(video_path, final_result)
+        return final_result
+
+    except Exception as e:
+        print(f"エラーが発生しました: {str(e)}")
+        return None
+
+def generate_slide_analysis(asset: SlideAsset) -> str:
+    """
+    スライドの代表画像と、そのスライドを表示していた区間の音声だけを送って解析する
+    Args:
+        asset: slide_detectionで書き出した代表画像と音声
+    Returns:
+        モデルの出力テキスト（見出しなし）
+    """
+    contents = [SLIDE_PROMPT]
+    with open(asset.image_path, 'rb') as f:
+        contents.append({'mime_type': 'image/jpeg', 'data': f.read()})
+    if asset.audio_path:
+        with open(asset.audio_path, 'rb') as f:
+            contents.append({'mime_type': 'audio/mp4', 'data': f.read()})
+    model = genai.GenerativeModel(MODEL_NAME)
+    response = model.generate_content(contents)
+    return response.text.strip()
+
+def analyze_video_slides(video_path: str, max_workers: int = 4, cache: AnalysisCache = None) -> str:
+    """
+    スライドの切り替わりを検出し、スライドごとに代表画像1枚と音声区間だけを送って解析する
+    Args:
+        video_path: 動画ファイルのパス
+        max_workers: 同時に解析するスライドの数
+        cache: 解析結果のキャッシュ（指定した場合、同じ画像と音声の組み合わせは解析し直さない）
+    Returns:
+        解析結果のテキスト
+    """
+    try:
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory() as work_dir:
+            assets = preprocess_video(video_path, work_dir)
+            print(f"送信量: {asset_bytes(assets) / 1024 ** 2:.1f}MB "
+                  f"（動画全体: {os.path.getsize(video_path) / 1024 ** 2:.1f}MB）")
+            source_hash = cache.file_hash(video_path) if cache else None
+
+            def analyze(asset: SlideAsset) -> SlideSection:
+                key = None
+                if cache:
+                    content_hash = sha256_file(asset.image_path)
+                    if asset.audio_path:
+                        content_hash += sha256_file(asset.audio_path)
+                    key = cache.make_key(content_hash, MODEL_NAME, SLIDE_PROMPT, kind='slide')
+                    entry = cache.get(key)
+                    if entry is not None:
+                        return SlideSection(asset.start, entry['raw'])
+                body = generate_slide_analysis(asset)
+                if cache:
+                    cache.put(key, body, kind='slide', model=MODEL_NAME, source=video_path,
+                              source_sha256=source_hash)
+                return SlideSection(asset.start, body)
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                sections = list(executor.map(analyze, assets))
+
+        final_result = postprocess_analysis(format_sections(sections, separator='\n---\n'))
+        save_analysis(video_path, final_result)
+        print(f"スライド単位の解析が完了しました: {time.perf_counter() - start:.1f}秒")
+        return final_result
+
+    except Exception as e:
+        print(f"エラーが発生しました: {str(e)}")
+        return None
+
 def main():
+    parser = argparse.ArgumentParser(description="講義動画を解析して文字起こしを行う")
     # 入力動画ファイルのパス
-    video_path = "../data/video/python_basic_guidance.mp4"
-    
+    parser.add_argument("--video", default="../data/video/python_basic_guidance.mp4", help="入力動画ファイル")
     # 出力テキストファイルのパス
-    output_path = "../data/output/video_analysis.txt"
+    parser.add_argument("--output", default="../data/output/video_analysis.txt", help="出力テキストファイル")
+    parser.add_argument("--window-minutes", type=float, default=0,
+                        help="指定すると動画をこの長さ（分）の時間窓に分割して並列に解析する")
+    parser.add_argument("--overlap-seconds", type=float, default=30, help="時間窓どうしを重ねる長さ（秒）")
+    parser.add_argument("--slides", action="store_true",
+                        help="スライドの切り替わりを検出し、スライドごとに代表画像と音声区間だけを送って解析する")
+    parser.add_argument("--workers", type=int, default=4, help="同時に解析する時間窓（スライド）の数")
+    parser.add_argument("--cache-dir", default="../data/output/cache", help="解析結果のキャッシュのディレクトリ")
+    parser.add_argument("--no-cache", action="store_true", help="キャッシュを使わずに解析し直す")
+    args = parser.parse_args()
+    video_path = args.video
+    output_path = args.output
+    cache = None if args.no_cache else AnalysisCache(args.cache_dir)
     
     # 動画の解析
-    result = analyze_video(video_path)
+    if args.slides:
+        result = analyze_video_slides(video_path, args.workers, cache=cache)
+    elif args.window_minutes > 0:
+        result = analyze_video_windowed(video_path, args.window_minutes, args.overlap_seconds, args.workers,
+                                        cache=cache)
+    else:
+        result = analyze_video(video_path, cache=cache)
     
     if result:
         # 出力ディレクトリの作成
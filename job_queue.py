@@ -0,0 +1,740 @@
+"""
+講義の処理ジョブのキュー（SQLite）とワーカープロセス
+
+講義ごとのジョブを SQLite のデータベースに登録し、複数のワーカープロセスで並行に処理する。
+1つのジョブは「音声抽出 → 文字起こし → 資料のテキスト抽出 → 修正 → 評価」の工程を順に進み、
+ワーカーは工程を1つずつ取り出して実行する（別の講義の別の工程が同時に進む）。
+
+- 工程が失敗した場合は、少し待ってからその工程だけをやり直す（上限回数を超えたらジョブを failed にする）
+- 各工程の出力は講義ごとのディレクトリに一時ファイル経由で書き出すため、途中で止まっても壊れたファイルは残らない
+- 実行中のワーカーが止まった場合は、期限（リース）が切れた時点で別のワーカーがその工程を引き継ぐ
+- 出力が残っていて入力が変わっていない工程は実行せずに飛ばすため、何度実行しても結果は同じになる
+
+使い方:
+    # ジョブの登録（動画と同じ名前の PDF があれば講義資料として使う）
+    python job_queue.py add data/video
+    python job_queue.py add lectures.txt
+    python job_queue.py add data/video/lecture1.mp4 --pdf data/pdf/lecture1.pdf
+
+    # 4つのワーカープロセスで処理する（--fake-rtf で Whisper の代わりに待つだけの処理を使う）
+    python job_queue.py run --workers 4 --model small
+    python job_queue.py run --workers 4 --fake-rtf 0.1
+
+    # 状態の確認と、失敗したジョブのやり直し
+    python job_queue.py status
+    python job_queue.py retry
+    python job_queue.py retry week1/lecture
+
+    # ワーカー数ごとの処理時間の計測
+    python job_queue.py --benchmark
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from analysis_cache import sha256_file
+
+DEFAULT_DB = os.path.join("data", "output", "jobs.sqlite3")
+DEFAULT_OUTPUT_DIR = os.path.join("data", "output", "jobs")
+
+STAGES = ("extract_audio", "transcribe", "extract_pdf", "correct", "evaluate")
+
+# 工程ごとの試行回数の上限と、やり直すまでの待ち時間（秒、失敗するごとに倍にする）
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 10.0
+
+# 実行中の工程の期限（秒）。ワーカーは期限の 1/3 ごとに延長し、止まったワーカーの工程は期限切れ後に引き継がれる
+LEASE_SECONDS = 120.0
+
+# 実行できるジョブがないときに待つ時間（秒）
+POLL_SECONDS = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    media TEXT NOT NULL,
+    pdf TEXT,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_until REAL,
+    outputs TEXT NOT NULL DEFAULT '{}',
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_runnable ON jobs (status, not_before);
+CREATE TABLE IF NOT EXISTS stage_runs (
+    id INTEGER PRIMARY KEY,
+    job_id INTEGER NOT NULL REFERENCES jobs (id),
+    stage TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    worker TEXT NOT NULL,
+    status TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    error TEXT,
+    finished_at REAL NOT NULL
+);
+"""
+
+
+class Job(NamedTuple):
+    """キューのジョブ1件（講義1本分）"""
+    id: int
+    name: str  # 出力ディレクトリに使う相対パス
+    media: str  # 動画または音声のパス
+    pdf: Optional[str]  # 講義資料の PDF のパス
+    stage: str  # 次に実行する工程（全て終わったら done）
+    status: str  # queued, running, done, failed
+    attempts: int  # 現在の工程の試行回数
+    outputs: Dict[str, dict]  # 工程ごとの出力（path と入力のハッシュ）
+    error: Optional[str]
+
+
+def _source_hashes(media: str, pdf: Optional[str]) -> Tuple[str, Optional[str]]:
+    """元のファイル（動画・音声と PDF）の内容のハッシュ"""
+    return sha256_file(media), sha256_file(pdf) if pdf else None
+
+
+def _recorded_sources(outputs: Dict[str, dict]) -> Tuple[Optional[str], Optional[str]]:
+    """処理済みの工程が入力として記録した元のファイルのハッシュ（StageRunner.inputs の media と pdf）"""
+    def recorded(stage: str, key: str) -> Optional[str]:
+        return outputs.get(stage, {}).get("key", {}).get("inputs", {}).get(key)
+
+    return recorded("extract_audio", "media"), recorded("extract_pdf", "pdf")
+
+
+class JobQueue:
+    """
+    SQLite に保存するジョブのキュー
+    複数のプロセスから同時に使えるよう WAL モードで開き、工程の取り出しは書き込みロックを取ってから行う
+    Args:
+        path: データベースファイルのパス
+    """
+
+    def __init__(self, path: str = DEFAULT_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # isolation_level=None で自動のトランザクションを無効にし、BEGIN IMMEDIATE を明示する
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "JobQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Job:
+        return Job(row["id"], row["name"], row["media"], row["pdf"], row["stage"], row["status"],
+                   row["attempts"], json.loads(row["outputs"]), row["error"])
+
+    def add(self, name: str, media: str, pdf: Optional[str] = None) -> Tuple[int, bool]:
+        """
+        ジョブを登録する（同じ名前のジョブがあれば、入力が変わった場合だけ最初の工程から処理し直す）
+        処理済みのジョブは、パスが同じでも元のファイルの内容が変わっていれば処理し直す
+        （どの工程をやり直すかは、実行時に StageRunner.run が入力のハッシュで判断する）
+        Args:
+            name: ジョブの名前
+            media: 動画または音声のパス
+            pdf: 講義資料の PDF のパス
+        Returns:
+            (ジョブのID, 新しく登録したか処理し直すことにしたか)
+        """
+        media, pdf = os.path.abspath(media), pdf and os.path.abspath(pdf)
+        # 動画のハッシュの計算に時間がかかるため、書き込みロックを取る前に求めておく
+        existing = self.conn.execute("SELECT status FROM jobs WHERE name = ?", (name,)).fetchone()
+        sources = _source_hashes(media, pdf) if existing is not None and existing["status"] == "done" else None
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute("SELECT * FROM jobs WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                cursor = self.conn.execute(
+                    "INSERT INTO jobs (name, media, pdf, stage, status, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', ?, ?)", (name, media, pdf, STAGES[0], now, now))
+                job_id, changed = cursor.lastrowid, True
+            else:
+                # 出力は残しておき、工程ごとに入力のハッシュを見て必要なものだけを作り直す
+                job_id = row["id"]
+                changed = (row["media"], row["pdf"]) != (media, pdf)
+                if not changed and row["status"] == "done":
+                    changed = _recorded_sources(json.loads(row["outputs"])) != (sources or _source_hashes(media, pdf))
+                if changed:
+                    self.conn.execute(
+                        "UPDATE jobs SET media = ?, pdf = ?, stage = ?, status = 'queued', attempts = 0, "
+                        "not_before = 0, error = NULL, updated_at = ? WHERE id = ?",
+                        (media, pdf, STAGES[0], now, job_id))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return job_id, changed
+
+    def claim(self, worker: str, lease_seconds: float = LEASE_SECONDS,
+              max_attempts: int = MAX_ATTEMPTS) -> Optional[Job]:
+        """
+        実行できる工程を1つ取り出して実行中にする（期限が切れた実行中の工程も対象にする）
+        期限が切れた工程が既に上限回数まで試行されていれば、引き継がずにジョブを failed にする
+        （ワーカーごと止まる工程は fail() に届かないため、ここで打ち切る）
+        Args:
+            worker: ワーカーの名前
+            lease_seconds: 実行中の工程の期限（秒）
+            max_attempts: 工程ごとの試行回数の上限
+        Returns:
+            取り出したジョブ（なければ None）
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                row = self.conn.execute(
+                    "SELECT * FROM jobs WHERE (status = 'queued' AND not_before <= ?) "
+                    "OR (status = 'running' AND lease_until < ?) ORDER BY not_before, id LIMIT 1",
+                    (now, now)).fetchone()
+                if row is None or row["status"] == "queued" or row["attempts"] < max_attempts:
+                    break
+                error = f"工程の期限が切れました（{row['attempts']}回目、ワーカーが停止した可能性があります）"
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'failed', worker = NULL, lease_until = NULL, error = ?, "
+                    "updated_at = ? WHERE id = ?", (error, now, row["id"]))
+                self._record_run(self._job(row), row["worker"] or "", "failed", now - row["updated_at"], error)
+            if row is not None:
+                # 期限切れの工程を引き継ぐ場合も、1回の試行として数える
+                attempts = row["attempts"] + 1
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = ?, "
+                    "updated_at = ? WHERE id = ?", (worker, now + lease_seconds, attempts, now, row["id"]))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return self._job(row)._replace(status="running", attempts=row["attempts"] + 1)
+
+    def extend(self, job: Job, worker: str, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """実行中の工程の期限を延ばす（別のワーカーに引き継がれていれば False）"""
+        cursor = self.conn.execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running' AND stage = ?",
+            (time.time() + lease_seconds, job.id, worker, job.stage))
+        return cursor.rowcount == 1
+
+    def _record_run(self, job: Job, worker: str, status: str, seconds: float, error: Optional[str]) -> None:
+        self.conn.execute(
+            "INSERT INTO stage_runs (job_id, stage, attempt, worker, status, seconds, error, finished_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.id, job.stage, job.attempts, worker, status, seconds, error, time.time()))
+
+    def complete(self, job: Job, worker: str, output: dict, seconds: float) -> bool:
+        """
+        工程を完了にして次の工程に進める
+        Args:
+            job: claim で取り出したジョブ
+            worker: ワーカーの名前
+            output: 工程の出力（path と入力のハッシュ）
+            seconds: 工程にかかった時間
+        Returns:
+            記録できた場合は True（期限が切れて別のワーカーに引き継がれていた場合は False）
+        """
+        outputs = dict(job.outputs, **{job.stage: output})
+        index = STAGES.index(job.stage)
+        stage, status = (STAGES[index + 1], "queued") if index + 1 < len(STAGES) else ("done", "done")
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET stage = ?, status = ?, attempts = 0, not_before = 0, worker = NULL, "
+                "lease_until = NULL, outputs = ?, error = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running' AND stage = ?",
+                (stage, status, json.dumps(outputs, ensure_ascii=False), time.time(), job.id, worker, job.stage))
+            owned = cursor.rowcount == 1
+            self._record_run(job, worker, "done" if owned else "lost", seconds, None)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return owned
+
+    def fail(self, job: Job, worker: str, error: str, seconds: float, max_attempts: int = MAX_ATTEMPTS,
+             retry_delay: float = RETRY_DELAY) -> str:
+        """
+        工程の失敗を記録する（上限回数までは待ち時間をおいてやり直す）
+        Returns:
+            ジョブの新しい状態（queued または failed）
+        """
+        if job.attempts < max_attempts:
+            status, not_before = "queued", time.time() + retry_delay * 2 ** (job.attempts - 1)
+        else:
+            status, not_before = "failed", 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, not_before = ?, worker = NULL, lease_until = NULL, error = ?, "
+                "updated_at = ? WHERE id = ? AND worker = ? AND status = 'running' AND stage = ?",
+                (status, not_before, error, time.time(), job.id, worker, job.stage))
+            self._record_run(job, worker, "failed", seconds, error)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return status
+
+    def retry(self, name: Optional[str] = None) -> int:
+        """
+        失敗したジョブを、失敗した工程から処理し直す
+        Args:
+            name: ジョブの名前（省略時は失敗した全てのジョブ）
+        Returns:
+            処理し直すことにしたジョブの数
+        """
+        query = ("UPDATE jobs SET status = 'queued', attempts = 0, not_before = 0, error = NULL, updated_at = ? "
+                 "WHERE status = 'failed'")
+        params: tuple = (time.time(),)
+        if name is not None:
+            query += " AND name = ?"
+            params += (name,)
+        return self.conn.execute(query, params).rowcount
+
+    def jobs(self) -> List[Job]:
+        return [self._job(row) for row in self.conn.execute("SELECT * FROM jobs ORDER BY id")]
+
+    def get(self, name: str) -> Optional[Job]:
+        row = self.conn.execute("SELECT * FROM jobs WHERE name = ?", (name,)).fetchone()
+        return self._job(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        """状態ごとのジョブの数"""
+        rows = self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        return {status: count for status, count in rows}
+
+    def pending(self) -> bool:
+        """まだ終わっていない（待機中か実行中の）ジョブがあるか"""
+        row = self.conn.execute("SELECT 1 FROM jobs WHERE status IN ('queued', 'running') LIMIT 1").fetchone()
+        return row is not None
+
+    def stage_seconds(self) -> Dict[str, Tuple[int, float]]:
+        """工程ごとの (完了した回数, 合計時間)"""
+        rows = self.conn.execute(
+            "SELECT stage, COUNT(*), SUM(seconds) FROM stage_runs WHERE status = 'done' GROUP BY stage")
+        return {stage: (count, total) for stage, count, total in rows}
+
+
+# --- 工程の実行 ---
+
+def _write_text(path: str, text: str) -> None:
+    """一時ファイルに書いてから置き換える（途中で止まっても壊れたファイルを残さない）"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+class StageRunner:
+    """
+    ジョブの工程を実行する
+    各工程は入力のハッシュを出力と一緒に記録し、同じ入力の出力が残っていれば実行せずに飛ばす
+    Args:
+        output_dir: 出力のディレクトリ（講義ごとに output_dir/<ジョブの名前>/ に書き出す）
+        model: Whisperモデルの大きさ
+        device: 実行デバイス
+        backend: 文字起こしのバックエンド
+        fake_rtf: 指定すると Whisper の代わりに音声の長さ×この値だけ待つ処理を使う
+        llm: 指定すると用語辞書の代わりにこの LLM（gemini, fake）で修正する
+    """
+
+    def __init__(self, output_dir: str = DEFAULT_OUTPUT_DIR, model: Optional[str] = None,
+                 device: Optional[str] = None, backend: Optional[str] = None, fake_rtf: Optional[float] = None,
+                 llm: Optional[str] = None):
+        self.output_dir = output_dir
+        self.model = model
+        self.device = device
+        self.backend = backend
+        self.fake_rtf = fake_rtf
+        self.llm = llm
+
+    def settings(self, stage: str) -> dict:
+        """工程の結果に影響する設定（変わった場合は工程をやり直す）"""
+        if stage == "transcribe":
+            if self.fake_rtf is not None:
+                return {"transcriber": "fake"}
+            return {"model": self.model, "backend": self.backend}
+        if stage == "correct":
+            return {"llm": self.llm}
+        return {}
+
+    def run(self, job: Job) -> dict:
+        """
+        ジョブの現在の工程を実行する
+        Returns:
+            工程の出力（path, input（入力のハッシュ）, skipped）
+        """
+        job_dir = os.path.join(self.output_dir, job.name)
+        inputs = self.inputs(job)
+        key = {"inputs": inputs, "settings": self.settings(job.stage)}
+        previous = job.outputs.get(job.stage)
+        if previous and previous.get("key") == key and (previous["path"] is None or os.path.exists(previous["path"])):
+            return dict(previous, skipped=True)
+        path = getattr(self, job.stage)(job, job_dir)
+        return {"path": path, "key": key, "sha256": sha256_file(path) if path else None, "skipped": False}
+
+    def inputs(self, job: Job) -> dict:
+        """工程の入力のハッシュ（前の工程の出力のハッシュ、元のファイルは内容のハッシュ）"""
+        def output_hash(stage: str) -> Optional[str]:
+            return job.outputs.get(stage, {}).get("sha256")
+
+        if job.stage == "extract_audio":
+            return {"media": sha256_file(job.media)}
+        if job.stage == "transcribe":
+            return {"audio": output_hash("extract_audio")}
+        if job.stage == "extract_pdf":
+            return {"pdf": sha256_file(job.pdf) if job.pdf else None}
+        return {"transcript": output_hash("transcribe"), "slides": output_hash("extract_pdf"),
+                "corrected": output_hash("correct") if job.stage == "evaluate" else None}
+
+    def extract_audio(self, job: Job, job_dir: str) -> str:
+        """動画から 16kHz モノラルの WAV を取り出す（16kHz モノラルの WAV はそのまま使う）"""
+        from extract_audio import WHISPER_SAMPLE_RATE, extract_audio_from_video
+
+        if Path(job.media).suffix.lower() == ".wav":
+            import wave
+
+            with wave.open(job.media, "rb") as f:
+                if f.getframerate() == WHISPER_SAMPLE_RATE and f.getnchannels() == 1:
+                    return job.media
+        path = os.path.join(job_dir, "audio.wav")
+        tmp_path = os.path.join(job_dir, f"audio.{os.getpid()}.tmp.wav")
+        outputs = extract_audio_from_video(job.media, tmp_path, sample_rate=WHISPER_SAMPLE_RATE, mono=True)
+        if not outputs:
+            raise RuntimeError(f"音声の抽出に失敗しました: {job.media}")
+        os.replace(outputs[0], path)
+        return path
+
+    def transcribe(self, job: Job, job_dir: str) -> str:
+        """音声を文字起こしする（Whisper はチャンクごとのチェックポイントから再開する）"""
+        from transcribe_audio import store_path_for, transcribe_to_file, write_transcript
+
+        audio = job.outputs["extract_audio"]["path"]
+        path = os.path.join(job_dir, "transcript.txt")
+        if self.fake_rtf is not None:
+            from lecture_pipeline import fake_transcriber
+            from transcript_store import TranscriptStore
+
+            segments = fake_transcriber(self.fake_rtf)(audio)
+            tmp_path = os.path.join(job_dir, f"transcript.{os.getpid()}.tmp.txt")
+            write_transcript(segments, tmp_path)
+            TranscriptStore.from_dicts(segments, job.name).save(store_path_for(path))
+            os.replace(tmp_path, path)
+            return path
+
+        from whisper_model import get_model_holder
+
+        # モデルはワーカープロセスごとに1度だけ読み込み、以降のジョブで使い回す
+        holder = get_model_holder(self.model, self.device, self.backend)
+        transcribe_to_file(audio, path, holder, resume=True)
+        return path
+
+    def extract_pdf(self, job: Job, job_dir: str) -> Optional[str]:
+        """講義資料のページごとのテキストを JSON に書き出す（資料がなければ何もしない）"""
+        if not job.pdf:
+            return None
+        from pdf_extract import extract_texts
+
+        path = os.path.join(job_dir, "slides.json")
+        _write_text(path, json.dumps(extract_texts(job.pdf), ensure_ascii=False))
+        return path
+
+    def _slides(self, job: Job) -> List[str]:
+        path = job.outputs.get("extract_pdf", {}).get("path")
+        return json.loads(_read_text(path)) if path else []
+
+    def correct(self, job: Job, job_dir: str) -> str:
+        """講義資料の用語辞書（または LLM）で書き起こしを修正する"""
+        transcript = _read_text(job.outputs["transcribe"]["path"])
+        slides = self._slides(job)
+        if self.llm:
+            from llm_correction import AsyncLLMClient, correct_transcript, get_backend
+
+            index = None
+            if job.pdf:
+                from slide_retrieval import SlideIndex
+
+                index = SlideIndex(os.path.join(job_dir, "slide_index"))
+                index.update([job.pdf])
+            corrected, report = correct_transcript(transcript, AsyncLLMClient(get_backend(self.llm)), index)
+            if report.failed:
+                raise RuntimeError(f"{report.failed}チャンクの修正に失敗しました")
+        elif slides:
+            from term_correction import TermCorrector
+
+            corrected, _ = TermCorrector.from_texts(slides).correct(transcript)
+        else:
+            corrected = transcript
+        path = os.path.join(job_dir, "corrected.txt")
+        _write_text(path, corrected)
+        return path
+
+    def evaluate(self, job: Job, job_dir: str) -> str:
+        """修正前後の書き起こしを評価して JSON に書き出す"""
+        from quality_metrics import TermChecker, evaluate
+
+        slides = self._slides(job)
+        checker = TermChecker.from_texts(slides) if slides else None
+        scores = evaluate(_read_text(job.outputs["transcribe"]["path"]),
+                          _read_text(job.outputs["correct"]["path"]), checker)
+        path = os.path.join(job_dir, "quality.json")
+        # NaN（資料がない場合の accuracy）は JSON では null にする
+        scores = {k: (None if v != v else round(v, 4)) for k, v in scores.items()}
+        _write_text(path, json.dumps(scores, ensure_ascii=False, indent=2))
+        return path
+
+
+def _heartbeat(queue: JobQueue, job: Job, worker: str, lease_seconds: float, stop: threading.Event) -> None:
+    """工程の実行中、期限の 1/3 ごとに期限を延ばす"""
+    # 接続はスレッドをまたいで使えないため、延長用に開き直す
+    with JobQueue(queue.path) as own:
+        while not stop.wait(lease_seconds / 3):
+            if not own.extend(job, worker, lease_seconds):
+                break
+
+
+def worker_loop(db_path: str, runner: StageRunner, worker: Optional[str] = None, follow: bool = False,
+                max_attempts: int = MAX_ATTEMPTS, retry_delay: float = RETRY_DELAY,
+                lease_seconds: float = LEASE_SECONDS, poll_seconds: float = POLL_SECONDS) -> Dict[str, int]:
+    """
+    キューから工程を取り出して実行し続ける
+    Args:
+        db_path: データベースファイルのパス
+        runner: 工程を実行するオブジェクト
+        worker: ワーカーの名前（省略時はホスト名とプロセスID）
+        follow: 全てのジョブが終わっても終了せず、新しいジョブを待つ
+        max_attempts: 工程ごとの試行回数の上限
+        retry_delay: 最初のやり直しまでの待ち時間（秒）
+        lease_seconds: 実行中の工程の期限（秒）
+        poll_seconds: 実行できる工程がないときに待つ時間（秒）
+    Returns:
+        実行した工程の数（done, skipped, failed）
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    stats = {"done": 0, "skipped": 0, "failed": 0}
+    with JobQueue(db_path) as queue:
+        while True:
+            job = queue.claim(worker, lease_seconds, max_attempts)
+            if job is None:
+                # 他のワーカーが実行中の工程が終われば、次の工程を取り出せるようになる
+                if follow or queue.pending():
+                    time.sleep(poll_seconds)
+                    continue
+                return stats
+
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=_heartbeat, args=(queue, job, worker, lease_seconds, stop),
+                                         daemon=True)
+            heartbeat.start()
+            start = time.perf_counter()
+            try:
+                output = runner.run(job)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                status = queue.fail(job, worker, error, time.perf_counter() - start, max_attempts, retry_delay)
+                stats["failed"] += 1
+                label = "やり直します" if status == "queued" else "ジョブを中止します"
+                print(f"[{worker}] {job.name}: {job.stage} 失敗（{job.attempts}回目）: {error} → {label}")
+                continue
+            finally:
+                stop.set()
+                heartbeat.join()
+            seconds = time.perf_counter() - start
+            queue.complete(job, worker, output, seconds)
+            stats["skipped" if output["skipped"] else "done"] += 1
+            label = "出力が最新のためスキップ" if output["skipped"] else f"{seconds:.1f}秒"
+            print(f"[{worker}] {job.name}: {job.stage} {label}")
+
+
+def _worker_main(db_path: str, settings: dict, index: int, options: dict) -> Dict[str, int]:
+    """ワーカープロセスの本体"""
+    worker = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    return worker_loop(db_path, StageRunner(**settings), worker, **options)
+
+
+def run_workers(db_path: str, settings: dict, workers: int = 2, **options) -> Dict[str, int]:
+    """
+    ワーカープロセスを起動し、全てのジョブが終わるまで待つ
+    Args:
+        db_path: データベースファイルのパス
+        settings: StageRunner の引数
+        workers: ワーカープロセスの数
+        options: worker_loop の引数
+    Returns:
+        全てのワーカーで実行した工程の数
+    """
+    totals = {"done": 0, "skipped": 0, "failed": 0}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_worker_main, db_path, settings, i, options) for i in range(workers)]
+        for future in futures:
+            for key, value in future.result().items():
+                totals[key] += value
+    return totals
+
+
+def find_lectures(source: str, pdf: Optional[str] = None) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    登録する講義の一覧を作る
+    動画のディレクトリ・マニフェストは lecture_pipeline と同じ形式で、動画と同じ名前の PDF を講義資料にする
+    Args:
+        source: 動画・音声のファイル、動画のディレクトリ、またはマニフェスト（.txt / .json）
+        pdf: 講義資料の PDF（source がファイルの場合）
+    Returns:
+        (名前, 動画のパス, PDF のパス) のリスト
+    """
+    from lecture_pipeline import load_jobs
+
+    if os.path.isfile(source) and Path(source).suffix.lower() not in (".txt", ".json"):
+        return [(Path(source).stem, source, pdf)]
+    lectures = []
+    for job in load_jobs(source):
+        candidate = job.video_path.with_suffix(".pdf")
+        lectures.append((job.name, str(job.video_path), str(candidate) if candidate.exists() else None))
+    return lectures
+
+
+def print_status(queue: JobQueue) -> None:
+    """ジョブごとの工程と状態を表示する"""
+    jobs = queue.jobs()
+    if not jobs:
+        print("ジョブはありません")
+        return
+    width = max(len(job.name) for job in jobs)
+    for job in jobs:
+        line = f"{job.name:<{width}}  {job.stage:<13}  {job.status:<7}"
+        if job.attempts:
+            line += f"  試行 {job.attempts}回"
+        if job.error:
+            line += f"  {job.error}"
+        print(line)
+    counts = queue.counts()
+    print(" / ".join(f"{status}: {counts.get(status, 0)}" for status in ("queued", "running", "done", "failed")))
+    for stage, (count, total) in sorted(queue.stage_seconds().items(), key=lambda item: STAGES.index(item[0])):
+        print(f"  {stage}: {count}回, 平均 {total / count:.2f}秒")
+
+
+def benchmark(lectures: int = 8, seconds: float = 20.0, rtf: float = 0.1,
+              worker_counts: Tuple[int, ...] = (1, 2, 4)) -> None:
+    """
+    合成音声の講義をワーカー数を変えて処理し、全体の処理時間を計測する
+    文字起こしは音声の長さ×rtf秒だけ待つ処理を使う（ffmpeg が必要）
+    Args:
+        lectures: 講義の数
+        seconds: 講義1本の音声の長さ（秒）
+        rtf: 文字起こしの実時間比
+        worker_counts: 試すワーカー数
+    """
+    from transcribe_audio import make_sample_audio
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio = [make_sample_audio(os.path.join(tmp, f"lecture{i}.wav"), seconds) for i in range(lectures)]
+        print(f"講義 {lectures}本 × {seconds:g}秒, 文字起こしの実時間比 {rtf:g}"
+              f"（1本あたり {seconds * rtf:.1f}秒）")
+        for workers in worker_counts:
+            db_path = os.path.join(tmp, f"jobs_{workers}.sqlite3")
+            with JobQueue(db_path) as queue:
+                for path in audio:
+                    queue.add(Path(path).stem, path)
+            settings = {"output_dir": os.path.join(tmp, f"output_{workers}"), "fake_rtf": rtf}
+            start = time.perf_counter()
+            stats = run_workers(db_path, settings, workers, poll_seconds=0.05)
+            elapsed = time.perf_counter() - start
+            print(f"ワーカー {workers}: {elapsed:.2f}秒（{lectures / elapsed:.2f}講義/秒, 工程 {stats['done']}回）")
+
+            # 2回目は入力が変わっていないため、登録し直しても処理し直さない
+            start = time.perf_counter()
+            with JobQueue(db_path) as queue:
+                changed = sum(queue.add(Path(path).stem, path)[1] for path in audio)
+            stats = run_workers(db_path, settings, workers, poll_seconds=0.05)
+            print(f"  再実行: {time.perf_counter() - start:.2f}秒（処理し直した講義 {changed}本, 工程 {stats['done']}回）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="講義の処理ジョブを SQLite のキューに登録し、ワーカープロセスで処理する")
+    parser.add_argument("--db", default=DEFAULT_DB, help="ジョブのデータベースのパス")
+    parser.add_argument("--benchmark", action="store_true", help="ワーカー数ごとの処理時間を計測する")
+    subparsers = parser.add_subparsers(dest="command")
+
+    add = subparsers.add_parser("add", help="ジョブを登録する")
+    add.add_argument("source", help="動画・音声のファイル、動画のディレクトリ、またはマニフェスト（.txt / .json）")
+    add.add_argument("--pdf", help="講義資料の PDF（source がファイルの場合）")
+
+    run = subparsers.add_parser("run", help="ワーカープロセスでジョブを処理する")
+    run.add_argument("--workers", type=int, default=2, help="ワーカープロセスの数")
+    run.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="出力のディレクトリ")
+    run.add_argument("--model", help="Whisperモデルの大きさ")
+    run.add_argument("--device", help="実行デバイス（cpu, cuda など）")
+    run.add_argument("--backend", help="文字起こしのバックエンド（既定: whisper）")
+    run.add_argument("--llm", choices=["gemini", "fake"], help="用語辞書の代わりに LLM で修正する")
+    run.add_argument("--fake-rtf", type=float,
+                     help="Whisperの代わりに音声の長さ×この値だけ待つ処理を使う（動作確認・計測用）")
+    run.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS, help="工程ごとの試行回数の上限")
+    run.add_argument("--retry-delay", type=float, default=RETRY_DELAY, help="最初のやり直しまでの待ち時間（秒）")
+    run.add_argument("--follow", action="store_true", help="全てのジョブが終わっても新しいジョブを待ち続ける")
+
+    subparsers.add_parser("status", help="ジョブの状態を表示する")
+
+    retry = subparsers.add_parser("retry", help="失敗したジョブを処理し直す")
+    retry.add_argument("name", nargs="?", help="ジョブの名前（省略時は失敗した全てのジョブ）")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+        return
+    if args.command is None:
+        parser.error("add, run, status, retry のいずれかを指定してください")
+
+    if args.command == "run":
+        settings = {"output_dir": args.output_dir, "model": args.model, "device": args.device,
+                    "backend": args.backend, "fake_rtf": args.fake_rtf, "llm": args.llm}
+        start = time.perf_counter()
+        stats = run_workers(args.db, settings, args.workers, follow=args.follow,
+                            max_attempts=args.max_attempts, retry_delay=args.retry_delay)
+        print(f"実行 {stats['done']}工程, スキップ {stats['skipped']}工程, 失敗 {stats['failed']}回 / "
+              f"経過 {time.perf_counter() - start:.1f}秒")
+        with JobQueue(args.db) as queue:
+            print_status(queue)
+        return
+
+    with JobQueue(args.db) as queue:
+        if args.command == "add":
+            for name, media, pdf in find_lectures(args.source, args.pdf):
+                _, changed = queue.add(name, media, pdf)
+                label = "登録しました" if changed else "登録済みです"
+                print(f"{name}: {label}" + (f"（資料: {pdf}）" if pdf else ""))
+        elif args.command == "status":
+            print_status(queue)
+        elif args.command == "retry":
+            print(f"{queue.retry(args.name)}件のジョブを処理し直します")
+
+
+if __name__ == "__main__":
+    main()
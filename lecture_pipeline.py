@@ -0,0 +1,289 @@
+"""
+講義動画の一括処理（音声抽出 → 文字起こし）
+
+ディレクトリ内の動画、またはマニフェストに列挙した動画を順に処理する。
+音声抽出（ffmpeg）を別スレッドで先に進めておき、N本目の文字起こし中にN+1本目の音声を抽出する。
+動画の内容のチェックサムと設定が前回と同じで、文字起こし結果も残っている動画は処理を飛ばす。
+実行ごとにファイル別の処理時間をまとめたレポートを書き出す。
+
+マニフェストは1行に1つ動画のパスを書いたテキスト（# 以降はコメント）か、パスのリストのJSON。
+
+使い方:
+    python lecture_pipeline.py data/video
+    python lecture_pipeline.py lectures.txt --model small --audio-dir data/audio --output-dir data/output
+
+    # Whisperの代わりに「音声の長さ×RTF」だけ待つ処理で、パイプラインの重なりを確認する
+    python lecture_pipeline.py data/video --fake-rtf 0.1
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from analysis_cache import sha256_file
+from extract_audio import WHISPER_SAMPLE_RATE, find_videos, extract_audio_from_video
+from ffmpeg_utils import probe_media
+from transcribe_audio import store_path_for, write_transcript
+from transcript_store import TranscriptStore
+from whisper_model import BACKENDS, DEFAULT_BACKEND, TranscriptionWorker
+
+STATE_FILE = "pipeline_state.json"
+
+# 抽出済みの音声を溜めておく数（ディスク使用量を抑えつつ、文字起こしを待たせない）
+QUEUE_SIZE = 2
+
+# 音声のパスを受け取り、start, end, text を持つセグメントのリストを返す関数
+Transcriber = Callable[[str], List[dict]]
+
+
+class PipelineJob(NamedTuple):
+    """処理する動画1本分"""
+    video_path: Path
+    name: str  # 出力ファイル名に使う相対パス（拡張子なし）
+
+
+def load_jobs(source: str) -> List[PipelineJob]:
+    """
+    ディレクトリまたはマニフェストから処理する動画の一覧を作る
+    Args:
+        source: 動画のディレクトリ、またはマニフェスト（.txt / .json）のパス
+    Returns:
+        処理する動画のリスト
+    """
+    if os.path.isdir(source):
+        root = Path(source)
+        return [PipelineJob(video.resolve(), str(video.relative_to(root).with_suffix("")))
+                for video in find_videos(source)]
+
+    base = Path(source).parent
+    with open(source, "r", encoding="utf-8") as f:
+        if source.endswith(".json"):
+            paths = json.load(f)
+        else:
+            paths = [line.split("#", 1)[0].strip() for line in f]
+    videos = [(base / p).resolve() for p in paths if p]
+    missing = [str(v) for v in videos if not v.exists()]
+    if missing:
+        raise FileNotFoundError(f"マニフェストの動画が見つかりません: {', '.join(missing)}")
+    # 同じ名前の動画が別のディレクトリにあっても出力が重ならないよう、共通の親からの相対パスを使う
+    root = Path(os.path.commonpath([str(v.parent) for v in videos])) if videos else base
+    return [PipelineJob(video, str(video.relative_to(root).with_suffix(""))) for video in videos]
+
+
+class PipelineState:
+    """
+    処理済みの動画のチェックサムと出力を記録する
+    大きな動画を毎回読み直さないよう、サイズと更新時刻が同じ場合は記録済みのチェックサムを使う
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries: Dict[str, dict] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+        self._lock = threading.Lock()
+
+    def checksum(self, video_path: Path) -> str:
+        stat = video_path.stat()
+        with self._lock:
+            entry = self.entries.get(str(video_path))
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["sha256"]
+        return sha256_file(str(video_path))
+
+    def is_done(self, video_path: Path, checksum: str, settings: dict) -> bool:
+        """同じ内容・設定で処理済みで、出力も書き換えられていなければ True"""
+        with self._lock:
+            entry = self.entries.get(str(video_path))
+        if not entry or entry["sha256"] != checksum or entry["settings"] != settings:
+            return False
+        transcript = entry["transcript"]
+        return os.path.exists(transcript) and sha256_file(transcript) == entry["transcript_sha256"]
+
+    def mark_done(self, video_path: Path, checksum: str, settings: dict, audio: List[str], transcript: str) -> None:
+        stat = video_path.stat()
+        with self._lock:
+            self.entries[str(video_path)] = {
+                "sha256": checksum,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "settings": settings,
+                "audio": audio,
+                "transcript": transcript,
+                "transcript_sha256": sha256_file(transcript),
+                "completed_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def fake_transcriber(rtf: float) -> Transcriber:
+    """音声の長さ×rtf秒だけ待って、1つのセグメントを返す（動作確認・計測用）"""
+    def transcribe(audio_path: str) -> List[dict]:
+        duration = probe_media(audio_path)["duration"] or 0.0
+        time.sleep(duration * rtf)
+        return [{"start": 0.0, "end": duration, "text": f"{Path(audio_path).stem} の文字起こし"}]
+
+    return transcribe
+
+
+def run_pipeline(jobs: List[PipelineJob], transcriber: Transcriber, audio_dir: str, output_dir: str,
+                 settings: Optional[dict] = None, force: bool = False) -> dict:
+    """
+    音声抽出と文字起こしを重ねて実行する
+    Args:
+        jobs: 処理する動画のリスト
+        transcriber: 文字起こし関数
+        audio_dir: 抽出した音声（16kHzモノラルWAV）の出力ディレクトリ
+        output_dir: 文字起こし結果とレポートの出力ディレクトリ
+        settings: 結果に影響する設定（変わった場合は処理し直す）
+        force: 処理済みの動画も処理し直す
+    Returns:
+        実行レポート
+    """
+    settings = settings or {}
+    state = PipelineState(os.path.join(output_dir, STATE_FILE))
+    ready: "queue.Queue" = queue.Queue(maxsize=QUEUE_SIZE)
+    stop = threading.Event()
+
+    def produce():
+        """音声を抽出してキューに入れる（文字起こしが追いつくまでは待つ）"""
+        for job in jobs:
+            if stop.is_set():
+                break
+            record = {"video": str(job.video_path), "name": job.name, "status": "pending"}
+            try:
+                start = time.perf_counter()
+                checksum = state.checksum(job.video_path)
+                record["checksum_seconds"] = round(time.perf_counter() - start, 3)
+                record["sha256"] = checksum
+                if not force and state.is_done(job.video_path, checksum, settings):
+                    record["status"] = "skipped"
+                    ready.put((job, record, None))
+                    continue
+                start = time.perf_counter()
+                audio_path = os.path.join(audio_dir, job.name + ".wav")
+                outputs = extract_audio_from_video(str(job.video_path), audio_path,
+                                                   sample_rate=WHISPER_SAMPLE_RATE, mono=True)
+                record["extract_seconds"] = round(time.perf_counter() - start, 3)
+                if not outputs:
+                    raise RuntimeError("音声の抽出に失敗しました")
+                record["audio_seconds"] = probe_media(outputs[0])["duration"]
+                ready.put((job, record, outputs))
+            except Exception as e:
+                record.update(status="failed", error=str(e))
+                ready.put((job, record, None))
+        ready.put(None)
+
+    producer = threading.Thread(target=produce, name="audio-extractor", daemon=True)
+    started_at = datetime.now()
+    run_start = time.perf_counter()
+    producer.start()
+
+    records = []
+    try:
+        while True:
+            wait_start = time.perf_counter()
+            item = ready.get()
+            if item is None:
+                break
+            job, record, audio = item
+            record["wait_seconds"] = round(time.perf_counter() - wait_start, 3)
+            records.append(record)
+            if record["status"] != "pending":
+                label = "処理済みのためスキップ" if record["status"] == "skipped" else f"失敗: {record['error']}"
+                print(f"[{len(records)}/{len(jobs)}] {job.name}: {label}")
+                continue
+            try:
+                start = time.perf_counter()
+                segments = transcriber(audio[0])
+                transcript = os.path.join(output_dir, job.name + ".txt")
+                write_transcript(segments, transcript)
+                TranscriptStore.from_dicts(segments, job.name).save(store_path_for(transcript))
+                record["transcribe_seconds"] = round(time.perf_counter() - start, 3)
+                if record.get("audio_seconds"):
+                    record["rtf"] = round(record["transcribe_seconds"] / record["audio_seconds"], 3)
+                record.update(status="done", transcript=transcript, segments=len(segments))
+                state.mark_done(job.video_path, record["sha256"], settings, audio, transcript)
+                print(f"[{len(records)}/{len(jobs)}] {job.name}: 抽出 {record['extract_seconds']:.1f}秒, "
+                      f"文字起こし {record['transcribe_seconds']:.1f}秒 → {transcript}")
+            except Exception as e:
+                record.update(status="failed", error=str(e))
+                print(f"[{len(records)}/{len(jobs)}] {job.name}: 失敗: {e}")
+    finally:
+        stop.set()
+        # 中断された場合でも抽出スレッドがキューで止まらないよう空にする
+        while producer.is_alive():
+            try:
+                ready.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    wall = time.perf_counter() - run_start
+    stage_total = sum(r.get("extract_seconds", 0) + r.get("transcribe_seconds", 0) for r in records)
+    report = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "settings": settings,
+        "files": records,
+        "summary": {
+            "total": len(records),
+            "done": sum(r["status"] == "done" for r in records),
+            "skipped": sum(r["status"] == "skipped" for r in records),
+            "failed": sum(r["status"] == "failed" for r in records),
+            "wall_seconds": round(wall, 3),
+            "stage_seconds": round(stage_total, 3),
+            "overlap_seconds": round(max(stage_total - wall, 0.0), 3),
+        },
+    }
+    report_dir = os.path.join(output_dir, "reports")
+    os.makedirs(report_dir, exist_ok=True)
+    report_path = os.path.join(report_dir, f"run_{started_at:%Y%m%d_%H%M%S}.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    summary = report["summary"]
+    print(f"完了: {summary['done']}件, スキップ: {summary['skipped']}件, 失敗: {summary['failed']}件 / "
+          f"経過 {summary['wall_seconds']:.1f}秒（各工程の合計 {summary['stage_seconds']:.1f}秒）")
+    print(f"レポート: {report_path}")
+    report["path"] = report_path
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="講義動画の音声抽出と文字起こしを一括で行う")
+    parser.add_argument("source", help="動画のディレクトリ、またはマニフェスト（.txt / .json）")
+    parser.add_argument("--audio-dir", default="data/audio", help="抽出した音声の出力ディレクトリ")
+    parser.add_argument("--output-dir", default="data/output", help="文字起こし結果とレポートの出力ディレクトリ")
+    parser.add_argument("--model", default="base", help="Whisperモデルの大きさ")
+    parser.add_argument("--device", help="実行デバイス（cpu, cuda など）")
+    parser.add_argument("--backend", choices=list(BACKENDS), help="文字起こしのバックエンド（既定: whisper）")
+    parser.add_argument("--force", action="store_true", help="処理済みの動画も処理し直す")
+    parser.add_argument("--fake-rtf", type=float,
+                        help="Whisperの代わりに音声の長さ×この値だけ待つ処理を使う（動作確認・計測用）")
+    args = parser.parse_args()
+
+    jobs = load_jobs(args.source)
+    if args.fake_rtf is not None:
+        transcriber = fake_transcriber(args.fake_rtf)
+        settings = {"transcriber": "fake", "rtf": args.fake_rtf}
+        run_pipeline(jobs, transcriber, args.audio_dir, args.output_dir, settings, force=args.force)
+        return
+
+    # モデルを読み込んだワーカープロセスを起動しておき、全ての動画で使い回す
+    # （モデルの読み込みは最初の動画の音声抽出と並行して進む）
+    settings = {"transcriber": args.backend or DEFAULT_BACKEND, "model": args.model}
+    with TranscriptionWorker(args.model, args.device, backend=args.backend, verbose=False) as worker:
+        run_pipeline(jobs, worker.transcribe, args.audio_dir, args.output_dir, settings, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
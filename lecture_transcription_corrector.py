@@ -4,23 +4,34 @@ from typing import Dict, List, Tuple
 
 import assemblyai as aai
 from dotenv import load_dotenv
-import fitz  # PyMuPDF
-import pdfplumber
-import whisper
+
+from assemblyai_transcribe import transcribe_files
+from llm_correction import AsyncLLMClient, CorrectionReport, correct_transcript, get_backend
+from pdf_extract import extract_texts
+from quality_metrics import TermChecker, evaluate
+from slide_retrieval import SLIDE_INDEX_DIR, CorrectionPrompt, SlideIndex, build_correction_prompts
+from term_correction import TermCorrector
+from text_diff import diff_stats, diff_texts, write_diff
+from whisper_model import get_model_holder
 
 class LectureTranscriptionCorrector:
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, whisper_model: str = None, device: str = None,
+                 backend: str = None):
         """
         講義書き起こし修正システムの初期化
         Args:
             api_key: AssemblyAI APIキー
+            whisper_model: バックアップに使うWhisperモデルの大きさ（省略時は環境変数 WHISPER_MODEL、なければ base）
+            device: Whisperの実行デバイス
+            backend: 文字起こしのバックエンド（whisper, whisper-int8, faster-whisper）
         """
         # AssemblyAIの設定
+        self.api_key = api_key
         if api_key:
             aai.settings.api_key = api_key
         
-        # Whisperモデルの読み込み（バックアップとして）
-        self.whisper_model = whisper.load_model("base")
+        # Whisperモデル（バックアップとして）。使うときに初めて読み込み、他のモジュールと共有する
+        self.whisper_model = get_model_holder(whisper_model, device, backend)
         
     def transcribe_audio(self, audio_file: str, use_whisper: bool = False) -> str:
         """
@@ -44,63 +55,123 @@ class LectureTranscriptionCorrector:
             transcript = transcriber.transcribe(audio_file, config)
             return transcript.text
 
+    def transcribe_audio_files(self, audio_files: List[str], concurrency: int = 4) -> Dict[str, str]:
+        """
+        複数の音声ファイルをAssemblyAIで並行に文字起こしする
+        全てのファイルのアップロードとジョブ登録を先に進め、終わったジョブから結果を受け取る
+        Args:
+            audio_files: 音声ファイルのパスのリスト
+            concurrency: 同時に行うアップロードの数
+        Returns:
+            音声ファイルのパスから文字起こしテキストへの辞書（失敗したファイルは含まない）
+        """
+        results = transcribe_files(audio_files, self.api_key or aai.settings.api_key, concurrency=concurrency)
+        for result in results:
+            if result.status != "completed":
+                print(f"文字起こしに失敗しました: {result.audio_path}: {result.error}")
+        return {r.audio_path: r.text for r in results if r.status == "completed"}
+
     def extract_text_from_pdf(self, pdf_file: str) -> List[str]:
         """
         PDFから講義資料のテキストを抽出
+        PDFは1回だけ開き、抽出結果はPDFの内容のハッシュをキーにキャッシュする。
+        表も必要な場合やページを順に処理したい場合は pdf_extract.extract_pages を使う
         Args:
             pdf_file: PDFファイルのパス
         Returns:
             ページごとのテキストのリスト
         """
-        texts = []
-        
-        # PyMuPDFを使用した基本的なテキスト抽出
-        doc = fitz.open(pdf_file)
-        for page in doc:
-            text = page.get_text()
-            texts.append(text)
-        
-        # より詳細な抽出が必要な場合はpdfplumberを使用
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                # テーブルや特殊なレイアウトの処理が必要な場合に使用
-                pass
-        
-        return texts
+        return extract_texts(pdf_file)
+
+    def build_correction_prompts(self, transcription: str, pdf_file: str, top_k: int = 3,
+                                 max_chars: int = 3000) -> List[CorrectionPrompt]:
+        """
+        LLMで修正するためのプロンプトを書き起こしのチャンクごとに作成
+        講義資料の全ページではなく、チャンクごとに関係の深い上位 top_k ページだけを入れる。
+        資料の索引は data/output/cache/slides に保存し、PDFが変わった場合は変わったページだけを更新する
+        Args:
+            transcription: 元の書き起こしテキスト
+            pdf_file: 講義資料のPDFファイルのパス
+            top_k: チャンクごとに入れるページ数の上限
+            max_chars: プロンプトの文字数の上限
+        Returns:
+            チャンク・選んだページ・プロンプトのリスト
+        """
+        index = SlideIndex(os.path.join(SLIDE_INDEX_DIR, Path(pdf_file).stem))
+        index.update([pdf_file])
+        return build_correction_prompts(transcription, index, top_k, max_chars)
 
     def correct_transcription(self, transcription: str, reference_texts: List[str]) -> str:
         """
         講義資料を参照して書き起こしを修正
+        講義資料から固有名詞・専門用語の辞書を作り、読みが近い誤認識の語を辞書の用語に置き換える
         Args:
             transcription: 元の書き起こしテキスト
             reference_texts: 講義資料から抽出したテキストのリスト
         Returns:
             修正された書き起こしテキスト
         """
-        # TODO: より高度な修正ロジックの実装
-        # 1. 固有名詞の抽出と修正
-        # 2. 文脈を考慮した修正
-        # 3. 数字や専門用語の修正
-        return transcription
+        # 固有名詞・専門用語の修正（講義資料の用語辞書）。文脈を考慮した修正は correct_transcription_with_llm で行う
+        corrected, corrections = TermCorrector.from_texts(reference_texts).correct(transcription)
+        print(f"用語を{len(corrections)}か所修正しました")
+        return corrected
+
+    def correct_transcription_with_llm(self, transcription: str, pdf_file: str = None, llm: str = "gemini",
+                                       concurrency: int = 4,
+                                       requests_per_minute: float = None) -> Tuple[str, CorrectionReport]:
+        """
+        LLMで書き起こしを修正
+        書き起こしを重なりのあるチャンクに分け、チャンクごとに関係の深い講義資料のページだけを入れて並行に修正する
+        Args:
+            transcription: 元の書き起こしテキスト
+            pdf_file: 講義資料のPDFファイルのパス（省略時は資料を参照しない）
+            llm: LLM（gemini, fake）
+            concurrency: 同時に送るリクエスト数
+            requests_per_minute: 1分あたりのリクエスト数の上限
+        Returns:
+            (修正された書き起こしテキスト, 処理結果)
+        """
+        index = None
+        if pdf_file:
+            index = SlideIndex(os.path.join(SLIDE_INDEX_DIR, Path(pdf_file).stem))
+            index.update([pdf_file])
+        client = AsyncLLMClient(get_backend(llm), concurrency, requests_per_minute)
+        corrected, report = correct_transcript(transcription, client, index)
+        print(report.summary())
+        return corrected, report
+
+    def write_diff(self, original: str, corrected: str, output_path: str) -> Dict[str, float]:
+        """
+        修正箇所を差分として保存
+        Args:
+            original: 元の書き起こしテキスト
+            corrected: 修正後のテキスト
+            output_path: 出力ファイル（.html なら修正箇所に色を付けたHTML、.json なら変更箇所の一覧）
+        Returns:
+            差分の統計（変更箇所の数、削除・追加した文字数、類似度）
+        """
+        spans = diff_texts(original, corrected)
+        write_diff(original, corrected, output_path, spans)
+        return diff_stats(spans)
 
-    def evaluate_quality(self, original: str, corrected: str) -> Dict[str, float]:
+    def evaluate_quality(self, original: str, corrected: str, reference_texts: List[str] = None,
+                         gold: str = None) -> Dict[str, float]:
         """
         修正の品質を評価
         Args:
             original: 元の書き起こしテキスト
             corrected: 修正後のテキスト
+            reference_texts: 講義資料から抽出したテキストのリスト（固有名詞の正確性の評価に使う）
+            gold: 正解の書き起こし（あれば cer, wer は正解との誤り率、なければ元のテキストからの変更率）
         Returns:
             品質評価の結果
+            - naturalness: 文の自然さ（フィラーなどではない文字の割合）
+            - faithfulness: 元の発言との一致度（元の文字のうち修正後にも残っている割合）
+            - accuracy: 固有名詞の正確性（講義資料の用語として正しく書かれた割合。資料がなければ NaN）
+            - cer, wer: 文字・単語の誤り率
         """
-        # TODO: 評価指標の実装
-        # - 文の自然さ
-        # - 元の発言との一致度
-        # - 固有名詞の正確性
-        return {
-            "naturalness": 0.0,
-            "faithfulness": 0.0,
-            "accuracy": 0.0
-        }
+        checker = TermChecker.from_texts(reference_texts) if reference_texts else None
+        return evaluate(original, corrected, checker, gold)
 
 def main():
     # 環境変数の読み込み
@@ -124,7 +195,7 @@ def main():
     corrected_text = corrector.correct_transcription(transcription, reference_texts)
     
     # 品質評価
-    quality_metrics = corrector.evaluate_quality(transcription, corrected_text)
+    quality_metrics = corrector.evaluate_quality(transcription, corrected_text, reference_texts)
     print(f"Quality Metrics: {quality_metrics}")
 
 if __name__ == "__main__":
@@ -0,0 +1,490 @@
+"""
+LLMによる書き起こしの並列修正
+
+書き起こしを文の区切りで重なりのあるチャンクに分け、非同期のクライアントで同時に修正してから1つにまとめる。
+
+- チャンクは「前の文脈 + 担当部分 + 後の文脈」からなる。LLMにはチャンク全体を修正させ、
+  元のチャンクと修正結果を文字単位で対応付けて、担当部分に当たる範囲だけを使う。
+  重なりの部分は両側のチャンクで修正されるが、採用するのはその文を担当するチャンクの結果だけなので、
+  境界で文が重複したり欠けたりしない
+- リクエスト数・トークン数はトークンバケットで制限し、一時的なエラー（レート制限・タイムアウトなど）は
+  指数バックオフで再試行する。失敗したチャンク・長さが大きく変わったチャンクは元のテキストを使う
+- 講義資料を指定した場合は、チャンクごとに関係の深いページだけをプロンプトに入れる（slide_retrieval.py）
+- 複数の講義の書き起こしも、全てのチャンクを同じクライアント（同じレート制限）で並行に処理する
+
+LLMは gemini（google-generativeai、環境変数 GOOGLE_API_KEY）と、動作確認・計測用の fake から選ぶ。
+
+使い方:
+    # 講義資料を参照して書き起こしを修正する
+    python llm_correction.py day3/data/LLM2024_day4_raw.txt --reference data/slides/day4.pdf -o data/output/day4_llm.txt
+
+    # 複数の講義を並行に修正する（出力は <名前>_corrected.txt）
+    python llm_correction.py data/output/day1.txt data/output/day2.txt --output-dir data/output --concurrency 8
+
+    # 応答を一定時間待つだけの LLM で、同時実行数ごとのチャンク/秒と応答時間の分布を計測する
+    python llm_correction.py --benchmark --concurrency 1 4 16
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from slide_retrieval import DEFAULT_PROMPT_CHARS, DEFAULT_TOP_K, SLIDE_INDEX_DIR, SlideIndex, build_prompt
+from text_diff import diff_texts, map_offset
+from text_segmenter import segment_text
+
+GEMINI_MODEL = "gemini-2.0-flash"
+# チャンクの担当部分の文字数と、前後に付ける文脈の文字数
+DEFAULT_CHUNK_CHARS = 800
+DEFAULT_OVERLAP_CHARS = 150
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 4
+# 修正結果の長さが元のチャンクのこの範囲を外れたら、修正に失敗したとみなして元のテキストを使う
+LENGTH_RATIO_RANGE = (0.5, 1.5)
+
+Backend = Callable[[str], Awaitable[str]]
+
+
+class TransientLLMError(Exception):
+    """再試行すれば成功する可能性のあるエラー（レート制限・一時的なサーバーエラーなど）"""
+
+
+# --- チャンクへの分割 ---
+
+def split_sentences(text: str, max_chars: int = DEFAULT_CHUNK_CHARS) -> List[str]:
+    """
+    文の区切り（text_segmenter）で分割する（つなげると元のテキストに戻る）
+    文の直後の空白・改行は前の文に含める。句点のないまま max_chars を超える部分は、読点・空白の位置で分ける
+    """
+    sentences: List[str] = []
+    start = 0
+    for unit in segment_text(text, max_chars):
+        end = unit.end
+        while end < len(text) and text[end] in " \t\r\u3000":
+            end += 1
+        if text.startswith("\n", end):
+            end += 1
+        sentences.append(text[start:end])
+        start = end
+    if start < len(text):
+        sentences.append(text[start:])
+    return sentences
+
+
+class Chunk(NamedTuple):
+    """修正するチャンク（text[core_start:core_end] が担当部分、その前後は文脈）"""
+    index: int
+    text: str
+    core_start: int
+    core_end: int
+    source: int = 0  # 何番目の書き起こしか
+
+
+def plan_chunks(text: str, chunk_chars: int = DEFAULT_CHUNK_CHARS, overlap_chars: int = DEFAULT_OVERLAP_CHARS,
+                source: int = 0) -> List[Chunk]:
+    """
+    書き起こしを文の区切りで、前後の文脈と重なるチャンクに分ける
+    Args:
+        text: 書き起こし
+        chunk_chars: 担当部分の文字数の目安
+        overlap_chars: 前後に付ける文脈の文字数の目安（最低1文）
+        source: チャンクに記録する書き起こしの番号
+    Returns:
+        チャンクのリスト（担当部分をつなげると元のテキストになる）
+    """
+    sentences = split_sentences(text, chunk_chars)
+    groups: List[Tuple[int, int]] = []
+    start = 0
+    while start < len(sentences):
+        end, size = start, 0
+        while end < len(sentences) and (end == start or size + len(sentences[end]) <= chunk_chars):
+            size += len(sentences[end])
+            end += 1
+        groups.append((start, end))
+        start = end
+
+    chunks = []
+    for index, (start, end) in enumerate(groups):
+        before, size = start, 0
+        while before > 0 and (before == start or size < overlap_chars):
+            before -= 1
+            size += len(sentences[before])
+        after, size = end, 0
+        while after < len(sentences) and (after == end or size < overlap_chars):
+            size += len(sentences[after])
+            after += 1
+        head = "".join(sentences[before:start])
+        core = "".join(sentences[start:end])
+        tail = "".join(sentences[end:after])
+        chunks.append(Chunk(index, head + core + tail, len(head), len(head) + len(core), source))
+    return chunks
+
+
+def extract_core(chunk: Chunk, corrected: str) -> str:
+    """修正結果のうち、チャンクの担当部分に当たる範囲"""
+    if chunk.core_start == 0 and chunk.core_end == len(chunk.text):
+        return corrected
+    spans = diff_texts(chunk.text, corrected)
+    start = map_offset(spans, chunk.core_start) if chunk.core_start else 0
+    end = map_offset(spans, chunk.core_end) if chunk.core_end < len(chunk.text) else len(corrected)
+    return corrected[start:end]
+
+
+# --- 非同期クライアント ---
+
+class TokenBucket:
+    """
+    非同期のトークンバケット
+    待っている処理の順に予約し、予約した分が貯まるまで待つ（残量が負になっても予約は受け付ける）
+    Args:
+        rate: 1秒あたりに貯まる量
+        capacity: 貯められる上限（省略時は rate。一度にこれを超える量は capacity として扱う）
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """amount を取り出せるまで待ち、待った秒数を返す"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= min(amount, self.capacity)
+        if self._tokens >= 0:
+            return 0.0
+        wait = -self._tokens / self.rate
+        await asyncio.sleep(wait)
+        return wait
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の目安（日本語はおおよそ1文字1トークン）"""
+    return len(text)
+
+
+class ChunkResult(NamedTuple):
+    chunk: Chunk
+    corrected: Optional[str]  # 修正後の担当部分（失敗した場合は None）
+    latency: float  # 応答時間（レート制限の待ち時間・再試行を含む秒数）
+    attempts: int
+    error: Optional[str] = None
+
+
+class AsyncLLMClient:
+    """
+    同時実行数・レート制限・再試行付きのLLMクライアント
+    Args:
+        backend: プロンプトを受け取り応答のテキストを返す非同期関数
+        concurrency: 同時に送るリクエスト数
+        requests_per_minute: 1分あたりのリクエスト数の上限（None なら制限しない）
+        tokens_per_minute: 1分あたりの入力トークン数の上限（None なら制限しない）
+        max_retries: 一時的なエラーで再試行する回数
+        timeout: 1回のリクエストのタイムアウト（秒）
+        backoff: 再試行の待ち時間の基準（秒。回数ごとに倍にし、ランダムに短くする）
+    """
+
+    def __init__(self, backend: Backend, concurrency: int = DEFAULT_CONCURRENCY,
+                 requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_retries: int = DEFAULT_MAX_RETRIES, timeout: float = 120.0, backoff: float = 1.0):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.request_bucket = TokenBucket(requests_per_minute / 60, max(1.0, requests_per_minute / 60)) \
+            if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute / 60, tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.retries = 0
+
+    async def complete(self, prompt: str, semaphore: asyncio.Semaphore) -> Tuple[str, int, float]:
+        """
+        応答のテキスト、試行回数、応答時間（最初に送り始めてからの秒数。同時実行数の空きを待つ時間は除く）を返す
+        再試行しても失敗したら最後のエラーを送出する
+        """
+        async with semaphore:
+            started = time.perf_counter()
+            attempt = 0
+            while True:
+                attempt += 1
+                if self.request_bucket:
+                    await self.request_bucket.acquire()
+                if self.token_bucket:
+                    await self.token_bucket.acquire(estimate_tokens(prompt))
+                try:
+                    text = await asyncio.wait_for(self.backend(prompt), self.timeout)
+                    return text, attempt, time.perf_counter() - started
+                except (TransientLLMError, asyncio.TimeoutError) as e:
+                    if attempt > self.max_retries:
+                        raise
+                    error = e
+                # 再試行を待つ間も枠を空けない（レート制限のエラーが続くときに送る量を減らす）
+                self.retries += 1
+                delay = self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.0)
+                print(f"警告: LLMの一時的なエラーのため{delay:.1f}秒後に再試行します（{attempt}回目）: {error}")
+                await asyncio.sleep(delay)
+
+
+# --- LLM のバックエンド ---
+
+class FakeLLM:
+    """
+    一定時間待ってから、プロンプトの書き起こしに置き換えの表を適用して返す（動作確認・計測用）
+    Args:
+        latency: 応答までの秒数
+        jitter: 応答時間のばらつき（latency に対する割合）
+        failure_rate: 一時的なエラーにする割合
+        replacements: 書き起こしに適用する置き換えの表
+        seed: 乱数の種
+    """
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.5, failure_rate: float = 0.0,
+                 replacements: Optional[Dict[str, str]] = None, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.replacements = replacements or {}
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    async def __call__(self, prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency * (1 + self.jitter * self.random.random()))
+        if self.random.random() < self.failure_rate:
+            raise TransientLLMError("429 Too Many Requests（fake）")
+        text = prompt.split("\n# 書き起こし\n", 1)[1][:-1]
+        for old, new in self.replacements.items():
+            text = text.replace(old, new)
+        return text
+
+
+class GeminiLLM:
+    """
+    Gemini による修正（google-generativeai、APIキーは環境変数 GOOGLE_API_KEY）
+    Args:
+        model_name: モデル名
+    """
+
+    def __init__(self, model_name: str = GEMINI_MODEL):
+        import google.generativeai as genai
+        from google.api_core import exceptions
+
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        self.model = genai.GenerativeModel(model_name)
+        self._transient = (exceptions.ResourceExhausted, exceptions.ServiceUnavailable,
+                           exceptions.DeadlineExceeded, exceptions.InternalServerError)
+
+    async def __call__(self, prompt: str) -> str:
+        try:
+            response = await self.model.generate_content_async(prompt)
+        except self._transient as e:
+            raise TransientLLMError(str(e)) from e
+        return response.text
+
+
+def get_backend(name: str) -> Backend:
+    """名前からLLMのバックエンドを作る（gemini, fake）"""
+    if name == "gemini":
+        return GeminiLLM()
+    if name == "fake":
+        return FakeLLM()
+    raise ValueError(f"不明なLLMです: {name}（gemini, fake から選んでください）")
+
+
+# --- 修正のパイプライン ---
+
+class CorrectionReport(NamedTuple):
+    """修正の処理結果（latencies はチャンクごとの秒数）"""
+    chunks: int
+    failed: int
+    retries: int
+    seconds: float
+    latencies: List[float]
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        p50, p90, p99 = np.percentile(self.latencies, [50, 90, 99]) if self.latencies else (0.0, 0.0, 0.0)
+        return (f"{self.chunks}チャンク, {self.seconds:.2f}秒, {self.chunks_per_second:.2f}チャンク/秒, "
+                f"応答時間 p50 {p50:.2f}秒 / p90 {p90:.2f}秒 / p99 {p99:.2f}秒 / 最大 {max(self.latencies, default=0):.2f}秒, "
+                f"再試行{self.retries}回, 失敗{self.failed}チャンク")
+
+
+async def _correct_chunk(chunk: Chunk, prompt: str, client: AsyncLLMClient,
+                         semaphore: asyncio.Semaphore) -> ChunkResult:
+    start = time.perf_counter()
+    try:
+        corrected, attempts, latency = await client.complete(prompt, semaphore)
+    except Exception as e:
+        return ChunkResult(chunk, None, time.perf_counter() - start, client.max_retries + 1, str(e))
+    ratio = len(corrected) / max(len(chunk.text), 1)
+    low, high = LENGTH_RATIO_RANGE
+    if not low <= ratio <= high:
+        return ChunkResult(chunk, None, latency, attempts, f"修正結果の長さが元の{ratio:.0%}です")
+    return ChunkResult(chunk, extract_core(chunk, corrected), latency, attempts)
+
+
+async def correct_chunks_async(chunks: List[Chunk], client: AsyncLLMClient, index: Optional[SlideIndex] = None,
+                               top_k: int = DEFAULT_TOP_K,
+                               max_chars: int = DEFAULT_PROMPT_CHARS) -> List[ChunkResult]:
+    """
+    チャンクを同時に修正する（結果はチャンクの順）
+    Args:
+        chunks: 修正するチャンク
+        client: LLMクライアント
+        index: 講義資料の索引（None なら資料を入れない）
+        top_k: チャンクごとに入れる講義資料のページ数
+        max_chars: プロンプトの文字数の上限
+    Returns:
+        ChunkResult のリスト
+    """
+    texts = [chunk.text for chunk in chunks]
+    found = index.search_many(texts, top_k) if index is not None and len(index) else [[] for _ in chunks]
+    prompts = [build_prompt(text, [result.slide for result in results], max_chars)
+               for text, results in zip(texts, found)]
+    semaphore = asyncio.Semaphore(client.concurrency)
+    return list(await asyncio.gather(*(_correct_chunk(chunk, prompt, client, semaphore)
+                                       for chunk, prompt in zip(chunks, prompts))))
+
+
+def reassemble(chunks: List[Chunk], results: List[ChunkResult]) -> str:
+    """担当部分の修正結果をつなげる（失敗したチャンクは元のテキスト）"""
+    by_index = {(result.chunk.source, result.chunk.index): result for result in results}
+    parts = []
+    for chunk in chunks:
+        result = by_index.get((chunk.source, chunk.index))
+        if result is None or result.corrected is None:
+            parts.append(chunk.text[chunk.core_start:chunk.core_end])
+        else:
+            parts.append(result.corrected)
+    return "".join(parts)
+
+
+def correct_transcripts(transcripts: List[str], client: AsyncLLMClient, index: Optional[SlideIndex] = None,
+                        chunk_chars: int = DEFAULT_CHUNK_CHARS, overlap_chars: int = DEFAULT_OVERLAP_CHARS,
+                        top_k: int = DEFAULT_TOP_K,
+                        max_chars: int = DEFAULT_PROMPT_CHARS) -> Tuple[List[str], CorrectionReport]:
+    """
+    複数の書き起こしを、全てのチャンクを並行に処理して修正する
+    Args:
+        transcripts: 書き起こしのリスト
+        client: LLMクライアント（同時実行数・レート制限は全ての書き起こしで共有する）
+        index: 講義資料の索引（None なら資料を入れない）
+        chunk_chars: チャンクの担当部分の文字数
+        overlap_chars: 前後に付ける文脈の文字数
+        top_k: チャンクごとに入れる講義資料のページ数
+        max_chars: プロンプトの文字数の上限
+    Returns:
+        (修正後の書き起こしのリスト, 処理結果)
+    """
+    planned = [plan_chunks(text, chunk_chars, overlap_chars, source=i) for i, text in enumerate(transcripts)]
+    chunks = [chunk for chunks in planned for chunk in chunks]
+    retries_before = client.retries
+    start = time.perf_counter()
+    results = asyncio.run(correct_chunks_async(chunks, client, index, top_k, max_chars))
+    seconds = time.perf_counter() - start
+
+    for result in results:
+        if result.error:
+            print(f"警告: チャンク{result.chunk.index + 1}（書き起こし{result.chunk.source + 1}）は"
+                  f"修正せずに元のテキストを使います: {result.error}")
+    report = CorrectionReport(len(chunks), sum(1 for r in results if r.corrected is None),
+                              client.retries - retries_before, seconds, [r.latency for r in results])
+    return [reassemble(source_chunks, results) for source_chunks in planned], report
+
+
+def correct_transcript(text: str, client: AsyncLLMClient, index: Optional[SlideIndex] = None,
+                       **options) -> Tuple[str, CorrectionReport]:
+    """1つの書き起こしを修正する（options は correct_transcripts と同じ）"""
+    corrected, report = correct_transcripts([text], client, index, **options)
+    return corrected[0], report
+
+
+# --- ベンチマーク ---
+
+def benchmark(transcript_path: str, concurrency_levels: List[int], lectures: int = 3, latency: float = 0.2,
+              failure_rate: float = 0.05, requests_per_minute: float = 1200) -> None:
+    """
+    応答を待つだけの LLM で、同時実行数ごとのチャンク/秒と応答時間の分布を計測する
+    Args:
+        transcript_path: 書き起こし（lectures 回繰り返して複数の講義とみなす）
+        concurrency_levels: 試す同時実行数
+        lectures: 並行に処理する講義の数
+        latency: LLM の応答時間（秒）
+        failure_rate: 一時的なエラーにする割合
+        requests_per_minute: 1分あたりのリクエスト数の上限
+    """
+    with open(transcript_path, "r", encoding="utf-8") as f:
+        transcripts = [f.read()] * lectures
+    chunk_count = sum(len(plan_chunks(text)) for text in transcripts)
+    print(f"書き起こし: {len(transcripts[0])}文字 × {lectures}講義, {chunk_count}チャンク, "
+          f"応答時間 {latency:g}〜{latency * 1.5:g}秒, エラー率 {failure_rate:.0%}, 上限 {requests_per_minute:.0f}リクエスト/分")
+    for concurrency in concurrency_levels:
+        client = AsyncLLMClient(FakeLLM(latency, failure_rate=failure_rate), concurrency,
+                                requests_per_minute=requests_per_minute, backoff=latency)
+        corrected, report = correct_transcripts(transcripts, client)
+        assert corrected == transcripts
+        print(f"==> 同時実行数 {concurrency}: {report.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLMで書き起こしを並列に修正する")
+    parser.add_argument("transcripts", nargs="*", help="修正する書き起こし")
+    parser.add_argument("--reference", nargs="+", default=[], help="講義資料（PDF またはテキスト）")
+    parser.add_argument("-o", "--output", help="出力ファイル（書き起こしが1つの場合）")
+    parser.add_argument("--output-dir", help="出力ディレクトリ（<名前>_corrected.txt に保存する）")
+    parser.add_argument("--llm", default="gemini", help="LLM（gemini, fake）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[DEFAULT_CONCURRENCY],
+                        help="同時に送るリクエスト数（ベンチマークでは複数指定可）")
+    parser.add_argument("--rpm", type=float, help="1分あたりのリクエスト数の上限")
+    parser.add_argument("--tpm", type=float, help="1分あたりの入力トークン数の上限")
+    parser.add_argument("--chunk-chars", type=int, default=DEFAULT_CHUNK_CHARS, help="チャンクの文字数")
+    parser.add_argument("--overlap-chars", type=int, default=DEFAULT_OVERLAP_CHARS, help="前後の文脈の文字数")
+    parser.add_argument("--benchmark", action="store_true", help="同時実行数ごとのチャンク/秒と応答時間を計測する")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "day3", "data")
+        levels = args.concurrency if args.concurrency != [DEFAULT_CONCURRENCY] else [1, 4, 16]
+        benchmark(os.path.join(data_dir, "LLM2024_day4_raw.txt"), levels)
+        return
+    if not args.transcripts:
+        parser.print_help()
+        return
+
+    index = None
+    if args.reference:
+        index = SlideIndex(os.path.join(SLIDE_INDEX_DIR, os.path.splitext(os.path.basename(args.reference[0]))[0]))
+        index.update(args.reference)
+    transcripts = []
+    for path in args.transcripts:
+        with open(path, "r", encoding="utf-8") as f:
+            transcripts.append(f.read())
+    client = AsyncLLMClient(get_backend(args.llm), args.concurrency[0], args.rpm, args.tpm)
+    corrected, report = correct_transcripts(transcripts, client, index, args.chunk_chars, args.overlap_chars)
+    print(report.summary())
+
+    for path, text in zip(args.transcripts, corrected):
+        if args.output and len(args.transcripts) == 1:
+            output_path = args.output
+        elif args.output_dir:
+            output_path = os.path.join(args.output_dir, f"{os.path.splitext(os.path.basename(path))[0]}_corrected.txt")
+        else:
+            print(text)
+            continue
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"修正結果を保存しました: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""
+無音区間で分割した音声の並列文字起こし
+
+音声を16kHzモノラルで読み込み、フレームごとのエネルギー（NumPy）で発話と無音を判定して、
+無音の位置で数十秒ごとのチャンクに分ける。チャンクはプロセスプールで並列に文字起こしし
+（各プロセスがWhisperモデルを1つずつ持つ）、セグメントの時刻を音声全体の時刻に直して
+transcribe_audio.py と同じ `[hh:mm:ss.mmm --> hh:mm:ss.mmm] テキスト` 形式で書き出す。
+無音だけのチャンクは文字起こししないため、無音部分での誤認識（幻聴）も減る。
+
+使い方:
+    python parallel_transcribe.py data/audio/python_basic_guidance.wav -o data/output/python_basic_guidance.txt --workers 4
+
+    # 並列数ごとの処理時間を計測する（Whisperがない場合は計算量が音声の長さに比例する代替モデルを使う）
+    python parallel_transcribe.py --benchmark --workers 1 2 4
+"""
+import argparse
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ffmpeg_utils import FFmpegError, get_ffmpeg_binary
+from transcribe_audio import store_path_for, write_transcript
+from transcript_store import TranscriptStore
+from whisper_model import BACKENDS, SEGMENT_KEYS, WhisperModelHolder, get_loader, load_whisper
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+
+# 発話とみなすエネルギー（dB）の決め方: 雑音レベル（下位10%）より MARGIN_DB 以上大きいフレーム
+MARGIN_DB = 10.0
+MIN_THRESHOLD_DB = -50.0
+
+
+class AudioChunk(NamedTuple):
+    """文字起こしの単位となる音声の区間（サンプル位置）"""
+    index: int
+    start: int
+    end: int
+
+    @property
+    def offset(self) -> float:
+        return self.start / SAMPLE_RATE
+
+    @property
+    def duration(self) -> float:
+        return (self.end - self.start) / SAMPLE_RATE
+
+
+def _decode_command(path: str, sample_rate: int, start: Optional[float] = None,
+                    duration: Optional[float] = None) -> List[str]:
+    command = [get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-nostdin"]
+    if start:
+        command += ["-ss", f"{start:.3f}"]
+    if duration is not None:
+        command += ["-t", f"{duration:.3f}"]
+    return command + ["-i", path, "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"]
+
+
+def load_audio(path: str, sample_rate: int = SAMPLE_RATE, start: Optional[float] = None,
+               duration: Optional[float] = None) -> np.ndarray:
+    """
+    音声ファイルをモノラル・指定サンプリングレートの float32 配列として読み込む
+    （Whisper の load_audio と同じ形式）。start, duration を指定するとその区間だけを読み込む
+    """
+    command = _decode_command(path, sample_rate, start, duration)
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise FFmpegError(f"音声の読み込みに失敗しました: {result.stderr.decode('utf-8', errors='replace')}")
+    return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+def scan_energy(path: str, block_seconds: float = 30.0) -> Tuple[np.ndarray, int]:
+    """
+    音声を少しずつデコードしながらフレームごとのエネルギー（dB）を求める
+    音声全体をメモリに載せないため、長い講義でも使うメモリはフレーム数に比例する分だけで済む
+    Returns:
+        (フレームごとのエネルギー, 音声の総サンプル数)
+    """
+    frame_length = int(SAMPLE_RATE * FRAME_SECONDS)
+    block_bytes = int(block_seconds / FRAME_SECONDS) * frame_length * 2
+    process = subprocess.Popen(_decode_command(path, SAMPLE_RATE), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    energies = []
+    total_samples = 0
+    rest = b""
+    while True:
+        block = process.stdout.read(block_bytes)
+        if not block:
+            break
+        data = rest + block
+        usable = len(data) // (frame_length * 2) * frame_length * 2
+        samples = np.frombuffer(data[:usable], np.int16).astype(np.float32) / 32768.0
+        energies.append(frame_energy_db(samples, frame_length))
+        total_samples += len(block) // 2
+        rest = data[usable:]
+    stderr = process.stderr.read()
+    if process.wait() != 0:
+        raise FFmpegError(f"音声の読み込みに失敗しました: {stderr.decode('utf-8', errors='replace')}")
+    energy = np.concatenate(energies) if energies else np.zeros(0, dtype=np.float32)
+    return energy, total_samples
+
+
+def frame_energy_db(audio: np.ndarray, frame_length: int) -> np.ndarray:
+    """フレームごとの平均エネルギー（dB）"""
+    frames = len(audio) // frame_length
+    if frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    power = np.square(audio[:frames * frame_length].reshape(frames, frame_length)).mean(axis=1)
+    return 10 * np.log10(power + 1e-10)
+
+
+def detect_voiced(energy_db: np.ndarray, min_silence_frames: int) -> np.ndarray:
+    """
+    発話しているフレームを判定する
+    しきい値は雑音レベルから決め、min_silence_frames より短い無音（息継ぎ）は発話に含める
+    """
+    if len(energy_db) == 0:
+        return np.zeros(0, dtype=bool)
+    noise_floor = np.percentile(energy_db, 10)
+    loud = np.percentile(energy_db, 90)
+    # 全体が発話でも区切れるよう上限を設け、無音だけの音声を発話と判定しないよう下限を設ける
+    threshold = max(min(noise_floor + MARGIN_DB, loud - MARGIN_DB / 2), MIN_THRESHOLD_DB)
+    voiced = energy_db > threshold
+
+    # 短い無音を埋める
+    changes = np.flatnonzero(np.diff(voiced.astype(np.int8))) + 1
+    bounds = np.concatenate([[0], changes, [len(voiced)]])
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if not voiced[start] and end - start < min_silence_frames and start > 0 and end < len(voiced):
+            voiced[start:end] = True
+    return voiced
+
+
+def split_on_silence(audio: np.ndarray, target_seconds: float = 60.0, max_seconds: float = 120.0,
+                     min_silence_seconds: float = 0.3, padding_seconds: float = 0.2) -> List[AudioChunk]:
+    """
+    無音の位置で音声をチャンクに分ける
+    各チャンクは target_seconds に近い長さになる無音の中央で区切り、max_seconds までに無音がなければ
+    その範囲で最もエネルギーの小さい位置で区切る。チャンクの前後の無音は padding_seconds を残して除き、
+    無音だけのチャンクは返さない
+    Args:
+        audio: 16kHzモノラルの音声
+        target_seconds: チャンクの目標の長さ（秒）
+        max_seconds: チャンクの最大の長さ（秒）
+        min_silence_seconds: 区切りに使う無音の最短の長さ（秒）
+        padding_seconds: 発話の前後に残す余白（秒）
+    Returns:
+        チャンクのリスト
+    """
+    energy = frame_energy_db(audio, int(SAMPLE_RATE * FRAME_SECONDS))
+    return plan_chunks(energy, len(audio), target_seconds, max_seconds, min_silence_seconds, padding_seconds)
+
+
+def plan_chunks(energy: np.ndarray, total_samples: int, target_seconds: float = 60.0, max_seconds: float = 120.0,
+                min_silence_seconds: float = 0.3, padding_seconds: float = 0.2) -> List[AudioChunk]:
+    """
+    フレームごとのエネルギーからチャンクの区間を決める（split_on_silence の本体）
+    Args:
+        energy: frame_energy_db または scan_energy で求めたエネルギー
+        total_samples: 音声の総サンプル数
+    Returns:
+        チャンクのリスト
+    """
+    frame_length = int(SAMPLE_RATE * FRAME_SECONDS)
+    voiced = detect_voiced(energy, max(1, int(min_silence_seconds / FRAME_SECONDS)))
+    total_frames = len(voiced)
+    if total_frames == 0 or not voiced.any():
+        return []
+
+    # 区切りの候補: 十分な長さの無音の中央
+    changes = np.flatnonzero(np.diff(voiced.astype(np.int8))) + 1
+    bounds = np.concatenate([[0], changes, [total_frames]])
+    cuts = np.array([(start + end) // 2 for start, end in zip(bounds[:-1], bounds[1:]) if not voiced[start]],
+                    dtype=np.int64)
+
+    target = int(target_seconds / FRAME_SECONDS)
+    limit = int(max_seconds / FRAME_SECONDS)
+    pieces: List[Tuple[int, int]] = []
+    start = 0
+    while total_frames - start > target + target // 2:
+        candidates = cuts[(cuts > start + target // 2) & (cuts <= start + limit)]
+        if len(candidates):
+            cut = int(candidates[np.argmin(np.abs(candidates - (start + target)))])
+        else:
+            window = energy[start + target:start + limit]
+            cut = start + target + int(np.argmin(window))
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, total_frames))
+
+    padding = int(padding_seconds / FRAME_SECONDS)
+    chunks = []
+    for start, end in pieces:
+        inside = np.flatnonzero(voiced[start:end])
+        if len(inside) == 0:
+            continue
+        first = max(start, start + int(inside[0]) - padding)
+        last = min(end, start + int(inside[-1]) + 1 + padding)
+        sample_end = total_samples if last == total_frames else last * frame_length
+        chunks.append(AudioChunk(len(chunks), first * frame_length, sample_end))
+    return chunks
+
+
+# --- プロセスプールのワーカー ---
+
+_worker_model: Optional[WhisperModelHolder] = None
+
+
+def _init_worker(model_name: str, device: Optional[str], loader: Callable, threads: int) -> None:
+    """各ワーカープロセスでモデルを1つ読み込む（CPUのスレッド数は並列数で分け合う）"""
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_model = WhisperModelHolder(model_name, device, loader)
+    _worker_model.get()
+
+
+def _transcribe_chunk(job) -> Tuple[int, List[dict], float]:
+    index, offset, samples, options = job
+    start = time.perf_counter()
+    result = _worker_model.transcribe(samples, **options)
+    segments = [
+        dict({key: s[key] for key in SEGMENT_KEYS if key in s}, start=s["start"] + offset, end=s["end"] + offset)
+        for s in result["segments"]
+    ]
+    return index, segments, time.perf_counter() - start
+
+
+def transcribe_chunks(audio: np.ndarray, chunks: List[AudioChunk], workers: int = 4,
+                      model_name: Optional[str] = None, device: Optional[str] = None,
+                      loader: Callable = load_whisper, **options) -> List[dict]:
+    """
+    チャンクをプロセスプールで並列に文字起こしし、時刻を音声全体の時刻に直してつなげる
+    Args:
+        audio: 16kHzモノラルの音声
+        chunks: split_on_silence で作ったチャンク
+        workers: 並列数（ワーカーごとにモデルを1つ読み込む）
+        model_name: Whisperモデルの大きさ
+        device: 実行デバイス
+        loader: モデルを読み込む関数
+        options: transcribe に渡す引数（language など）
+    Returns:
+        時刻順のセグメントのリスト
+    """
+    if not chunks:
+        return []
+    workers = max(1, min(workers, len(chunks)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # 長いチャンクから先に処理して、最後に1つだけ長いチャンクが残らないようにする
+    order = sorted(chunks, key=lambda c: c.duration, reverse=True)
+    jobs = [(c.index, c.offset, audio[c.start:c.end], options) for c in order]
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_name, device, loader, threads)) as executor:
+        for index, segments, elapsed in executor.map(_transcribe_chunk, jobs):
+            results[index] = segments
+            print(f"チャンク {index + 1}/{len(chunks)} "
+                  f"({chunks[index].offset:.1f}秒〜, {chunks[index].duration:.1f}秒) の文字起こしが完了しました: "
+                  f"{elapsed:.1f}秒")
+
+    segments = [segment for index in range(len(chunks)) for segment in results[index]]
+    return sorted(segments, key=lambda s: s["start"])
+
+
+def transcribe_parallel(audio_path: str, output_path: str, workers: int = 4, model_name: Optional[str] = None,
+                        device: Optional[str] = None, target_seconds: float = 60.0,
+                        loader: Callable = load_whisper, **options) -> List[dict]:
+    """
+    音声を無音で分割して並列に文字起こしし、タイムコード付きで保存する
+    Args:
+        audio_path: 入力音声ファイルのパス
+        output_path: 出力テキストファイルのパス
+        workers: 並列数
+        model_name: Whisperモデルの大きさ
+        device: 実行デバイス
+        target_seconds: チャンクの目標の長さ（秒）
+        loader: モデルを読み込む関数
+        options: transcribe に渡す引数
+    Returns:
+        セグメントのリスト
+    """
+    start = time.perf_counter()
+    audio = load_audio(audio_path)
+    chunks = split_on_silence(audio, target_seconds=target_seconds, max_seconds=target_seconds * 2)
+    voiced_seconds = sum(c.duration for c in chunks)
+    print(f"音声 {len(audio) / SAMPLE_RATE:.1f}秒を{len(chunks)}個のチャンクに分割しました"
+          f"（文字起こし対象 {voiced_seconds:.1f}秒, 同時実行数 {workers}）")
+    segments = transcribe_chunks(audio, chunks, workers, model_name, device, loader, **options)
+    write_transcript(segments, output_path)
+    TranscriptStore.from_dicts(segments, os.path.basename(audio_path)).save(store_path_for(output_path))
+    print(f"タイムコード付き文字起こしが完了しました: {output_path}（{time.perf_counter() - start:.1f}秒）")
+    return segments
+
+
+# --- ベンチマーク ---
+
+def synthetic_lecture(seconds: float, seed: int = 0) -> Tuple[np.ndarray, List[Tuple[float, float]]]:
+    """
+    発話（振幅が揺れる複数の音の重なり）と無音が交互に続く、講義風の音声を作る
+    Returns:
+        (音声, 発話区間 (開始秒, 終了秒) のリスト)
+    """
+    rng = np.random.default_rng(seed)
+    audio = (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 0.002).astype(np.float32)
+    utterances = []
+    t = 0.5
+    while True:
+        length = rng.uniform(2.0, 12.0)
+        if t + length > seconds - 0.5:
+            break
+        start, end = int(t * SAMPLE_RATE), int((t + length) * SAMPLE_RATE)
+        time_axis = np.arange(end - start) / SAMPLE_RATE
+        voice = sum(np.sin(2 * np.pi * f * time_axis) for f in rng.uniform(120, 900, 4))
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(2, 5) * time_axis) ** 2
+        audio[start:end] += (0.05 * voice * envelope).astype(np.float32)
+        utterances.append((t, t + length))
+        t += length + rng.uniform(0.4, 1.5)
+    return audio, utterances
+
+
+class SyntheticModel:
+    """
+    Whisperの代わりに使う計算量が音声の長さに比例するモデル（ベンチマーク用）
+    0.5秒ごとのスペクトルを計算し、発話区間ごとに1つのセグメントを返す
+    """
+
+    device = "cpu"
+
+    def __init__(self, work: int = 40):
+        self.work = work
+
+    def transcribe(self, audio: np.ndarray, **options) -> dict:
+        frame = SAMPLE_RATE // 2
+        for _ in range(self.work):
+            np.abs(np.fft.rfft(audio[:len(audio) // frame * frame].reshape(-1, frame), axis=1)).sum()
+        frame_length = int(SAMPLE_RATE * FRAME_SECONDS)
+        voiced = detect_voiced(frame_energy_db(audio, frame_length), int(0.3 / FRAME_SECONDS))
+        changes = np.flatnonzero(np.diff(np.concatenate([[0], voiced.astype(np.int8), [0]])))
+        segments = [
+            {"start": s * FRAME_SECONDS, "end": e * FRAME_SECONDS, "text": f"発話 {s * FRAME_SECONDS:.1f}"}
+            for s, e in zip(changes[::2], changes[1::2])
+        ]
+        return {"text": "", "segments": segments}
+
+
+def synthetic_loader(model_name: str, device: Optional[str]) -> SyntheticModel:
+    return SyntheticModel()
+
+
+def benchmark(worker_counts: List[int], seconds: float = 600, model_name: Optional[str] = None) -> None:
+    """
+    並列数ごとの処理時間を計測する
+    Args:
+        worker_counts: 試す並列数のリスト
+        seconds: 合成音声の長さ（秒）
+        model_name: 指定し、Whisperがインストールされている場合は実際のモデルで計測する
+    """
+    loader = synthetic_loader
+    if model_name:
+        try:
+            import whisper  # noqa: F401
+            loader = load_whisper
+        except ImportError:
+            print("Whisperがインストールされていないため、代替モデルで計測します")
+    audio, utterances = synthetic_lecture(seconds)
+    chunks = split_on_silence(audio)
+    print(f"合成音声: {seconds:.0f}秒, 発話 {len(utterances)}個, チャンク {len(chunks)}個, "
+          f"CPU {os.cpu_count()}コア, モデル: {'whisper ' + model_name if loader is load_whisper else '代替モデル'}")
+
+    baseline = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        segments = transcribe_chunks(audio, chunks, workers, model_name, None, loader)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"==> 同時実行数 {workers}: {elapsed:.2f}秒 (1並列比 {baseline / elapsed:.2f}倍, "
+              f"セグメント {len(segments)}個)\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="無音で分割した音声を並列に文字起こしする")
+    parser.add_argument("audio", nargs="?", help="入力音声ファイル")
+    parser.add_argument("-o", "--output", help="出力テキストファイル（既定: data/output/<音声ファイル名>.txt）")
+    parser.add_argument("--workers", type=int, nargs="+", default=[os.cpu_count() or 1],
+                        help="並列数（ベンチマークでは試す並列数のリスト）")
+    parser.add_argument("--model", help="Whisperモデルの大きさ")
+    parser.add_argument("--device", help="実行デバイス（cpu, cuda など）")
+    parser.add_argument("--backend", choices=list(BACKENDS), help="文字起こしのバックエンド（既定: whisper）")
+    parser.add_argument("--language", help="言語（ja など。省略時は自動判定）")
+    parser.add_argument("--chunk-seconds", type=float, default=60.0, help="チャンクの目標の長さ（秒）")
+    parser.add_argument("--benchmark", action="store_true", help="並列数ごとの処理時間を計測する")
+    parser.add_argument("--seconds", type=float, default=600, help="ベンチマークの合成音声の長さ（秒）")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.workers, args.seconds, args.model)
+    elif args.audio:
+        output = args.output or os.path.join("data", "output", os.path.splitext(os.path.basename(args.audio))[0] + ".txt")
+        options = {"language": args.language} if args.language else {}
+        transcribe_parallel(args.audio, output, args.workers[0], args.model, args.device,
+                            target_seconds=args.chunk_seconds, loader=get_loader(args.backend), **options)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+講義資料（PDF）のページごとのテキスト・表の抽出
+
+PDFは PyMuPDF で1回だけ開き、同じ文書からテキストと（指定した場合は）表を取り出す。
+ページ数の多いスライド資料は、ページの範囲ごとにプロセスプールで並列に処理する
+（各ワーカープロセスも文書を1回だけ開いて使い回す）。結果はページ順にジェネレーターで返すため、
+全ページの抽出が終わる前から処理を始められ、同時に持つページ数も並列数分に限られる。
+
+抽出結果はPDFの内容のハッシュをキーにして data/output/cache/pdf に1行1ページのJSONLで保存し、
+同じPDFは2回目からキャッシュを読むだけで済む。
+
+使い方:
+    python pdf_extract.py data/slides/day4.pdf --tables --workers 4
+
+    # 300ページの合成資料で、これまでの抽出方法との処理時間・メモリを比較する
+    python pdf_extract.py --benchmark --pages 300
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from analysis_cache import DEFAULT_CACHE_DIR, sha256_file
+
+PDF_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, "pdf")
+# これより少ないページ数ではプロセスの起動の方が重いため並列にしない
+PARALLEL_MIN_PAGES = 32
+# 1つのジョブで処理するページ数
+PAGES_PER_JOB = 16
+# 抽出方法を変えたら上げる（古いキャッシュを使わないようにする）
+EXTRACTOR_VERSION = 1
+
+
+class PdfPage(NamedTuple):
+    """1ページ分の抽出結果（number は1から始まるページ番号）"""
+    number: int
+    text: str
+    tables: Optional[List[List[List[str]]]] = None
+
+
+def _extract_page(page, tables: bool) -> PdfPage:
+    text = page.get_text()
+    found = None
+    if tables:
+        # 表の検出は PyMuPDF 1.23 以降の find_tables を使い、同じ文書から取り出す
+        found = [[["" if cell is None else str(cell) for cell in row] for row in table.extract()]
+                 for table in page.find_tables().tables]
+    return PdfPage(page.number + 1, text, found)
+
+
+# --- プロセスプールのワーカー ---
+
+_worker_doc = None
+
+
+def _init_worker(pdf_path: str) -> None:
+    """各ワーカープロセスで文書を1回だけ開く"""
+    global _worker_doc
+    import fitz
+
+    _worker_doc = fitz.open(pdf_path)
+
+
+def _extract_range(job: Tuple[int, int, bool]) -> List[PdfPage]:
+    start, end, tables = job
+    return [_extract_page(_worker_doc[i], tables) for i in range(start, end)]
+
+
+def _extract_serial(doc, tables: bool) -> Iterator[PdfPage]:
+    for page in doc:
+        yield _extract_page(page, tables)
+
+
+def _extract_parallel(pdf_path: str, page_count: int, tables: bool, workers: int) -> Iterator[PdfPage]:
+    """ページの範囲ごとに並列に抽出し、ページ順に返す（同時に処理中のジョブは並列数の2倍まで）"""
+    jobs = [(start, min(start + PAGES_PER_JOB, page_count), tables)
+            for start in range(0, page_count, PAGES_PER_JOB)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pdf_path,)) as executor:
+        pending = []
+        for job in jobs:
+            pending.append(executor.submit(_extract_range, job))
+            if len(pending) >= workers * 2:
+                yield from pending.pop(0).result()
+        for future in pending:
+            yield from future.result()
+
+
+def cache_path_for(pdf_hash: str, tables: bool, cache_dir: str = PDF_CACHE_DIR) -> str:
+    return os.path.join(cache_dir, f"{pdf_hash}.v{EXTRACTOR_VERSION}{'.tables' if tables else ''}.jsonl")
+
+
+def _read_cache(path: str) -> Iterator[PdfPage]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            yield PdfPage(record["number"], record["text"], record.get("tables"))
+
+
+def extract_pages(pdf_path: str, tables: bool = False, workers: Optional[int] = None,
+                  cache_dir: Optional[str] = PDF_CACHE_DIR) -> Iterator[PdfPage]:
+    """
+    PDFのページごとのテキスト（と表）をページ順に返すジェネレーター
+    Args:
+        pdf_path: PDFファイルのパス
+        tables: 表も抽出するか（セルの文字列の二次元リストのリストを PdfPage.tables に入れる）
+        workers: 並列数（省略時は表を抽出する場合だけCPUのコア数。テキストだけならプロセスの起動の方が
+            重いため1。PARALLEL_MIN_PAGES 未満のページ数では並列にしない）
+        cache_dir: キャッシュのディレクトリ（None ならキャッシュを使わない）
+    Returns:
+        PdfPage のジェネレーター
+    """
+    cache_path = None
+    if cache_dir:
+        cache_path = cache_path_for(sha256_file(pdf_path), tables, cache_dir)
+        if os.path.exists(cache_path):
+            yield from _read_cache(cache_path)
+            return
+
+    import fitz
+
+    workers = workers or ((os.cpu_count() or 1) if tables else 1)
+    cache_file = None
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        cache_file = os.fdopen(fd, "w", encoding="utf-8")
+    completed = False
+    try:
+        with fitz.open(pdf_path) as doc:
+            if workers > 1 and len(doc) >= PARALLEL_MIN_PAGES:
+                pages = _extract_parallel(pdf_path, len(doc), tables, workers)
+            else:
+                pages = _extract_serial(doc, tables)
+            for page in pages:
+                if cache_file:
+                    cache_file.write(json.dumps(page._asdict(), ensure_ascii=False) + "\n")
+                yield page
+        completed = True
+    finally:
+        # 全ページを抽出し終えた場合だけキャッシュとして保存する
+        if cache_file:
+            cache_file.close()
+            if completed:
+                os.replace(tmp_path, cache_path)
+            else:
+                os.remove(tmp_path)
+
+
+def extract_texts(pdf_path: str, **options) -> List[str]:
+    """ページごとのテキストのリスト"""
+    return [page.text for page in extract_pages(pdf_path, **options)]
+
+
+# --- ベンチマーク ---
+
+def make_sample_deck(output_path: str, pages: int = 300) -> str:
+    """スライド資料を模した、見出し・箇条書き・表のあるPDFを作る（ベンチマーク用）"""
+    import fitz
+
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page(width=960, height=540)
+        page.insert_text((40, 60), f"Lecture 4 - Scaling Laws ({i + 1})", fontsize=28)
+        for j in range(6):
+            page.insert_text((60, 110 + j * 30), f"- point {j + 1}: compute C = 6ND, loss L(N, D) slide {i + 1}",
+                             fontsize=16)
+        # 3行3列の表
+        x0, y0, width, height = 560, 320, 120, 40
+        for r in range(4):
+            page.draw_line((x0, y0 + r * height), (x0 + 3 * width, y0 + r * height))
+        for c in range(4):
+            page.draw_line((x0 + c * width, y0), (x0 + c * width, y0 + 3 * height))
+        for r in range(3):
+            for c in range(3):
+                page.insert_text((x0 + c * width + 8, y0 + r * height + 26), f"r{r}c{c}-{i}", fontsize=12)
+    doc.save(output_path)
+    return output_path
+
+
+def _legacy_extract(pdf_file: str) -> List[str]:
+    """これまでの extract_text_from_pdf と同じ処理（比較用）"""
+    import fitz
+    import pdfplumber
+
+    texts = []
+    doc = fitz.open(pdf_file)
+    for page in doc:
+        texts.append(page.get_text())
+    with pdfplumber.open(pdf_file) as pdf:
+        for page in pdf.pages:
+            pass
+    return texts
+
+
+def _measure(pdf_path: str, method: str, workers: int, tables: bool, cache_dir: Optional[str]) -> dict:
+    """1つの方法を別プロセスで実行し、処理時間と最大メモリ使用量を返す"""
+    code = (
+        "import json, resource, sys, time\n"
+        "import pdf_extract\n"
+        "start = time.perf_counter()\n"
+        f"if {method!r} == 'legacy':\n"
+        f"    count = len(pdf_extract._legacy_extract({pdf_path!r}))\n"
+        "else:\n"
+        f"    count = sum(1 for _ in pdf_extract.extract_pages({pdf_path!r}, tables={tables!r}, "
+        f"workers={workers!r}, cache_dir={cache_dir!r}))\n"
+        "elapsed = time.perf_counter() - start\n"
+        "rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,"
+        " resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)\n"
+        "print(json.dumps({'seconds': elapsed, 'pages': count, 'max_rss_mb': rss / 1024}))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def benchmark(pages: int = 300, worker_counts: Tuple[int, ...] = (1, 4)) -> None:
+    """
+    合成資料でこれまでの抽出方法と処理時間・最大メモリ使用量を比較する
+    Args:
+        pages: 合成資料のページ数
+        worker_counts: 試す並列数
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = make_sample_deck(os.path.join(tmp, "deck.pdf"), pages)
+        cache_dir = os.path.join(tmp, "cache")
+        print(f"合成資料: {pages}ページ, {os.path.getsize(pdf_path) / 1024 / 1024:.1f}MB, CPU {os.cpu_count()}コア")
+        cases = [("これまで（PyMuPDF + pdfplumber）", "legacy", 1, False, None)]
+        cases += [(f"テキスト, 同時実行数 {w}", "new", w, False, None) for w in worker_counts]
+        cases += [(f"テキスト+表, 同時実行数 {w}", "new", w, True, None) for w in worker_counts]
+        cases += [("テキスト, キャッシュ作成", "new", 1, False, cache_dir),
+                  ("テキスト, キャッシュから読み込み", "new", 1, False, cache_dir)]
+        for label, method, workers, tables, cache in cases:
+            result = _measure(pdf_path, method, workers, tables, cache)
+            print(f"==> {label}: {result['seconds']:.2f}秒, 最大メモリ {result['max_rss_mb']:.0f}MB, "
+                  f"{result['pages']}ページ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDFのページごとのテキスト・表を抽出する")
+    parser.add_argument("pdf", nargs="?", help="入力PDFファイル")
+    parser.add_argument("--tables", action="store_true", help="表も抽出する")
+    parser.add_argument("--workers", type=int, help="並列数（既定: 表を抽出する場合はCPUのコア数、それ以外は1）")
+    parser.add_argument("--no-cache", action="store_true", help="キャッシュを使わない")
+    parser.add_argument("--benchmark", action="store_true", help="合成資料で処理時間とメモリを計測する")
+    parser.add_argument("--pages", type=int, default=300, help="ベンチマークの合成資料のページ数")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.pages)
+        return
+    if not args.pdf:
+        parser.print_help()
+        return
+
+    cache_dir = None if args.no_cache else PDF_CACHE_DIR
+    for page in extract_pages(args.pdf, tables=args.tables, workers=args.workers, cache_dir=cache_dir):
+        print(f"--- {page.number}ページ ---")
+        print(page.text.strip())
+        for table in page.tables or []:
+            for row in table:
+                print(" | ".join(row))
+
+
+if __name__ == "__main__":
+    main()
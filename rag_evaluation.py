@@ -0,0 +1,579 @@
+"""
+RAGの回答生成と、LLMによる評価（day3 の llm_evaluation_detailed.csv と同じ形式）
+
+day3 のノートブックでは、質問ごとにモデルで回答を1件ずつ生成し、評価も1件ずつ LLM に問い合わせていた。
+ここでは質問と模範解答のファイルから、次の工程をまとめて処理する。
+
+1. 索引: 参照文書の索引（rag_index.py）に、変わった文書だけを追加する
+2. 検索: 全ての質問をまとめて検索し、上位のチャンクを参考資料にする
+3. 生成: RAGなし（ベースライン）と RAG のプロンプトを長さの順に並べ、バッチにまとめて生成する
+4. 評価: 模範解答と比べた正確性・完全性・関連性を、同時実行数・レート制限付きのクライアント
+   （llm_correction.AsyncLLMClient）で並行に問い合わせる
+
+生成と評価の呼び出しは、モデル名とプロンプトのハッシュをキーにしてキャッシュ（JSON Lines）に追記する。
+同じプロンプトの呼び出しはキャッシュを使うため、やり直した場合や質問を追加した場合は、変わった分だけを処理する。
+最後に工程ごとの時間・呼び出し数・費用（トークン数の目安 × 料金）を表示する。
+
+回答の生成は transformers（既定: google/gemma-2-2b-jpn-it）と fake、評価は openai（gpt-4o-mini、
+環境変数 OPENAI_API_KEY）、gemini（環境変数 GOOGLE_API_KEY）、fake から選ぶ。
+
+使い方:
+    # day3 の質問と模範解答で評価し、同じ列の CSV に書き出す
+    python rag_evaluation.py day3/llm_evaluation_detailed.csv -o data/output/llm_evaluation_detailed.csv
+
+    # 参照文書・モデル・同時実行数を指定する
+    python rag_evaluation.py questions.csv --documents "day3/data/松尾・岩澤研究室 講座受講規約.txt" \
+        --generator transformers:google/gemma-2-2b-jpn-it --batch-size 8 --judge openai --concurrency 8 --rpm 500
+
+    # 応答を一定時間待つだけのモデルで、1件ずつ処理する場合との時間と、やり直しの時間を比べる
+    python rag_evaluation.py --benchmark
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from analysis_cache import DEFAULT_CACHE_DIR, sha256_text
+from llm_correction import (DEFAULT_CONCURRENCY, GEMINI_MODEL, AsyncLLMClient, Backend, GeminiLLM,
+                            TransientLLMError, estimate_tokens)
+from quality_metrics import lcs_length
+from rag_index import DEFAULT_TOP_K, RAG_INDEX_DIR, RagIndex, format_references
+
+DEFAULT_QUESTIONS = os.path.join("day3", "llm_evaluation_detailed.csv")
+DEFAULT_DOCUMENTS = [os.path.join("day3", "data", "松尾・岩澤研究室 講座受講規約.txt")]
+DEFAULT_OUTPUT = os.path.join("data", "output", "llm_evaluation_detailed.csv")
+EVAL_CACHE_PATH = os.path.join(DEFAULT_CACHE_DIR, "rag_eval", "calls.jsonl")
+DEFAULT_GENERATOR = "transformers:google/gemma-2-2b-jpn-it"
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_MAX_NEW_TOKENS = 256
+JUDGE_MODELS = {"openai": "gpt-4o-mini", "gemini": GEMINI_MODEL, "fake": "fake-judge"}
+# 100万トークンあたりの料金（USD、入力・出力）。載っていないモデル（ローカルのモデルなど）は 0 とする
+PRICES = {"gpt-4o-mini": (0.15, 0.60), "gemini-2.0-flash": (0.10, 0.40)}
+
+CRITERIA = ("correctness", "completeness", "relevance")
+SYSTEMS = ("baseline", "rag")
+COLUMNS = ["question", "baseline_answer", "rag_answer", "golden_answer"] + [
+    f"{system}_{criterion}_explanation" for system in SYSTEMS for criterion in CRITERIA]
+
+# day3 のノートブックと同じプロンプト
+RAG_PROMPT = "以下の講座規約を参考にして質問に答えてください。\n\n{references}\n\n質問：{question}"
+JUDGE_PROMPT = (
+    "あなたはAIによる回答の評価者です。\n\n"
+    "以下はある質問に対するユーザーの回答と、その模範解答（golden answer）です。\n"
+    "以下の3つの観点でユーザー回答を0〜5点で評価し、それぞれについて簡単な理由を説明してください。\n\n"
+    "【観点】\n"
+    "1. 正確性（Correctness）: golden answerと矛盾せず、事実として正しいか？\n"
+    "2. 完全性（Completeness）: golden answerに含まれる要点がカバーされているか？\n"
+    "3. 関連性（Relevance）: 回答が質問に直接関連し、無関係な内容を含んでいないか？\n\n"
+    "【出力形式】（必ず以下の形式で）\n"
+    "Correctness: <スコア>（理由）\n"
+    "Completeness: <スコア>（理由）\n"
+    "Relevance: <スコア>（理由）\n\n"
+    "### 質問:\n{query}\n\n"
+    "### ユーザーの回答:\n{user_answer}\n\n"
+    "### 模範解答:\n{golden_answer}\n"
+)
+_JUDGE_PROMPT_RE = re.compile(r"### 質問:\n(.*)\n\n### ユーザーの回答:\n(.*)\n\n### 模範解答:\n(.*)\n\Z", re.DOTALL)
+_SCORE_RE = re.compile(r":\s*(\d)")
+
+
+class Item(NamedTuple):
+    question: str
+    golden_answer: str
+
+
+class Judgement(NamedTuple):
+    scores: Tuple[int, int, int]  # 正確性・完全性・関連性（0〜5）
+    explanations: Tuple[str, str, str]  # 評価の行（「Correctness: 3（理由）」の形式）
+
+
+class EvaluationRow(NamedTuple):
+    item: Item
+    baseline_answer: str
+    rag_answer: str
+    baseline: Optional[Judgement]  # 評価できなかった場合は None
+    rag: Optional[Judgement]
+
+
+class StageReport(NamedTuple):
+    name: str
+    seconds: float
+    calls: int  # 実際に呼び出した数
+    cached: int  # キャッシュを使った数
+    cost: float  # 費用の目安（USD）
+
+
+class EvaluationReport(NamedTuple):
+    """評価の処理結果"""
+    stages: List[StageReport]
+    retries: int
+    failed: int  # 評価できなかった回答の数
+
+    @property
+    def seconds(self) -> float:
+        return sum(stage.seconds for stage in self.stages)
+
+    @property
+    def cost(self) -> float:
+        return sum(stage.cost for stage in self.stages)
+
+    def summary(self) -> str:
+        lines = [f"  {stage.name}: {stage.seconds:.2f}秒, 呼び出し{stage.calls}件, キャッシュ{stage.cached}件, "
+                 f"${stage.cost:.4f}" for stage in self.stages]
+        lines.append(f"  合計: {self.seconds:.2f}秒, ${self.cost:.4f}, 再試行{self.retries}回, 評価の失敗{self.failed}件")
+        return "\n".join(lines)
+
+
+def read_questions(path: str) -> List[Item]:
+    """質問と模範解答を CSV（question, golden_answer の列。UTF-8、BOM付きでもよい）から読み込む"""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return [Item(row["question"], row["golden_answer"]) for row in csv.DictReader(f)]
+
+
+def parse_judgement(response: str) -> Optional[Judgement]:
+    """評価の応答から、観点ごとのスコアと評価の行を取り出す（形式が違う場合は None）"""
+    found: Dict[str, str] = {}
+    for line in response.strip().splitlines():
+        line = line.strip().lstrip("*- ")
+        for criterion in CRITERIA:
+            if criterion not in found and line.lower().startswith(criterion):
+                found[criterion] = line
+    scores = []
+    for criterion in CRITERIA:
+        match = _SCORE_RE.search(found.get(criterion, ""))
+        if match is None:
+            return None
+        scores.append(int(match.group(1)))
+    return Judgement(tuple(scores), tuple(found[criterion] for criterion in CRITERIA))
+
+
+def call_cost(model: str, prompt: str, response: str) -> float:
+    """1回の呼び出しの費用の目安（USD）"""
+    input_price, output_price = PRICES.get(model, (0.0, 0.0))
+    return (estimate_tokens(prompt) * input_price + estimate_tokens(response) * output_price) / 1_000_000
+
+
+# --- 呼び出しのキャッシュ ---
+
+class CallCache:
+    """
+    モデルの呼び出し結果のキャッシュ（モデル名とプロンプトのハッシュをキーにして JSON Lines に追記する）
+    Args:
+        path: キャッシュのファイル（None ならメモリにだけ保存する）
+    """
+
+    def __init__(self, path: Optional[str] = EVAL_CACHE_PATH):
+        self.path = path
+        self.entries: Dict[str, str] = {}
+        self._needs_newline = False
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            for line in text.splitlines():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # 書き込みの途中で止まった行
+                self.entries[record["key"]] = record["text"]
+            self._needs_newline = bool(text) and not text.endswith("\n")
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def key(model: str, prompt: str) -> str:
+        return sha256_text(json.dumps([model, prompt], ensure_ascii=False))
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        return self.entries.get(self.key(model, prompt))
+
+    def put(self, model: str, prompt: str, text: str) -> None:
+        key = self.key(model, prompt)
+        self.entries[key] = text
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            if self._needs_newline:
+                f.write("\n")
+                self._needs_newline = False
+            f.write(json.dumps({"key": key, "model": model, "text": text}, ensure_ascii=False) + "\n")
+
+
+# --- 回答の生成 ---
+
+def generate_batched(prompts: List[str], generate_batch: Callable[[List[str]], List[str]],
+                     batch_size: int) -> List[str]:
+    """長さの近いプロンプトを batch_size 件ずつ generate_batch に渡し、結果を元の順に並べ直す"""
+    order = sorted(range(len(prompts)), key=lambda i: len(prompts[i]))
+    results = [""] * len(prompts)
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        for i, text in zip(batch, generate_batch([prompts[i] for i in batch])):
+            results[i] = text.strip()
+    return results
+
+
+class TransformersGenerator:
+    """
+    transformers のモデルで、複数のプロンプトの回答をまとめて生成する（貪欲法）
+    バッチの中のプロンプトは左側を詰め物で揃え、1回の generate で生成する
+    Args:
+        model_name: モデル名
+        batch_size: 1回に生成するプロンプトの数
+        max_new_tokens: 生成するトークン数の上限
+    """
+
+    def __init__(self, model_name: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self._torch = torch
+        self.name = f"{model_name}?max_new_tokens={max_new_tokens}"
+        self.batch_size = batch_size
+        self.max_new_tokens = max_new_tokens
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, padding_side="left")
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        dtype = torch.bfloat16 if torch.cuda.is_available() else torch.float32
+        self.model = AutoModelForCausalLM.from_pretrained(model_name, device_map="auto", torch_dtype=dtype)
+        self.batches = 0
+
+    def _generate_batch(self, prompts: List[str]) -> List[str]:
+        self.batches += 1
+        texts = [self.tokenizer.apply_chat_template([{"role": "user", "content": prompt}], tokenize=False,
+                                                    add_generation_prompt=True) for prompt in prompts]
+        inputs = self.tokenizer(texts, return_tensors="pt", padding=True,
+                                add_special_tokens=False).to(self.model.device)
+        with self._torch.inference_mode():
+            outputs = self.model.generate(**inputs, max_new_tokens=self.max_new_tokens, do_sample=False,
+                                          pad_token_id=self.tokenizer.pad_token_id)
+        return self.tokenizer.batch_decode(outputs[:, inputs["input_ids"].shape[1]:], skip_special_tokens=True)
+
+    def __call__(self, prompts: List[str]) -> List[str]:
+        return generate_batched(prompts, self._generate_batch, self.batch_size)
+
+
+class FakeGenerator:
+    """
+    バッチごとに一定時間待ってから、参考資料の最初の項目（なければ決まった文）を回答として返す（動作確認・計測用）
+    Args:
+        batch_size: 1回に生成するプロンプトの数
+        latency: 1バッチの生成にかかる秒数（バッチの大きさによらない部分）
+        per_prompt: プロンプト1件ごとに加わる秒数
+    """
+
+    name = "fake-generator"
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, latency: float = 0.0, per_prompt: float = 0.0):
+        self.batch_size = batch_size
+        self.latency = latency
+        self.per_prompt = per_prompt
+        self.batches = 0
+
+    def _generate_batch(self, prompts: List[str]) -> List[str]:
+        self.batches += 1
+        time.sleep(self.latency + self.per_prompt * len(prompts))
+        answers = []
+        for prompt in prompts:
+            references = [line[2:] for line in prompt.splitlines() if line.startswith("* ")]
+            answers.append(references[0] if references else "わかりません。")
+        return answers
+
+    def __call__(self, prompts: List[str]) -> List[str]:
+        return generate_batched(prompts, self._generate_batch, self.batch_size)
+
+
+def get_generator(name: str, batch_size: int = DEFAULT_BATCH_SIZE, max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS):
+    """名前から回答の生成器を作る（transformers:<モデル名>, fake）"""
+    if name == "fake":
+        return FakeGenerator(batch_size)
+    if name == "transformers" or name.startswith("transformers:"):
+        model_name = name.partition(":")[2] or DEFAULT_GENERATOR.partition(":")[2]
+        return TransformersGenerator(model_name, batch_size, max_new_tokens)
+    raise ValueError(f"不明な生成器です: {name}（transformers:<モデル名>, fake から選んでください）")
+
+
+# --- 評価の LLM ---
+
+class OpenAIJudge:
+    """
+    OpenAI のモデルによる評価（openai、APIキーは環境変数 OPENAI_API_KEY）
+    Args:
+        model_name: モデル名
+    """
+
+    def __init__(self, model_name: str = JUDGE_MODELS["openai"]):
+        import openai
+
+        self.model_name = model_name
+        # 再試行は AsyncLLMClient で行う
+        self.client = openai.AsyncOpenAI(max_retries=0)
+        self._transient = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                           openai.InternalServerError)
+
+    async def __call__(self, prompt: str) -> str:
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model_name, messages=[{"role": "user", "content": prompt}])
+        except self._transient as e:
+            raise TransientLLMError(str(e)) from e
+        return response.choices[0].message.content.strip()
+
+
+class FakeJudge:
+    """
+    一定時間待ってから、回答と模範解答の共通部分（LCS）の長さでスコアを付ける（動作確認・計測用）
+    Args:
+        latency: 応答までの秒数
+        jitter: 応答時間のばらつき（latency に対する割合）
+        failure_rate: 一時的なエラーにする割合
+        seed: 乱数の種
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.5, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    async def __call__(self, prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency * (1 + self.jitter * self.random.random()))
+        if self.random.random() < self.failure_rate:
+            raise TransientLLMError("429 Too Many Requests（fake）")
+        question, answer, golden = _JUDGE_PROMPT_RE.search(prompt).groups()
+        common = lcs_length(golden, answer)
+        correctness = round(5 * common / max(1, min(len(answer), len(golden))))
+        completeness = round(5 * common / max(1, len(golden)))
+        relevance = round(5 * min(1.0, 2 * lcs_length(question, answer) / max(1, len(question))))
+        return (f"Correctness: {correctness}（模範解答と共通する文字が{common}文字）\n"
+                f"Completeness: {completeness}（模範解答の{common / max(1, len(golden)):.0%}に当たる）\n"
+                f"Relevance: {relevance}（質問と共通する部分の長さによる）")
+
+
+def get_judge(name: str) -> Tuple[Backend, str]:
+    """名前から評価の LLM とモデル名を作る（openai, gemini, fake）"""
+    if name == "openai":
+        return OpenAIJudge(), JUDGE_MODELS[name]
+    if name == "gemini":
+        return GeminiLLM(), JUDGE_MODELS[name]
+    if name == "fake":
+        return FakeJudge(), JUDGE_MODELS[name]
+    raise ValueError(f"不明な評価のLLMです: {name}（openai, gemini, fake から選んでください）")
+
+
+# --- 評価のパイプライン ---
+
+async def _judge_async(prompts: List[str], client: AsyncLLMClient) -> List[Optional[str]]:
+    """評価のプロンプトを同時に問い合わせる（失敗したものは None）"""
+    semaphore = asyncio.Semaphore(client.concurrency)
+
+    async def judge(prompt: str) -> Optional[str]:
+        try:
+            text, _, _ = await client.complete(prompt, semaphore)
+        except Exception as e:
+            print(f"警告: 評価に失敗しました: {e}")
+            return None
+        return text
+
+    return list(await asyncio.gather(*(judge(prompt) for prompt in prompts)))
+
+
+def evaluate_rag(items: List[Item], generator, client: AsyncLLMClient, judge_model: str, index: RagIndex,
+                 cache: CallCache, documents: Optional[List[str]] = None,
+                 top_k: int = DEFAULT_TOP_K) -> Tuple[List[EvaluationRow], EvaluationReport]:
+    """
+    ベースラインと RAG の回答を生成し、模範解答と比べて評価する
+    Args:
+        items: 質問と模範解答
+        generator: プロンプトのリストを受け取り回答のリストを返す生成器（name 属性をキャッシュのキーに使う）
+        client: 評価の LLM のクライアント
+        judge_model: 評価のモデル名（キャッシュのキーと費用に使う）
+        index: 参照文書の索引
+        cache: 呼び出しのキャッシュ
+        documents: 索引に追加する参照文書（None なら索引をそのまま使う）
+        top_k: 質問ごとに参考資料にするチャンクの数
+    Returns:
+        (質問ごとの結果, 処理結果)
+    """
+    stages = []
+    questions = [item.question for item in items]
+
+    if documents:
+        start = time.perf_counter()
+        stats = index.add_documents(documents)
+        stages.append(StageReport("索引", time.perf_counter() - start, stats["embedded"],
+                                  stats["chunks"] - stats["embedded"], 0.0))
+
+    start = time.perf_counter()
+    found = index.search_many(questions, top_k) if questions and len(index) else [[] for _ in questions]
+    rag_prompts = [RAG_PROMPT.format(references=format_references(hits), question=question)
+                   for question, hits in zip(questions, found)]
+    stages.append(StageReport("検索", time.perf_counter() - start, len(questions), 0, 0.0))
+
+    # ベースラインと RAG のプロンプトを一緒にバッチにまとめて生成する
+    start = time.perf_counter()
+    prompts = questions + rag_prompts
+    unique = list(dict.fromkeys(prompts))
+    pending = [prompt for prompt in unique if cache.get(generator.name, prompt) is None]
+    cost = 0.0
+    if pending:
+        for prompt, answer in zip(pending, generator(pending)):
+            cache.put(generator.name, prompt, answer)
+            cost += call_cost(generator.name, prompt, answer)
+    answers = [cache.get(generator.name, prompt) for prompt in prompts]
+    stages.append(StageReport("生成", time.perf_counter() - start, len(pending), len(unique) - len(pending), cost))
+
+    # 評価（形式どおりに答えた応答だけをキャッシュする）
+    start = time.perf_counter()
+    retries_before = client.retries
+    judge_prompts = [JUDGE_PROMPT.format(query=item.question, user_answer=answer, golden_answer=item.golden_answer)
+                     for item, answer in zip(items + items, answers)]
+    unique = list(dict.fromkeys(judge_prompts))
+    pending = [prompt for prompt in unique if cache.get(judge_model, prompt) is None]
+    responses = dict(zip(pending, asyncio.run(_judge_async(pending, client)))) if pending else {}
+    cost = 0.0
+    for prompt, response in responses.items():
+        if response is None:
+            continue
+        cost += call_cost(judge_model, prompt, response)
+        if parse_judgement(response) is not None:
+            cache.put(judge_model, prompt, response)
+        else:
+            print(f"警告: 評価の形式が違うため使いません: {response[:80]!r}")
+    judgements = []
+    for prompt in judge_prompts:
+        response = cache.get(judge_model, prompt)
+        judgements.append(parse_judgement(response) if response is not None else None)
+    stages.append(StageReport("評価", time.perf_counter() - start, len(pending), len(unique) - len(pending), cost))
+
+    n = len(items)
+    rows = [EvaluationRow(item, answers[i], answers[n + i], judgements[i], judgements[n + i])
+            for i, item in enumerate(items)]
+    report = EvaluationReport(stages, client.retries - retries_before,
+                              sum(1 for judgement in judgements if judgement is None))
+    return rows, report
+
+
+def mean_scores(rows: List[EvaluationRow]) -> Dict[str, float]:
+    """評価できた回答の、観点ごとのスコアの平均（キーは <baseline|rag>_<観点>）"""
+    means = {}
+    for system in SYSTEMS:
+        judgements = [getattr(row, system) for row in rows if getattr(row, system) is not None]
+        for i, criterion in enumerate(CRITERIA):
+            scores = [judgement.scores[i] for judgement in judgements]
+            means[f"{system}_{criterion}"] = sum(scores) / len(scores) if scores else 0.0
+    return means
+
+
+def write_csv(rows: List[EvaluationRow], output_path: str) -> str:
+    """llm_evaluation_detailed.csv と同じ列の CSV（UTF-8 BOM付き）に書き出す（評価できなかった観点は N/A）"""
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8-sig", newline="") as f:
+        # day3 の CSV（pandas で書き出したもの）と同じく改行は LF にする
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(COLUMNS)
+        for row in rows:
+            explanations = []
+            for judgement in (row.baseline, row.rag):
+                explanations.extend(judgement.explanations if judgement is not None else ("N/A",) * len(CRITERIA))
+            writer.writerow([row.item.question, row.baseline_answer, row.rag_answer, row.item.golden_answer]
+                            + explanations)
+    return output_path
+
+
+def print_scores(rows: List[EvaluationRow]) -> None:
+    means = mean_scores(rows)
+    for system, label in zip(SYSTEMS, ("ベースライン", "RAG")):
+        print(f"  {label}: " + ", ".join(f"{criterion} {means[f'{system}_{criterion}']:.2f}"
+                                        for criterion in CRITERIA))
+
+
+# --- ベンチマーク ---
+
+def benchmark(questions: int = 20, latency: float = 0.2, per_prompt: float = 0.01, judge_latency: float = 0.2,
+              batch_size: int = 16, concurrency: int = 8) -> None:
+    """
+    応答を一定時間待つだけのモデルで、1件ずつ処理する場合とまとめて処理する場合、やり直す場合の時間を比べる
+    Args:
+        questions: 質問の数（day3 の5問を繰り返して作る）
+        latency: 1バッチの生成にかかる秒数
+        per_prompt: 生成でプロンプト1件ごとに加わる秒数
+        judge_latency: 評価の応答時間（秒）
+        batch_size: まとめて生成する数
+        concurrency: 評価の同時実行数
+    """
+    base = read_questions(DEFAULT_QUESTIONS)
+    items = [Item(f"{item.question}（{i // len(base) + 1}）", item.golden_answer)
+             for i, item in ((i, base[i % len(base)]) for i in range(questions))]
+    # 評価の費用は openai の既定のモデルの料金で見積もる
+    judge_model = JUDGE_MODELS["openai"]
+    print(f"質問 {questions}件, 生成 {latency:g}秒/バッチ + {per_prompt:g}秒/件, 評価の応答時間 {judge_latency:g}秒〜, "
+          f"評価の費用は {judge_model} の料金で見積もる")
+    with tempfile.TemporaryDirectory() as tmp:
+        index = RagIndex(os.path.join(tmp, "index"))
+        index.add_documents(DEFAULT_DOCUMENTS)
+        cache_path = os.path.join(tmp, "calls.jsonl")
+        added = items + [Item(item.question + "（追加）", item.golden_answer) for item in base[:2]]
+        runs = [("1件ずつ（バッチ1・同時実行数1）", 1, 1, None, items),
+                (f"まとめて（バッチ{batch_size}・同時実行数{concurrency}）", batch_size, concurrency, cache_path, items),
+                ("やり直し（キャッシュあり）", batch_size, concurrency, cache_path, items),
+                ("質問を2件追加", batch_size, concurrency, cache_path, added)]
+        for label, size, workers, path, run_items in runs:
+            generator = FakeGenerator(size, latency, per_prompt)
+            client = AsyncLLMClient(FakeJudge(judge_latency), workers)
+            rows, report = evaluate_rag(run_items, generator, client, judge_model, index, CallCache(path))
+            print(f"==> {label}: {report.seconds:.2f}秒")
+            print(report.summary())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAGの回答を生成し、LLMで評価する")
+    parser.add_argument("questions", nargs="?", default=DEFAULT_QUESTIONS,
+                        help="質問と模範解答の CSV（question, golden_answer の列）")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="評価結果の CSV")
+    parser.add_argument("--documents", nargs="+", default=DEFAULT_DOCUMENTS, help="参照文書（テキストまたは PDF）")
+    parser.add_argument("--index-dir", default=RAG_INDEX_DIR, help="参照文書の索引のディレクトリ")
+    parser.add_argument("--embedder", help="埋め込み（hashing, hashing-<次元数>, st:<モデル名>）")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help="質問ごとに参考資料にするチャンクの数")
+    parser.add_argument("--generator", default=DEFAULT_GENERATOR, help="回答の生成器（transformers:<モデル名>, fake）")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="まとめて生成するプロンプトの数")
+    parser.add_argument("--max-new-tokens", type=int, default=DEFAULT_MAX_NEW_TOKENS, help="回答のトークン数の上限")
+    parser.add_argument("--judge", default="openai", help="評価のLLM（openai, gemini, fake）")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="評価で同時に送るリクエスト数")
+    parser.add_argument("--rpm", type=float, help="評価の1分あたりのリクエスト数の上限")
+    parser.add_argument("--tpm", type=float, help="評価の1分あたりの入力トークン数の上限")
+    parser.add_argument("--cache", default=EVAL_CACHE_PATH, help="呼び出しのキャッシュのファイル")
+    parser.add_argument("--no-cache", action="store_true", help="キャッシュを読み書きしない")
+    parser.add_argument("--benchmark", action="store_true", help="1件ずつ処理する場合との時間と、やり直しの時間を比べる")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+        return
+
+    items = read_questions(args.questions)
+    generator = get_generator(args.generator, args.batch_size, args.max_new_tokens)
+    backend, judge_model = get_judge(args.judge)
+    client = AsyncLLMClient(backend, args.concurrency, requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    cache = CallCache(None if args.no_cache else args.cache)
+    index = RagIndex(args.index_dir, args.embedder)
+    rows, report = evaluate_rag(items, generator, client, judge_model, index, cache, args.documents, args.top_k)
+    write_csv(rows, args.output)
+    print(f"{len(items)}問を評価しました: {args.output}")
+    print(report.summary())
+    print("スコアの平均:")
+    print_scores(rows)
+
+
+if __name__ == "__main__":
+    main()
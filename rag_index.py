@@ -0,0 +1,426 @@
+"""
+RAG用の埋め込み索引（講座受講規約などの参照文書）
+
+day3 のノートブックでは、実行のたびに文書全体を埋め込み直し、質問ごとに全ての文との内積を計算していた。
+ここでは文書を文の区切りでチャンクに分けて埋め込み、ディスクに保存して使い回す。
+
+- ベクトルは float16 の行列としてファイルの末尾に追記し、メモリマップで読み込む（全体を読み込まない）
+- チャンクのテキストと文書ごとの行の範囲は chunks.jsonl と manifest.json に保存する
+- 文書を追加する場合は、その文書のチャンクだけを埋め込んで追記する。内容が変わっていない文書は埋め込み直さず、
+  変わった文書の古い行は検索の対象から外す（使われない行が多くなったら詰め直す）
+- 質問はまとめて埋め込み、ベクトルの行列をブロックごとに float32 にして内積を計算し、
+  argpartition で上位 k 件だけを取り出す
+
+文書は UTF-8 または Shift_JIS のテキスト、PDF を読み込む。
+
+使い方:
+    # 索引を作る（2回目以降は変わった文書だけを埋め込む）
+    python rag_index.py build "day3/data/松尾・岩澤研究室 講座受講規約.txt"
+    python rag_index.py build day3/data/*.txt --embedder st:intfloat/multilingual-e5-small
+
+    # 質問に関係の深いチャンクを検索する（複数の質問はまとめて埋め込む）
+    python rag_index.py query "受講者が他の人のSlack投稿をSNSで共有することは、講座規約上どう扱われますか？" --top-k 5
+
+    # 文書数ごとの検索時間を計測する
+    python rag_index.py --benchmark
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from analysis_cache import DEFAULT_CACHE_DIR, sha256_file
+from embeddings import canonical_embedder_name, get_embedder
+from text_segmenter import group_paragraphs, segment_text
+
+RAG_INDEX_DIR = os.path.join(DEFAULT_CACHE_DIR, "rag")
+# 索引の形式を変えたら上げる（古い索引は作り直す）
+INDEX_VERSION = 1
+DEFAULT_TOP_K = 5
+# チャンクの文字数の上限（同じ段落の文をこの長さまでつなげる）
+DEFAULT_CHUNK_CHARS = 200
+# 検索で一度に float32 にする行数
+BLOCK_ROWS = 32768
+VECTOR_DTYPE = np.float16
+
+
+class Hit(NamedTuple):
+    """検索結果の1件"""
+    text: str
+    score: float
+    doc: str  # 文書のID（パス）
+    row: int
+
+
+def read_document(path: str) -> str:
+    """文書のテキストを読み込む（PDF はページをつなげる。テキストは UTF-8、だめなら Shift_JIS とみなす）"""
+    if path.lower().endswith(".pdf"):
+        from pdf_extract import extract_texts
+
+        return "\n\n".join(extract_texts(path))
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        text = data.decode("cp932")
+    # 古い Mac 形式（CR だけ）の改行も段落の区切りとして扱う
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def split_chunks(text: str, chunk_chars: int = DEFAULT_CHUNK_CHARS) -> List[str]:
+    """文の区切り（text_segmenter）で分け、同じ段落の文を chunk_chars 文字までつなげる"""
+    chunks: List[str] = []
+    for paragraph in group_paragraphs(segment_text(text, chunk_chars)):
+        current = ""
+        for unit in paragraph:
+            if current and len(current) + len(unit.text) > chunk_chars:
+                chunks.append(current)
+                current = ""
+            current += unit.text
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+def format_references(hits: List[Hit]) -> str:
+    """検索結果をプロンプトに入れる参照情報の形式にする（day3 のノートブックと同じ形式）"""
+    return "\n".join(f"* {hit.text}" for hit in hits)
+
+
+class RagIndex:
+    """
+    ディスクに保存する埋め込み索引
+    Args:
+        index_dir: 索引を保存するディレクトリ
+        embedder: 埋め込みの名前（embeddings.get_embedder に渡す。省略時は保存済みの索引と同じもの）
+    """
+
+    def __init__(self, index_dir: str = RAG_INDEX_DIR, embedder: Optional[str] = None):
+        self.index_dir = index_dir
+        self._embedder_name = embedder
+        self._embedder = None
+        self.dim = 0
+        self.rows = 0
+        self.chunks_bytes = 0
+        self.documents: Dict[str, dict] = {}
+        self.texts: List[str] = []
+        self.doc_of_row: List[str] = []
+        self.vectors: np.ndarray = np.zeros((0, 0), dtype=VECTOR_DTYPE)
+        self._load()
+
+    # --- 保存と読み込み ---
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _load(self) -> None:
+        try:
+            with open(self._path("manifest.json"), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        if manifest.get("version") != INDEX_VERSION or \
+                (self._embedder_name and manifest["embedder"] != canonical_embedder_name(self._embedder_name)):
+            # 形式や埋め込みの種類が違う索引は使わない（次の追加で作り直す）
+            return
+        self._embedder_name = manifest["embedder"]
+        self.dim, self.rows, self.chunks_bytes = manifest["dim"], manifest["rows"], manifest["chunks_bytes"]
+        self.documents = manifest["documents"]
+        # マニフェストに記録した行までを使う（追記の途中で止まった場合の残りは次の追加で切り詰める）
+        with open(self._path("chunks.jsonl"), "rb") as f:
+            for line in f.read(self.chunks_bytes).splitlines():
+                record = json.loads(line)
+                self.texts.append(record["text"])
+                self.doc_of_row.append(record["doc"])
+        self._map_vectors()
+
+    def _map_vectors(self) -> None:
+        if self.rows:
+            self.vectors = np.memmap(self._path("vectors.f16"), dtype=VECTOR_DTYPE, mode="r",
+                                     shape=(self.rows, self.dim))
+        else:
+            self.vectors = np.zeros((0, self.dim), dtype=VECTOR_DTYPE)
+
+    def _write_manifest(self) -> None:
+        manifest = {"version": INDEX_VERSION, "embedder": self._embedder_name, "dim": self.dim,
+                    "rows": self.rows, "chunks_bytes": self.chunks_bytes, "documents": self.documents}
+        fd, tmp_path = tempfile.mkstemp(dir=self.index_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._path("manifest.json"))
+
+    def _append(self, doc: str, texts: List[str], vectors: np.ndarray) -> Tuple[int, int]:
+        """チャンクとベクトルをファイルの末尾に追記する（マニフェストは呼び出し側で書く）"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        if not self.rows:
+            self.dim = int(vectors.shape[1])
+        start = self.rows
+        lines = b"".join((json.dumps({"doc": doc, "text": text}, ensure_ascii=False) + "\n").encode("utf-8")
+                         for text in texts)
+        # 前回の追記が途中で止まっていた場合に備え、記録済みの位置で切り詰めてから書く
+        with open(self._path("vectors.f16"), "ab") as f:
+            f.truncate(self.rows * self.dim * np.dtype(VECTOR_DTYPE).itemsize)
+            f.write(np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE).tobytes())
+        with open(self._path("chunks.jsonl"), "ab") as f:
+            f.truncate(self.chunks_bytes)
+            f.write(lines)
+        self.rows += len(texts)
+        self.chunks_bytes += len(lines)
+        self.texts.extend(texts)
+        self.doc_of_row.extend([doc] * len(texts))
+        return start, self.rows
+
+    def _reset(self) -> None:
+        """索引を空にする（埋め込みの種類や形式が変わった場合）"""
+        for name in ("vectors.f16", "chunks.jsonl", "manifest.json"):
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+        self.rows = self.chunks_bytes = self.dim = 0
+        self.documents, self.texts, self.doc_of_row = {}, [], []
+        self._map_vectors()
+
+    # --- 追加と削除 ---
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = get_embedder(self._embedder_name)
+            self._embedder_name = self._embedder.name
+        return self._embedder
+
+    def add_texts(self, doc: str, texts: List[str], sha256: Optional[str] = None) -> int:
+        """
+        文書のチャンクを埋め込んで追加する（同じIDの文書があれば置き換える）
+        Args:
+            doc: 文書のID
+            texts: チャンクのリスト
+            sha256: 文書の内容のハッシュ（同じなら何もしない）
+        Returns:
+            埋め込んだチャンクの数
+        """
+        previous = self.documents.get(doc)
+        if previous and sha256 and previous["sha256"] == sha256:
+            return 0
+        embedder = self.embedder
+        if not self.documents and self.rows == 0 and os.path.exists(self._path("manifest.json")):
+            # 読み込めなかった（形式や埋め込みが違う）索引を消してから作り直す
+            self._reset()
+        vectors = embedder(texts) if texts else np.zeros((0, embedder.dim), np.float32)
+        start, end = self._append(doc, texts, vectors)
+        self.documents[doc] = {"sha256": sha256, "start": start, "end": end}
+        self._write_manifest()
+        self._map_vectors()
+        if self.dead_rows() > self.live_rows():
+            self.compact()
+        return len(texts)
+
+    def add_documents(self, paths: List[str], chunk_chars: int = DEFAULT_CHUNK_CHARS) -> Dict[str, int]:
+        """
+        文書を追加する（内容が変わっていない文書は埋め込み直さない）
+        Args:
+            paths: 文書のパス
+            chunk_chars: チャンクの文字数の上限
+        Returns:
+            {"documents": 索引の文書数, "added": 埋め込んだ文書の数, "reused": 使い回した文書の数,
+             "embedded": 埋め込んだチャンクの数, "chunks": 検索の対象のチャンク数}
+        """
+        added = reused = embedded = 0
+        for path in paths:
+            file_hash = sha256_file(path)
+            if self.documents.get(path, {}).get("sha256") == file_hash:
+                reused += 1
+                continue
+            embedded += self.add_texts(path, split_chunks(read_document(path), chunk_chars), file_hash)
+            added += 1
+        return {"documents": len(self.documents), "added": added, "reused": reused, "embedded": embedded,
+                "chunks": self.live_rows()}
+
+    def remove(self, doc: str) -> bool:
+        """文書を検索の対象から外す（行は次に詰め直すまで残る）"""
+        if self.documents.pop(doc, None) is None:
+            return False
+        self._write_manifest()
+        return True
+
+    def live_rows(self) -> int:
+        return sum(d["end"] - d["start"] for d in self.documents.values())
+
+    def dead_rows(self) -> int:
+        return self.rows - self.live_rows()
+
+    def compact(self) -> None:
+        """検索の対象でない行を除いて、ベクトルとチャンクを書き直す"""
+        keep = [(doc, d) for doc, d in sorted(self.documents.items(), key=lambda item: item[1]["start"])]
+        vectors = np.concatenate([self.vectors[d["start"]:d["end"]] for _, d in keep]) if keep \
+            else np.zeros((0, self.dim), VECTOR_DTYPE)
+        texts = [self.texts[d["start"]:d["end"]] for _, d in keep]
+        self._reset()
+        for (doc, d), doc_texts in zip(keep, texts):
+            start, end = (self.rows, self.rows + len(doc_texts))
+            if doc_texts:
+                start, end = self._append(doc, doc_texts, vectors[start:end])
+            self.documents[doc] = {"sha256": d["sha256"], "start": start, "end": end}
+        self._write_manifest()
+        self._map_vectors()
+
+    # --- 検索 ---
+
+    def __len__(self) -> int:
+        return self.live_rows()
+
+    def _dead_mask(self) -> Optional[np.ndarray]:
+        if not self.dead_rows():
+            return None
+        dead = np.ones(self.rows, dtype=bool)
+        for d in self.documents.values():
+            dead[d["start"]:d["end"]] = False
+        return dead
+
+    def search_vectors(self, queries: np.ndarray, top_k: int = DEFAULT_TOP_K) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        質問のベクトルに内積の大きい行を上位 top_k 件返す
+        Args:
+            queries: 質問のベクトル（質問数 × 次元数）
+            top_k: 質問ごとに返す件数
+        Returns:
+            (行番号, スコア) それぞれ 質問数 × k の配列（スコアの大きい順）
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        k = min(top_k, self.live_rows())
+        if k == 0:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        dead = self._dead_mask()
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        for start in range(0, self.rows, BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+            scores = queries @ block.T
+            if dead is not None:
+                scores[:, dead[start:start + len(block)]] = -np.inf
+            # ブロックの上位 k 件と、これまでの上位 k 件を合わせて残す
+            kk = min(k, len(block))
+            top = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+            rows = np.concatenate([best_rows, top + start], axis=1)
+            candidates = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            if candidates.shape[1] > k:
+                keep = np.argpartition(-candidates, k - 1, axis=1)[:, :k]
+                rows = np.take_along_axis(rows, keep, axis=1)
+                candidates = np.take_along_axis(candidates, keep, axis=1)
+            best_rows, best_scores = rows, candidates
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def search_many(self, queries: List[str], top_k: int = DEFAULT_TOP_K) -> List[List[Hit]]:
+        """
+        複数の質問をまとめて検索する（埋め込みは1回でまとめて計算する）
+        Args:
+            queries: 質問のリスト
+            top_k: 質問ごとに返す件数
+        Returns:
+            質問ごとの検索結果のリスト（スコアの大きい順）
+        """
+        if not queries or not self.live_rows():
+            return [[] for _ in queries]
+        rows, scores = self.search_vectors(self.embedder.queries(queries), top_k)
+        return [[Hit(self.texts[row], float(score), self.doc_of_row[row], int(row))
+                 for row, score in zip(query_rows, query_scores)]
+                for query_rows, query_scores in zip(rows, scores)]
+
+    def search(self, query: str, top_k: int = DEFAULT_TOP_K) -> List[Hit]:
+        """質問に関係の深いチャンクを上位 top_k 件返す"""
+        return self.search_many([query], top_k)[0]
+
+
+# --- ベンチマーク ---
+
+def benchmark(doc_counts: Tuple[int, ...] = (1000, 10000, 100000), dim: int = 512, queries: int = 64,
+              top_k: int = DEFAULT_TOP_K) -> None:
+    """
+    ランダムなベクトルの索引で、文書数ごとの検索時間を計測する（質問の埋め込みの時間は含まない）
+    比較として、day3 のノートブックと同じく質問ごとに全ての内積を計算して argsort する場合も計測する
+    Args:
+        doc_counts: 試す文書（チャンク）数
+        dim: ベクトルの次元数
+        queries: まとめて検索する質問の数
+        top_k: 質問ごとに返す件数
+    """
+    rng = np.random.default_rng(0)
+    query_vectors = rng.standard_normal((queries, dim)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    print(f"次元 {dim}, 質問 {queries}件をまとめて検索, 上位 {top_k}件")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in doc_counts:
+            index = RagIndex(os.path.join(tmp, str(count)))
+            vectors = rng.standard_normal((count, dim)).astype(np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            start, end = index._append("random", [""] * count, vectors)
+            index.documents["random"] = {"sha256": None, "start": start, "end": end}
+            index._write_manifest()
+            index = RagIndex(index.index_dir)
+
+            index.search_vectors(query_vectors[:1], top_k)
+            start_time = time.perf_counter()
+            rows, _ = index.search_vectors(query_vectors, top_k)
+            batched = (time.perf_counter() - start_time) / queries
+
+            dense = np.asarray(index.vectors, dtype=np.float32)
+            start_time = time.perf_counter()
+            for q in query_vectors:
+                expected = (q @ dense.T).argsort()[::-1][:top_k]
+            naive = (time.perf_counter() - start_time) / queries
+            assert list(rows[-1]) == list(expected)
+
+            print(f"{count:>7}件: まとめて検索 {batched * 1000:.3f}ms/質問（1000件あたり {batched * 1e6 / count:.4f}ms）, "
+                  f"1件ずつ argsort {naive * 1000:.3f}ms/質問（x{naive / batched:.1f}）, "
+                  f"ファイル {count * dim * 2 / (1 << 20):.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG用の埋め込み索引を作り、検索する")
+    parser.add_argument("--index-dir", default=RAG_INDEX_DIR, help="索引のディレクトリ")
+    parser.add_argument("--benchmark", action="store_true", help="文書数ごとの検索時間を計測する")
+    subparsers = parser.add_subparsers(dest="command")
+
+    build = subparsers.add_parser("build", help="文書を索引に追加する（変わっていない文書は埋め込み直さない）")
+    build.add_argument("documents", nargs="+", help="文書のパス（テキストまたは PDF）")
+    build.add_argument("--embedder", help="埋め込み（hashing, hashing-<次元数>, st:<モデル名>）")
+    build.add_argument("--chunk-chars", type=int, default=DEFAULT_CHUNK_CHARS, help="チャンクの文字数の上限")
+
+    query = subparsers.add_parser("query", help="質問に関係の深いチャンクを検索する")
+    query.add_argument("questions", nargs="+", help="質問（複数指定するとまとめて埋め込む）")
+    query.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help="質問ごとに返す件数")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+        return
+    if args.command == "build":
+        start = time.perf_counter()
+        stats = RagIndex(args.index_dir, args.embedder).add_documents(args.documents, args.chunk_chars)
+        print(f"文書 {stats['documents']}件（埋め込み {stats['added']}件, 使い回し {stats['reused']}件）, "
+              f"チャンク {stats['chunks']}件（新たに埋め込み {stats['embedded']}件）: "
+              f"{time.perf_counter() - start:.2f}秒 → {args.index_dir}")
+    elif args.command == "query":
+        index = RagIndex(args.index_dir)
+        if not len(index):
+            parser.error(f"索引がありません。先に build で作ってください: {args.index_dir}")
+        start = time.perf_counter()
+        results = index.search_many(args.questions, args.top_k)
+        elapsed = time.perf_counter() - start
+        for question, hits in zip(args.questions, results):
+            print(f"=== {question}")
+            for rank, hit in enumerate(hits, start=1):
+                print(f"[{rank}] {hit.score:.4f} {hit.text[:200]}")
+        print(f"検索 {len(args.questions)}件: {elapsed * 1000:.1f}ms（埋め込みを含む）")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
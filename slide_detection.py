@@ -0,0 +1,291 @@
+"""
+スライドの切り替わり検出
+
+講義動画のフレームを一定間隔で縮小・グレースケール化して取り出し、
+差分ハッシュ（dHash）のハミング距離と画素の平均差分でスライドの切り替わりを検出する。
+スライドごとに代表画像1枚と、そのスライドを表示していた区間の音声だけを書き出すことで、
+動画全体の代わりにこれらを解析に使えるようにする。
+
+使い方:
+    # スライドの代表画像と音声区間を書き出す
+    python slide_detection.py data/video/python_basic_guidance.mp4 -o data/output/slides
+
+    # 合成動画で、動画全体を送る場合との送信量と処理時間を比較する
+    python slide_detection.py --benchmark
+"""
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+from typing import Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+
+from ffmpeg_utils import FFmpegError, get_ffmpeg_binary, make_synthetic_video, probe_media, run_ffmpeg
+
+# 検出用に縮小するフレームの大きさ（dHashの 8x9 ブロックに割り切れる大きさ）
+HASH_SIZE = 8
+FRAME_WIDTH = (HASH_SIZE + 1) * 8
+FRAME_HEIGHT = HASH_SIZE * 8
+
+# 切り替わりとみなすしきい値
+HASH_THRESHOLD = 12  # dHash 64ビットのうち異なるビット数
+DIFF_THRESHOLD = 0.06  # 画素の平均差分（0〜1）
+
+
+class SlideSegment(NamedTuple):
+    """1枚のスライドを表示していた区間"""
+    index: int
+    start: float
+    end: float
+
+
+class SlideAsset(NamedTuple):
+    """解析に送るスライドの代表画像と音声"""
+    index: int
+    start: float
+    end: float
+    image_path: str
+    audio_path: str
+
+
+def sample_frames(video_path: str, fps: float = 1.0) -> Iterator[Tuple[float, np.ndarray]]:
+    """
+    動画から一定間隔でフレームを取り出す
+    ffmpegの出力を1フレームずつ読むため、動画の長さによらずメモリ使用量は一定
+    Args:
+        video_path: 動画ファイルのパス
+        fps: 1秒あたりに取り出すフレーム数
+    Yields:
+        (時刻[秒], FRAME_HEIGHT x FRAME_WIDTH のグレースケール画像)
+    """
+    command = [
+        get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-i", video_path, "-an",
+        "-vf", f"fps={fps},scale={FRAME_WIDTH}:{FRAME_HEIGHT}:flags=area,format=gray",
+        "-f", "rawvideo", "-",
+    ]
+    frame_bytes = FRAME_WIDTH * FRAME_HEIGHT
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        index = 0
+        while True:
+            data = process.stdout.read(frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            yield index / fps, np.frombuffer(data, dtype=np.uint8).reshape(FRAME_HEIGHT, FRAME_WIDTH)
+            index += 1
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read()
+        process.stderr.close()
+        if process.wait() != 0 and index == 0:
+            raise FFmpegError(f"フレームの取り出しに失敗しました: {stderr.decode('utf-8', errors='replace')}")
+
+
+def dhash(frame: np.ndarray) -> np.ndarray:
+    """
+    差分ハッシュを計算する
+    フレームを 8x9 のブロック平均に縮小し、横に隣り合うブロックの明るさの大小を64ビットにする
+    """
+    blocks = frame.reshape(HASH_SIZE, FRAME_HEIGHT // HASH_SIZE,
+                           HASH_SIZE + 1, FRAME_WIDTH // (HASH_SIZE + 1)).mean(axis=(1, 3))
+    return (blocks[:, 1:] > blocks[:, :-1]).ravel()
+
+
+def frame_distance(a: np.ndarray, b: np.ndarray, hash_a: np.ndarray, hash_b: np.ndarray) -> Tuple[int, float]:
+    """2つのフレームの (dHashのハミング距離, 画素の平均差分) を返す"""
+    diff = np.abs(a.astype(np.int16) - b.astype(np.int16)).mean() / 255
+    return int(np.count_nonzero(hash_a != hash_b)), float(diff)
+
+
+def detect_slides(video_path: str, fps: float = 1.0, hash_threshold: int = HASH_THRESHOLD,
+                  diff_threshold: float = DIFF_THRESHOLD, min_slide_seconds: float = 2.0) -> List[SlideSegment]:
+    """
+    スライドの切り替わりを検出し、スライドごとの表示区間を返す
+    現在のスライドの最初のフレームと比べるため、少しずつ変わる場合（アニメーション）も検出できる。
+    min_slide_seconds より短い区間（フェードの途中など）は次のスライドにまとめる
+    Args:
+        video_path: 動画ファイルのパス
+        fps: 1秒あたりに調べるフレーム数
+        hash_threshold: 切り替わりとみなすdHashのハミング距離
+        diff_threshold: 切り替わりとみなす画素の平均差分
+        min_slide_seconds: スライドとみなす最短の表示時間（秒）
+    Returns:
+        スライドの表示区間のリスト
+    """
+    duration = probe_media(video_path)["duration"]
+    boundaries = []
+    reference = reference_hash = None
+    last_time = 0.0
+    for timestamp, frame in sample_frames(video_path, fps):
+        frame_hash = dhash(frame)
+        last_time = timestamp
+        if reference is None:
+            boundaries.append(timestamp)
+            reference, reference_hash = frame, frame_hash
+            continue
+        bits, diff = frame_distance(reference, frame, reference_hash, frame_hash)
+        if bits >= hash_threshold or diff >= diff_threshold:
+            boundaries.append(timestamp)
+            reference, reference_hash = frame, frame_hash
+    if not boundaries:
+        return []
+    end_time = duration or last_time + 1 / fps
+
+    # 短すぎる区間は次の区間に含める（次の区間の開始を前に倒す）
+    merged = [boundaries[0]]
+    for start in boundaries[1:]:
+        if start - merged[-1] >= min_slide_seconds:
+            merged.append(start)
+    # 最後の区間が短すぎる場合は前の区間に含める
+    if len(merged) > 1 and end_time - merged[-1] < min_slide_seconds:
+        merged.pop()
+
+    ends = merged[1:] + [end_time]
+    return [SlideSegment(i, start, end) for i, (start, end) in enumerate(zip(merged, ends))]
+
+
+def extract_slide_assets(video_path: str, segments: List[SlideSegment], output_dir: str,
+                         image_width: int = 1280, audio_bitrate: str = "32k") -> List[SlideAsset]:
+    """
+    スライドごとに代表画像（JPEG）と表示区間の音声（16kHzモノラルのAAC）を書き出す
+    スライドごとにシークするとキーフレームからのデコードを繰り返すため、
+    動画を1回だけデコードして、画像はselectフィルタ、音声はsegmentで一度に書き出す。
+    代表画像は、段階的に表示される内容が出そろった区間の終わり近くのフレームを使う
+    Args:
+        video_path: 動画ファイルのパス
+        segments: detect_slidesで得たスライドの表示区間
+        output_dir: 出力ディレクトリ
+        image_width: 代表画像の幅（高さは縦横比を保つ）
+        audio_bitrate: 音声のビットレート
+    Returns:
+        スライドごとの代表画像と音声のパス
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if not segments:
+        return []
+    has_audio = probe_media(video_path)["audio_codec"] is not None
+    image_pattern = os.path.join(output_dir, "slide_%03d.jpg")
+    audio_pattern = os.path.join(output_dir, "slide_%03d.m4a")
+
+    # n枚目に選ぶフレームは「n番目の代表時刻以降の最初のフレーム」
+    frame_times = [max(segment.start, segment.end - 1.0) for segment in segments]
+    select = "+".join(f"eq(selected_n\\,{i})*gte(t\\,{t:.3f})" for i, t in enumerate(frame_times))
+    args = [
+        "-i", video_path,
+        "-filter_complex", f"[0:v]select='{select}',scale='min({image_width},iw)':-2[slides]",
+        "-map", "[slides]", "-fps_mode", "vfr", "-q:v", "4", "-start_number", "0", image_pattern,
+    ]
+    if has_audio:
+        args += ["-map", "0:a:0", "-ac", "1", "-ar", "16000", "-c:a", "aac", "-b:a", audio_bitrate]
+        if len(segments) > 1:
+            args += ["-f", "segment", "-segment_format", "ipod", "-reset_timestamps", "1",
+                     "-segment_times", ",".join(f"{segment.start:.3f}" for segment in segments[1:])]
+            args.append(audio_pattern)
+        else:
+            args.append(audio_pattern % 0)
+    run_ffmpeg(args)
+
+    assets = []
+    for segment, frame_time in zip(segments, frame_times):
+        image_path = image_pattern % segment.index
+        if not os.path.exists(image_path):
+            # 動画の末尾などで選べなかったフレームは個別に取り出す
+            run_ffmpeg(["-ss", f"{frame_time:.3f}", "-i", video_path, "-frames:v", "1",
+                        "-vf", f"scale='min({image_width},iw)':-2", "-q:v", "4", image_path])
+        audio_path = audio_pattern % segment.index if has_audio else ""
+        assets.append(SlideAsset(segment.index, segment.start, segment.end, image_path, audio_path))
+
+    with open(os.path.join(output_dir, "slides.json"), "w", encoding="utf-8") as f:
+        json.dump({"video": video_path, "slides": [asset._asdict() for asset in assets]},
+                  f, ensure_ascii=False, indent=2)
+    return assets
+
+
+def preprocess_video(video_path: str, output_dir: str, fps: float = 1.0) -> List[SlideAsset]:
+    """
+    スライドの切り替わりを検出し、代表画像と音声区間を書き出す
+    Args:
+        video_path: 動画ファイルのパス
+        output_dir: 出力ディレクトリ
+        fps: 1秒あたりに調べるフレーム数
+    Returns:
+        スライドごとの代表画像と音声のパス
+    """
+    start = time.perf_counter()
+    segments = detect_slides(video_path, fps=fps)
+    detected = time.perf_counter()
+    assets = extract_slide_assets(video_path, segments, output_dir)
+    print(f"{len(segments)}枚のスライドを検出しました（検出: {detected - start:.1f}秒, "
+          f"書き出し: {time.perf_counter() - detected:.1f}秒）")
+    return assets
+
+
+def asset_bytes(assets: List[SlideAsset]) -> int:
+    """代表画像と音声の合計バイト数"""
+    return sum(os.path.getsize(path) for asset in assets
+               for path in (asset.image_path, asset.audio_path) if path)
+
+
+def benchmark(seconds: int = 600, slide_seconds: int = 30, bandwidth_mbps: float = 10.0) -> None:
+    """
+    講師の小窓が動き続ける合成動画で、動画全体を送る場合と代表画像・音声だけを送る場合を比較する
+    送信時間は指定した回線速度から見積もる
+    Args:
+        seconds: 合成動画の長さ（秒）
+        slide_seconds: スライドが切り替わる間隔（秒）
+        bandwidth_mbps: 想定する上り回線速度（Mbps）
+    """
+    def upload_seconds(size: int) -> float:
+        return size * 8 / (bandwidth_mbps * 1000 ** 2)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_synthetic_video(os.path.join(tmp_dir, "synthetic.mp4"), seconds,
+                                          slide_seconds=slide_seconds, presenter=True)
+        video_size = os.path.getsize(video_path)
+
+        start = time.perf_counter()
+        assets = preprocess_video(video_path, os.path.join(tmp_dir, "slides"))
+        preprocess_time = time.perf_counter() - start
+        slides_size = asset_bytes(assets)
+
+        expected = list(range(0, seconds, slide_seconds))
+        detected = [asset.start for asset in assets]
+        errors = [min(abs(d - e) for d in detected) for e in expected]
+        print(f"合成動画: {seconds}秒, スライド{len(expected)}枚（{slide_seconds}秒ごと）, 回線速度: {bandwidth_mbps}Mbps")
+        print(f"検出したスライド: {len(detected)}枚, 切り替わり時刻の最大誤差: {max(errors):.1f}秒")
+        print(f"{'':>12} | {'送信量':>10} | {'前処理':>8} | {'送信(見積)':>10} | {'合計':>8}")
+        full_total = upload_seconds(video_size)
+        print(f"{'動画全体':>10} | {video_size / 1024 ** 2:>8.2f}MB | {0:>7.1f}s | "
+              f"{full_total:>9.1f}s | {full_total:>7.1f}s")
+        slides_total = preprocess_time + upload_seconds(slides_size)
+        print(f"{'スライドのみ':>8} | {slides_size / 1024 ** 2:>8.2f}MB | {preprocess_time:>7.1f}s | "
+              f"{upload_seconds(slides_size):>9.1f}s | {slides_total:>7.1f}s")
+        print(f"送信量: {(1 - slides_size / video_size) * 100:.1f}%削減, "
+              f"合計時間: {full_total / slides_total:.1f}倍高速")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="スライドの切り替わりを検出して代表画像と音声区間を書き出す")
+    parser.add_argument("video", nargs="?", help="入力動画ファイル")
+    parser.add_argument("-o", "--output", default="data/output/slides", help="出力ディレクトリ")
+    parser.add_argument("--fps", type=float, default=1.0, help="1秒あたりに調べるフレーム数")
+    parser.add_argument("--benchmark", action="store_true", help="合成動画で送信量と処理時間を比較する")
+    parser.add_argument("--seconds", type=int, default=600, help="ベンチマークの合成動画の長さ（秒）")
+    parser.add_argument("--bandwidth", type=float, default=10.0, help="ベンチマークで想定する回線速度（Mbps）")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.seconds, bandwidth_mbps=args.bandwidth)
+    elif args.video:
+        assets = preprocess_video(args.video, args.output, fps=args.fps)
+        for asset in assets:
+            print(f"[{asset.index + 1:03d}] {asset.start:8.1f}s - {asset.end:8.1f}s  {asset.image_path}")
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
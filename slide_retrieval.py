@@ -0,0 +1,525 @@
+"""
+講義資料（スライド）のページの検索と、書き起こしの修正用プロンプトの作成
+
+LLMで書き起こしを修正するときに講義資料の全ページを毎回プロンプトに入れると、プロンプトが長くなり
+応答も遅くなる。ここではスライドのページごとに BM25（日本語は文字の2-gram、英字は単語）と
+埋め込みベクトル（embeddings.py）の索引を作り、書き起こしのチャンクごとに関係の深い上位 k ページだけを
+Reciprocal Rank Fusion で選んで、文字数の上限を超えないプロンプトを組み立てる。
+
+索引はディレクトリ（既定: data/output/cache/slides）に保存する。
+    manifest.json   埋め込みの種類と、資料ごとのファイルのハッシュ
+    pages.jsonl     ページごとのテキストとそのハッシュ（1行1ページ）
+    vectors.npy     ページの埋め込みベクトル（float32。読み込みはメモリマップ）
+PDFが変わった場合は変わったPDFだけを抽出し直し、テキストが変わったページだけを埋め込み直す。
+
+使い方:
+    # 講義資料の索引を作る（PDFが変わっていれば差分だけ更新する）
+    python slide_retrieval.py build data/slides/day4.pdf
+
+    # 索引を検索する
+    python slide_retrieval.py query "スケール則" -k 3
+
+    # 書き起こしのチャンクごとのプロンプトをJSONLに出力する
+    python slide_retrieval.py prompts day3/data/LLM2024_day4_raw.txt -o data/output/day4_prompts.jsonl
+
+    # day3 の書き起こしでプロンプトの長さと検索時間を全ページを入れる場合と比較する
+    python slide_retrieval.py --benchmark
+"""
+import argparse
+import json
+import math
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from analysis_cache import DEFAULT_CACHE_DIR, sha256_file, sha256_text
+from embeddings import canonical_embedder_name, get_embedder
+from text_segmenter import group_paragraphs, segment_text
+
+SLIDE_INDEX_DIR = os.path.join(DEFAULT_CACHE_DIR, "slides")
+# 索引の形式を変えたら上げる（古い索引は作り直す）
+INDEX_VERSION = 1
+DEFAULT_TOP_K = 3
+# プロンプト全体の文字数の上限（日本語はおおよそ1文字1トークン）
+DEFAULT_PROMPT_CHARS = 3000
+# 書き起こしのチャンクの文字数
+DEFAULT_CHUNK_CHARS = 600
+# Reciprocal Rank Fusion の定数
+RRF_K = 60
+
+PROMPT_HEADER = (
+    "以下は講義の書き起こしの一部です。講義資料の抜粋を参考に、固有名詞・専門用語・数字の誤認識を修正し、"
+    "修正後の書き起こしだけを出力してください。発言の内容は変えないでください。\n"
+)
+
+_LATIN_WORD_RE = re.compile(r"[A-Za-z][A-Za-z0-9]*|[0-9]+(?:\.[0-9]+)?")
+_JAPANESE_RUN_RE = re.compile(r"[぀-ヿ㐀-鿿豈-﫿々〆]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """BM25用のトークン（英数字は小文字の単語、日本語は連続する部分の文字2-gram）"""
+    tokens = [word.lower() for word in _LATIN_WORD_RE.findall(text)]
+    for run in _JAPANESE_RUN_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class BM25:
+    """
+    Okapi BM25 の転置索引
+    Args:
+        documents: 文書ごとのトークンのリスト
+        k1, b: BM25 のパラメータ
+    """
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.lengths = np.array([len(tokens) for tokens in documents], dtype=np.float32)
+        self.average_length = float(self.lengths.mean()) if len(documents) else 0.0
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        for doc_id, tokens in enumerate(documents):
+            for token, count in Counter(tokens).items():
+                ids, counts = postings.setdefault(token, ([], []))
+                ids.append(doc_id)
+                counts.append(count)
+        n = len(documents)
+        self.postings = {token: (np.array(ids, dtype=np.int32), np.array(counts, dtype=np.float32),
+                                 math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5)))
+                         for token, (ids, counts) in postings.items()}
+        # 文書の長さによる正規化の項は文書ごとに一度だけ計算しておく
+        self._norm = k1 * (1 - b + b * self.lengths / max(self.average_length, 1e-9))
+
+    def scores(self, tokens: Iterable[str]) -> np.ndarray:
+        """クエリのトークンに対する全文書のスコア"""
+        scores = np.zeros(len(self.lengths), dtype=np.float32)
+        for token, weight in Counter(tokens).items():
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            ids, counts, idf = posting
+            scores[ids] += weight * idf * counts * (self.k1 + 1) / (counts + self._norm[ids])
+        return scores
+
+
+class Slide(NamedTuple):
+    """索引の1ページ（number は1から始まるページ番号）"""
+    source: str
+    number: int
+    text: str
+
+
+class SearchResult(NamedTuple):
+    slide: Slide
+    score: float
+
+
+class CorrectionPrompt(NamedTuple):
+    """書き起こしのチャンクと、選んだページ、組み立てたプロンプト"""
+    chunk: str
+    slides: List[Slide]
+    prompt: str
+
+
+def _rank_of(scores: np.ndarray) -> np.ndarray:
+    """スコアの高い順の順位（0から）"""
+    ranks = np.empty(len(scores), dtype=np.int64)
+    ranks[np.argsort(-scores, kind="stable")] = np.arange(len(scores))
+    return ranks
+
+
+def read_source_pages(path: str) -> List[str]:
+    """講義資料のページごとのテキスト（PDFはページごと、テキストは空行で区切った段落ごと）"""
+    if path.lower().endswith(".pdf"):
+        from pdf_extract import extract_texts
+        return extract_texts(path)
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    return [page.strip() for page in re.split(r"\n\s*\n|\f", text) if page.strip()]
+
+
+class SlideIndex:
+    """
+    講義資料のページの BM25 + 埋め込みベクトルのハイブリッド索引
+    Args:
+        index_dir: 索引を保存するディレクトリ
+        embedder: 埋め込みの名前（embeddings.get_embedder に渡す。省略時は保存済みの索引と同じもの）
+    """
+
+    def __init__(self, index_dir: str = SLIDE_INDEX_DIR, embedder: Optional[str] = None):
+        self.index_dir = index_dir
+        self._embedder_name = embedder
+        self._embedder = None
+        self.slides: List[Slide] = []
+        self.page_hashes: List[str] = []
+        self.source_hashes: Dict[str, str] = {}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self._bm25: Optional[BM25] = None
+        self._load()
+
+    # --- 保存と読み込み ---
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _load(self) -> None:
+        try:
+            with open(self._path("manifest.json"), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        if manifest.get("version") != INDEX_VERSION or \
+                (self._embedder_name and manifest["embedder"] != canonical_embedder_name(self._embedder_name)):
+            # 形式や埋め込みの種類が違う索引は使わない（次の update で作り直す）
+            return
+        self._embedder_name = manifest["embedder"]
+        self.source_hashes = manifest["sources"]
+        with open(self._path("pages.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                self.slides.append(Slide(record["source"], record["number"], record["text"]))
+                self.page_hashes.append(record["hash"])
+        self.vectors = np.load(self._path("vectors.npy"), mmap_mode="r")
+
+    def _save(self, vectors: np.ndarray) -> None:
+        """ページ・ベクトル・マニフェストの順に一時ファイルに書いてから置き換える"""
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        def replace(name: str, write) -> None:
+            fd, tmp_path = tempfile.mkstemp(dir=self.index_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    write(f)
+                os.replace(tmp_path, self._path(name))
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+        def write_pages(f) -> None:
+            for slide, page_hash in zip(self.slides, self.page_hashes):
+                record = dict(slide._asdict(), hash=page_hash)
+                f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+
+        manifest = {"version": INDEX_VERSION, "embedder": self._embedder_name, "dim": int(vectors.shape[1]),
+                    "sources": self.source_hashes}
+        replace("pages.jsonl", write_pages)
+        replace("vectors.npy", lambda f: np.save(f, vectors))
+        replace("manifest.json",
+                lambda f: f.write(json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")))
+        self.vectors = np.load(self._path("vectors.npy"), mmap_mode="r")
+
+    # --- 更新 ---
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = get_embedder(self._embedder_name)
+            self._embedder_name = self._embedder.name
+        return self._embedder
+
+    def update(self, paths: List[str]) -> Dict[str, int]:
+        """
+        索引の資料を paths に合わせる（変わっていない資料・ページは抽出や埋め込みをし直さない）
+        Args:
+            paths: 講義資料（PDFまたはテキスト）のパス
+        Returns:
+            {"pages": 全ページ数, "extracted": 抽出し直した資料の数, "embedded": 埋め込んだページ数,
+             "reused": 埋め込みを使い回したページ数}
+        """
+        embedder = self.embedder
+        old_rows: Dict[str, int] = {page_hash: row for row, page_hash in enumerate(self.page_hashes)}
+        old_pages: Dict[str, List[int]] = {}
+        for row, slide in enumerate(self.slides):
+            old_pages.setdefault(slide.source, []).append(row)
+
+        slides: List[Slide] = []
+        page_hashes: List[str] = []
+        source_hashes: Dict[str, str] = {}
+        extracted = 0
+        for path in paths:
+            file_hash = sha256_file(path)
+            source_hashes[path] = file_hash
+            if self.source_hashes.get(path) == file_hash and path in old_pages:
+                rows = old_pages[path]
+                slides.extend(self.slides[row] for row in rows)
+                page_hashes.extend(self.page_hashes[row] for row in rows)
+                continue
+            extracted += 1
+            for number, text in enumerate(read_source_pages(path), start=1):
+                slides.append(Slide(path, number, text))
+                page_hashes.append(sha256_text(text))
+
+        # テキストが同じページのベクトルは前の索引から写し、残りだけをまとめて埋め込む
+        new_texts = {page_hash: slide.text for slide, page_hash in zip(slides, page_hashes)
+                     if page_hash not in old_rows}
+        new_vectors = embedder(list(new_texts.values())) if new_texts else np.zeros((0, embedder.dim), np.float32)
+        new_rows = {page_hash: row for row, page_hash in enumerate(new_texts)}
+        vectors = np.empty((len(slides), embedder.dim), dtype=np.float32)
+        for row, page_hash in enumerate(page_hashes):
+            if page_hash in new_rows:
+                vectors[row] = new_vectors[new_rows[page_hash]]
+            else:
+                vectors[row] = self.vectors[old_rows[page_hash]]
+
+        self.slides, self.page_hashes, self.source_hashes = slides, page_hashes, source_hashes
+        self._bm25 = None
+        self._save(vectors)
+        return {"pages": len(slides), "extracted": extracted, "embedded": len(new_texts),
+                "reused": len(slides) - sum(1 for page_hash in page_hashes if page_hash in new_rows)}
+
+    # --- 検索 ---
+
+    @property
+    def bm25(self) -> BM25:
+        # BM25 の転置索引はページのテキストから作り直す方が保存するより速い（ページ数は多くても数千）
+        if self._bm25 is None:
+            self._bm25 = BM25([tokenize(slide.text) for slide in self.slides])
+        return self._bm25
+
+    def __len__(self) -> int:
+        return len(self.slides)
+
+    def search_many(self, queries: List[str], top_k: int = DEFAULT_TOP_K) -> List[List[SearchResult]]:
+        """
+        複数のクエリをまとめて検索する（埋め込みは1回でまとめて計算する）
+        Args:
+            queries: クエリのリスト
+            top_k: クエリごとに返すページ数
+        Returns:
+            クエリごとの SearchResult のリスト（score は Reciprocal Rank Fusion のスコア）
+        """
+        if not self.slides or not queries:
+            return [[] for _ in queries]
+        dense = np.asarray(self.embedder.queries(queries) @ np.asarray(self.vectors).T)
+        results = []
+        for query, dense_scores in zip(queries, dense):
+            sparse_scores = self.bm25.scores(tokenize(query))
+            fused = 1.0 / (RRF_K + 1 + _rank_of(dense_scores))
+            # 一致する語が1つもないページは BM25 の順位に加えない
+            matched = sparse_scores > 0
+            fused[matched] += 1.0 / (RRF_K + 1 + _rank_of(sparse_scores)[matched])
+            k = min(top_k, len(fused))
+            top = np.argpartition(-fused, k - 1)[:k]
+            top = top[np.argsort(-fused[top], kind="stable")]
+            results.append([SearchResult(self.slides[i], float(fused[i])) for i in top])
+        return results
+
+    def search(self, query: str, top_k: int = DEFAULT_TOP_K) -> List[SearchResult]:
+        """クエリに関係の深いページを上位 top_k 件返す"""
+        return self.search_many([query], top_k)[0]
+
+
+# --- プロンプトの作成 ---
+
+def chunk_transcript(text: str, max_chars: int = DEFAULT_CHUNK_CHARS) -> List[str]:
+    """
+    書き起こしを段落（1行。長い段落は文）の区切りで max_chars 文字程度のチャンクに分ける
+    行頭のタイムスタンプと区切り線は検索の邪魔になるため除く（text_segmenter）
+    """
+    sentences: List[str] = []
+    for paragraph in group_paragraphs(segment_text(text, max_chars)):
+        joined = "".join(unit.text for unit in paragraph)
+        if len(joined) <= max_chars:
+            sentences.append(joined)
+        else:
+            sentences.extend(unit.text for unit in paragraph)
+
+    chunks: List[str] = []
+    current = ""
+    for sentence in sentences:
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def build_prompt(chunk: str, slides: List[Slide], max_chars: int = DEFAULT_PROMPT_CHARS) -> str:
+    """
+    書き起こしのチャンクと講義資料のページからプロンプトを組み立てる
+    全体が max_chars 文字を超えないよう、順位の低いページから削る（書き起こしは削らない）
+    Args:
+        chunk: 書き起こしのチャンク
+        slides: 関係の深い順の講義資料のページ
+        max_chars: プロンプト全体の文字数の上限
+    Returns:
+        プロンプト
+    """
+    body = f"\n# 書き起こし\n{chunk}\n"
+    budget = max_chars - len(PROMPT_HEADER) - len(body) - len("\n# 講義資料\n")
+    excerpts: List[str] = []
+    for slide in slides:
+        label = f"[{os.path.basename(slide.source)} p.{slide.number}]\n"
+        text = re.sub(r"\n\s*\n", "\n", slide.text.strip())
+        room = budget - len(label) - 1
+        if room < 40:
+            break
+        excerpt = label + (text if len(text) <= room else text[:room - 1] + "…") + "\n"
+        excerpts.append(excerpt)
+        budget -= len(excerpt)
+    if not excerpts:
+        return PROMPT_HEADER + body
+    return PROMPT_HEADER + "\n# 講義資料\n" + "".join(excerpts) + body
+
+
+def build_correction_prompts(transcript: str, index: SlideIndex, top_k: int = DEFAULT_TOP_K,
+                             max_chars: int = DEFAULT_PROMPT_CHARS,
+                             chunk_chars: int = DEFAULT_CHUNK_CHARS) -> List[CorrectionPrompt]:
+    """
+    書き起こしをチャンクに分け、チャンクごとに関係の深いページだけを入れたプロンプトを作る
+    Args:
+        transcript: 書き起こしのテキスト
+        index: 講義資料の索引
+        top_k: チャンクごとに入れるページ数の上限
+        max_chars: プロンプトの文字数の上限
+        chunk_chars: チャンクの文字数
+    Returns:
+        CorrectionPrompt のリスト
+    """
+    chunks = chunk_transcript(transcript, chunk_chars)
+    prompts = []
+    for chunk, results in zip(chunks, index.search_many(chunks, top_k)):
+        slides = [result.slide for result in results]
+        prompts.append(CorrectionPrompt(chunk, slides, build_prompt(chunk, slides, max_chars)))
+    return prompts
+
+
+def build_full_prompt(chunk: str, reference_texts: List[str]) -> str:
+    """講義資料の全ページを入れたプロンプト（比較用）"""
+    return PROMPT_HEADER + "\n# 講義資料\n" + "\n".join(reference_texts) + f"\n\n# 書き起こし\n{chunk}\n"
+
+
+# --- ベンチマーク ---
+
+def benchmark(transcript_path: str, reference_path: str, top_k: int = DEFAULT_TOP_K,
+              max_chars: int = DEFAULT_PROMPT_CHARS) -> None:
+    """
+    講義資料の全ページを入れる場合と、上位 top_k ページだけを入れる場合のプロンプトの長さと処理時間を比べる
+    Args:
+        transcript_path: 書き起こしのテキスト
+        reference_path: 講義資料（PDFまたはテキスト）
+        top_k: チャンクごとに入れるページ数
+        max_chars: プロンプトの文字数の上限
+    """
+    with open(transcript_path, "r", encoding="utf-8") as f:
+        transcript = f.read()
+    with tempfile.TemporaryDirectory() as tmp:
+        # 段落ごとに空行を入れた写しを資料のページとして使う
+        pages = read_source_pages(reference_path)
+        if len(pages) == 1:
+            pages = [line for line in pages[0].splitlines() if line.strip()]
+        deck_path = os.path.join(tmp, "deck.txt")
+        with open(deck_path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(pages))
+        index_dir = os.path.join(tmp, "index")
+
+        start = time.perf_counter()
+        stats = SlideIndex(index_dir).update([deck_path])
+        build_seconds = time.perf_counter() - start
+        print(f"索引の作成: {stats['pages']}ページ, {build_seconds * 1000:.0f}ms")
+
+        start = time.perf_counter()
+        index = SlideIndex(index_dir)
+        stats = index.update([deck_path])
+        print(f"変更のない資料での更新: 埋め込み{stats['embedded']}ページ, {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        pages[len(pages) // 2] += "（追記）"
+        with open(deck_path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(pages))
+        start = time.perf_counter()
+        stats = index.update([deck_path])
+        print(f"1ページを変更した資料での更新: 埋め込み{stats['embedded']}ページ, "
+              f"使い回し{stats['reused']}ページ, {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        chunks = chunk_transcript(transcript)
+        start = time.perf_counter()
+        full = [build_full_prompt(chunk, pages) for chunk in chunks]
+        full_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        bounded = build_correction_prompts(transcript, index, top_k, max_chars)
+        bounded_seconds = time.perf_counter() - start
+
+    full_chars = [len(prompt) for prompt in full]
+    bounded_chars = [len(prompt.prompt) for prompt in bounded]
+    print(f"書き起こし: {len(transcript)}文字, {len(chunks)}チャンク")
+    print(f"==> 全ページ: 平均{np.mean(full_chars):.0f}文字, 最大{max(full_chars)}文字, "
+          f"合計{sum(full_chars)}文字, 作成{full_seconds * 1000:.1f}ms")
+    print(f"==> 上位{top_k}ページ: 平均{np.mean(bounded_chars):.0f}文字, 最大{max(bounded_chars)}文字, "
+          f"合計{sum(bounded_chars)}文字, 検索と作成{bounded_seconds * 1000:.1f}ms "
+          f"（1チャンク{bounded_seconds / len(chunks) * 1000:.2f}ms）")
+    print(f"==> プロンプトの合計文字数: {sum(bounded_chars) / sum(full_chars):.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="講義資料のページの索引と、書き起こしの修正用プロンプトの作成")
+    parser.add_argument("--index", default=SLIDE_INDEX_DIR, help="索引のディレクトリ")
+    parser.add_argument("--embedder", help="埋め込み（hashing, hashing-<次元数>, st:<モデル名>）")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="day3 の書き起こしでプロンプトの長さと処理時間を比較する")
+    subparsers = parser.add_subparsers(dest="command")
+
+    build = subparsers.add_parser("build", help="講義資料の索引を作る（変わった資料・ページだけを更新する）")
+    build.add_argument("sources", nargs="+", help="講義資料（PDF またはテキスト）")
+
+    query = subparsers.add_parser("query", help="索引を検索する")
+    query.add_argument("query", help="検索する文")
+    query.add_argument("-k", "--top-k", type=int, default=DEFAULT_TOP_K, help="表示するページ数")
+
+    prompts = subparsers.add_parser("prompts", help="書き起こしのチャンクごとのプロンプトを作る")
+    prompts.add_argument("transcript", help="書き起こしのテキスト")
+    prompts.add_argument("-k", "--top-k", type=int, default=DEFAULT_TOP_K, help="チャンクごとに入れるページ数")
+    prompts.add_argument("--max-chars", type=int, default=DEFAULT_PROMPT_CHARS, help="プロンプトの文字数の上限")
+    prompts.add_argument("--chunk-chars", type=int, default=DEFAULT_CHUNK_CHARS, help="チャンクの文字数")
+    prompts.add_argument("-o", "--output", help="出力ファイル（JSONL。省略時は標準出力）")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "day3", "data")
+        benchmark(os.path.join(data_dir, "LLM2024_day4_raw.txt"), os.path.join(data_dir, "LLM2024_day4.txt"))
+        return
+    if not args.command:
+        parser.print_help()
+        return
+
+    index = SlideIndex(args.index, args.embedder)
+    if args.command == "build":
+        stats = index.update(args.sources)
+        print(f"{stats['pages']}ページの索引を保存しました: {args.index}"
+              f"（抽出した資料 {stats['extracted']}, 埋め込んだページ {stats['embedded']}）")
+        return
+    if not len(index):
+        print(f"索引がありません。先に build で作成してください: {args.index}")
+        return
+    if args.command == "query":
+        for result in index.search(args.query, args.top_k):
+            slide = result.slide
+            print(f"--- {os.path.basename(slide.source)} p.{slide.number}（{result.score:.4f}） ---")
+            print(slide.text.strip())
+        return
+
+    with open(args.transcript, "r", encoding="utf-8") as f:
+        transcript = f.read()
+    results = build_correction_prompts(transcript, index, args.top_k, args.max_chars, args.chunk_chars)
+    lines = [json.dumps({"chunk": p.chunk, "pages": [[s.source, s.number] for s in p.slides],
+                         "prompt": p.prompt}, ensure_ascii=False) for p in results]
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"{len(results)}個のプロンプトを保存しました: {args.output}")
+    else:
+        print("\n".join(lines))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,556 @@
+"""
+講義資料の用語辞書による書き起こしの固有名詞・専門用語の修正
+
+講義資料（PDFのページのテキストなど）から固有名詞・専門用語（英字の語句とカタカナ語）を集めて辞書を作り、
+書き起こしの中のカタカナ語・英字の語を、読みが近い辞書の用語に置き換える
+（例: 「マジョリティーコーティング」→「Majority Voting」、「コサイン」→「Cosine」）。
+
+読みの比較にはカタカナをローマ字にし、英字は綴りを発音に近づけた共通の表記（読みのキー）を使う。
+辞書の読みのキーは BK-tree に入れておき、書き起こしの語ごとに編集距離がしきい値以内のものだけを探すため、
+全ての語と全ての用語を総当たりで比べる場合と違い、書き起こしの長さにほぼ比例する時間で修正できる。
+
+使い方:
+    # 講義資料（PDFまたはテキスト）の用語で書き起こしを修正する
+    python term_correction.py day3/data/LLM2024_day4_raw.txt --reference data/slides/day4.pdf -o data/output/day4_corrected.txt
+
+    # day3 の書き起こし（修正前・修正後）で修正の効果と処理時間を計測する
+    python term_correction.py --benchmark
+"""
+import argparse
+import os
+import re
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# --- 読みのキー ---
+
+_KANA_ROWS = {
+    "": "アイウエオ", "k": "カキクケコ", "s": "サシスセソ", "t": "タチツテト", "n": "ナニヌネノ",
+    "h": "ハヒフヘホ", "m": "マミムメモ", "y": "ヤ_ユ_ヨ", "r": "ラリルレロ", "w": "ワヰ_ヱヲ",
+    "g": "ガギグゲゴ", "z": "ザジズゼゾ", "d": "ダヂヅデド", "b": "バビブベボ", "p": "パピプペポ",
+}
+KANA_ROMAJI = {kana: consonant + vowel
+               for consonant, row in _KANA_ROWS.items() for vowel, kana in zip("aiueo", row) if kana != "_"}
+KANA_ROMAJI.update({"シ": "shi", "チ": "chi", "ツ": "tsu", "フ": "fu", "ジ": "ji", "ヂ": "ji", "ヅ": "zu",
+                    "ヲ": "o", "ン": "n", "ヴ": "vu"})
+SMALL_VOWELS = {"ァ": "a", "ィ": "i", "ゥ": "u", "ェ": "e", "ォ": "o"}
+SMALL_Y = {"ャ": "a", "ュ": "u", "ョ": "o"}
+
+_CONSONANTS = "bcdfghjkmprstvwz"
+# 子音の後に補われる母音（「グ」の u、「ド」「ト」の o）
+_EPENTHETIC_U = re.compile(f"(?<=[{_CONSONANTS}])u(?=[{_CONSONANTS}]|$)")
+_EPENTHETIC_O = re.compile(f"(?<=[td])o(?=[{_CONSONANTS}]|$)")
+# 母音の後の r（英語の er, ar などはカタカナでは長音になる）
+_POSTVOCALIC_R = re.compile(f"(?<=[aeiou])r(?=[{_CONSONANTS}ln]|$)")
+
+
+def katakana_to_romaji(text: str) -> str:
+    """カタカナをローマ字にする（長音は直前の母音を繰り返し、カタカナ以外の文字は無視する）"""
+    out: List[str] = []
+    double = False
+    for ch in text:
+        if ch == "ッ":
+            double = True
+            continue
+        if ch == "ー":
+            if out and out[-1]:
+                out.append(out[-1][-1])
+            continue
+        if ch in SMALL_Y and out and out[-1]:
+            stem = out[-1][:-1]
+            out[-1] = stem + ("" if stem in ("sh", "ch", "j") else "y") + SMALL_Y[ch]
+            continue
+        if ch in SMALL_VOWELS:
+            if out and out[-1]:
+                previous = out[-1]
+                stem = previous[:-1] if len(previous) > 1 else ("w" if previous == "u" else previous)
+                out[-1] = stem + SMALL_VOWELS[ch]
+            else:
+                out.append(SMALL_VOWELS[ch])
+            continue
+        romaji = KANA_ROMAJI.get(ch, "")
+        if double and romaji:
+            romaji = romaji[0] + romaji
+        double = False
+        out.append(romaji)
+    return "".join(out)
+
+
+def _common_key(text: str) -> str:
+    """カタカナ由来・英字由来のどちらにも使う表記の揺れの吸収"""
+    text = text.replace("sh", "s").replace("ts", "t").replace("l", "r").replace("v", "b").replace("y", "i")
+    text = re.sub(r"(.)\1+", r"\1", text)
+    return text.replace("ou", "o").replace("ei", "e")
+
+
+def katakana_key(text: str) -> str:
+    """カタカナ語の読みのキー"""
+    romaji = katakana_to_romaji(text)
+    romaji = _EPENTHETIC_U.sub("", romaji)
+    romaji = _EPENTHETIC_O.sub("", romaji)
+    return _common_key(romaji)
+
+
+def latin_key(text: str) -> str:
+    """英字の語句の読みのキー（綴りを発音に近い表記にする）"""
+    text = re.sub(r"[^a-z0-9]", "", text.lower())
+    text = text.replace("ck", "k").replace("ph", "f").replace("th", "s").replace("qu", "kw").replace("x", "ks")
+    text = re.sub(r"c(?=[eiy])", "s", text.replace("ch", "C")).replace("c", "k").replace("C", "ch")
+    if len(text) > 3 and text.endswith("e"):
+        text = text[:-1]
+    text = _POSTVOCALIC_R.sub("", text)
+    return _common_key(text)
+
+
+KATAKANA_RE = re.compile(r"[ァ-ヴー・]+")
+LATIN_RE = re.compile(r"[A-Za-z][A-Za-z0-9]*(?:[-.][A-Za-z0-9]+)*")
+# 英字の用語: 大文字で始まる語を空白（と of, for などのつなぎの語）でつないだ語句
+LATIN_PHRASE_RE = re.compile(
+    r"[A-Za-z][A-Za-z0-9]*(?:-[A-Za-z0-9]+)*(?: (?:(?:of|for|the|and|to) )?[A-Z][A-Za-z0-9]*(?:-[A-Za-z0-9]+)*)*")
+
+
+# カタカナ語とそれに続く英字の語（「ベストオブN」のように、英字の語句の一部だけがカタカナになったもの）
+KATAKANA_LATIN_RE = re.compile(r"[ァ-ヴー・]+ ?[A-Za-z][A-Za-z0-9]*")
+
+
+def reading_key(text: str) -> str:
+    """語の種類（カタカナ・英字）に合わせた読みのキー。両方を含む語は部分ごとのキーをつなぐ"""
+    if KATAKANA_RE.fullmatch(text):
+        return katakana_key(text)
+    if not KATAKANA_RE.search(text):
+        return latin_key(text)
+    return "".join(katakana_key(part) if KATAKANA_RE.fullmatch(part) else latin_key(part)
+                   for part in re.split(f"({KATAKANA_RE.pattern})", text) if part)
+
+
+# --- 編集距離と BK-tree ---
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """
+    レーベンシュタイン距離
+    limit を指定すると、距離が limit を超えることがわかった時点で limit + 1 を返す
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+# 置き換えても同じ語とみなせる近い音の子音（有声・無声など）
+_SIMILAR_CONSONANTS = {c: group for group in ("bpf", "dt", "gk", "sz", "mn") for c in group}
+
+
+def sound_distance(a: str, b: str) -> int:
+    """
+    読みのキーの編集距離。母音どうしと近い音の子音どうし以外の置き換えは、削除と挿入の2回と数える
+    edit_distance と同じ値なら、音の違う子音に置き換えずに一致させられる
+    """
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            if ca == cb:
+                cost = 0
+            elif (ca in "aeiou" and cb in "aeiou") or _SIMILAR_CONSONANTS.get(ca, ca) == _SIMILAR_CONSONANTS.get(cb):
+                cost = 1
+            else:
+                cost = 2
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost))
+        previous = current
+    return previous[-1]
+
+
+class BKTree:
+    """
+    編集距離の BK-tree
+    各ノードの子を親との距離ごとに持ち、三角不等式で調べる必要のない枝を飛ばす
+    """
+
+    def __init__(self, keys: Iterable[str] = ()):
+        self.root: Optional[list] = None
+        self.size = 0
+        for key in keys:
+            self.add(key)
+
+    def add(self, key: str) -> None:
+        if self.root is None:
+            self.root = [key, {}]
+            self.size = 1
+            return
+        node = self.root
+        while True:
+            distance = edit_distance(key, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [key, {}]
+                self.size += 1
+                return
+            node = child
+
+    def search(self, key: str, max_distance: int) -> List[Tuple[int, str]]:
+        """距離が max_distance 以内のキーを (距離, キー) の昇順で返す"""
+        if self.root is None:
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            node_key, children = stack.pop()
+            distance = edit_distance(key, node_key)
+            if distance <= max_distance:
+                found.append((distance, node_key))
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(child for d, child in children.items() if low <= d <= high)
+        return sorted(found)
+
+
+# --- 用語辞書と修正 ---
+
+# 用語にしない英単語（英語の見出しの中の一般的な語）
+STOP_WORDS = {"of", "for", "the", "and", "to", "from", "with", "in", "on", "by", "is", "are", "an", "this",
+              "that", "how", "what", "we", "our", "you", "your", "it", "its", "as", "at", "be", "or", "not"}
+# カタカナ語をカタカナの用語に置き換えるときの条件（一般的なカタカナ語を別の語に変えないよう厳しくする）
+KATAKANA_MIN_KEY = 6
+KATAKANA_MAX_DISTANCE = 1
+# 読みが完全には一致しない英字の用語に置き換える最短の読みのキー（「ママ」→「Llama」のような誤りを防ぐ）
+FUZZY_MIN_KEY = 5
+# 用語の読みのキーが語より短くてよい文字数（これより短い用語に置き換えると語の一部を消すことになる）
+MAX_KEY_SHORTENING = 1
+# 音の違う子音に置き換える必要がある英字の用語を候補にしない最長の読みのキー
+# （「ブロッキング」→「Grokking」、「オプティカル」→「Optimal」のような別の語への置き換えを防ぐ）
+SOUND_CHECK_MAX_KEY = 9
+
+
+def max_distance_for(key: str) -> int:
+    """読みのキーの長さに応じた、同じ用語とみなす編集距離の上限"""
+    if len(key) < 4:
+        return 0
+    if len(key) <= 5:
+        return 1
+    if len(key) <= 9:
+        return 2
+    return 3
+
+
+def _normalize_latin(text: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def extract_terms(texts: Iterable[str], min_length: int = 3) -> Counter:
+    """
+    講義資料から用語の候補（英字の語句とカタカナ語）と出現回数を集める
+    Args:
+        texts: 講義資料のテキスト（ページごとなど）
+        min_length: 用語とする最短の文字数
+    Returns:
+        用語ごとの出現回数
+    """
+    terms: Counter = Counter()
+    for text in texts:
+        for match in LATIN_PHRASE_RE.finditer(text):
+            phrase = match.group()
+            words = phrase.split(" ")
+            # 語句全体と、語句を構成する各語の両方を用語にする
+            for candidate in {phrase, *words}:
+                if len(candidate) >= min_length and candidate.lower() not in STOP_WORDS:
+                    terms[candidate] += 1
+        for match in KATAKANA_RE.finditer(text):
+            if len(match.group()) >= min_length:
+                terms[match.group()] += 1
+    return terms
+
+
+class Correction(NamedTuple):
+    """1か所の修正（位置は修正前のテキストの文字位置）"""
+    start: int
+    end: int
+    original: str
+    replacement: str
+    distance: int
+
+
+class TermDictionary:
+    """
+    用語と読みのキーの辞書。読みのキーを BK-tree に入れて近いものを探す
+    Args:
+        terms: 用語と出現回数（同じ読みの用語が複数ある場合は出現回数の多いものを使う）
+    """
+
+    def __init__(self, terms: Dict[str, int]):
+        self.counts = Counter(terms)
+        self.by_key: Dict[str, str] = {}
+        for term, count in sorted(self.counts.items(), key=lambda item: (-item[1], item[0])):
+            key = reading_key(term)
+            if key and key not in self.by_key:
+                self.by_key[key] = term
+        self.tree = BKTree(self.by_key)
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], extra_terms: Iterable[str] = ()) -> "TermDictionary":
+        """講義資料のテキストと、追加の用語のリストから辞書を作る"""
+        terms = extract_terms(texts)
+        for term in extra_terms:
+            terms[term] += 1
+        return cls(terms)
+
+    def __len__(self) -> int:
+        return len(self.by_key)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.counts
+
+    def lookup(self, word: str) -> Optional[Tuple[str, int]]:
+        """
+        読みが近い用語を探す
+        Returns:
+            (用語, 編集距離)。見つからない場合や、語がすでに辞書の用語の場合は None
+        """
+        if word in self.counts:
+            return None
+        key = reading_key(word)
+        if len(key) < 4:
+            return None
+        matches = self.tree.search(key, max_distance_for(key))
+        return _choose(word, key, matches, self.by_key, self.counts)
+
+
+def _choose(word: str, key: str, matches: List[Tuple[int, str]], by_key: Dict[str, str],
+            counts: Counter) -> Optional[Tuple[str, int]]:
+    """
+    候補から置き換える用語を選ぶ
+    英字の語は大文字・小文字や空白の違いだけを直し、カタカナ語をカタカナの用語にするのは
+    読みがほぼ同じ長い語に限る。語より読みが短すぎる用語と、短い語を音の違う英字の用語にするものは候補にしない
+    """
+    matches = [(d, k) for d, k in matches if _plausible(word, key, d, k, by_key[k])]
+    if not matches:
+        return None
+    distance = matches[0][0]
+    # 同じ距離の候補が複数ある場合は資料での出現回数が多いものを選ぶ
+    best = max((by_key[k] for d, k in matches if d == distance), key=lambda t: counts[t])
+    if best == word:
+        return None
+    if LATIN_RE.fullmatch(word):
+        return (best, 0) if _normalize_latin(best) == _normalize_latin(word) else None
+    if KATAKANA_RE.fullmatch(best) and (len(key) < KATAKANA_MIN_KEY or distance > KATAKANA_MAX_DISTANCE):
+        return None
+    if distance > 0 and len(key) < FUZZY_MIN_KEY:
+        return None
+    return best, distance
+
+
+def _plausible(word: str, key: str, distance: int, term_key: str, term: str) -> bool:
+    """語を用語 term に置き換えられる候補か"""
+    if len(key) - len(term_key) > MAX_KEY_SHORTENING:
+        return False
+    if (distance > 0 and len(key) <= SOUND_CHECK_MAX_KEY and not LATIN_RE.fullmatch(word)
+            and not KATAKANA_RE.fullmatch(term)):
+        return sound_distance(key, term_key) == distance
+    return True
+
+
+def _find_corrections(text: str, lookup: Callable[[str], Optional[Tuple[str, int]]]) -> List[Correction]:
+    """
+    テキストのカタカナ語・英字の語ごとに lookup で用語を探す
+    カタカナ語に英字の語が続く箇所は、まとめて語句の用語（「Best of N」など）になる場合はまとめて置き換える
+    """
+    corrections = []
+    for match in KATAKANA_LATIN_RE.finditer(text):
+        found = lookup(match.group())
+        if found and " " in found[0]:
+            corrections.append(Correction(match.start(), match.end(), match.group(), found[0], found[1]))
+    phrases = [(c.start, c.end) for c in corrections]
+    for pattern in (KATAKANA_RE, LATIN_RE):
+        for match in pattern.finditer(text):
+            if any(start <= match.start() < end for start, end in phrases):
+                continue
+            found = lookup(match.group())
+            if found:
+                corrections.append(Correction(match.start(), match.end(), match.group(), found[0], found[1]))
+    return sorted(corrections)
+
+
+class TermCorrector:
+    """
+    書き起こしの中のカタカナ語・英字の語を、辞書の用語に置き換える
+    Args:
+        dictionary: 用語辞書
+        cache: 同じ語の検索結果を使い回すか
+    """
+
+    def __init__(self, dictionary: TermDictionary, cache: bool = True):
+        self.dictionary = dictionary
+        self.cache = cache
+        self._cache: Dict[str, Optional[Tuple[str, int]]] = {}
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], extra_terms: Iterable[str] = ()) -> "TermCorrector":
+        return cls(TermDictionary.from_texts(texts, extra_terms))
+
+    def _lookup(self, word: str) -> Optional[Tuple[str, int]]:
+        if not self.cache:
+            return self.dictionary.lookup(word)
+        if word not in self._cache:
+            self._cache[word] = self.dictionary.lookup(word)
+        return self._cache[word]
+
+    def find_corrections(self, text: str) -> List[Correction]:
+        """修正する箇所を探す（同じ語の検索結果は使い回す）"""
+        return _find_corrections(text, self._lookup)
+
+    def correct(self, text: str) -> Tuple[str, List[Correction]]:
+        """
+        書き起こしを修正する
+        Returns:
+            (修正後のテキスト, 修正箇所のリスト)
+        """
+        corrections = self.find_corrections(text)
+        parts = []
+        position = 0
+        for correction in corrections:
+            parts.append(text[position:correction.start])
+            parts.append(correction.replacement)
+            position = correction.end
+        parts.append(text[position:])
+        return "".join(parts), corrections
+
+
+def correct_with_pairwise(text: str, dictionary: TermDictionary) -> List[Correction]:
+    """全ての語と全ての用語の読みを総当たりで比べる修正（比較用。結果は TermCorrector と同じ）"""
+    keys = list(dictionary.by_key)
+
+    def lookup(word: str) -> Optional[Tuple[str, int]]:
+        if word in dictionary.counts:
+            return None
+        key = reading_key(word)
+        if len(key) < 4:
+            return None
+        limit = max_distance_for(key)
+        scored = sorted((d, k) for d, k in ((edit_distance(key, k), k) for k in keys) if d <= limit)
+        return _choose(word, key, scored, dictionary.by_key, dictionary.counts)
+
+    return _find_corrections(text, lookup)
+
+
+# --- ベンチマーク ---
+
+def term_accuracy(text: str, reference: str, terms: Iterable[str]) -> Tuple[int, int, int]:
+    """
+    用語の出現回数で見た正しさ
+    Returns:
+        (正解と一致した出現回数, 正解での出現回数の合計, 正解より多く現れた回数)
+    """
+    matched = total = extra = 0
+    for term in terms:
+        expected = reference.count(term)
+        found = text.count(term)
+        matched += min(found, expected)
+        total += expected
+        extra += max(0, found - expected)
+    return matched, total, extra
+
+
+def benchmark(raw_path: str, reference_path: str, repeats: Tuple[int, ...] = (1, 4, 16)) -> None:
+    """
+    修正前の書き起こしを修正し、修正後の書き起こしと比べる
+    講義のスライドは同梱されていないため、修正後の書き起こしから作った辞書を資料の代わりに使う
+    Args:
+        raw_path: 修正前の書き起こし
+        reference_path: 修正後の書き起こし（正解）
+        repeats: 処理時間を測るときに書き起こしを繰り返す回数
+    """
+    with open(raw_path, "r", encoding="utf-8") as f:
+        raw = f.read()
+    with open(reference_path, "r", encoding="utf-8") as f:
+        reference = f.read()
+
+    start = time.perf_counter()
+    dictionary = TermDictionary.from_texts(reference.splitlines())
+    build_seconds = time.perf_counter() - start
+    corrected, corrections = TermCorrector(dictionary).correct(raw)
+    print(f"辞書: {len(dictionary)}語（作成 {build_seconds * 1000:.0f}ms）, 修正 {len(corrections)}か所")
+
+    # 英字の用語（カタカナから英字への置き換えが主な修正）で評価する
+    latin_terms = [t for t in dictionary.counts if LATIN_RE.fullmatch(t.replace(" ", "")) and len(t) >= 4]
+    for label, text in (("修正前", raw), ("修正後", corrected)):
+        matched, total, extra = term_accuracy(text, reference, latin_terms)
+        print(f"==> {label}: 英字の用語 {matched}/{total} ({matched / total:.1%}), 余分な出現 {extra}")
+    for (original, replacement), count in Counter((c.original, c.replacement) for c in corrections).most_common(20):
+        print(f"    {original} → {replacement} ({count}回)")
+
+    # 処理時間: 語の検索結果の使い回しあり・なしの BK-tree と、総当たり
+    for repeat in repeats:
+        text = raw * repeat
+        times = {}
+        results = {}
+        for label, run in (("BK-tree", lambda: TermCorrector(dictionary).find_corrections(text)),
+                           ("BK-tree（使い回しなし）", lambda: TermCorrector(dictionary, cache=False).find_corrections(text)),
+                           ("総当たり", lambda: correct_with_pairwise(text, dictionary))):
+            start = time.perf_counter()
+            results[label] = run()
+            times[label] = time.perf_counter() - start
+        assert len({len(r) for r in results.values()}) == 1
+        print(f"==> {len(text) / 1000:.0f}k文字: " + ", ".join(f"{label} {seconds * 1000:.0f}ms"
+                                                          for label, seconds in times.items()))
+
+
+def load_reference_texts(paths: List[str]) -> List[str]:
+    """講義資料（PDFはページごと、テキストは行ごと）を読み込む"""
+    texts: List[str] = []
+    for path in paths:
+        if path.lower().endswith(".pdf"):
+            from pdf_extract import extract_texts
+            texts.extend(extract_texts(path))
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                texts.extend(f.read().splitlines())
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="講義資料の用語で書き起こしの固有名詞・専門用語を修正する")
+    parser.add_argument("transcript", nargs="?", help="修正する書き起こし")
+    parser.add_argument("--reference", nargs="+", default=[], help="講義資料（PDF またはテキスト）")
+    parser.add_argument("--terms", help="追加の用語のリスト（1行1語）")
+    parser.add_argument("-o", "--output", help="出力ファイル（省略時は標準出力）")
+    parser.add_argument("--benchmark", action="store_true", help="day3 の書き起こしで効果と処理時間を計測する")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "day3", "data")
+        benchmark(os.path.join(data_dir, "LLM2024_day4_raw.txt"), os.path.join(data_dir, "LLM2024_day4.txt"))
+        return
+    if not args.transcript:
+        parser.print_help()
+        return
+
+    extra_terms: List[str] = []
+    if args.terms:
+        with open(args.terms, "r", encoding="utf-8") as f:
+            extra_terms = [line.strip() for line in f if line.strip()]
+    corrector = TermCorrector.from_texts(load_reference_texts(args.reference), extra_terms)
+    with open(args.transcript, "r", encoding="utf-8") as f:
+        corrected, corrections = corrector.correct(f.read())
+    for correction in corrections:
+        print(f"{correction.original} → {correction.replacement}")
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(corrected)
+        print(f"{len(corrections)}か所を修正しました: {args.output}")
+    else:
+        print(corrected)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# テストからリポジトリ直下のモジュールを読み込めるようにする
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def has_ffmpeg() -> bool:
+    """imageio-ffmpeg に同梱された ffmpeg か、PATH 上の ffmpeg が使えるか"""
+    try:
+        import imageio_ffmpeg  # noqa: F401
+        return True
+    except ImportError:
+        return shutil.which("ffmpeg") is not None
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "requires_ffmpeg: ffmpeg が必要なテスト（使えない環境では飛ばす）")
+
+
+def pytest_collection_modifyitems(config, items):
+    if has_ffmpeg():
+        return
+    skip = pytest.mark.skip(reason="ffmpegが必要")
+    for item in items:
+        if "requires_ffmpeg" in item.keywords:
+            item.add_marker(skip)
@@ -0,0 +1,75 @@
+import os
+import time
+
+from analysis_cache import AnalysisCache
+
+
+def _write(path, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_analyze_reuses_result_for_same_content(tmp_path):
+    """同じ内容・モデル・プロンプトなら解析せずにキャッシュを返し、どれかが変われば解析し直すこと"""
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    video = _write(tmp_path / "lecture.mp4", b"video-bytes")
+    calls = []
+
+    def generate(path):
+        calls.append(path)
+        return "raw result"
+
+    first = cache.analyze(video, generate, "model-a", "prompt", postprocess=str.upper)
+    second = cache.analyze(video, generate, "model-a", "prompt", postprocess=str.upper)
+    assert first == second == "RAW RESULT"
+    assert len(calls) == 1
+
+    cache.analyze(video, generate, "model-a", "other prompt")
+    cache.analyze(video, generate, "model-b", "prompt")
+    assert len(calls) == 3
+
+    # 同じパスでも内容が変われば別のキー
+    _write(tmp_path / "lecture.mp4", b"edited-video-bytes")
+    cache.analyze(video, generate, "model-a", "prompt")
+    assert len(calls) == 4
+
+    entry = [e for e in cache.entries() if e["model"] == "model-a" and e["kind"] == "full"]
+    assert entry and all(e["video"] == video for e in entry)
+
+
+def test_window_analyzer_only_recomputes_changed_clips(tmp_path):
+    """時間窓単位のキャッシュで、内容が変わった窓だけを解析し直すこと"""
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    source = _write(tmp_path / "lecture.mp4", b"source")
+    clips = [_write(tmp_path / f"clip{i}.mp4", f"clip-{i}".encode()) for i in range(3)]
+    calls = []
+
+    def analyze_window(path):
+        calls.append(os.path.basename(path))
+        return f"result of {os.path.basename(path)}"
+
+    analyzer = cache.cached_window_analyzer(analyze_window, "model", "prompt", source_path=source)
+    assert [analyzer(c) for c in clips] == [f"result of clip{i}.mp4" for i in range(3)]
+    _write(clips[1], b"clip-1-edited")
+    [analyzer(c) for c in clips]
+    assert calls == ["clip0.mp4", "clip1.mp4", "clip2.mp4", "clip1.mp4"]
+
+    # 元の動画で絞り込んで削除できる
+    assert cache.purge(video_hash=cache.file_hash(source)) == 4
+    assert cache.entries() == []
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    """合計サイズが上限を超えたら、最後に使われた時刻の古いものから削除すること"""
+    cache = AnalysisCache(str(tmp_path / "cache"), max_bytes=10 ** 9)
+    for i, key in enumerate(["old", "used", "new"]):
+        cache.put(key, "x" * 1000, kind="full")
+        os.utime(cache._entry_path(key), (time.time() - 100 + i, time.time() - 100 + i))
+    cache.get("used")  # 使われたものは新しい扱いになる
+
+    keep_size = sum(os.path.getsize(cache._entry_path(key)) for key in ["used", "new"])
+    removed = cache.evict(max_bytes=keep_size)
+    assert removed == 1
+    assert cache.get("old") is None
+    assert cache.get("used") is not None and cache.get("new") is not None
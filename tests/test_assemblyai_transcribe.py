@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import httpx
+
+from assemblyai_transcribe import AsyncAssemblyAI, FakeAssemblyAI, retry_after_seconds, transcribe_files
+
+OPTIONS = {"poll_interval": 0.05, "max_poll_interval": 0.2, "backoff": 0.01}
+
+
+def _make_files(tmp_path, count, size=4000):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"lecture{i}.wav"
+        path.write_bytes(b"\0" * (size + i))
+        paths.append(str(path))
+    return paths
+
+
+def test_jobs_run_concurrently(tmp_path):
+    """全てのジョブを並行に進め、処理時間が最も長い1本に近く、結果は入力の順に返すこと"""
+    paths = _make_files(tmp_path, 6)
+    finished = []
+    with FakeAssemblyAI(base_seconds=0.5) as server:
+        start = time.perf_counter()
+        results = transcribe_files(paths, server.api_key, on_result=finished.append, base_url=server.base_url,
+                                   concurrency=3, **OPTIONS)
+        elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.5 * 3
+    assert [r.audio_path for r in results] == paths
+    assert all(r.status == "completed" and r.polls >= 1 for r in results)
+    assert [r.text.split("（")[1] for r in results] == [f"{4000 + i} bytes）" for i in range(6)]
+    assert sorted(r.audio_path for r in finished) == sorted(paths)
+    assert server.jobs and all(job["language_code"] == "ja" for job in server.jobs.values())
+
+
+def test_transient_errors_are_retried(tmp_path):
+    """一時的なエラー（503）は再試行して、全てのファイルの文字起こしを終えること"""
+    paths = _make_files(tmp_path, 4)
+    with FakeAssemblyAI(base_seconds=0.1, failure_rate=0.3, seed=1) as server:
+        client = AsyncAssemblyAI(server.api_key, server.base_url, max_retries=8, **OPTIONS)
+        results = asyncio.run(client.transcribe_many(paths))
+    assert all(r.status == "completed" for r in results)
+    assert server.failures > 0 and client.retries == server.failures
+
+
+def test_failures_are_reported_per_file(tmp_path):
+    """音声でないファイルや認証の失敗は、例外ではなくファイルごとの error として返すこと"""
+    paths = _make_files(tmp_path, 1) + [str(tmp_path / "empty.wav"), str(tmp_path / "missing.wav")]
+    (tmp_path / "empty.wav").write_bytes(b"")
+    with FakeAssemblyAI(base_seconds=0.05) as server:
+        results = transcribe_files(paths, server.api_key, base_url=server.base_url, **OPTIONS)
+        assert [r.status for r in results] == ["completed", "error", "error"]
+        assert results[1].error == "File does not appear to contain audio."
+        assert results[1].transcript_id is not None and results[2].transcript_id is None
+
+        results = transcribe_files(paths[:1], "wrong-key", base_url=server.base_url, **OPTIONS)
+        assert results[0].status == "error" and "401" in results[0].error
+
+
+def test_malformed_responses_fail_only_that_file(tmp_path):
+    """Retry-After が日時や不正な値でも再試行し、JSON でない応答や項目のない応答はそのファイルだけの error にすること"""
+    assert retry_after_seconds("2.5") == 2.5
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert 50 < retry_after_seconds(time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 60))) <= 60
+    assert retry_after_seconds("soon") is None and retry_after_seconds("nan") is None
+
+    paths = _make_files(tmp_path, 3)
+    calls = {"upload": 0}
+
+    def handler(request):
+        if request.url.path == "/v2/upload":
+            calls["upload"] += 1
+            size = len(request.read())
+            if calls["upload"] == 1:
+                return httpx.Response(429, headers={"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})
+            if calls["upload"] == 2:
+                return httpx.Response(503, headers={"retry-after": "later"})
+            if size == 4001:
+                return httpx.Response(200, text="<html>Bad Gateway</html>")
+            if size == 4002:
+                return httpx.Response(200, json={"unexpected": True})
+            return httpx.Response(200, json={"upload_url": f"https://files/{size}"})
+        if request.url.path == "/v2/transcript":
+            return httpx.Response(200, json={"id": "job", "status": "queued"})
+        return httpx.Response(200, json={"id": "job", "status": "completed", "text": "文字起こし"})
+
+    async def run():
+        client = AsyncAssemblyAI("key", "https://example.invalid", max_retries=3, **OPTIONS)
+        semaphore = asyncio.Semaphore(1)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            results = [await client.transcribe(http, path, semaphore) for path in paths]
+        return client, results
+
+    client, results = asyncio.run(run())
+    assert client.retries == 2
+    assert [r.status for r in results] == ["completed", "error", "error"]
+    assert "JSON" in results[1].error and "upload_url" in results[2].error
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+from extract_audio import can_stream_copy, extract_audio_from_video, extract_directory
+from ffmpeg_utils import make_synthetic_video, probe_media
+
+
+def test_can_stream_copy():
+    """出力形式が元のコーデックを格納できる場合だけコピーすること"""
+    assert can_stream_copy("aac", "out.m4a")
+    assert can_stream_copy("opus", "out.mka")
+    assert not can_stream_copy("aac", "out.mp3")
+    assert not can_stream_copy("aac", "out.xyz")
+    assert not can_stream_copy(None, "out.m4a")
+
+
+@pytest.mark.requires_ffmpeg
+def test_whisper_format_and_chunks(tmp_path):
+    """16kHzモノラルで、指定した長さごとに分割して書き出すこと"""
+    video = make_synthetic_video(str(tmp_path / "lecture.mp4"), 25, slide_seconds=25)
+    outputs = extract_audio_from_video(video, str(tmp_path / "audio" / "lecture.wav"),
+                                       sample_rate=16000, mono=True, chunk_seconds=10)
+    assert [os.path.basename(p) for p in outputs] == ["lecture_000.wav", "lecture_001.wav", "lecture_002.wav"]
+    media = probe_media(outputs[0])
+    assert media["audio_codec"] == "pcm_s16le"
+    assert media["audio_sample_rate"] == 16000 and media["audio_channels"] == 1
+    assert sum(probe_media(p)["duration"] for p in outputs) == pytest.approx(25, abs=0.5)
+
+
+@pytest.mark.requires_ffmpeg
+def test_extract_directory_keeps_structure(tmp_path):
+    """ディレクトリ内の動画を同じ階層構造で書き出し、コピー可能な場合は再エンコードしないこと"""
+    (tmp_path / "video" / "week1").mkdir(parents=True)
+    make_synthetic_video(str(tmp_path / "video" / "week1" / "day1.mp4"), 5, slide_seconds=5)
+    make_synthetic_video(str(tmp_path / "video" / "day2.mp4"), 5, slide_seconds=5)
+
+    results = extract_directory(str(tmp_path / "video"), str(tmp_path / "audio"), ".m4a", workers=2)
+    assert sorted(os.path.relpath(p[0], tmp_path / "audio") for p in results) == \
+        ["day2.m4a", os.path.join("week1", "day1.m4a")]
+    assert all(probe_media(p[0])["audio_codec"] == "aac" for p in results)
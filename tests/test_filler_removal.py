@@ -0,0 +1,91 @@
+import os
+import random
+
+import pytest
+
+from filler_removal import FillerRemover, remove_fillers, remove_fillers_reference
+
+RAW_TRANSCRIPT_PATH = os.path.join(
+    os.path.dirname(__file__), "../day3/data/LLM2024_day4_raw.txt"
+)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "えーと、今日はですね、あのー、機械学習の話をします",
+        "まあの、話です",
+        "方が、あの、あるロス",
+        "けど、、です、ます、",
+        "ええええーと 説明。。します",
+        "  、。スライドの内容です",
+    ],
+)
+def test_matches_reference(text):
+    """従来の実装と同じ出力になることを確認"""
+    assert remove_fillers(text) == remove_fillers_reference(text)
+
+
+def test_matches_reference_on_lecture_transcript():
+    """講義の書き起こし全体で従来の実装と出力が一致することを確認"""
+    with open(RAW_TRANSCRIPT_PATH, encoding="utf-8") as f:
+        text = f.read()
+    remover = FillerRemover()
+    for paragraph in text.splitlines():
+        assert remover.remove(paragraph) == remove_fillers_reference(paragraph)
+    assert remover.remove(text) == remove_fillers_reference(text)
+
+
+def test_matches_reference_on_random_text():
+    """フィラーが密集したランダムな文字列でも出力が一致することを確認"""
+    rng = random.Random(0)
+    alphabet = list("えーとあのそっまなんかいうでがけどらすした、。 ア\nab")
+    for _ in range(20000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        assert remove_fillers(text) == remove_fillers_reference(text)
+
+
+def test_stream_skips_empty_paragraphs():
+    """段落ごとの処理で空の段落が出力されないことを確認"""
+    paragraphs = ["えーと、説明します\n", "\n", "あの、次の話です\n"]
+    assert list(FillerRemover().remove_stream(paragraphs)) == ["説明します。", "次の話です。"]
+
+
+def test_file_keeps_timestamps(tmp_path):
+    """transcribe_audio.py の書き起こしのタイムスタンプを残し、本文だけからフィラーを除去することを確認"""
+    path = tmp_path / "transcript.txt"
+    path.write_text(
+        "[00:00:00.000 --> 00:00:07.720] えーと、私は森と申します\n"
+        "[00:00:07.720 --> 00:00:13.440] \n"
+        "[01:02:03.450 --> 01:02:09.001] あの、パイソン基礎講座です\n"
+        "---\n"
+        "まあ、まとめです\n",
+        encoding="utf-8",
+    )
+    output = tmp_path / "cleaned.txt"
+    assert FillerRemover().remove_file(str(path), str(output)) == 3
+    assert output.read_text(encoding="utf-8").splitlines() == [
+        "[00:00:00.000 --> 00:00:07.720] 私は森と申します。",
+        "[01:02:03.450 --> 01:02:09.001] パイソン基礎講座です。",
+        "まとめです。",
+    ]
+
+
+def test_file_stream_matches_remove_fillers(tmp_path):
+    """ファイルからの逐次処理の出力が、各行の本文に remove_fillers を適用した結果と一致することを確認"""
+    with open(RAW_TRANSCRIPT_PATH, encoding="utf-8") as f:
+        lines = [line.rstrip("\n") for line in f][:200]
+    lines += ["テストます。 です、次。", "[00:00:01.000 --> 00:00:02.000] テストます。 です、次。", "   "]
+    path = tmp_path / "transcript.txt"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    expected = []
+    for line in lines:
+        timestamp, body = ("[00:00:01.000 --> 00:00:02.000]", line[32:]) if line.startswith("[00:") else (None, line)
+        cleaned = remove_fillers(body)
+        if cleaned:
+            expected.append(f"{timestamp} {cleaned}" if timestamp else cleaned)
+    actual = list(FillerRemover().remove_file_stream(str(path)))
+    assert actual == expected
+    assert actual[-2:] == ["テストます。です。次。", "[00:00:01.000 --> 00:00:02.000] テストます。です。次。"]
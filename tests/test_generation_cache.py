@@ -0,0 +1,115 @@
+import asyncio
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "day1", "03_FastAPI"))
+
+from generation_cache import GenerationCache
+
+
+def _request(prompt="こんにちは", do_sample=False, temperature=0.7):
+    return SimpleNamespace(prompt=prompt, max_new_tokens=64, do_sample=do_sample, temperature=temperature, top_p=0.9)
+
+
+def _key(request):
+    return GenerationCache.make_key("model", request)
+
+
+def test_hit_after_miss(tmp_path):
+    """最初の生成の結果をメモリに保持し、再起動後もディスクから読み込むこと"""
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return "応答"
+
+    async def run(cache):
+        return [await cache.get_or_generate(_key(_request()), generate) for _ in range(2)]
+
+    cache = GenerationCache(cache_dir=str(tmp_path), model_name="model")
+    assert asyncio.run(run(cache)) == [("MISS", "応答"), ("HIT-MEMORY", "応答")]
+    assert asyncio.run(run(GenerationCache(cache_dir=str(tmp_path))))[0] == ("HIT-DISK", "応答")
+    assert len(calls) == 1
+    assert cache.stats()["hit_ratio"] == 0.5
+
+
+def test_concurrent_requests_generate_once():
+    """同じリクエストが同時に届いた場合、生成は1回だけで全員に同じ結果を返すこと"""
+    calls = []
+    release = threading.Event()
+
+    def generate():
+        calls.append(1)
+        release.wait(5)
+        return "応答"
+
+    async def run():
+        cache = GenerationCache()
+        tasks = [asyncio.ensure_future(cache.get_or_generate(_key(_request()), generate)) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        release.set()
+        return cache, await asyncio.gather(*tasks)
+
+    cache, results = asyncio.run(run())
+    assert len(calls) == 1
+    assert sorted(status for status, _ in results) == ["COALESCED", "COALESCED", "MISS"]
+    assert {text for _, text in results} == {"応答"}
+    assert cache.stats()["inflight"] == 0
+
+
+def test_sampling_requests_are_not_cacheable():
+    """サンプリングするリクエストは temperature によらずキャッシュせず、貪欲法のキーは temperature に依存しないこと"""
+    assert not GenerationCache.is_cacheable(_request(do_sample=True, temperature=0.0))
+    assert GenerationCache.is_cacheable(_request(do_sample=False))
+    assert _key(_request(temperature=0.1)) == _key(_request(temperature=1.5))
+    assert _key(_request("a")) != _key(_request("b"))
+
+
+def test_failure_releases_waiters():
+    """生成に失敗したら待っていたリクエストにも例外を返し、結果はキャッシュしないこと"""
+    release = threading.Event()
+
+    def generate():
+        release.wait(5)
+        raise RuntimeError("GPUのメモリ不足")
+
+    async def run():
+        cache = GenerationCache()
+        tasks = [asyncio.ensure_future(cache.get_or_generate(_key(_request()), generate)) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        release.set()
+        results = await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), 5)
+        return cache, results
+
+    cache, results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert cache.get(_key(_request())) == (None, None) and cache.stats()["inflight"] == 0
+
+
+def test_cancelled_leader_releases_waiters():
+    """生成を始めたリクエストがキャンセルされても、待っていたリクエストが止まったままにならないこと"""
+    release = threading.Event()
+
+    def generate():
+        release.wait(5)
+        return "応答"
+
+    async def run():
+        cache = GenerationCache()
+        leader = asyncio.ensure_future(cache.get_or_generate(_key(_request()), generate))
+        await asyncio.sleep(0.05)
+        waiter = asyncio.ensure_future(cache.get_or_generate(_key(_request()), generate))
+        await asyncio.sleep(0.05)
+        leader.cancel()  # クライアントの切断
+        try:
+            result = await asyncio.wait_for(asyncio.gather(waiter, return_exceptions=True), 2)
+        finally:
+            release.set()
+        return cache, leader, result[0]
+
+    cache, leader, result = asyncio.run(run())
+    assert leader.cancelled()
+    assert isinstance(result, RuntimeError) and "中断" in str(result)
+    assert cache.stats()["inflight"] == 0
@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from job_queue import STAGES, JobQueue, StageRunner, run_workers, worker_loop
+from transcribe_audio import make_sample_audio
+
+SLIDES = ["Transformer と Attention の仕組み", "Chinchilla の最適なトークン数"]
+TRANSCRIPT = "[00:00:00.000 --> 00:00:05.000] トランスフォーマーのアテンションとチンチラの話です\n"
+
+
+class FlakyRunner(StageRunner):
+    """文字起こしを決まった文章にし、講義ごとに最初の文字起こしだけ失敗させる"""
+
+    def __init__(self, output_dir, fail_stage="transcribe", failures=1, delay=0.0):
+        super().__init__(output_dir)
+        self.fail_stage = fail_stage
+        self.failures = failures
+        self.delay = delay
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def run(self, job):
+        if job.stage == self.fail_stage:
+            with self.lock:
+                count = self.calls[job.name] = self.calls.get(job.name, 0) + 1
+            if count <= self.failures:
+                raise RuntimeError("一時的なエラー")
+        return super().run(job)
+
+    def transcribe(self, job, job_dir):
+        time.sleep(self.delay)
+        path = os.path.join(job_dir, "transcript.txt")
+        os.makedirs(job_dir, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(TRANSCRIPT)
+        return path
+
+    def extract_pdf(self, job, job_dir):
+        path = os.path.join(job_dir, "slides.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(SLIDES, f, ensure_ascii=False)
+        return path
+
+
+def _add_lectures(db_path, tmp_path, count, pdf=True):
+    with JobQueue(db_path) as queue:
+        for i in range(count):
+            audio = make_sample_audio(str(tmp_path / f"lecture{i}.wav"), 2)
+            deck = None
+            if pdf:
+                deck = tmp_path / f"lecture{i}.pdf"
+                deck.write_bytes(f"deck {i}".encode())
+            queue.add(f"lecture{i}", audio, deck and str(deck))
+
+
+def test_stages_run_in_order_with_retries(tmp_path):
+    """工程を順に実行し、失敗した工程だけをやり直し、出力が最新の工程は再実行しないこと"""
+    db_path = str(tmp_path / "jobs.sqlite3")
+    _add_lectures(db_path, tmp_path, 2)
+    runner = FlakyRunner(str(tmp_path / "output"))
+
+    stats = worker_loop(db_path, runner, "w1", retry_delay=0, poll_seconds=0.01)
+    assert stats == {"done": 2 * len(STAGES), "skipped": 0, "failed": 2}
+    with JobQueue(db_path) as queue:
+        jobs = queue.jobs()
+        assert [(job.stage, job.status, job.error) for job in jobs] == [("done", "done", None)] * 2
+        assert queue.stage_seconds()["transcribe"][0] == 2
+        with open(jobs[0].outputs["correct"]["path"], encoding="utf-8") as f:
+            assert "Transformer" in f.read()
+        with open(jobs[0].outputs["evaluate"]["path"], encoding="utf-8") as f:
+            quality = json.load(f)
+        assert quality["accuracy"] > quality["original_accuracy"]
+
+        # 登録し直しても、入力が変わっていなければ処理し直さない
+        assert not queue.add("lecture0", str(tmp_path / "lecture0.wav"), str(tmp_path / "lecture0.pdf"))[1]
+        assert queue.get("lecture0").status == "done"
+    stats = worker_loop(db_path, runner, "w1", retry_delay=0, poll_seconds=0.01)
+    assert stats == {"done": 0, "skipped": 0, "failed": 0}
+
+    # 資料だけが変わった場合は処理し直すが、入力のハッシュが変わっていない工程は飛ばす
+    # （FlakyRunner の資料のテキストは PDF によらず同じため、修正と評価も飛ばす）
+    (tmp_path / "lecture0.pdf").write_bytes(b"deck 0 v2")
+    with JobQueue(db_path) as queue:
+        assert queue.add("lecture0", str(tmp_path / "lecture0.wav"), str(tmp_path / "lecture0.pdf"))[1]
+    stats = worker_loop(db_path, runner, "w1", retry_delay=0, poll_seconds=0.01)
+    assert stats == {"done": 1, "skipped": len(STAGES) - 1, "failed": 0}
+
+    # 音声が変わった場合は全ての工程をやり直す
+    make_sample_audio(str(tmp_path / "lecture0.wav"), 3)
+    with JobQueue(db_path) as queue:
+        assert queue.add("lecture0", str(tmp_path / "lecture0.wav"), str(tmp_path / "lecture0.pdf"))[1]
+    stats = worker_loop(db_path, runner, "w1", retry_delay=0, poll_seconds=0.01)
+    assert stats["done"] >= 2 and stats["failed"] == 0
+
+
+def test_failed_jobs_and_expired_leases(tmp_path):
+    """上限回数まで失敗したジョブは failed になって retry で戻り、止まったワーカーの工程は引き継がれること"""
+    db_path = str(tmp_path / "jobs.sqlite3")
+    _add_lectures(db_path, tmp_path, 1)
+    runner = FlakyRunner(str(tmp_path / "output"), fail_stage="correct", failures=10)
+    stats = worker_loop(db_path, runner, "w1", max_attempts=2, retry_delay=0, poll_seconds=0.01)
+    assert stats["failed"] == 2
+
+    with JobQueue(db_path) as queue:
+        job = queue.get("lecture0")
+        assert (job.stage, job.status, job.error) == ("correct", "failed", "RuntimeError: 一時的なエラー")
+        assert queue.retry() == 1
+        assert queue.get("lecture0").status == "queued"
+
+        # 期限の切れた工程は別のワーカーが取り出し、元のワーカーの完了の記録は無視する
+        stale = queue.claim("dead", lease_seconds=-1)
+        taken = queue.claim("alive")
+        assert (taken.id, taken.stage, taken.attempts) == (stale.id, "correct", 2)
+        assert queue.claim("other") is None
+        assert not queue.complete(stale, "dead", {"path": None}, 0.0)
+        assert queue.complete(taken, "alive", {"path": None}, 0.0)
+        assert queue.get("lecture0").stage == "evaluate"
+
+
+def test_expired_leases_count_towards_max_attempts(tmp_path):
+    """ワーカーごと止まる工程は、期限切れが上限回数に達したら引き継がずにジョブを failed にすること"""
+    db_path = str(tmp_path / "jobs.sqlite3")
+    _add_lectures(db_path, tmp_path, 2, pdf=False)
+    with JobQueue(db_path) as queue:
+        first = queue.claim("dead1", lease_seconds=-1, max_attempts=2)
+        assert queue.claim("dead2", lease_seconds=-1, max_attempts=2).id == first.id
+        # 2回とも期限が切れたジョブは failed にして、次のジョブを取り出す
+        taken = queue.claim("alive", max_attempts=2)
+        assert taken.name == "lecture1" and taken.attempts == 1
+        job = queue.get("lecture0")
+        assert (job.stage, job.status) == ("extract_audio", "failed") and "期限が切れました" in job.error
+        runs = queue.conn.execute("SELECT worker, status FROM stage_runs").fetchall()
+        assert [tuple(r) for r in runs] == [("dead2", "failed")]
+        assert queue.claim("other", max_attempts=2) is None
+        assert queue.retry("lecture0") == 1
+
+
+def test_concurrent_workers_run_each_stage_once(tmp_path):
+    """複数のワーカーが同時に動いても、各工程を1回ずつしか実行しないこと"""
+    db_path = str(tmp_path / "jobs.sqlite3")
+    _add_lectures(db_path, tmp_path, 6)
+    runner = FlakyRunner(str(tmp_path / "output"), failures=0, delay=0.05)
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(
+        worker_loop(db_path, runner, f"w{i}", poll_seconds=0.01))) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(r["done"] for r in results) == 6 * len(STAGES)
+    assert sum(r["done"] > 0 for r in results) > 1
+    with JobQueue(db_path) as queue:
+        assert queue.counts() == {"done": 6}
+        runs = queue.conn.execute("SELECT status, COUNT(*) FROM stage_runs GROUP BY status").fetchall()
+        assert [tuple(r) for r in runs] == [("done", 6 * len(STAGES))]
+
+
+def test_llm_correction_stage(tmp_path, monkeypatch):
+    """LLM で修正する場合、修正できたチャンクを書き出し、修正に失敗したチャンクがあれば工程を失敗にすること"""
+    import llm_correction
+
+    replacements = {}
+    monkeypatch.setattr(llm_correction, "get_backend",
+                        lambda name: llm_correction.FakeLLM(latency=0, replacements=replacements))
+    db_path = str(tmp_path / "jobs.sqlite3")
+    _add_lectures(db_path, tmp_path, 1, pdf=False)
+    runner = FlakyRunner(str(tmp_path / "output"), failures=0)
+    runner.llm = "fake"
+
+    # 長さが大きく変わった修正結果は使わない
+    replacements["の"] = "の" * 20
+    stats = worker_loop(db_path, runner, "w1", max_attempts=1, retry_delay=0, poll_seconds=0.01)
+    assert stats["failed"] == 1
+    with JobQueue(db_path) as queue:
+        job = queue.get("lecture0")
+        assert (job.stage, job.status, job.error) == ("correct", "failed", "RuntimeError: 1チャンクの修正に失敗しました")
+        queue.retry()
+
+    replacements.clear()
+    replacements["トランスフォーマー"] = "Transformer"
+    stats = worker_loop(db_path, runner, "w1", retry_delay=0, poll_seconds=0.01)
+    assert stats["failed"] == 0
+    with JobQueue(db_path) as queue:
+        job = queue.get("lecture0")
+        assert job.status == "done"
+        with open(job.outputs["correct"]["path"], encoding="utf-8") as f:
+            assert "Transformer" in f.read()
+
+
+@pytest.mark.requires_ffmpeg
+def test_worker_processes(tmp_path):
+    """ワーカープロセスで全ての講義を処理すること"""
+    db_path = str(tmp_path / "jobs.sqlite3")
+    _add_lectures(db_path, tmp_path, 3, pdf=False)
+    settings = {"output_dir": str(tmp_path / "output"), "fake_rtf": 0}
+    stats = run_workers(db_path, settings, workers=2, poll_seconds=0.01)
+    assert stats["done"] == 3 * len(STAGES)
+    with JobQueue(db_path) as queue:
+        assert queue.counts() == {"done": 3}
@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+
+from ffmpeg_utils import make_synthetic_video
+from lecture_pipeline import fake_transcriber, load_jobs, run_pipeline
+
+
+def test_load_jobs_from_manifest(tmp_path):
+    """マニフェストのパスをマニフェストの場所から解決し、同名の動画の出力が重ならないこと"""
+    for week in ["week1", "week2"]:
+        (tmp_path / week).mkdir()
+        (tmp_path / week / "lecture.mp4").write_bytes(b"")
+    manifest = tmp_path / "lectures.txt"
+    manifest.write_text("# 前期\nweek1/lecture.mp4\n\nweek2/lecture.mp4  # 第2週\n", encoding="utf-8")
+
+    jobs = load_jobs(str(manifest))
+    assert [job.name for job in jobs] == [os.path.join("week1", "lecture"), os.path.join("week2", "lecture")]
+    assert all(job.video_path.is_absolute() for job in jobs)
+
+    (tmp_path / "lectures.json").write_text(json.dumps(["week1/lecture.mp4", "missing.mp4"]))
+    with pytest.raises(FileNotFoundError):
+        load_jobs(str(tmp_path / "lectures.json"))
+
+
+@pytest.mark.requires_ffmpeg
+def test_pipeline_skips_processed_videos(tmp_path):
+    """処理済みの動画は飛ばし、内容が変わった動画と出力が消えた動画だけを処理し直すこと"""
+    video_dir = tmp_path / "video"
+    video_dir.mkdir()
+    for i in range(3):
+        make_synthetic_video(str(video_dir / f"lecture{i}.mp4"), 4, slide_seconds=4)
+    audio_dir, output_dir = str(tmp_path / "audio"), str(tmp_path / "output")
+    settings = {"transcriber": "fake"}
+
+    report = run_pipeline(load_jobs(str(video_dir)), fake_transcriber(0), audio_dir, output_dir, settings)
+    assert report["summary"]["done"] == 3
+    assert os.path.exists(report["path"])
+    with open(os.path.join(output_dir, "lecture0.txt"), encoding="utf-8") as f:
+        assert f.read().startswith("[00:00:00.000 --> 00:00:04.")
+    assert all(r["extract_seconds"] >= 0 and r["transcribe_seconds"] >= 0 for r in report["files"])
+
+    report = run_pipeline(load_jobs(str(video_dir)), fake_transcriber(0), audio_dir, output_dir, settings)
+    assert [r["status"] for r in report["files"]] == ["skipped"] * 3
+
+    make_synthetic_video(str(video_dir / "lecture1.mp4"), 5, slide_seconds=5)
+    os.remove(os.path.join(output_dir, "lecture2.txt"))
+    report = run_pipeline(load_jobs(str(video_dir)), fake_transcriber(0), audio_dir, output_dir, settings)
+    assert [r["status"] for r in report["files"]] == ["skipped", "done", "done"]
+
+    # 設定が変わった場合はすべて処理し直す
+    report = run_pipeline(load_jobs(str(video_dir)), fake_transcriber(0), audio_dir, output_dir,
+                          {"transcriber": "fake", "model": "small"})
+    assert report["summary"]["done"] == 3
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+from llm_correction import (AsyncLLMClient, Chunk, FakeLLM, TokenBucket, TransientLLMError, correct_transcripts,
+                            extract_core, plan_chunks)
+
+TRANSCRIPT = "\n".join(
+    f"{i}番目の段落です。スケール足について説明します、マジョリティーコーティングも使います。" * 3 for i in range(40))
+REPLACEMENTS = {"スケール足": "スケール則", "マジョリティーコーティング": "Majority Voting"}
+
+
+def test_chunks_overlap_and_cover_transcript():
+    """担当部分をつなげると元のテキストになり、前後の文脈が重なること"""
+    chunks = plan_chunks(TRANSCRIPT, chunk_chars=300, overlap_chars=60)
+    assert len(chunks) > 5
+    assert "".join(c.text[c.core_start:c.core_end] for c in chunks) == TRANSCRIPT
+    assert all(c.core_start > 0 for c in chunks[1:]) and all(c.core_end < len(c.text) for c in chunks[:-1])
+    assert all(c.core_end - c.core_start <= 300 for c in chunks)
+
+    # 句点のない長い行は読点で分ける
+    long_line = "、".join(["とても長い話"] * 200)
+    chunks = plan_chunks(long_line, chunk_chars=100, overlap_chars=20)
+    assert "".join(c.text[c.core_start:c.core_end] for c in chunks) == long_line
+    assert all(c.core_end - c.core_start <= 100 for c in chunks)
+
+
+def test_extract_core_follows_changed_length():
+    """修正で長さが変わっても担当部分の範囲を対応付けること"""
+    chunk = Chunk(0, "前の文です。スケール足の話。後の文です。", 6, 14)
+    assert extract_core(chunk, "前の文です。スケール則についての話。後の文です。") == "スケール則についての話。"
+
+
+def test_concurrent_correction_with_retries():
+    """一時的なエラーを再試行し、複数の書き起こしを並行に修正して元の順にまとめること"""
+    backend = FakeLLM(latency=0.01, failure_rate=0.3, replacements=REPLACEMENTS, seed=1)
+    client = AsyncLLMClient(backend, concurrency=8, max_retries=10, backoff=0.001)
+    transcripts = [TRANSCRIPT, TRANSCRIPT[:500]]
+    corrected, report = correct_transcripts(transcripts, client, chunk_chars=300, overlap_chars=60)
+
+    expected = []
+    for text in transcripts:
+        for old, new in REPLACEMENTS.items():
+            text = text.replace(old, new)
+        expected.append(text)
+    assert corrected == expected
+    assert report.failed == 0 and report.retries > 0 and report.chunks == len(report.latencies)
+    assert backend.calls == report.chunks + report.retries
+
+
+def test_failed_chunks_keep_original_text():
+    """再試行しても失敗したチャンクは元のテキストのままにすること"""
+    async def failing(prompt):
+        raise TransientLLMError("503")
+
+    client = AsyncLLMClient(failing, concurrency=4, max_retries=1, backoff=0.001)
+    corrected, report = correct_transcripts([TRANSCRIPT], client, chunk_chars=300)
+    assert corrected == [TRANSCRIPT] and report.failed == report.chunks
+
+
+def test_token_bucket_limits_rate():
+    """トークンバケットで1秒あたりの取り出し量を制限すること"""
+    async def run():
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.perf_counter()
+        await asyncio.gather(*(bucket.acquire() for _ in range(11)))
+        return time.perf_counter() - start
+
+    assert 0.18 <= asyncio.run(run()) < 0.5
@@ -0,0 +1,42 @@
+import re
+
+import numpy as np
+
+from parallel_transcribe import (SAMPLE_RATE, split_on_silence, synthetic_lecture, synthetic_loader,
+                                 transcribe_chunks)
+from transcribe_audio import write_transcript
+
+
+def test_split_on_silence_does_not_cut_utterances():
+    """チャンクの境界が発話の途中に来ず、無音だけの区間は含まれないこと"""
+    audio, utterances = synthetic_lecture(180, seed=1)
+    chunks = split_on_silence(audio, target_seconds=30, max_seconds=60)
+
+    assert len(chunks) >= 4
+    assert all(c.duration <= 60 for c in chunks)
+    for start, end in utterances:
+        assert any(c.offset <= start + 0.05 and c.offset + c.duration >= end - 0.05 for c in chunks)
+    # 先頭の無音は余白を残して除かれる
+    assert 0.2 <= chunks[0].offset <= utterances[0][0]
+
+
+def test_split_on_silence_without_speech():
+    """無音だけの音声ではチャンクを作らないこと"""
+    assert split_on_silence(np.zeros(SAMPLE_RATE * 5, dtype=np.float32)) == []
+
+
+def test_parallel_segments_use_global_timestamps(tmp_path):
+    """並列に処理したチャンクのセグメントが、音声全体の時刻で時刻順に並ぶこと"""
+    audio, utterances = synthetic_lecture(120, seed=2)
+    chunks = split_on_silence(audio, target_seconds=20, max_seconds=40)
+    segments = transcribe_chunks(audio, chunks, workers=2, loader=synthetic_loader)
+
+    assert len(segments) == len(utterances)
+    for segment, (start, end) in zip(segments, utterances):
+        assert abs(segment["start"] - start) < 0.1 and abs(segment["end"] - end) < 0.1
+
+    output = tmp_path / "transcript.txt"
+    write_transcript(segments, str(output))
+    lines = output.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == len(utterances)
+    assert re.match(r"^\[\d{2}:\d{2}:\d{2}\.\d{3} --> \d{2}:\d{2}:\d{2}\.\d{3}\] 発話", lines[0])
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+import pdf_extract
+from pdf_extract import extract_pages, extract_texts, make_sample_deck
+
+
+@pytest.fixture(scope="module")
+def deck(tmp_path_factory):
+    return make_sample_deck(str(tmp_path_factory.mktemp("pdf") / "deck.pdf"), pages=40)
+
+
+def test_parallel_extraction_matches_serial(deck):
+    """並列に抽出してもページ順と内容が1プロセスの場合と同じになること"""
+    serial = list(extract_pages(deck, tables=True, workers=1, cache_dir=None))
+    parallel = list(extract_pages(deck, tables=True, workers=2, cache_dir=None))
+
+    assert [p.number for p in serial] == list(range(1, 41))
+    assert parallel == serial
+    assert "Scaling Laws (3)" in serial[2].text
+    assert serial[2].tables == [[["r0c0-2", "r0c1-2", "r0c2-2"], ["r1c0-2", "r1c1-2", "r1c2-2"],
+                                 ["r2c0-2", "r2c1-2", "r2c2-2"]]]
+    # 表を抽出しない場合は tables が None
+    assert next(extract_pages(deck, cache_dir=None)).tables is None
+
+
+def test_cache_is_reused(deck, tmp_path, monkeypatch):
+    """2回目はPDFを開かずにキャッシュから返し、途中で止めた場合はキャッシュを作らないこと"""
+    cache_dir = str(tmp_path / "cache")
+    pages = extract_pages(deck, cache_dir=cache_dir)
+    next(pages)
+    pages.close()
+    assert not os.listdir(cache_dir)
+
+    texts = extract_texts(deck, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("キャッシュがあるのにPDFを開いた")
+
+    monkeypatch.setattr(fitz, "open", fail)
+    assert extract_texts(deck, cache_dir=cache_dir) == texts
+    assert pdf_extract.cache_path_for("x", True, cache_dir).endswith(".tables.jsonl")
@@ -0,0 +1,102 @@
+import csv
+import math
+import os
+import random
+
+from quality_metrics import (BATCH_MAX_LENGTH, TermChecker, align_segments, batch_lcs_length, batch_levenshtein,
+                             evaluate, evaluate_lines, evaluate_segments, lcs_length, levenshtein, summarize, write_csv)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "day3", "data")
+
+
+def _dp(a, b):
+    """(編集距離, LCS の長さ) を素朴なDPで求める"""
+    distance = list(range(len(b) + 1))
+    common = [0] * (len(b) + 1)
+    for i, x in enumerate(a, start=1):
+        next_distance, next_common = [i], [0]
+        for j, y in enumerate(b, start=1):
+            next_distance.append(min(distance[j] + 1, next_distance[j - 1] + 1, distance[j - 1] + (x != y)))
+            next_common.append(common[j - 1] + 1 if x == y else max(common[j], next_common[j - 1]))
+        distance, common = next_distance, next_common
+    return distance[-1], common[-1]
+
+
+def _random_pairs(count, max_length, seed=0):
+    rng = random.Random(seed)
+    return [("".join(rng.choice("あいうアB") for _ in range(rng.randint(0, max_length))),
+             "".join(rng.choice("あいうアB") for _ in range(rng.randint(0, max_length)))) for _ in range(count)]
+
+
+def test_bit_parallel_matches_dp():
+    """ビット並列の編集距離・LCS が素朴なDPと一致すること（64文字を超える場合・単語の列も）"""
+    for a, b in _random_pairs(300, 150):
+        assert (levenshtein(a, b), lcs_length(a, b)) == _dp(a, b)
+    assert levenshtein(["スケール", "則", "は"], ["スケール", "足", "は"]) == 1
+
+
+def test_batch_matches_single():
+    """まとめた計算が1組ずつの計算と一致すること（空の組・長い組を含む）"""
+    pairs = _random_pairs(600, 60, seed=1) + [("", ""), ("あ" * (BATCH_MAX_LENGTH + 10), "あい" * 300)]
+    a_texts, b_texts = [p[0] for p in pairs], [p[1] for p in pairs]
+    assert batch_levenshtein(a_texts, b_texts).tolist() == [levenshtein(a, b) for a, b in pairs]
+    assert batch_lcs_length(a_texts, b_texts).tolist() == [lcs_length(a, b) for a, b in pairs]
+
+
+def test_evaluate_with_terms_and_gold():
+    """用語辞書と正解の書き起こしを使って評価すること"""
+    checker = TermChecker.from_texts(["Majority Voting で答えを選ぶ", "Majority Voting の例"])
+    original = "えーと、マジョリティーボーティングで答えを選びます。"
+    corrected = "Majority Votingで答えを選びます。"
+    gold = "Majority Votingで答えを選びます。"
+    scores = evaluate(original, corrected, checker, gold)
+    assert scores["cer"] == 0.0 and scores["original_cer"] > 0.5
+    assert scores["accuracy"] == 1.0 and scores["original_accuracy"] == 0.0
+    assert scores["naturalness"] == 1.0 and evaluate(original, original)["naturalness"] < 0.9
+    assert 0.3 < scores["faithfulness"] < 0.6
+    assert math.isnan(evaluate(original, corrected)["accuracy"])
+
+
+def test_segment_scores_for_lecture(tmp_path):
+    """day3 の書き起こしを行ごとに対応付けて評価し、CSVに出力すること"""
+    with open(os.path.join(DATA_DIR, "LLM2024_day4_raw.txt"), encoding="utf-8") as f:
+        raw = f.read()
+    with open(os.path.join(DATA_DIR, "LLM2024_day4.txt"), encoding="utf-8") as f:
+        gold = f.read()
+    pairs = align_segments(raw, gold)
+    assert len(pairs) == len([line for line in raw.splitlines() if line.strip()])
+    assert "".join(p[1] for p in pairs).replace("\n", "") == gold.replace("\n", "")
+
+    scores = evaluate_segments([p[0] for p in pairs], [p[1] for p in pairs])
+    summary = summarize(scores)
+    whole = evaluate(raw, gold)
+    assert abs(summary["faithfulness"] - whole["faithfulness"]) < 0.02
+    assert abs(summary["cer"] - whole["cer"]) < 0.02
+
+    path = write_csv(scores, str(tmp_path / "quality.csv"))
+    with open(path, encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == len(pairs) and set(rows[0]) >= {"segment", "cer", "faithfulness", "naturalness"}
+
+
+def test_segment_term_accuracy_matches_whole_text():
+    """語句の用語を含む正解どうしを比べたとき、セグメントごとの accuracy が全体の評価と一致すること"""
+    with open(os.path.join(DATA_DIR, "LLM2024_day4.txt"), encoding="utf-8") as f:
+        gold = f.read()
+    lines = gold.splitlines()
+    checker = TermChecker.from_texts(lines)
+    scores = evaluate_segments(lines, lines, checker)
+    assert scores["terms_wrong"].sum() == 0
+    assert summarize(scores)["accuracy"] == evaluate(gold, gold, checker)["accuracy"] == 1.0
+
+
+def test_line_scores_use_gold_like_whole_text():
+    """正解を渡した行ごとの cer が、全体の評価と同じく正解との誤り率になること"""
+    with open(os.path.join(DATA_DIR, "LLM2024_day4_raw.txt"), encoding="utf-8") as f:
+        raw = f.read()
+    with open(os.path.join(DATA_DIR, "LLM2024_day4.txt"), encoding="utf-8") as f:
+        gold = f.read()
+    summary = summarize(evaluate_lines(raw, raw, gold=gold))
+    whole = evaluate(raw, raw, gold=gold)
+    assert whole["cer"] > 0.05 and abs(summary["cer"] - whole["cer"]) < 0.02
+    assert summarize(evaluate_lines(raw, raw))["cer"] == 0.0
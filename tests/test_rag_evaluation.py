@@ -0,0 +1,94 @@
+import csv
+import os
+
+from llm_correction import AsyncLLMClient
+from rag_evaluation import (COLUMNS, CallCache, FakeGenerator, FakeJudge, Item, call_cost, evaluate_rag,
+                            mean_scores, parse_judgement, read_questions, write_csv)
+from rag_index import RagIndex
+
+DAY3_CSV_PATH = os.path.join(os.path.dirname(__file__), "../day3/llm_evaluation_detailed.csv")
+RULES_PATH = os.path.join(os.path.dirname(__file__), "../day3/data/松尾・岩澤研究室 講座受講規約.txt")
+
+
+def _run(tmp_path, items, judge, cache_path, batch_size=4):
+    generator = FakeGenerator(batch_size)
+    client = AsyncLLMClient(judge, concurrency=4, backoff=0.0)
+    index = RagIndex(str(tmp_path / "index"))
+    rows, report = evaluate_rag(items, generator, client, "fake-judge", index, CallCache(cache_path),
+                                documents=[RULES_PATH], top_k=3)
+    return rows, report, generator
+
+
+def test_writes_day3_columns(tmp_path):
+    """day3 の質問をバッチで生成・並行に評価し、llm_evaluation_detailed.csv と同じ列で書き出すこと"""
+    items = read_questions(DAY3_CSV_PATH)
+    assert len(items) == 5
+    rows, report, generator = _run(tmp_path, items, FakeJudge(), str(tmp_path / "calls.jsonl"))
+    assert generator.batches == 3  # ベースラインと RAG の10件を4件ずつ
+    assert [stage.name for stage in report.stages] == ["索引", "検索", "生成", "評価"]
+    assert report.failed == 0 and all(row.baseline_answer == "わかりません。" for row in rows)
+    with open(RULES_PATH, "rb") as f:
+        rules = f.read().decode("cp932").replace("\r", "\n")
+    assert all(row.rag_answer and row.rag_answer in rules for row in rows)
+
+    means = mean_scores(rows)
+    assert means["rag_completeness"] > means["baseline_completeness"]
+
+    output = write_csv(rows, str(tmp_path / "out" / "llm_evaluation_detailed.csv"))
+    with open(output, "rb") as f, open(DAY3_CSV_PATH, "rb") as g:
+        assert f.readline() == g.readline()  # BOM・列・改行まで同じ
+    with open(output, encoding="utf-8-sig", newline="") as f:
+        records = list(csv.DictReader(f))
+    assert list(records[0]) == COLUMNS and len(records) == 5
+    assert records[0]["rag_relevance_explanation"].startswith("Relevance: ")
+
+
+def test_rerun_is_incremental(tmp_path):
+    """やり直すとキャッシュだけを使い、質問を追加すると追加分だけを生成・評価すること"""
+    items = read_questions(DAY3_CSV_PATH)[:3]
+    cache_path = str(tmp_path / "calls.jsonl")
+    _run(tmp_path, items, FakeJudge(), cache_path)
+
+    judge = FakeJudge()
+    rows, report, generator = _run(tmp_path, items, judge, cache_path)
+    stages = {stage.name: stage for stage in report.stages}
+    assert judge.calls == 0 and generator.batches == 0
+    assert stages["生成"].cached == 6 and stages["評価"].cached == 6 and report.cost == 0
+
+    # 書き込みの途中で止まった行があっても読み込めて、続けて追記できる
+    with open(cache_path, "a", encoding="utf-8") as f:
+        f.write('{"key": "abc", "te')
+    items = items + [Item("受講者は講座の権利を他人に譲渡できますか？", "譲渡することはできません。")]
+    judge = FakeJudge()
+    rows, report, generator = _run(tmp_path, items, judge, cache_path)
+    stages = {stage.name: stage for stage in report.stages}
+    assert judge.calls == 2 and stages["生成"].calls == 2 and stages["評価"].calls == 2
+    assert len(CallCache(cache_path)) == 16
+
+
+def test_judge_retries_and_malformed_responses(tmp_path):
+    """一時的なエラーは再試行し、形式の違う応答は N/A にしてキャッシュしないこと"""
+    response = "Correctness: 3（理由）\nCompleteness: 2（理由）\nRelevance: 5（理由）"
+    judgement = parse_judgement(response)
+    assert judgement.scores == (3, 2, 5) and judgement.explanations[2] == "Relevance: 5（理由）"
+    with open(DAY3_CSV_PATH, encoding="utf-8-sig", newline="") as f:
+        row = next(csv.DictReader(f))
+    day3 = parse_judgement("\n".join(row[column] for column in COLUMNS[4:7]))
+    assert day3.scores == (3, 2, 4)
+    assert parse_judgement("5点です") is None
+    assert call_cost("gpt-4o-mini", "あ" * 1000, "い" * 100) > call_cost("fake-judge", "あ" * 1000, "い" * 100) == 0
+
+    items = read_questions(DAY3_CSV_PATH)
+    rows, report, _ = _run(tmp_path, items, FakeJudge(failure_rate=0.3, seed=1), None)
+    assert report.retries > 0 and report.failed == 0
+
+    async def malformed(prompt):
+        return "よい回答です"
+
+    cache_path = str(tmp_path / "calls.jsonl")
+    rows, report, _ = _run(tmp_path, items[:1], malformed, cache_path)
+    assert report.failed == 2 and rows[0].rag is None
+    output = write_csv(rows, str(tmp_path / "out.csv"))
+    with open(output, encoding="utf-8-sig", newline="") as f:
+        assert next(csv.DictReader(f))["baseline_correctness_explanation"] == "N/A"
+    assert len(CallCache(cache_path)) == 2  # 生成の2件だけ
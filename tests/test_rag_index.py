@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+
+import rag_index
+from rag_index import RagIndex, format_references, read_document, split_chunks
+
+RULES_PATH = os.path.join(os.path.dirname(__file__), "../day3/data/松尾・岩澤研究室 講座受講規約.txt")
+
+
+def test_build_and_query_rules(tmp_path):
+    """Shift_JIS の規約を読み込んで索引を作り、保存した索引をメモリマップで読み込んで検索できること"""
+    text = read_document(RULES_PATH)
+    assert text.startswith("松尾・岩澤研究室 講座受講規約")
+    chunks = split_chunks(text, 200)
+    assert all(len(chunk) <= 200 for chunk in chunks) and len(chunks) > 20
+
+    stats = RagIndex(str(tmp_path)).add_documents([RULES_PATH])
+    assert stats == {"documents": 1, "added": 1, "reused": 0, "embedded": len(chunks), "chunks": len(chunks)}
+
+    index = RagIndex(str(tmp_path))
+    assert isinstance(index.vectors, np.memmap) and index.vectors.dtype == np.float16
+    results = index.search_many(["受講で知り得た教材・動画のURLをSNS上にシェアする行為", "譲渡の禁止"], top_k=3)
+    assert "SNS" in results[0][0].text and "譲渡" in results[1][0].text
+    assert all(a.score >= b.score for a, b in zip(results[0], results[0][1:]))
+    assert format_references(results[1][:1]) == f"* {results[1][0].text}"
+    assert index.add_documents([RULES_PATH])["reused"] == 1
+
+
+def test_incremental_add_and_replace(tmp_path):
+    """文書の追加は追記だけで行い、変わった文書の古い行は検索に出さず、多くなったら詰め直すこと"""
+    a, b = tmp_path / "a.txt", tmp_path / "b.txt"
+    a.write_text("りんごは赤い。バナナは黄色い。", encoding="utf-8")
+    b.write_text("Transformer は Attention を使う。", encoding="utf-8")
+    index_dir = str(tmp_path / "index")
+
+    assert RagIndex(index_dir).add_documents([str(a)])["embedded"] == 1
+    index = RagIndex(index_dir)
+    size = os.path.getsize(os.path.join(index_dir, "vectors.f16"))
+    assert index.add_documents([str(a), str(b)])["embedded"] == 1
+    assert os.path.getsize(os.path.join(index_dir, "vectors.f16")) == size * 2
+    assert RagIndex(index_dir).search("Attention")[0].doc == str(b)
+
+    b.write_text("Chinchilla はトークン数を増やす。" * 3, encoding="utf-8")
+    index = RagIndex(index_dir)
+    index.add_documents([str(b)])
+    index = RagIndex(index_dir)
+    assert len(index) == 2 and index.rows == 3 and index.dead_rows() == 1
+    assert all("Attention" not in hit.text for hit in index.search("Attention", top_k=5))
+    index.compact()
+    index = RagIndex(index_dir)
+    assert index.rows == 2 and index.dead_rows() == 0
+    assert index.search("Chinchilla")[0].doc == str(b)
+
+    # 埋め込みの種類が違う索引は作り直す
+    assert RagIndex(index_dir, embedder="hashing-64").add_documents([str(a)])["chunks"] == 1
+
+
+def test_rebuild_with_embedder_alias_reuses_index(tmp_path):
+    """「hashing」と指定して作り直しても、同じ指定で作った索引を使い回すこと"""
+    rules = tmp_path / "rules.txt"
+    rules.write_text("受講の権利は譲渡できない。", encoding="utf-8")
+    index_dir = str(tmp_path / "index")
+    assert RagIndex(index_dir, embedder="hashing").add_documents([str(rules)])["embedded"] == 1
+    stats = RagIndex(index_dir, embedder="hashing").add_documents([str(rules)])
+    assert stats["embedded"] == 0 and stats["reused"] == 1
+
+
+def test_blocked_top_k_matches_full_sort(tmp_path, monkeypatch):
+    """ブロックごとの argpartition の結果が、全ての内積を並べ替えた結果と一致すること"""
+    monkeypatch.setattr(rag_index, "BLOCK_ROWS", 64)
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((500, 32)).astype(np.float32)
+    index = RagIndex(str(tmp_path))
+    start, end = index._append("random", [str(i) for i in range(500)], vectors)
+    index.documents["random"] = {"sha256": None, "start": start, "end": end}
+    index._write_manifest()
+    index = RagIndex(str(tmp_path))
+
+    queries = rng.standard_normal((7, 32)).astype(np.float32)
+    rows, scores = index.search_vectors(queries, top_k=10)
+    dense = np.asarray(index.vectors, dtype=np.float32)
+    expected = np.argsort(-(queries @ dense.T), axis=1, kind="stable")[:, :10]
+    np.testing.assert_array_equal(rows, expected)
+    assert rows.shape == scores.shape == (7, 10)
@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pytest
+
+from slide_detection import FRAME_HEIGHT, FRAME_WIDTH, asset_bytes, dhash, frame_distance, preprocess_video
+from ffmpeg_utils import make_synthetic_video
+
+
+def test_small_change_keeps_hash_close():
+    """画面の一部だけが変わった場合は距離が小さく、別の画面では大きくなること"""
+    rng = np.random.default_rng(0)
+    slide = np.full((FRAME_HEIGHT, FRAME_WIDTH), 230, dtype=np.uint8)
+    slide[10:20, 5:60] = 20
+    with_cursor = slide.copy()
+    with_cursor[-8:, -8:] = rng.integers(0, 255, (8, 8), dtype=np.uint8)
+    other = np.full((FRAME_HEIGHT, FRAME_WIDTH), 180, dtype=np.uint8)
+    other[40:55, 20:70] = 20
+
+    bits, diff = frame_distance(slide, with_cursor, dhash(slide), dhash(with_cursor))
+    assert bits < 12 and diff < 0.06
+    bits, diff = frame_distance(slide, other, dhash(slide), dhash(other))
+    assert bits >= 12 or diff >= 0.06
+
+
+@pytest.mark.requires_ffmpeg
+def test_preprocess_detects_slides_and_reduces_bytes(tmp_path):
+    """講師の小窓が動き続けても、スライドの切り替わりだけを検出し送信量が減ること"""
+    video = make_synthetic_video(str(tmp_path / "lecture.mp4"), 60, slide_seconds=15, presenter=True)
+    assets = preprocess_video(video, str(tmp_path / "slides"))
+
+    assert [round(a.start) for a in assets] == [0, 15, 30, 45]
+    assert round(assets[-1].end) == 60
+    assert all(os.path.exists(a.image_path) and os.path.exists(a.audio_path) for a in assets)
+    assert os.path.exists(tmp_path / "slides" / "slides.json")
+    assert asset_bytes(assets) < os.path.getsize(video) / 2
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from slide_retrieval import BM25, SlideIndex, Slide, build_correction_prompts, build_prompt, tokenize
+
+PAGES = [
+    "スケール則\n計算量 C = 6ND とロスの関係",
+    "Chinchilla の最適なトークン数とパラメータ数",
+    "Majority Voting による推論時の計算量の増加",
+    "講義のまとめと次回の予定",
+]
+
+
+def test_bm25_and_hybrid_search(tmp_path):
+    """BM25 と埋め込みの順位を合わせて関係の深いページを返すこと"""
+    assert tokenize("スケール則 Chinchilla") == ["chinchilla", "スケ", "ケー", "ール", "ル則"]
+    bm25 = BM25([tokenize(page) for page in PAGES])
+    assert int(np.argmax(bm25.scores(tokenize("chinchilla")))) == 1
+
+    deck = tmp_path / "deck.txt"
+    deck.write_text("\n\n".join(PAGES), encoding="utf-8")
+    index = SlideIndex(str(tmp_path / "index"))
+    index.update([str(deck)])
+    assert index.search("マジョリティーボーティング Majority Voting をする", top_k=1)[0].slide.number == 3
+    results = index.search_many(["スケール則について", "次回の予定"], top_k=2)
+    assert [r[0].slide.number for r in results] == [1, 4]
+    assert len(results[0]) == 2
+
+
+def test_incremental_update_when_pdf_changes(tmp_path, monkeypatch):
+    """PDFが変わった場合は変わったページだけを埋め込み直し、ベクトルはメモリマップで読み込むこと"""
+    fitz = pytest.importorskip("fitz")
+    monkeypatch.chdir(tmp_path)  # PDFの抽出結果のキャッシュも一時ディレクトリに作る
+
+    def make_pdf(texts):
+        doc = fitz.open()
+        for text in texts:
+            doc.new_page().insert_text((72, 72), text)
+        doc.save("deck.pdf")
+
+    texts = ["Scaling Laws", "Chinchilla optimal", "Majority Voting", "Summary"]
+    make_pdf(texts)
+    stats = SlideIndex("index").update(["deck.pdf"])
+    assert stats == {"pages": 4, "extracted": 1, "embedded": 4, "reused": 0}
+
+    index = SlideIndex("index")
+    assert len(index) == 4 and isinstance(index.vectors, np.memmap)
+    assert index.update(["deck.pdf"]) == {"pages": 4, "extracted": 0, "embedded": 0, "reused": 4}
+
+    texts[2] = "Majority Voting and Best-of-N"
+    make_pdf(texts + ["Appendix"])
+    before = np.array(index.vectors[0])
+    stats = SlideIndex("index").update(["deck.pdf"])
+    assert stats == {"pages": 5, "extracted": 1, "embedded": 2, "reused": 3}
+    index = SlideIndex("index")
+    np.testing.assert_array_equal(index.vectors[0], before)
+    assert index.search("best of n", top_k=1)[0].slide == Slide("deck.pdf", 3, index.slides[2].text)
+
+    # 埋め込みの種類が違う索引は作り直す
+    assert SlideIndex("index", embedder="hashing-64").update(["deck.pdf"])["embedded"] == 5
+
+
+def test_index_built_with_embedder_alias_is_reused(tmp_path):
+    """「hashing」と指定して作った索引を、同じ指定で検索・更新するときに作り直さないこと"""
+    deck = tmp_path / "deck.txt"
+    deck.write_text("\n\n".join(PAGES), encoding="utf-8")
+    index_dir = str(tmp_path / "index")
+    assert SlideIndex(index_dir, embedder="hashing").update([str(deck)])["embedded"] == 4
+
+    index = SlideIndex(index_dir, embedder="hashing")
+    assert len(index) == 4
+    assert index.search("Chinchilla", top_k=1)[0].slide.number == 2
+    assert index.update([str(deck)])["embedded"] == 0
+
+
+def test_prompts_are_bounded(tmp_path):
+    """プロンプトが文字数の上限を超えず、書き起こしのチャンクは削らないこと"""
+    long_page = Slide("deck.pdf", 1, "スケール則 " * 500)
+    prompt = build_prompt("スケール則の話です", [long_page, Slide("deck.pdf", 2, "まとめ")], max_chars=800)
+    assert len(prompt) <= 800 and "スケール則の話です" in prompt and "deck.pdf p.1" in prompt
+
+    deck = tmp_path / "deck.txt"
+    deck.write_text("\n\n".join(PAGES * 20), encoding="utf-8")
+    index = SlideIndex(str(tmp_path / "index"))
+    index.update([str(deck)])
+    transcript = "\n".join(f"{i}番目の文です。スケール則と計算量の話をします。" for i in range(200))
+    prompts = build_correction_prompts(transcript, index, top_k=3, max_chars=1000, chunk_chars=300)
+    assert len(prompts) > 1
+    assert "\n".join(p.chunk for p in prompts) == transcript
+    assert all(len(p.prompt) <= 1000 and len(p.slides) == 3 for p in prompts)
+
+
+def test_queries_use_query_embedding(tmp_path, monkeypatch):
+    """検索のクエリはページとは別に embedder.queries で埋め込むこと（クエリ用のプロンプトを持つモデルのため）"""
+    import slide_retrieval
+    from embeddings import HashingEmbedder
+
+    class RecordingEmbedder(HashingEmbedder):
+        def __init__(self):
+            super().__init__(64)
+            self.query_calls = []
+
+        def queries(self, texts):
+            self.query_calls.append(list(texts))
+            return super().queries(texts)
+
+    embedder = RecordingEmbedder()
+    monkeypatch.setattr(slide_retrieval, "get_embedder", lambda name=None: embedder)
+    deck = tmp_path / "deck.txt"
+    deck.write_text("\n\n".join(PAGES), encoding="utf-8")
+    index = SlideIndex(str(tmp_path / "index"))
+    index.update([str(deck)])
+    assert embedder.query_calls == []
+
+    results = index.search_many(["Chinchilla", "まとめ"], top_k=1)
+    assert embedder.query_calls == [["Chinchilla", "まとめ"]]
+    assert results[0][0].slide.number == 2
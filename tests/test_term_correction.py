@@ -0,0 +1,57 @@
+from term_correction import (BKTree, TermCorrector, TermDictionary, correct_with_pairwise, edit_distance,
+                             katakana_key, katakana_to_romaji, latin_key)
+
+REFERENCE = [
+    "Inference Time Scaling: Majority Voting, Best of N, Process Reward Model",
+    "Grokking と Cosine スケジュール",
+    "CerebrasGPT, Llama, FFN, パラメータ数",
+]
+
+
+def test_readings_of_katakana_and_latin_terms_are_close():
+    """カタカナの読みと英字の綴りから、近い読みのキーを作ること"""
+    assert katakana_to_romaji("マジョリティーコーティング") == "majoritiikootingu"
+    assert katakana_to_romaji("ティッカー") == "tikkaa"
+    for katakana, latin in [("コサイン", "Cosine"), ("ロッキング", "Grokking"),
+                            ("マジョリティーコーティング", "Majority Voting"), ("リワードモデル", "Reward Model")]:
+        assert edit_distance(katakana_key(katakana), latin_key(latin)) <= 2
+
+
+def test_bk_tree_matches_linear_search():
+    """BK-tree の検索結果が全件との比較と一致すること"""
+    words = ["kosin", "groking", "majoritiboting", "rewadmoder", "rama", "parameta", "fn", "serebrasgpt"]
+    tree = BKTree(words)
+    for query in ["kosain", "roking", "rama", "paramet", "xyz"]:
+        for limit in range(4):
+            expected = sorted((edit_distance(query, w), w) for w in words if edit_distance(query, w) <= limit)
+            assert tree.search(query, limit) == expected
+
+
+def test_corrects_misrecognized_terms_from_reference():
+    """資料の用語に誤認識の語を置き換え、資料にある語や短い語は変えないこと"""
+    corrector = TermCorrector.from_texts(REFERENCE)
+    text = "マジョリティーコーティングやロッキング、コサインを使う。パラメータ数は同じ。ママも来た。Grokkingです"
+    corrected, corrections = corrector.correct(text)
+
+    assert corrected == "Majority VotingやGrokking、Cosineを使う。パラメータ数は同じ。ママも来た。Grokkingです"
+    assert [c.original for c in corrections] == ["マジョリティーコーティング", "ロッキング", "コサイン"]
+    # 総当たりで比べた場合と同じ結果になる
+    assert correct_with_pairwise(text, corrector.dictionary) == corrections
+
+
+def test_latin_words_only_get_case_and_spacing_fixes():
+    """英字の語は大文字・小文字と空白の違いだけを直すこと"""
+    dictionary = TermDictionary.from_texts(["MBR Decoding", "FLOPS"])
+    corrected, _ = TermCorrector(dictionary).correct("MBRDecoding と FLOP と flops")
+    assert corrected == "MBR Decoding と FLOP と FLOPS"
+
+
+def test_does_not_truncate_or_rewrite_words_into_other_terms():
+    """語の一部を消す短い用語や、音の違う別の用語には置き換えず、カタカナに続く英字は語句の用語にまとめること"""
+    corrector = TermCorrector.from_texts(REFERENCE + ["Backward Pass", "Optimal Transport"])
+    text = "ベストオブNを使う。バックヤードで、ブロッキングとオプティカルを見る"
+    corrected, corrections = corrector.correct(text)
+
+    assert corrected == "Best of Nを使う。バックヤードで、ブロッキングとオプティカルを見る"
+    assert [(c.original, c.replacement) for c in corrections] == [("ベストオブN", "Best of N")]
+    assert correct_with_pairwise(text, corrector.dictionary) == corrections
@@ -0,0 +1,75 @@
+import difflib
+import json
+import os
+import random
+
+from text_diff import diff_stats, diff_texts, myers_diff, write_diff
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "day3", "data")
+
+
+def _apply(a, b, spans):
+    """差分の区間が両方のテキストを隙間なく覆い、一致区間が本当に一致していることを確かめて b を組み立てる"""
+    out, pa, pb = [], 0, 0
+    for tag, a0, a1, b0, b1 in spans:
+        assert (a0, b0) == (pa, pb)
+        if tag == "equal":
+            assert a[a0:a1] == b[b0:b1]
+        out.append(b[b0:b1])
+        pa, pb = a1, b1
+    assert (pa, pb) == (len(a), len(b))
+    return "".join(out)
+
+
+def _lcs_length(a, b):
+    previous = [0] * (len(b) + 1)
+    for x in a:
+        current = [0]
+        for j, y in enumerate(b):
+            current.append(previous[j] + 1 if x == y else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+
+def test_myers_diff_is_minimal():
+    """Myers の差分が最長共通部分列と同じ数の文字を一致させること"""
+    rng = random.Random(0)
+    for _ in range(500):
+        a = "".join(rng.choice("あいう") for _ in range(rng.randint(0, 40)))
+        b = "".join(rng.choice("あいう") for _ in range(rng.randint(0, 40)))
+        spans = myers_diff(a, b)
+        assert _apply(a, b, spans) == b
+        assert diff_stats(spans)["equal"] == _lcs_length(a, b)
+
+
+def test_diff_texts_on_lecture_pair(tmp_path):
+    """day3 の書き起こしの差分が修正後のテキストを再現し、difflib 以上の文字を一致させること"""
+    with open(os.path.join(DATA_DIR, "LLM2024_day4_raw.txt"), encoding="utf-8") as f:
+        raw = f.read()
+    with open(os.path.join(DATA_DIR, "LLM2024_day4.txt"), encoding="utf-8") as f:
+        corrected = f.read()
+    spans = diff_texts(raw, corrected)
+    assert _apply(raw, corrected, spans) == corrected
+
+    a, b = raw[:3000], corrected[:3000]
+    expected = sum(size for _, _, size in difflib.SequenceMatcher(None, a, b, autojunk=False).get_matching_blocks())
+    assert diff_stats(diff_texts(a, b))["equal"] >= expected
+
+    # 同じ文が何度も現れるテキストでも対応付けられる
+    spans = diff_texts(raw[:5000] * 3, corrected[:5000] * 3)
+    assert diff_stats(spans)["ratio"] > 0.85
+
+
+def test_html_and_json_output(tmp_path):
+    """修正箇所をHTMLとJSONで出力すること"""
+    a, b = "スケール足について<説明>します。\n", "スケール則について<説明>します。\n"
+    html_path = write_diff(a, b, str(tmp_path / "diff.html"))
+    with open(html_path, encoding="utf-8") as f:
+        page = f.read()
+    assert "<del>足</del><ins>則</ins>" in page and "&lt;説明&gt;" in page
+
+    json_path = write_diff(a, b, str(tmp_path / "diff.json"))
+    with open(json_path, encoding="utf-8") as f:
+        data = json.load(f)
+    assert data["edits"] == [{"tag": "replace", "a": [4, 5], "b": [4, 5], "before": "足", "after": "則"}]
+    assert data["stats"]["edits"] == 1
@@ -0,0 +1,77 @@
+import os
+import random
+
+from filler_removal import FillerRemover
+from llm_correction import split_sentences
+from text_segmenter import Segmenter, group_paragraphs, iter_paragraphs, segment_stream, segment_text
+
+RAW_TRANSCRIPT_PATH = os.path.join(os.path.dirname(__file__), "../day3/data/LLM2024_day4_raw.txt")
+
+TRANSCRIPT = (
+    "[00:00:01.000 --> 00:00:03.500] 彼は「そうです。わかりました。」と言った。次です！？本当\n"
+    "\n"
+    "---\n"
+    "スケール則、計算量の話。\n"
+)
+
+
+def test_sentences_and_paragraphs():
+    """括弧の中の句点では区切らず、タイムスタンプは文に付け、空行と区切り線で段落を分けること"""
+    units = segment_text(TRANSCRIPT, line_paragraphs=False)
+    assert [u.text for u in units] == ["彼は「そうです。わかりました。」と言った。", "次です！？", "本当",
+                                       "スケール則、計算量の話。"]
+    assert [u.paragraph for u in units] == [0, 0, 0, 1]
+    assert units[0].timestamp == (1.0, 3.5) and units[3].timestamp is None
+    assert all(TRANSCRIPT[u.start:u.end] == u.text for u in units)
+
+    # 句点のない長い文は読点の位置で分ける
+    units = segment_text("あいうえお、" * 50, max_chars=40)
+    assert all(len(u.text) <= 40 for u in units) and all(u.text.endswith("、") for u in units)
+    assert "".join(u.text for u in units) == "あいうえお、" * 50
+    units = segment_text("あいうえお、" * 50 + "おわり。", max_chars=40)
+    assert all(len(u.text) <= 40 for u in units) and units[-1].text.endswith("おわり。")
+
+
+def test_streaming_matches_whole_text():
+    """どこで区切って渡しても全体を一度に渡した場合と同じ結果になり、使うメモリが増えないこと"""
+    with open(RAW_TRANSCRIPT_PATH, encoding="utf-8") as f:
+        text = f.read()
+    expected = segment_text(text)
+    assert len(expected) > 100
+
+    rng = random.Random(0)
+    blocks, position = [], 0
+    while position < len(text):
+        size = rng.randint(1, 500)
+        blocks.append(text[position:position + size])
+        position += size
+    assert list(segment_stream(blocks)) == expected
+    for block_size in (1, 3, 4096):
+        assert list(segment_stream(text[i:i + block_size] for i in range(0, len(text), block_size))) == expected
+
+    segmenter = Segmenter(max_chars=200)
+    longest = 0
+    repeated = text * 5
+    for i in range(0, len(repeated), 1000):
+        segmenter.feed(repeated[i:i + 1000])
+        longest = max(longest, len(segmenter.buffer))
+    assert longest < 1000 + 200 + 64
+
+    # 1行を1段落とすると、段落は元の行（前後の空白を除く）と一致する
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    assert list(iter_paragraphs(expected)) == lines
+
+
+def test_used_by_filler_removal_and_chunking(tmp_path):
+    """フィラー除去ではタイムスタンプを本文から外して付け直し、区切り線を除き、チャンク分割ではつなげると元に戻ること"""
+    path = tmp_path / "transcript.txt"
+    path.write_text(TRANSCRIPT, encoding="utf-8")
+    output = tmp_path / "cleaned.txt"
+    assert FillerRemover().remove_file(str(path), str(output)) == 2
+    cleaned = output.read_text(encoding="utf-8")
+    assert cleaned.startswith("[00:00:01.000 --> 00:00:03.500] 彼は") and "---" not in cleaned
+
+    pieces = split_sentences(TRANSCRIPT, max_chars=800)
+    assert "".join(pieces) == TRANSCRIPT
+    assert pieces[1] == "次です！？"
+    assert len([p for p in group_paragraphs(segment_text(TRANSCRIPT))]) == 2
@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+
+from parallel_transcribe import SyntheticModel
+from transcribe_audio import make_sample_audio, transcribe_to_file
+from transcript_store import read_range, read_transcript
+from whisper_model import WhisperModelHolder
+
+
+pytestmark = pytest.mark.requires_ffmpeg
+
+
+class RecordingModel(SyntheticModel):
+    """呼び出しを記録し、fail_at 回目の呼び出しで失敗する代替モデル"""
+
+    def __init__(self, fail_at=None):
+        super().__init__(work=1)
+        self.fail_at = fail_at
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        self.calls.append(options.get("initial_prompt"))
+        if len(self.calls) == self.fail_at:
+            raise RuntimeError("途中で停止")
+        return super().transcribe(audio, **options)
+
+
+def _holder(model):
+    return WhisperModelHolder("tiny", "cpu", loader=lambda name, device: model)
+
+
+def test_resume_after_crash_matches_full_run(tmp_path):
+    """途中で止まってもチェックポイントから再開し、止まらなかった場合と同じ結果になること"""
+    audio_path = make_sample_audio(str(tmp_path / "lecture.wav"), seconds=150)
+    expected_path = str(tmp_path / "expected.txt")
+    full = RecordingModel()
+    transcribe_to_file(audio_path, expected_path, _holder(full), chunk_seconds=20)
+    assert len(full.calls) >= 5
+    assert not os.path.exists(expected_path + ".checkpoint.json")
+
+    output_path = str(tmp_path / "output.txt")
+    crashed = RecordingModel(fail_at=4)
+    with pytest.raises(RuntimeError):
+        transcribe_to_file(audio_path, output_path, _holder(crashed), chunk_seconds=20)
+    with open(output_path + ".checkpoint.json", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    assert checkpoint["chunk"] == 3 and checkpoint["tail"]
+    # 書き終えた分はすでにファイルにある
+    with open(output_path, encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == checkpoint["segments"]
+
+    resumed = RecordingModel()
+    count = transcribe_to_file(audio_path, output_path, _holder(resumed), chunk_seconds=20)
+    # 処理済みのチャンクは文字起こしし直さず、前の文脈を引き継ぐ
+    assert len(resumed.calls) == len(full.calls) - 3
+    assert resumed.calls[0] == checkpoint["tail"]
+    with open(output_path, encoding="utf-8") as f, open(expected_path, encoding="utf-8") as g:
+        assert f.read() == g.read()
+    assert count == len(open(expected_path, encoding="utf-8").read().splitlines())
+    assert not os.path.exists(output_path + ".checkpoint.json")
+
+    # テキストと同じセグメントがストアにも書かれ、索引が作られる
+    store = read_transcript(str(tmp_path / "output.jsonl"))
+    assert len(store) == count and store.sources[0] == "lecture.wav"
+    assert read_range(str(tmp_path / "output.jsonl"), 0, 30) == store.between(0, 30)
+
+
+def test_checkpoint_ignored_when_settings_change(tmp_path):
+    """設定が変わった場合はチェックポイントを使わず最初から処理すること"""
+    audio_path = make_sample_audio(str(tmp_path / "lecture.wav"), seconds=90)
+    output_path = str(tmp_path / "output.txt")
+    with pytest.raises(RuntimeError):
+        transcribe_to_file(audio_path, output_path, _holder(RecordingModel(fail_at=2)), chunk_seconds=20)
+
+    model = RecordingModel()
+    transcribe_to_file(audio_path, output_path, _holder(model), chunk_seconds=30)
+    assert model.calls[0] is None
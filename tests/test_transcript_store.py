@@ -0,0 +1,79 @@
+import math
+import os
+import random
+
+from transcript_store import Segment, TranscriptStore, read_range, read_transcript
+
+REPO_ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+def _random_segments(count, seed=0):
+    rng = random.Random(seed)
+    segments, t = [], 0.0
+    for i in range(count):
+        start = t + rng.uniform(-1.0, 1.0)  # 前のセグメントと重なることもある
+        end = start + rng.uniform(0.0, 8.0)
+        segments.append(Segment(max(0.0, start), end, f"発話{i}", speaker=f"S{i % 2}", confidence=0.9))
+        t = end
+    rng.shuffle(segments)
+    return segments
+
+
+def test_between_matches_linear_scan():
+    """区間の検索結果が全件を調べた場合と一致すること"""
+    segments = _random_segments(500)
+    store = TranscriptStore(segments)
+    rng = random.Random(1)
+    for _ in range(200):
+        start = rng.uniform(-10, store.duration + 10)
+        end = start + rng.uniform(0.1, 60)
+        expected = sorted((s for s in segments if s.start < end and s.end > start), key=lambda s: s.start)
+        assert [s.text for s in store.between(start, end)] == [s.text for s in expected]
+    found = store.at(100.0)
+    assert found.start <= 100.0 < found.end
+
+
+def test_read_existing_text_formats(tmp_path):
+    """タイムコード付き、段落ごと、スライドごとのテキストを読み込めること"""
+    timestamped = read_transcript(os.path.join(REPO_ROOT, "data", "output", "python_basic_guidance.txt"))
+    assert len(timestamped) == 132
+    assert timestamped[0].start == 0.0 and timestamped[0].end == 7.72
+    assert [s.start for s in timestamped.between(60, 70)] == [57.44, 67.36]
+
+    plain = read_transcript(os.path.join(REPO_ROOT, "day3", "data", "LLM2024_day4.txt"))
+    assert len(plain) > 100 and math.isnan(plain[0].start)
+    assert plain.between(0, 1e9) == []
+    assert plain.search("スケール則")[0].text.startswith("早速内容ですけど")
+
+    path = tmp_path / "slides.txt"
+    path.write_text("前置き\n\n[スライド1 - 00:00:00]\n表紙\n\n[スライド2 - 00:01:30]\n目次\n", encoding="utf-8")
+    slides = read_transcript(str(path))
+    assert [(s.start, s.end, s.text) for s in slides] == [(0.0, 90.0, "表紙"), (90.0, 90.0, "目次")]
+
+
+def test_search_text():
+    """本文の検索でセグメントを重複なく返すこと"""
+    store = TranscriptStore([Segment(0, 1, "スケール則とは"), Segment(1, 2, "計算量"), Segment(2, 3, "則則")])
+    assert [s.start for s in store.search("則")] == [0, 2]
+    assert [s.start for s in store.search(r"計算.", regex=True)] == [1]
+    assert store.search("存在しない") == []
+
+
+def test_read_range_from_jsonl(tmp_path):
+    """保存したJSONLから索引を使って区間のセグメントだけを読み込むこと"""
+    store = TranscriptStore(_random_segments(300, seed=2) + [Segment(math.nan, math.nan, "時刻なし")])
+    path = str(tmp_path / "lecture.jsonl")
+    store.save(path)
+    assert os.path.exists(path + ".idx.npy")
+
+    for start, end in [(0, 30), (100, 250), (store.duration - 5, store.duration + 5), (-10, -1)]:
+        assert read_range(path, start, end) == store.between(start, end)
+
+    loaded = read_transcript(path)
+    assert len(loaded) == len(store) and loaded[0] == store[0]
+    assert math.isnan(loaded[len(loaded) - 1].start)
+
+    # ストアを書き換えると索引を作り直す
+    TranscriptStore([Segment(5, 6, "新しい")]).save(path)
+    os.remove(path + ".idx.npy")
+    assert [s.text for s in read_range(path, 0, 10)] == ["新しい"]
@@ -0,0 +1,125 @@
+import hashlib
+import os
+
+import pytest
+
+from video_upload import (
+    CHUNK_GRANULARITY,
+    LocalUploadStandIn,
+    ResumableUploader,
+    UploadError,
+    measure_peak_memory,
+)
+
+
+@pytest.fixture
+def video_file(tmp_path):
+    """テスト用の動画ファイル（中身はランダムなバイト列）"""
+    path = tmp_path / "lecture.mp4"
+    path.write_bytes(os.urandom(10 * CHUNK_GRANULARITY + 123))
+    return path
+
+
+def test_upload_sends_whole_file_in_chunks(video_file):
+    """ファイル全体が分割して送信され、内容が一致することを確認"""
+    stand_in = LocalUploadStandIn()
+    progress = []
+    uploader = ResumableUploader(
+        "test",
+        transport=stand_in,
+        chunk_size=4 * CHUNK_GRANULARITY,
+        progress=lambda sent, total: progress.append(sent),
+    )
+    uploaded = uploader.upload(str(video_file), "video/mp4")
+
+    assert uploaded["sha256Hash"] == hashlib.sha256(video_file.read_bytes()).hexdigest()
+    assert uploaded["displayName"] == "lecture.mp4"
+    assert stand_in.chunks_received == 3
+    assert stand_in.max_chunk_bytes == 4 * CHUNK_GRANULARITY
+    assert progress[-1] == video_file.stat().st_size
+
+
+def test_upload_resumes_after_connection_error(video_file):
+    """通信エラーの後、受信済みの位置から再開することを確認"""
+    stand_in = LocalUploadStandIn(fail_after_chunks=2)
+    uploader = ResumableUploader(
+        "test", transport=stand_in, chunk_size=2 * CHUNK_GRANULARITY, retry_wait=0
+    )
+    uploaded = uploader.upload(str(video_file), "video/mp4")
+
+    assert uploaded["sha256Hash"] == hashlib.sha256(video_file.read_bytes()).hexdigest()
+    assert stand_in.chunks_received == 6
+
+
+def test_upload_fails_when_file_shrinks(video_file):
+    """アップロード中にファイルが短くなった場合、空のチャンクを送り続けずにエラーにすることを確認"""
+    stand_in = LocalUploadStandIn()
+
+    def truncate(sent, total):
+        with open(video_file, "r+b") as f:
+            f.truncate(sent)
+
+    uploader = ResumableUploader("test", transport=stand_in, chunk_size=2 * CHUNK_GRANULARITY, progress=truncate)
+    with pytest.raises(UploadError, match="ファイルが変更されました"):
+        uploader.upload(str(video_file), "video/mp4")
+    assert stand_in.chunks_received == 1
+
+
+def test_peak_memory_does_not_scale_with_file_size(tmp_path):
+    """アップロード中のメモリ使用量がファイルサイズに比例しないことを確認"""
+    chunk_size = 4 * CHUNK_GRANULARITY
+    peaks = []
+    for size_mb in (4, 16):
+        path = tmp_path / f"video_{size_mb}.mp4"
+        path.write_bytes(b"\0" * (size_mb * 1024 * 1024))
+        uploader = ResumableUploader("test", transport=LocalUploadStandIn(), chunk_size=chunk_size)
+        _, peak, _ = measure_peak_memory(lambda: uploader.upload(str(path), "video/mp4"))
+        peaks.append(peak)
+
+    assert all(peak < 2 * chunk_size for peak in peaks)
+
+
+def test_chunk_size_must_match_granularity():
+    """分割サイズが256KiBの倍数でない場合はエラーになることを確認"""
+    with pytest.raises(ValueError):
+        ResumableUploader("test", chunk_size=CHUNK_GRANULARITY + 1)
+
+
+@pytest.mark.parametrize("status", [503, 429])
+def test_upload_resumes_after_transient_status(video_file, status):
+    """サーバーの一時的なエラー（5xx・429）の後も、受信済みの位置から再開することを確認"""
+    stand_in = LocalUploadStandIn(fail_after_chunks=2, fail_status=status)
+    uploader = ResumableUploader(
+        "test", transport=stand_in, chunk_size=2 * CHUNK_GRANULARITY, retry_wait=0
+    )
+    uploaded = uploader.upload(str(video_file), "video/mp4")
+
+    assert uploaded["sha256Hash"] == hashlib.sha256(video_file.read_bytes()).hexdigest()
+    assert stand_in.chunks_received == 6
+
+
+def test_upload_retries_failed_offset_query(video_file):
+    """再開位置の問い合わせが失敗しても再試行し、回数の上限を超えたら UploadError にすることを確認"""
+    stand_in = LocalUploadStandIn(fail_after_chunks=2, fail_queries=2)
+    uploader = ResumableUploader(
+        "test", transport=stand_in, chunk_size=2 * CHUNK_GRANULARITY, retry_wait=0
+    )
+    uploaded = uploader.upload(str(video_file), "video/mp4")
+    assert uploaded["sha256Hash"] == hashlib.sha256(video_file.read_bytes()).hexdigest()
+
+    stand_in = LocalUploadStandIn(fail_after_chunks=2, fail_queries=10)
+    uploader = ResumableUploader(
+        "test", transport=stand_in, chunk_size=2 * CHUNK_GRANULARITY, max_retries=3, retry_wait=0
+    )
+    with pytest.raises(UploadError, match="再開できませんでした"):
+        uploader.upload(str(video_file), "video/mp4")
+
+
+def test_upload_retries_rejected_start(video_file):
+    """アップロードの開始が一時的なエラーで拒否されても、再試行してアップロードすることを確認"""
+    stand_in = LocalUploadStandIn(fail_starts=1)
+    uploader = ResumableUploader("test", transport=stand_in, chunk_size=4 * CHUNK_GRANULARITY, retry_wait=0)
+    uploaded = uploader.upload(str(video_file), "video/mp4")
+
+    assert uploaded["sha256Hash"] == hashlib.sha256(video_file.read_bytes()).hexdigest()
+    assert len(stand_in.sessions) == 1
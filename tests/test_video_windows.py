@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+from analysis_cache import AnalysisCache
+from ffmpeg_utils import cut_clip, make_synthetic_video, probe_media, run_ffmpeg
+from video_windows import Window, analyze_in_windows, format_sections, merge_window_results, plan_windows
+
+
+def test_plan_windows_overlap():
+    """時間窓が指定した長さだけ重なり、動画の最後まで覆うこと"""
+    windows = plan_windows(1300, 600, 30)
+    assert [(w.start, w.end) for w in windows] == [(0, 600), (570, 1170), (1140, 1300)]
+
+
+def test_plan_windows_rejects_invalid_overlap():
+    """重なりが窓の長さ以上の場合はエラーになること"""
+    with pytest.raises(ValueError):
+        plan_windows(100, 30, 30)
+
+
+def test_merge_window_results_shifts_and_deduplicates():
+    """各窓の時刻を全体の時刻に補正し、重なり部分の同じスライドを1つにまとめること"""
+    first = (
+        "[スライド1 - 00:00:00]\nスライドの内容：\n* はじめに\n\n説明：講義の概要です。\n---\n"
+        "[スライド2 - 00:09:40]\nスライドの内容：\n* 変数と型\n\n説明：変数の説明です。"
+    )
+    second = (
+        "[スライド1 - 00:00:05]\nスライドの内容：\n* 変数と型\n\n説明：変数の説明の続きです。\n---\n"
+        "[スライド2 - 00:03:00]\nスライドの内容：\n* 関数\n\n説明：関数の説明です。"
+    )
+    sections = merge_window_results([
+        (Window(1, 570, 1170), second),
+        (Window(0, 0, 600), first),
+    ])
+    assert [s.timestamp for s in sections] == [0, 580, 750]
+
+    text = format_sections(sections, separator="\n---\n")
+    assert "[スライド2 - 00:09:40]" in text
+    assert "[スライド3 - 00:12:30]" in text
+    assert text.count("変数と型") == 1
+
+
+def _frame(path, seconds):
+    return run_ffmpeg(["-ss", str(seconds), "-i", path, "-frames:v", "1", "-vf", "scale=8:8",
+                       "-pix_fmt", "gray", "-f", "rawvideo", "-"], capture_stdout=True)
+
+
+@pytest.mark.requires_ffmpeg
+def test_cut_clip_starts_at_window_start(tmp_path):
+    """キーフレームの間から切り出しても、クリップが指定した開始位置からちょうど始まること"""
+    video = make_synthetic_video(str(tmp_path / "lecture.mp4"), 60, slide_seconds=20)
+    clip = cut_clip(video, str(tmp_path / "clip.mp4"), 37, 10)
+    assert abs(probe_media(clip)["duration"] - 10) < 0.2
+    # 元の動画の40秒でスライドが切り替わるので、クリップでは3秒の位置で切り替わる（再エンコードの誤差は許す）
+    def same(a, b):
+        return max(abs(x - y) for x, y in zip(a, b)) <= 8
+
+    assert same(_frame(clip, 0), _frame(video, 39.5)) and same(_frame(clip, 2.5), _frame(video, 39.5))
+    assert same(_frame(clip, 3.5), _frame(video, 40.5)) and not same(_frame(clip, 3.5), _frame(clip, 2.5))
+    assert open(clip, "rb").read() == open(cut_clip(video, str(tmp_path / "again.mp4"), 37, 10), "rb").read()
+
+
+@pytest.mark.requires_ffmpeg
+def test_failed_window_is_not_cached(tmp_path):
+    """解析に失敗した（例外を含む）時間窓があれば結果をまとめずキャッシュにも残さず、次回は失敗した窓だけをやり直すこと"""
+    video = make_synthetic_video(str(tmp_path / "lecture.mp4"), 30, slide_seconds=10)
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    calls = []
+
+    def analyze_window(clip_path, fail=True):
+        calls.append(clip_path)
+        if fail and os.path.basename(clip_path).startswith("window_001"):
+            return None
+        if fail and os.path.basename(clip_path).startswith("window_002"):
+            raise RuntimeError("APIエラー")  # generate_analysis のように例外を送出する窓
+        return "[スライド1 - 00:00:00]\nスライドの内容：\n* 区間\n\n説明：区間の説明です。"
+
+    def generate(path, fail=True):
+        analyzer = cache.cached_window_analyzer(lambda clip: analyze_window(clip, fail), "model", "prompt",
+                                                source_path=path)
+        return analyze_in_windows(path, analyzer, window_seconds=10, overlap_seconds=0, max_workers=2)
+
+    assert cache.analyze(video, generate, "model", "prompt", kind="windowed") is None
+    assert len(calls) == 3
+    assert [e["kind"] for e in cache.entries()].count("windowed") == 0
+    assert [e["kind"] for e in cache.entries()].count("window") == 1
+
+    result = cache.analyze(video, lambda path: generate(path, fail=False), "model", "prompt", kind="windowed")
+    assert result.count("[スライド") == 3
+    assert len(calls) == 5  # 失敗した窓だけを解析し直す
+    assert [e["kind"] for e in cache.entries()].count("windowed") == 1
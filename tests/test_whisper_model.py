@@ -0,0 +1,172 @@
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+from whisper_model import FasterWhisperModel, TranscriptionWorker, WhisperModelHolder, get_loader, load_faster_whisper
+
+
+class FakeModel:
+    device = "cpu"
+
+    def __init__(self, name):
+        self.name = name
+        self.pid = os.getpid()
+
+    def transcribe(self, audio_path, **options):
+        if audio_path.endswith("broken.wav"):
+            raise ValueError("壊れた音声")
+        text = f"{self.name}:{os.path.basename(audio_path)}:{self.pid}:fp16={options.get('fp16')}"
+        return {"text": text, "segments": [{"id": 0, "start": 0.0, "end": 1.5, "text": text}]}
+
+
+def fake_loader(model_name, device):
+    return FakeModel(model_name)
+
+
+class CrashingModel(FakeModel):
+    def transcribe(self, audio_path, **options):
+        if audio_path.endswith("crash.wav"):
+            os._exit(3)
+        return super().transcribe(audio_path, **options)
+
+
+def crashing_loader(model_name, device):
+    return CrashingModel(model_name)
+
+
+def failing_loader(model_name, device):
+    raise RuntimeError("CUDA out of memory")
+
+
+def test_holder_loads_once_on_first_use():
+    """最初に使われたときに1回だけ読み込み、同時に呼ばれても読み込みは1回であること"""
+    calls = []
+
+    def loader(model_name, device):
+        calls.append((model_name, device))
+        return FakeModel(model_name)
+
+    holder = WhisperModelHolder("small", "cpu", loader=loader)
+    assert not holder.loaded and calls == []
+
+    threads = [threading.Thread(target=holder.get) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    result = holder.transcribe("a.wav")
+    assert calls == [("small", "cpu")]
+    # CPUではfp16を無効にする
+    assert result["text"].endswith("fp16=False")
+
+
+def test_worker_reuses_model_across_jobs():
+    """ワーカープロセスでモデルを1回だけ読み込み、複数のジョブを処理すること"""
+    with TranscriptionWorker("tiny", loader=fake_loader) as worker:
+        assert worker.wait_ready(timeout=30) >= 0
+        futures = [worker.submit(f"lecture{i}.wav") for i in range(3)]
+        results = [future.result(timeout=30) for future in futures]
+
+    texts = [segments[0]["text"] for segments in results]
+    assert [t.split(":")[1] for t in texts] == ["lecture0.wav", "lecture1.wav", "lecture2.wav"]
+    pids = {t.split(":")[2] for t in texts}
+    assert len(pids) == 1 and pids != {str(os.getpid())}
+    assert set(results[0][0]) == {"start", "end", "text"}
+
+
+def test_worker_reports_job_errors():
+    """ジョブの失敗は呼び出し側に例外として返し、ワーカーは処理を続けること"""
+    with TranscriptionWorker("tiny", loader=fake_loader) as worker:
+        with pytest.raises(RuntimeError, match="壊れた音声"):
+            worker.transcribe("broken.wav")
+        assert worker.transcribe("ok.wav")[0]["end"] == 1.5
+
+
+def test_worker_crash_fails_pending_and_new_jobs():
+    """ワーカープロセスが異常終了したら、待機中のジョブも後から追加したジョブも例外で終わること"""
+    with TranscriptionWorker("tiny", loader=crashing_loader) as worker:
+        worker.wait_ready(timeout=30)
+        crashed = worker.submit("crash.wav")
+        waiting = worker.submit("after.wav")
+        for future in (crashed, waiting):
+            with pytest.raises(RuntimeError, match="終了コード: 3"):
+                future.result(timeout=30)
+        late = worker.submit("late.wav")
+        with pytest.raises(RuntimeError, match="終了コード: 3"):
+            late.result(timeout=5)
+
+
+class LateResults:
+    """タイムアウトまでに届かず、子プロセスの終了後に読める結果のキュー"""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+
+    def get(self, timeout=None):
+        raise queue.Empty
+
+    def get_nowait(self):
+        if not self.messages:
+            raise queue.Empty
+        return self.messages.pop(0)
+
+
+def test_results_written_before_exit_are_delivered():
+    """子プロセスが終了の直前に書き込んだ結果はそのジョブに渡し、残りのジョブだけを失敗にすること"""
+    worker = TranscriptionWorker.__new__(TranscriptionWorker)
+    worker._results = LateResults([(1, True, [{"start": 0.0, "end": 1.0, "text": "完了"}], 0.1)])
+    worker._process = SimpleNamespace(is_alive=lambda: False, exitcode=0)
+    worker._pending = {1: Future(), 2: Future()}
+    worker._pending_lock = threading.Lock()
+    worker._ready = Future()
+    worker._ready.set_result(True)
+    worker._error = None
+    finished, waiting = worker._pending[1], worker._pending[2]
+
+    worker._read_results()
+    assert finished.result(timeout=0)[0]["text"] == "完了"
+    with pytest.raises(RuntimeError, match="終了コード: 0"):
+        waiting.result(timeout=0)
+
+
+def test_load_failure_is_reported_to_jobs():
+    """モデルの読み込みに失敗したワーカーのジョブは、終了コードではなく読み込みの失敗の理由で終わること"""
+    with TranscriptionWorker("tiny", loader=failing_loader) as worker:
+        pending = worker.submit("lecture.wav")
+        with pytest.raises(RuntimeError, match="モデルの読み込みに失敗しました: RuntimeError: CUDA out of memory"):
+            pending.result(timeout=30)
+        with pytest.raises(RuntimeError, match="CUDA out of memory"):
+            worker.submit("late.wav").result(timeout=5)
+        with pytest.raises(RuntimeError, match="CUDA out of memory"):
+            worker.wait_ready(timeout=5)
+
+
+def test_backend_selection():
+    """バックエンド名から読み込み関数を選び、不明な名前はエラーにすること"""
+    assert get_loader("faster-whisper") is load_faster_whisper
+    with pytest.raises(ValueError, match="不明なバックエンド"):
+        get_loader("unknown")
+    with pytest.raises(ValueError):
+        WhisperModelHolder("tiny", backend="unknown")
+
+
+def test_faster_whisper_results_match_whisper_format():
+    """faster-whisper の結果を whisper と同じ形式に変換し、whisper固有の引数は渡さないこと"""
+    calls = []
+
+    class FakeFasterModel:
+        def transcribe(self, audio, **options):
+            calls.append(options)
+            segments = (SimpleNamespace(start=i * 2.0, end=i * 2.0 + 1.5, text=f" 文{i}", avg_logprob=-0.1) for i in range(2))
+            return segments, SimpleNamespace(language="ja")
+
+    holder = WhisperModelHolder("tiny", "cpu", loader=lambda name, device: FasterWhisperModel(FakeFasterModel()))
+    result = holder.transcribe("a.wav", language="ja", verbose=False, initial_prompt=None)
+
+    assert calls == [{"language": "ja"}]
+    assert result["text"] == " 文0 文1" and result["language"] == "ja"
+    assert result["segments"][1] == {"id": 1, "start": 2.0, "end": 3.5, "text": " 文1", "avg_logprob": -0.1}
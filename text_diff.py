@@ -0,0 +1,461 @@
+"""
+書き起こしの修正前後の文字単位の差分
+
+修正前後の書き起こし（日本語で10万文字程度）の差分を、メモリをテキストの長さに比例する量だけ使って求める。
+difflib.SequenceMatcher を文字単位で使うと処理時間が長さの2乗で増えるため、次の順に対応付ける。
+
+1. 文（句点・改行で区切った単位）をハッシュで引き、両方のテキストで出現回数の少ない文を
+   順序を保つ最長の組（最長増加部分列）として対応付け、前後に一致を伸ばす
+2. 対応付けた文の間の部分を、出現回数の少ない文字 k-gram（k を小さくしながら）で同じように対応付ける
+3. 残った短い部分を Myers の O(ND) 差分（中央のスネークで分割する線形メモリの版）で比べる。
+   編集距離が MYERS_MAX_D を超える部分は置き換えとして扱い、処理時間が2乗にならないようにする
+
+結果は difflib の get_opcodes() と同じ (tag, a_start, a_end, b_start, b_end) の並びで、HTML・JSON でも出力できる。
+
+使い方:
+    # 差分をHTMLとJSONに出力する
+    python text_diff.py day3/data/LLM2024_day4_raw.txt day3/data/LLM2024_day4.txt --html data/output/day4_diff.html --json data/output/day4_diff.json
+
+    # day3 の書き起こし（修正前・修正後）で difflib と処理時間・メモリを比較する
+    python text_diff.py --benchmark
+"""
+import argparse
+import bisect
+import html
+import json
+import os
+import re
+import time
+import tracemalloc
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Myers の差分で調べる編集距離の上限（超えた部分は置き換えとして扱う）
+MYERS_MAX_D = 1000
+# 対応付けに使う文字 k-gram の長さ（順に小さくする）
+ANCHOR_GRAM_SIZES = (16, 8, 4)
+# これより短い部分は k-gram で対応付けずに Myers の差分で比べる
+ANCHOR_MIN_LENGTH = 64
+# 対応付けに使う単位の、それぞれのテキストでの出現回数の上限
+ANCHOR_MAX_COUNT = 4
+
+_SENTENCE_RE = re.compile(r"[^。！？!?\n]*(?:[。！？!?]+\n?|\n|$)")
+
+
+class EditSpan(NamedTuple):
+    """差分の1区間（difflib の opcode と同じ並び。tag は equal, replace, delete, insert）"""
+    tag: str
+    a_start: int
+    a_end: int
+    b_start: int
+    b_end: int
+
+
+# --- Myers の差分 ---
+
+def _bisect(a: Sequence, b: Sequence, a0: int, a1: int, b0: int, b1: int,
+            max_d: int) -> Optional[Tuple[int, int]]:
+    """
+    a[a0:a1] と b[b0:b1] の最短編集経路の中央のスネークを前後から同時に探し、分割する位置を返す
+    編集距離が max_d を超える場合は None
+    """
+    n, m = a1 - a0, b1 - b0
+    limit = min((n + m + 1) // 2, max_d)
+    offset = limit + 1
+    size = 2 * offset + 1
+    forward = [-1] * size
+    backward = [-1] * size
+    forward[offset + 1] = 0
+    backward[offset + 1] = 0
+    delta = n - m
+    # 差が奇数なら前向きの探索で、偶数なら後ろ向きの探索で重なりを調べる
+    odd = delta % 2 != 0
+    k1_start = k1_end = k2_start = k2_end = 0
+    for d in range(limit + 1):
+        for k1 in range(-d + k1_start, d + 1 - k1_end, 2):
+            i = offset + k1
+            if k1 == -d or (k1 != d and forward[i - 1] < forward[i + 1]):
+                x1 = forward[i + 1]
+            else:
+                x1 = forward[i - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[a0 + x1] == b[b0 + y1]:
+                x1 += 1
+                y1 += 1
+            forward[i] = x1
+            if x1 > n:
+                k1_end += 2
+            elif y1 > m:
+                k1_start += 2
+            elif odd:
+                j = offset + delta - k1
+                if 0 <= j < size and backward[j] != -1 and x1 >= n - backward[j]:
+                    return x1, y1
+        for k2 in range(-d + k2_start, d + 1 - k2_end, 2):
+            i = offset + k2
+            if k2 == -d or (k2 != d and backward[i - 1] < backward[i + 1]):
+                x2 = backward[i + 1]
+            else:
+                x2 = backward[i - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[a1 - x2 - 1] == b[b1 - y2 - 1]:
+                x2 += 1
+                y2 += 1
+            backward[i] = x2
+            if x2 > n:
+                k2_end += 2
+            elif y2 > m:
+                k2_start += 2
+            elif not odd:
+                j = offset + delta - k2
+                if 0 <= j < size and forward[j] != -1:
+                    x1 = forward[j]
+                    if x1 >= n - x2:
+                        return x1, x1 - (j - offset)
+    return None
+
+
+def _myers(a: Sequence, b: Sequence, a0: int, a1: int, b0: int, b1: int, max_d: int,
+           out: List[EditSpan]) -> None:
+    """a[a0:a1] と b[b0:b1] の差分を out に追加する（再帰の代わりにスタックを使う）"""
+    stack = [(a0, a1, b0, b1)]
+    while stack:
+        a0, a1, b0, b1 = stack.pop()
+        # 共通の先頭と末尾
+        start = 0
+        while a0 + start < a1 and b0 + start < b1 and a[a0 + start] == b[b0 + start]:
+            start += 1
+        end = 0
+        while a1 - end > a0 + start and b1 - end > b0 + start and a[a1 - end - 1] == b[b1 - end - 1]:
+            end += 1
+        if start:
+            out.append(EditSpan("equal", a0, a0 + start, b0, b0 + start))
+        middle = (a0 + start, a1 - end, b0 + start, b1 - end)
+        if middle[0] == middle[1] or middle[2] == middle[3]:
+            if middle[0] < middle[1]:
+                out.append(EditSpan("delete", middle[0], middle[1], middle[2], middle[2]))
+            elif middle[2] < middle[3]:
+                out.append(EditSpan("insert", middle[0], middle[0], middle[2], middle[3]))
+            split = None
+        else:
+            split = _bisect(a, b, *middle, max_d)
+            if split is None:
+                out.append(EditSpan("replace", *middle))
+        if end:
+            # 末尾の一致は中央の部分を処理した後に出力する
+            stack.append((a1 - end, a1, b1 - end, b1))
+        if split is not None:
+            x, y = split
+            stack.append((middle[0] + x, middle[1], middle[2] + y, middle[3]))
+            stack.append((middle[0], middle[0] + x, middle[2], middle[2] + y))
+
+
+def myers_diff(a: Sequence, b: Sequence, max_d: int = MYERS_MAX_D) -> List[EditSpan]:
+    """
+    Myers の O(ND) 差分（線形メモリ）
+    Args:
+        a, b: 比べる列（文字列またはリスト）
+        max_d: 調べる編集距離の上限（超えた部分は置き換えとして扱う）
+    Returns:
+        EditSpan のリスト
+    """
+    out: List[EditSpan] = []
+    _myers(a, b, 0, len(a), 0, len(b), max_d, out)
+    return _merge(out)
+
+
+# --- 一意な単位による対応付け ---
+
+def _longest_increasing(pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """i の順に並んだ (i, j) のうち、j も増加する最長の部分列"""
+    tails: List[int] = []
+    tail_index: List[int] = []
+    previous = [-1] * len(pairs)
+    for n, (_, j) in enumerate(pairs):
+        position = bisect.bisect_left(tails, j)
+        if position == len(tails):
+            tails.append(j)
+            tail_index.append(n)
+        else:
+            tails[position] = j
+            tail_index[position] = n
+        previous[n] = tail_index[position - 1] if position else -1
+    result = []
+    n = tail_index[-1] if tail_index else -1
+    while n != -1:
+        result.append(pairs[n])
+        n = previous[n]
+    return result[::-1]
+
+
+def _rare_matches(units_a: List[Tuple[int, int]], units_b: List[Tuple[int, int]], key_a, key_b,
+                  max_count: int = ANCHOR_MAX_COUNT) -> List[Tuple[int, int]]:
+    """
+    両方で max_count 回以下しか現れない単位を、順序を保って最も多く対応付ける
+    （(a の単位番号, b の単位番号) のリスト。同じテキストが繰り返される場合も対応付けられる）
+    """
+    def positions(units, key) -> Dict:
+        found: Dict = {}
+        for n, unit in enumerate(units):
+            found.setdefault(key(unit), []).append(n)
+        return found
+
+    in_a = positions(units_a, key_a)
+    in_b = positions(units_b, key_b)
+    pairs = []
+    for k, rows_a in in_a.items():
+        rows_b = in_b.get(k)
+        if rows_b and len(rows_a) <= max_count and len(rows_b) <= max_count:
+            pairs.extend((i, j) for i in rows_a for j in rows_b)
+    # 同じ i の組は j の大きい順に並べ、1つの i から2つ以上を選ばないようにする
+    pairs.sort(key=lambda pair: (pair[0], -pair[1]))
+    return _longest_increasing(pairs)
+
+
+def _sentences(text: str, start: int, end: int) -> List[Tuple[int, int]]:
+    return [m.span() for m in _SENTENCE_RE.finditer(text, start, end) if m.end() > m.start()]
+
+
+def _anchor_ranges(a: str, b: str, a0: int, a1: int, b0: int, b1: int,
+                   level: int) -> List[Tuple[int, int, int, int]]:
+    """対応付けた一致区間 (a_start, a_end, b_start, b_end) のリスト（level 0 は文、それ以降は k-gram）"""
+    if level == 0:
+        units_a, units_b = _sentences(a, a0, a1), _sentences(b, b0, b1)
+        matches = _rare_matches(units_a, units_b, lambda u: a[u[0]:u[1]], lambda u: b[u[0]:u[1]])
+        return [units_a[i] + units_b[j] for i, j in matches]
+    k = ANCHOR_GRAM_SIZES[level - 1]
+    units_a = [(i, i + k) for i in range(a0, a1 - k + 1)]
+    units_b = [(j, j + k) for j in range(b0, b1 - k + 1)]
+    matches = _rare_matches(units_a, units_b, lambda u: a[u[0]:u[1]], lambda u: b[u[0]:u[1]])
+    return [units_a[i] + units_b[j] for i, j in matches]
+
+
+def _anchored(a: str, b: str, a0: int, a1: int, b0: int, b1: int, level: int, max_d: int,
+              out: List[EditSpan]) -> None:
+    if level > len(ANCHOR_GRAM_SIZES) or max(a1 - a0, b1 - b0) < ANCHOR_MIN_LENGTH:
+        _myers(a, b, a0, a1, b0, b1, max_d, out)
+        return
+    anchors = _anchor_ranges(a, b, a0, a1, b0, b1, level)
+    if not anchors:
+        _anchored(a, b, a0, a1, b0, b1, level + 1, max_d, out)
+        return
+    pa, pb = a0, b0
+    for sa, ea, sb, eb in anchors:
+        if sa < pa or sb < pb:
+            # 前の一致を伸ばした範囲と重なる対応は使わない
+            continue
+        # 一致を前後に伸ばす
+        while sa > pa and sb > pb and a[sa - 1] == b[sb - 1]:
+            sa -= 1
+            sb -= 1
+        while ea < a1 and eb < b1 and a[ea] == b[eb]:
+            ea += 1
+            eb += 1
+        _anchored(a, b, pa, sa, pb, sb, level + 1, max_d, out)
+        out.append(EditSpan("equal", sa, ea, sb, eb))
+        pa, pb = ea, eb
+    _anchored(a, b, pa, a1, pb, b1, level + 1, max_d, out)
+
+
+def _merge(spans: List[EditSpan]) -> List[EditSpan]:
+    """隣り合う区間をまとめ、削除と挿入が続く部分を置き換えにする"""
+    merged: List[EditSpan] = []
+    for span in spans:
+        if span.a_start == span.a_end and span.b_start == span.b_end:
+            continue
+        if merged:
+            last = merged[-1]
+            if (last.tag == "equal") == (span.tag == "equal"):
+                tag = "equal" if span.tag == "equal" else "replace"
+                merged[-1] = EditSpan(tag, last.a_start, span.a_end, last.b_start, span.b_end)
+                continue
+        merged.append(span)
+    # 削除だけ・挿入だけの区間のタグを付け直す
+    return [span if span.tag == "equal" else
+            EditSpan("delete" if span.b_start == span.b_end else "insert" if span.a_start == span.a_end
+                     else "replace", *span[1:])
+            for span in merged]
+
+
+def diff_texts(a: str, b: str, max_d: int = MYERS_MAX_D) -> List[EditSpan]:
+    """
+    2つのテキストの文字単位の差分
+    Args:
+        a: 修正前のテキスト
+        b: 修正後のテキスト
+        max_d: Myers の差分で調べる編集距離の上限
+    Returns:
+        EditSpan のリスト（difflib の get_opcodes() と同じ形式）
+    """
+    out: List[EditSpan] = []
+    _anchored(a, b, 0, len(a), 0, len(b), 0, max_d, out)
+    return _merge(out)
+
+
+def map_offset(spans: List[EditSpan], position: int) -> int:
+    """a（修正前）の位置を、差分の区間を使って b（修正後）の位置に対応付ける"""
+    for tag, i1, i2, j1, j2 in spans:
+        if position < i2 or (position == i2 and tag == "insert"):
+            if tag == "equal":
+                return j1 + position - i1
+            # 書き換えられた範囲の中は長さの比で対応付ける
+            return j1 + round((position - i1) * (j2 - j1) / max(i2 - i1, 1))
+    return spans[-1][4] if spans else 0
+
+
+# --- 出力 ---
+
+def diff_stats(spans: List[EditSpan]) -> Dict[str, float]:
+    """一致・削除・挿入した文字数と、difflib の ratio() と同じ類似度"""
+    equal = sum(s.a_end - s.a_start for s in spans if s.tag == "equal")
+    deleted = sum(s.a_end - s.a_start for s in spans if s.tag != "equal")
+    inserted = sum(s.b_end - s.b_start for s in spans if s.tag != "equal")
+    total = 2 * equal + deleted + inserted
+    return {"equal": equal, "deleted": deleted, "inserted": inserted,
+            "edits": sum(1 for s in spans if s.tag != "equal"), "ratio": 2 * equal / total if total else 1.0}
+
+
+def to_json(a: str, b: str, spans: List[EditSpan]) -> dict:
+    """差分をJSONにできる辞書にする（変更された区間だけ、修正前後のテキストと位置を含める）"""
+    return {
+        "stats": diff_stats(spans),
+        "edits": [{"tag": s.tag, "a": [s.a_start, s.a_end], "b": [s.b_start, s.b_end],
+                   "before": a[s.a_start:s.a_end], "after": b[s.b_start:s.b_end]}
+                  for s in spans if s.tag != "equal"],
+    }
+
+
+_HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; line-height: 1.8; max-width: 60em; margin: 2em auto; }}
+del {{ background: #fdd; color: #a00; }}
+ins {{ background: #dfd; color: #060; text-decoration: none; }}
+.stats {{ color: #555; border-bottom: 1px solid #ccc; padding-bottom: 0.5em; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<p class="stats">{stats}</p>
+<div>{body}</div>
+</body>
+</html>
+"""
+
+
+def to_html(a: str, b: str, spans: List[EditSpan], title: str = "書き起こしの修正箇所") -> str:
+    """修正前の文字を<del>、修正後の文字を<ins>で示したHTML"""
+    def escape(text: str) -> str:
+        return html.escape(text).replace("\n", "<br>\n")
+
+    parts = []
+    for span in spans:
+        if span.tag == "equal":
+            parts.append(escape(a[span.a_start:span.a_end]))
+            continue
+        if span.a_end > span.a_start:
+            parts.append(f"<del>{escape(a[span.a_start:span.a_end])}</del>")
+        if span.b_end > span.b_start:
+            parts.append(f"<ins>{escape(b[span.b_start:span.b_end])}</ins>")
+    stats = diff_stats(spans)
+    summary = (f"変更 {stats['edits']}か所（削除 {stats['deleted']}文字, 追加 {stats['inserted']}文字）, "
+               f"類似度 {stats['ratio']:.3f}")
+    return _HTML_TEMPLATE.format(title=html.escape(title), stats=summary, body="".join(parts))
+
+
+def write_diff(a: str, b: str, output_path: str, spans: Optional[List[EditSpan]] = None) -> str:
+    """差分を拡張子に応じてHTMLまたはJSONで保存する"""
+    spans = diff_texts(a, b) if spans is None else spans
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        if output_path.lower().endswith(".json"):
+            json.dump(to_json(a, b, spans), f, ensure_ascii=False, indent=2)
+        else:
+            f.write(to_html(a, b, spans))
+    return output_path
+
+
+# --- ベンチマーク ---
+
+def _measure(function) -> Tuple[object, float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak / 1024 / 1024
+
+
+def benchmark(raw_path: str, corrected_path: str,
+              difflib_sizes: Tuple[Optional[int], ...] = (2000, 8000, None)) -> None:
+    """
+    difflib と処理時間・最大メモリ（tracemalloc）を比較する
+    Args:
+        raw_path: 修正前の書き起こし
+        corrected_path: 修正後の書き起こし
+        difflib_sizes: difflib で比べる先頭の文字数（None は全体）
+    """
+    import difflib
+
+    with open(raw_path, "r", encoding="utf-8") as f:
+        raw = f.read()
+    with open(corrected_path, "r", encoding="utf-8") as f:
+        corrected = f.read()
+    print(f"修正前 {len(raw)}文字, 修正後 {len(corrected)}文字")
+
+    for size in difflib_sizes:
+        size = size or max(len(raw), len(corrected))
+        a, b = raw[:size], corrected[:size]
+        opcodes, seconds, peak = _measure(
+            lambda: [EditSpan(*op) for op in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()])
+        ours, our_seconds, our_peak = _measure(lambda: diff_texts(a, b))
+        print(f"==> 先頭{size}文字: difflib {seconds:.2f}秒 / {peak:.1f}MB, 一致{diff_stats(opcodes)['equal']}文字 | "
+              f"diff_texts {our_seconds:.3f}秒 / {our_peak:.1f}MB, 一致{diff_stats(ours)['equal']}文字")
+
+    # 同じ講義を3回つなげた約10万文字のテキスト（同じ文が繰り返し現れる）
+    for repeat in (3,):
+        a, b = raw * repeat, corrected * repeat
+        spans, seconds, peak = _measure(lambda: diff_texts(a, b))
+        stats = diff_stats(spans)
+        print(f"==> 全体×{repeat}（{len(a)}文字）: diff_texts {seconds:.2f}秒 / {peak:.1f}MB, "
+              f"一致{stats['equal']}文字, 変更{stats['edits']}か所, 類似度 {stats['ratio']:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="書き起こしの修正前後の文字単位の差分")
+    parser.add_argument("original", nargs="?", help="修正前のテキスト")
+    parser.add_argument("corrected", nargs="?", help="修正後のテキスト")
+    parser.add_argument("--html", help="HTMLの出力ファイル")
+    parser.add_argument("--json", help="JSONの出力ファイル")
+    parser.add_argument("--benchmark", action="store_true", help="day3 の書き起こしで difflib と比較する")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "day3", "data")
+        benchmark(os.path.join(data_dir, "LLM2024_day4_raw.txt"), os.path.join(data_dir, "LLM2024_day4.txt"))
+        return
+    if not args.original or not args.corrected:
+        parser.print_help()
+        return
+
+    with open(args.original, "r", encoding="utf-8") as f:
+        original = f.read()
+    with open(args.corrected, "r", encoding="utf-8") as f:
+        corrected = f.read()
+    spans = diff_texts(original, corrected)
+    stats = diff_stats(spans)
+    print(f"変更 {stats['edits']}か所（削除 {stats['deleted']}文字, 追加 {stats['inserted']}文字）, "
+          f"類似度 {stats['ratio']:.3f}")
+    for path in (args.html, args.json):
+        if path:
+            print(f"差分を保存しました: {write_diff(original, corrected, path, spans)}")
+    if not args.html and not args.json:
+        for edit in to_json(original, corrected, spans)["edits"]:
+            print(f"{edit['tag']}: {edit['before']!r} → {edit['after']!r}")
+
+
+if __name__ == "__main__":
+    main()
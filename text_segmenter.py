@@ -0,0 +1,346 @@
+"""
+日本語の書き起こしの文・段落への逐次分割
+
+テキストを少しずつ読みながら、文（句点・感嘆符・疑問符・改行）と段落の単位に分けて順に返す。
+ファイル全体を読み込まないため、大きな書き起こしでも使うメモリは読み込む単位と文の長さの上限で決まる。
+
+- 括弧（「」『』（）など）の中の句点では文を区切らない（括弧は行をまたがない）
+- 句点が続く場合や、句点の直後の閉じ括弧は前の文に含める
+- 行頭のタイムスタンプ（`[hh:mm:ss.mmm --> hh:mm:ss.mmm]`）は本文から外し、その行の文に付ける
+- `---` などの区切り線と空行は段落の区切りとして扱う（line_paragraphs=True なら1行を1段落とする）
+- 句点のないまま max_chars を超える部分は、読点・空白の位置で分ける
+
+フィラー除去（段落）、LLMによる修正のチャンク分割（文）、講義資料の検索のチャンク（段落と文）で使う。
+
+使い方:
+    # 文ごとに1行で出力する
+    python text_segmenter.py day3/data/LLM2024_day4_raw.txt
+
+    # 段落ごとに出力する（タイムスタンプ付きの書き起こしの場合は文の時刻も表示する）
+    python text_segmenter.py data/output/lecture.txt --paragraphs
+
+    # 処理速度（MB/秒）と使うメモリを計測する
+    python text_segmenter.py --benchmark
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+DEFAULT_MAX_CHARS = 800
+# ファイルから1回に読み込む文字数
+BLOCK_CHARS = 1 << 16
+
+TERMINATORS = "。．！？!?"
+OPENING_BRACKETS = "「『（(“【〈《"
+CLOSING_BRACKETS = "」』）)”】〉》"
+# 改行、句点の並び（直後の閉じ括弧を含む）、括弧のいずれか
+TOKEN_RE = re.compile(f"\r?\n|[{TERMINATORS}]+[{CLOSING_BRACKETS}’\"]*|[{OPENING_BRACKETS}]|[{CLOSING_BRACKETS}]")
+TIMESTAMP_RE = re.compile(r"\[(\d+):(\d{2}):(\d{2}(?:\.\d+)?) --> (\d+):(\d{2}):(\d{2}(?:\.\d+)?)\][ \t]?")
+SEPARATOR_RE = re.compile(r"[ \t]*(?:-{3,}|={3,}|\*{3,})[ \t]*(?=\r?\n|$)")
+# 行頭のタイムスタンプ・区切り線を判定するのに必要な文字数
+LINE_PREFIX_CHARS = 64
+SOFT_BREAKS = ("、", "，", " ", "　")
+
+
+class TextUnit(NamedTuple):
+    """分割した文"""
+    text: str
+    start: int  # 入力全体での開始位置（文字数）
+    end: int
+    paragraph: int  # 段落の番号（0から）
+    timestamp: Optional[Tuple[float, float]]  # 行頭のタイムスタンプ（開始, 終了 秒）
+
+
+def _seconds(hours: str, minutes: str, seconds: str) -> float:
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+class Segmenter:
+    """
+    テキストを少しずつ受け取り、文の単位に分ける
+    feed() で受け取った分のうち確定した文を返し、最後に close() で残りを返す
+    Args:
+        max_chars: 1文の文字数の上限（超える場合は読点・空白の位置で分ける）
+        line_paragraphs: 1行を1段落とするか（False なら空行と区切り線だけで段落を分ける）
+    """
+
+    def __init__(self, max_chars: int = DEFAULT_MAX_CHARS, line_paragraphs: bool = True):
+        self.max_chars = max_chars
+        self.line_paragraphs = line_paragraphs
+        self.buffer = ""
+        self.base = 0  # buffer[0] の入力全体での位置
+        self.pos = 0  # buffer の中で次に調べる位置
+        self.sentence_start: Optional[int] = None  # 未確定の文の開始位置（入力全体での位置）
+        self.depth = 0  # 括弧の深さ
+        self.line_start = True
+        self.line_has_text = False
+        self.timestamp: Optional[Tuple[float, float]] = None
+        self.paragraph = 0
+        self.paragraph_has_text = False
+        self.units: List[TextUnit] = []
+
+    def feed(self, text: str) -> List[TextUnit]:
+        """テキストを追加し、確定した文を返す"""
+        self.buffer += text
+        self._scan(final=False)
+        return self._take()
+
+    def close(self) -> List[TextUnit]:
+        """残りのテキストを処理し、最後の文までを返す"""
+        self._scan(final=True)
+        self._emit(self.base + len(self.buffer))
+        self.buffer, self.base, self.pos = "", self.base + len(self.buffer), 0
+        return self._take()
+
+    def _take(self) -> List[TextUnit]:
+        units, self.units = self.units, []
+        return units
+
+    def _open(self, start: int, end: int) -> None:
+        """buffer[start:end] に空白以外があれば、そこから文を始める"""
+        if self.sentence_start is not None:
+            return
+        piece = self.buffer[start:end]
+        stripped = piece.lstrip()
+        if stripped:
+            self.sentence_start = self.base + start + len(piece) - len(stripped)
+            self.line_has_text = True
+
+    def _emit(self, end: int) -> None:
+        """未確定の文を end（入力全体での位置）までで確定する"""
+        if self.sentence_start is None:
+            return
+        text = self.buffer[self.sentence_start - self.base:end - self.base].rstrip()
+        if text:
+            self.units.append(TextUnit(text, self.sentence_start, self.sentence_start + len(text),
+                                       self.paragraph, self.timestamp))
+            self.paragraph_has_text = True
+        self.sentence_start = None
+
+    def _end_paragraph(self) -> None:
+        if self.paragraph_has_text:
+            self.paragraph += 1
+            self.paragraph_has_text = False
+
+    def _split_long(self) -> None:
+        """未確定の文が max_chars を超えていれば、読点・空白の位置で分ける"""
+        while self.sentence_start is not None and self.base + self.pos - self.sentence_start > self.max_chars:
+            start = self.sentence_start - self.base
+            window = self.buffer[start:start + self.max_chars]
+            cut = max(window.rfind(mark) for mark in SOFT_BREAKS) + 1
+            if cut <= 0:
+                cut = self.max_chars
+            self._emit(self.sentence_start + cut)
+            self.depth = 0
+            self._open(start + cut, self.pos)
+
+    def _scan(self, final: bool) -> None:
+        buffer = self.buffer
+        pos = self.pos
+        while True:
+            if self.line_start:
+                # 行頭のタイムスタンプ・区切り線は、判定できるだけの文字が揃うまで待つ
+                if not final and len(buffer) - pos < LINE_PREFIX_CHARS and "\n" not in buffer[pos:]:
+                    break
+                self.line_start = False
+                match = TIMESTAMP_RE.match(buffer, pos)
+                if match:
+                    h1, m1, s1, h2, m2, s2 = match.groups()
+                    self.timestamp = (_seconds(h1, m1, s1), _seconds(h2, m2, s2))
+                    pos = match.end()
+                elif SEPARATOR_RE.match(buffer, pos):
+                    self._end_paragraph()
+                    pos = SEPARATOR_RE.match(buffer, pos).end()
+
+            match = TOKEN_RE.search(buffer, pos)
+            if match is None:
+                self._open(pos, len(buffer))
+                pos = len(buffer)
+                self.pos = pos
+                self._split_long()
+                break
+            token = match.group()
+            if not final and match.end() == len(buffer) and token[-1] != "\n":
+                # 句点の並びが次の読み込みに続く可能性がある
+                self._open(pos, match.start())
+                pos = match.start()
+                self.pos = pos
+                self._split_long()
+                break
+
+            if token[-1] == "\n":
+                self._open(pos, match.start())
+                self.pos = match.start()
+                self._split_long()
+                self._emit(self.base + match.start())
+                if self.line_paragraphs or not self.line_has_text:
+                    self._end_paragraph()
+                self.depth = 0
+                self.line_start = True
+                self.line_has_text = False
+                self.timestamp = None
+            else:
+                self._open(pos, match.end())
+                # 文を確定する前に、長すぎる部分を分けておく
+                self.pos = match.end()
+                self._split_long()
+                if token[0] in TERMINATORS:
+                    closing = sum(1 for c in token if c in CLOSING_BRACKETS)
+                    if self.depth == 0:
+                        self._emit(self.base + match.end())
+                    self.depth = max(0, self.depth - closing)
+                elif token in OPENING_BRACKETS:
+                    self.depth += 1
+                else:
+                    self.depth = max(0, self.depth - 1)
+            pos = match.end()
+            self.pos = pos
+            self._split_long()
+
+        # 確定した部分を捨てる（未確定の文の先頭からは残す）
+        keep = pos if self.sentence_start is None else min(pos, self.sentence_start - self.base)
+        self.buffer = buffer[keep:]
+        self.base += keep
+        self.pos = pos - keep
+
+
+def segment_stream(blocks: Iterable[str], max_chars: int = DEFAULT_MAX_CHARS,
+                   line_paragraphs: bool = True) -> Iterator[TextUnit]:
+    """
+    テキストの断片を順に受け取り、文の単位に分けて返す
+    Args:
+        blocks: テキストの断片（ファイルの行や一定の文字数ごとの読み込み結果など）
+        max_chars: 1文の文字数の上限
+        line_paragraphs: 1行を1段落とするか
+    Yields:
+        文
+    """
+    segmenter = Segmenter(max_chars, line_paragraphs)
+    for block in blocks:
+        yield from segmenter.feed(block)
+    yield from segmenter.close()
+
+
+def read_blocks(path: str, block_chars: int = BLOCK_CHARS) -> Iterator[str]:
+    """テキストファイルを block_chars 文字ずつ読み込む"""
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            block = f.read(block_chars)
+            if not block:
+                return
+            yield block
+
+
+def segment_text(text: str, max_chars: int = DEFAULT_MAX_CHARS, line_paragraphs: bool = True) -> List[TextUnit]:
+    """テキストを文の単位に分ける"""
+    return list(segment_stream([text], max_chars, line_paragraphs))
+
+
+def segment_file(path: str, max_chars: int = DEFAULT_MAX_CHARS, line_paragraphs: bool = True,
+                 block_chars: int = BLOCK_CHARS) -> Iterator[TextUnit]:
+    """テキストファイルを少しずつ読みながら文の単位に分ける"""
+    return segment_stream(read_blocks(path, block_chars), max_chars, line_paragraphs)
+
+
+def group_paragraphs(units: Iterable[TextUnit]) -> Iterator[List[TextUnit]]:
+    """文を段落ごとにまとめる"""
+    current: List[TextUnit] = []
+    for unit in units:
+        if current and unit.paragraph != current[-1].paragraph:
+            yield current
+            current = []
+        current.append(unit)
+    if current:
+        yield current
+
+
+def iter_paragraphs(units: Iterable[TextUnit]) -> Iterator[str]:
+    """段落ごとに文をつなげたテキストを返す"""
+    for paragraph in group_paragraphs(units):
+        yield "".join(unit.text for unit in paragraph)
+
+
+def read_paragraphs(path: str, line_paragraphs: bool = True, max_chars: int = DEFAULT_MAX_CHARS) -> Iterator[str]:
+    """テキストファイルを少しずつ読みながら段落ごとに返す（タイムスタンプ・区切り線は除く）"""
+    return iter_paragraphs(segment_file(path, max_chars, line_paragraphs))
+
+
+# --- ベンチマーク ---
+
+def benchmark(path: str, megabytes: float = 20.0) -> None:
+    """
+    書き起こしを繰り返した大きなファイルで、処理速度（MB/秒）と使うメモリを計測する
+    Args:
+        path: 書き起こしのテキストファイル
+        megabytes: 計測に使うファイルの大きさ（MB）
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    size = len(text.encode("utf-8"))
+    repeat = max(1, int(megabytes * (1 << 20) / size))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        large = os.path.join(tmp, "large.txt")
+        with open(large, "w", encoding="utf-8") as f:
+            for _ in range(repeat):
+                f.write(text)
+                f.write("\n")
+        total = os.path.getsize(large) / (1 << 20)
+        print(f"{os.path.basename(path)} × {repeat} = {total:.1f}MB")
+
+        def measure(label, run):
+            start = time.perf_counter()
+            count = run()
+            elapsed = time.perf_counter() - start
+            # メモリの追跡は処理を遅くするため、時間とは別に測る
+            tracemalloc.start()
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{label}: {count}件, {elapsed:.2f}秒（{total / elapsed:.1f}MB/秒）, 最大メモリ {peak / (1 << 20):.1f}MB")
+
+        def naive():
+            with open(large, "r", encoding="utf-8") as f:
+                return sum(1 for s in f.read().split("。") if s.strip())
+
+        measure("全体を読み込んで split(\"。\")", naive)
+        measure("逐次分割（文）", lambda: sum(1 for _ in segment_file(large)))
+        measure("逐次分割（段落）", lambda: sum(1 for _ in read_paragraphs(large)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日本語の書き起こしを文・段落に分ける")
+    parser.add_argument("input", nargs="?", help="入力テキストファイル")
+    parser.add_argument("--paragraphs", action="store_true", help="段落ごとに出力する")
+    parser.add_argument("--blank-line-paragraphs", action="store_true",
+                        help="空行と区切り線だけで段落を分ける（既定では1行を1段落とする）")
+    parser.add_argument("--max-chars", type=int, default=DEFAULT_MAX_CHARS, help="1文の文字数の上限")
+    parser.add_argument("--benchmark", action="store_true", help="処理速度（MB/秒）と使うメモリを計測する")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "day3", "data")
+        benchmark(args.input or os.path.join(data_dir, "LLM2024_day4_raw.txt"))
+        return
+    if not args.input:
+        parser.print_help()
+        return
+
+    units = segment_file(args.input, args.max_chars, not args.blank_line_paragraphs)
+    if args.paragraphs:
+        for paragraph in group_paragraphs(units):
+            print(f"[段落 {paragraph[0].paragraph + 1}] " + "".join(unit.text for unit in paragraph))
+        return
+    for unit in units:
+        if unit.timestamp:
+            print(f"[{unit.timestamp[0]:.1f}-{unit.timestamp[1]:.1f}] {unit.text}")
+        else:
+            print(unit.text)
+
+
+if __name__ == "__main__":
+    main()
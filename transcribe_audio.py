@@ -1,53 +1,338 @@
-import whisper
 import os
+import argparse
+import json
+import math
+import tempfile
+import time
 from pathlib import Path
 import re
 
+from transcript_store import append_jsonl, build_index, segment_from_dict
+from whisper_model import BACKENDS, WhisperModelHolder, get_loader, get_model_holder
+
+# 逐次書き出しで1回に文字起こしする音声の目標の長さ（秒）
+CHUNK_SECONDS = 60.0
+# 次のチャンクに前のチャンクの文脈として渡す文字数
+PROMPT_CHARS = 200
+
 def format_timestamp(seconds: float) -> str:
     hours = int(seconds // 3600)
     minutes = int((seconds % 3600) // 60)
     secs = seconds % 60
     return f"{hours:02d}:{minutes:02d}:{secs:06.3f}"
 
-def transcribe_audio(audio_path: str, output_path: str) -> None:
+def store_path_for(output_path: str) -> str:
+    """テキストの出力に対応するセグメントストア（JSONL）のパス"""
+    return os.path.splitext(output_path)[0] + ".jsonl"
+
+def write_transcript(segments, output_path: str) -> None:
+    """
+    セグメントをタイムコード付きでテキストファイルに書き出す
+    時刻の区間で検索できるセグメントストアが必要な場合は transcript_store.TranscriptStore を使う
+    Args:
+        segments: start, end, text を持つセグメントのリスト
+        output_path: 出力テキストファイルのパス
+    """
+    # 出力ディレクトリの作成
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    # タイムコード付きで書き出し
+    with open(output_path, "w", encoding="utf-8") as f:
+        for segment in segments:
+            f.write(format_segment(segment))
+
+def format_segment(segment) -> str:
+    """セグメントを `[hh:mm:ss.mmm --> hh:mm:ss.mmm] テキスト` の1行にする"""
+    start = format_timestamp(segment["start"])
+    end = format_timestamp(segment["end"])
+    text = segment["text"].strip()
+    return f"[{start} --> {end}] {text}\n"
+
+class TranscriptWriter:
+    """
+    セグメントを出力ファイルに追記しながら、書き終えた位置をチェックポイントに記録する
+    テキストと同時にセグメントストア（JSONL）にも追記し、完了したら時刻の索引を作る。
+    チェックポイントは <出力ファイル>.checkpoint.json に置き、完了したら削除する。
+    同じ音声・設定でやり直すと、チェックポイントの位置まで出力を戻して続きから追記する
+    Args:
+        output_path: 出力テキストファイルのパス
+        key: 音声と設定を表す値（一致しないチェックポイントは使わない）
+        store_path: セグメントストアのパス（省略時は出力ファイルの拡張子を .jsonl にしたもの）
+        source: ストアに記録する入力の名前
+    """
+
+    def __init__(self, output_path: str, key: dict, store_path: str = None, source: str = None):
+        self.output_path = output_path
+        self.store_path = store_path or store_path_for(output_path)
+        self.source = source
+        self.checkpoint_path = output_path + ".checkpoint.json"
+        self.key = key
+        self.state = {"key": key, "chunk": 0, "offset": 0.0, "bytes": 0, "store_bytes": 0, "segments": 0,
+                      "tail": ""}
+        self._file = None
+        self._store = None
+
+    def load_checkpoint(self):
+        """使えるチェックポイントがあれば読み込んで返す"""
+        if not all(os.path.exists(p) for p in (self.checkpoint_path, self.output_path, self.store_path)):
+            return None
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (state.get("key") != self.key or os.path.getsize(self.output_path) < state["bytes"]
+                or os.path.getsize(self.store_path) < state.get("store_bytes", math.inf)):
+            return None
+        return state
+
+    def open(self, resume: bool = True) -> int:
+        """
+        出力ファイルを開く
+        Returns:
+            続きから処理するチャンクの番号（最初からなら 0）
+        """
+        os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+        state = self.load_checkpoint() if resume else None
+        if state is None:
+            self._file = open(self.output_path, "wb")
+            self._store = open(self.store_path, "wb")
+            self._save_checkpoint()
+            return 0
+        # 最後のチェックポイントより後に書かれた（途中で止まった）部分は捨てる
+        self.state = state
+        self._file = self._reopen(self.output_path, state["bytes"])
+        self._store = self._reopen(self.store_path, state["store_bytes"])
+        return state["chunk"]
+
+    @staticmethod
+    def _reopen(path: str, size: int):
+        f = open(path, "r+b")
+        f.truncate(size)
+        f.seek(size)
+        return f
+
+    def write(self, segments, chunk: int, offset: float) -> None:
+        """チャンクのセグメントを追記してディスクに書き出し、チェックポイントを進める"""
+        text = "".join(format_segment(segment) for segment in segments).encode("utf-8")
+        self._file.write(text)
+        store_bytes = append_jsonl((segment_from_dict(segment, self.source) for segment in segments), self._store)
+        for f in (self._file, self._store):
+            f.flush()
+            os.fsync(f.fileno())
+        tail = self.state["tail"] + "".join(segment["text"] for segment in segments)
+        self.state.update(chunk=chunk + 1, offset=offset, bytes=self.state["bytes"] + len(text),
+                          store_bytes=self.state["store_bytes"] + store_bytes,
+                          segments=self.state["segments"] + len(segments), tail=tail[-PROMPT_CHARS:])
+        self._save_checkpoint()
+
+    def _save_checkpoint(self) -> None:
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def close(self, completed: bool = False) -> None:
+        """出力ファイルを閉じる。全て書き終えた場合はストアの索引を作り、チェックポイントを削除する"""
+        for f in (self._file, self._store):
+            if f is not None:
+                f.close()
+        self._file = self._store = None
+        if completed:
+            build_index(self.store_path)
+            if os.path.exists(self.checkpoint_path):
+                os.remove(self.checkpoint_path)
+
+def transcribe_to_file(audio_path: str, output_path: str, holder: WhisperModelHolder,
+                       chunk_seconds: float = CHUNK_SECONDS, resume: bool = True, **options) -> int:
+    """
+    音声を無音の位置で区切りながら順に文字起こしし、チャンクごとに出力ファイルへ追記する
+    音声はチャンクごとにデコードするため、使うメモリは講義の長さによらず一定に近い。
+    前のチャンクの末尾の文章を initial_prompt として次のチャンクに渡し、文脈をつなげる
+    Args:
+        audio_path: 入力音声ファイルのパス
+        output_path: 出力テキストファイルのパス
+        holder: 文字起こしに使うモデル
+        chunk_seconds: チャンクの目標の長さ（秒）
+        resume: チェックポイントがあれば続きから処理するか
+        options: transcribe に渡す引数（language など）
+    Returns:
+        書き出したセグメントの数
+    """
+    # parallel_transcribe は write_transcript を使うため、ここで読み込む
+    from parallel_transcribe import load_audio, plan_chunks, scan_energy
+
+    stat = os.stat(audio_path)
+    key = {"audio": os.path.abspath(audio_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+           "model": holder.model_name, "loader": getattr(holder.loader, "__name__", str(holder.loader)),
+           "chunk_seconds": chunk_seconds, "options": options}
+    writer = TranscriptWriter(output_path, json.loads(json.dumps(key, default=str)),
+                              source=os.path.basename(audio_path))
+    first = writer.open(resume)
+    completed = False
+    try:
+        energy, total_samples = scan_energy(audio_path)
+        chunks = plan_chunks(energy, total_samples, chunk_seconds, chunk_seconds * 2)
+        if first:
+            print(f"チェックポイントから再開します: {writer.state['offset']:.1f}秒まで処理済み"
+                  f"（チャンク {first}/{len(chunks)}）")
+        for chunk in chunks[first:]:
+            audio = load_audio(audio_path, start=chunk.offset, duration=chunk.duration)
+            chunk_options = dict(options)
+            if writer.state["tail"] and "initial_prompt" not in options:
+                chunk_options["initial_prompt"] = writer.state["tail"]
+            result = holder.transcribe(audio, **chunk_options)
+            segments = [
+                dict(s, start=s["start"] + chunk.offset, end=s["end"] + chunk.offset)
+                for s in result["segments"]
+            ]
+            writer.write(segments, chunk.index, chunk.offset + chunk.duration)
+            print(f"チャンク {chunk.index + 1}/{len(chunks)} "
+                  f"（{format_timestamp(chunk.offset + chunk.duration)} まで）を書き出しました")
+        completed = True
+    finally:
+        writer.close(completed)
+    return writer.state["segments"]
+
+def transcribe_audio(audio_path: str, output_path: str, model_name: str = None, device: str = None,
+                     backend: str = None, chunk_seconds: float = CHUNK_SECONDS, resume: bool = True) -> bool:
     """
     音声ファイルから文字起こしを行い、タイムコード付きでテキストファイルとして保存
+    Whisperモデルはプロセス内で共有し、最初の呼び出しでだけ読み込む。
+    チャンクごとに追記してチェックポイントを残すため、途中で止まってもやり直すと続きから処理する
     Args:
         audio_path: 入力音声ファイルのパス
         output_path: 出力テキストファイルのパス
+        model_name: Whisperモデルの大きさ（省略時は環境変数 WHISPER_MODEL、なければ base）
+        device: 実行デバイス（省略時は環境変数 WHISPER_DEVICE、なければ自動）
+        backend: 文字起こしのバックエンド（省略時は環境変数 WHISPER_BACKEND、なければ whisper）
+        chunk_seconds: 1回に文字起こしする音声の目標の長さ（秒）
+        resume: チェックポイントがあれば続きから処理するか
+    Returns:
+        成功した場合は True
     """
     try:
-        # Whisperモデルの読み込み
-        model = whisper.load_model("base")
-        
-        # 音声ファイルの文字起こし（セグメント付き）
-        result = model.transcribe(audio_path, verbose=True)
-        
-        # 出力ディレクトリの作成
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        
-        # タイムコード付きで書き出し
-        with open(output_path, "w", encoding="utf-8") as f:
-            for segment in result["segments"]:
-                start = format_timestamp(segment["start"])
-                end = format_timestamp(segment["end"])
-                text = segment["text"].strip()
-                f.write(f"[{start} --> {end}] {text}\n")
-        
+        # Whisperモデル（初回のみ読み込み）
+        holder = get_model_holder(model_name, device, backend)
+
+        # 音声ファイルの文字起こし（チャンクごとに追記）。セグメントごとの表示は行わない
+        transcribe_to_file(audio_path, output_path, holder, chunk_seconds, resume)
+
         print(f"タイムコード付き文字起こしが完了しました: {output_path}")
-        
+        return True
+
     except Exception as e:
         print(f"エラーが発生しました: {str(e)}")
+        return False
+
+def make_sample_audio(output_path: str, seconds: float = 30.0) -> str:
+    """
+    ベンチマーク用の短い音声（発話と無音が交互に続く合成音声、16kHz WAV）を作る
+    Returns:
+        作成したファイルのパス
+    """
+    import wave
+
+    import numpy as np
+
+    from parallel_transcribe import SAMPLE_RATE, synthetic_lecture
+
+    audio, _ = synthetic_lecture(seconds)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with wave.open(output_path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((np.clip(audio, -1, 1) * 32767).astype(np.int16).tobytes())
+    return output_path
+
+def benchmark(audio_path: str = None, backends=None, model_name: str = None, device: str = None,
+              output_dir: str = "data/output/benchmark") -> list:
+    """
+    バックエンドごとの実時間比（文字起こしにかかった時間 / 音声の長さ）を計測する
+    各バックエンドの結果は同じ形式で output_dir/<音声ファイル名>.<バックエンド>.txt に保存する
+    Args:
+        audio_path: 計測に使う音声（省略時は30秒の合成音声を作る）
+        backends: 計測するバックエンドのリスト（省略時は全て）
+        model_name: Whisperモデルの大きさ
+        device: 実行デバイス
+        output_dir: 文字起こし結果の出力ディレクトリ
+    Returns:
+        バックエンドごとの計測結果のリスト
+    """
+    from ffmpeg_utils import probe_media
+
+    if audio_path is None:
+        audio_path = make_sample_audio(os.path.join(tempfile.mkdtemp(prefix="whisper_bench_"), "sample.wav"))
+    duration = probe_media(audio_path)["duration"]
+    print(f"音声: {audio_path} ({duration:.1f}秒), CPU {os.cpu_count()}コア")
+
+    results = []
+    for backend in backends or list(BACKENDS):
+        holder = get_model_holder(model_name, device, backend)
+        try:
+            holder.get()
+            start = time.perf_counter()
+            segments = holder.transcribe(audio_path)["segments"]
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            print(f"==> {backend}: 計測できませんでした（{type(e).__name__}: {e}）\n")
+            continue
+        output_path = os.path.join(output_dir, f"{Path(audio_path).stem}.{backend}.txt")
+        write_transcript(segments, output_path)
+        result = {"backend": backend, "model": holder.model_name, "load_seconds": holder.load_seconds,
+                  "transcribe_seconds": elapsed, "rtf": elapsed / duration, "segments": len(segments),
+                  "output": output_path}
+        results.append(result)
+        print(f"==> {backend}: 読み込み {holder.load_seconds:.2f}秒, 文字起こし {elapsed:.2f}秒, "
+              f"実時間比 {result['rtf']:.3f}, セグメント {len(segments)}個\n")
+    return results
 
 def main():
-    # 入力音声ファイルのパス
-    audio_path = "data/audio/python_basic_guidance.mp3"
-    
+    parser = argparse.ArgumentParser(description="音声ファイルをタイムコード付きで文字起こしする")
+    # 入力音声ファイルのパス（複数指定した場合はモデルを1回だけ読み込んで順に処理する）
+    parser.add_argument("audio", nargs="*", default=["data/audio/python_basic_guidance.mp3"], help="入力音声ファイル")
     # 出力テキストファイルのパス
-    output_path = "data/output/python_basic_guidance.txt"
-    
+    parser.add_argument("-o", "--output", default="data/output/python_basic_guidance.txt",
+                        help="出力テキストファイル（入力が1つの場合）")
+    parser.add_argument("--output-dir", default="data/output", help="出力ディレクトリ（入力が複数の場合）")
+    parser.add_argument("--model", help="Whisperモデルの大きさ（既定: 環境変数 WHISPER_MODEL または base）")
+    parser.add_argument("--device", help="実行デバイス（cpu, cuda など）")
+    parser.add_argument("--backend", choices=list(BACKENDS),
+                        help="文字起こしのバックエンド（既定: 環境変数 WHISPER_BACKEND または whisper）")
+    parser.add_argument("--benchmark", nargs="*", choices=list(BACKENDS), metavar="BACKEND",
+                        help="バックエンドごとの実時間比を計測する（音声を省略すると合成音声を使う）")
+    parser.add_argument("--chunk-seconds", type=float, default=CHUNK_SECONDS,
+                        help="1回に文字起こしする音声の目標の長さ（秒）")
+    parser.add_argument("--no-resume", action="store_true", help="チェックポイントを使わず最初から処理する")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="2以上を指定すると、無音で分割した音声をこの数のプロセスで並列に文字起こしする")
+    args = parser.parse_args()
+
+    if args.benchmark is not None:
+        audio_path = args.audio[0] if args.audio and os.path.exists(args.audio[0]) else None
+        benchmark(audio_path, args.benchmark, args.model, args.device)
+        return
+
+    if args.workers > 1:
+        # parallel_transcribe は write_transcript を使うため、ここで読み込む
+        from parallel_transcribe import transcribe_parallel
+
+        def transcribe(audio_path, output_path, model_name=None, device=None, backend=None):
+            transcribe_parallel(audio_path, output_path, args.workers, model_name, device,
+                                loader=get_loader(backend))
+    else:
+        def transcribe(audio_path, output_path, model_name=None, device=None, backend=None):
+            transcribe_audio(audio_path, output_path, model_name, device, backend,
+                             chunk_seconds=args.chunk_seconds, resume=not args.no_resume)
+
     # 文字起こしの実行
-    transcribe_audio(audio_path, output_path)
+    if len(args.audio) == 1:
+        transcribe(args.audio[0], args.output, model_name=args.model, device=args.device, backend=args.backend)
+    else:
+        for audio_path in args.audio:
+            output_path = os.path.join(args.output_dir, Path(audio_path).stem + ".txt")
+            transcribe(audio_path, output_path, model_name=args.model, device=args.device, backend=args.backend)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,399 @@
+"""
+文字起こしのセグメントストア
+
+文字起こしをセグメント（start, end, text, speaker, confidence, source）の列として保持し、
+時刻の区間での検索と本文の検索を行う。ファイルには1行1セグメントのJSONL
+（pyarrow があればParquetも可）で保存する。
+
+JSONLには <ファイル>.idx.npy に各セグメントの時刻とバイト位置の索引を付けるため、
+read_range() は索引で位置を求めてその部分だけを読み込み、ファイル全体を走査しない。
+既存のテキスト形式（`[hh:mm:ss.mmm --> hh:mm:ss.mmm] テキスト`、時刻のない段落ごとのテキスト、
+`[スライドN - hh:mm:ss]` 形式の動画解析結果）も read_transcript() で読み込める。
+
+使い方:
+    # テキストの文字起こしをJSONLに変換する
+    python transcript_store.py convert data/output/python_basic_guidance.txt data/output/python_basic_guidance.jsonl
+
+    # 時刻の区間のセグメントを表示する / 本文を検索する
+    python transcript_store.py range data/output/python_basic_guidance.jsonl 00:01:00 00:02:00
+    python transcript_store.py search data/output/python_basic_guidance.jsonl パイソン
+"""
+import argparse
+import json
+import math
+import os
+import re
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+TIMESTAMP_LINE_RE = re.compile(
+    r"^\[(\d+):(\d{2}):(\d{2}(?:\.\d+)?) --> (\d+):(\d{2}):(\d{2}(?:\.\d+)?)\]\s?(.*)$")
+INDEX_SUFFIX = ".idx.npy"
+INDEX_DTYPE = np.dtype([("start", "f8"), ("end", "f8"), ("max_end", "f8"), ("offset", "i8"), ("length", "i8")])
+
+
+class Segment(NamedTuple):
+    """文字起こしの1区間（時刻がわからない場合は start, end が NaN）"""
+    start: float
+    end: float
+    text: str
+    speaker: Optional[str] = None
+    confidence: Optional[float] = None
+    source: Optional[str] = None
+
+
+def parse_time(value: str) -> float:
+    """`hh:mm:ss(.mmm)` または秒数の文字列を秒に変換する"""
+    parts = value.split(":")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def segment_from_dict(segment: dict, source: Optional[str] = None) -> Segment:
+    """
+    Whisper形式のセグメント（start, end, text）を Segment にする
+    confidence がなく avg_logprob があれば、トークンあたりの平均確率を信頼度とする
+    """
+    confidence = segment.get("confidence")
+    if confidence is None and segment.get("avg_logprob") is not None:
+        confidence = math.exp(segment["avg_logprob"])
+    start = segment.get("start")
+    end = segment.get("end")
+    return Segment(
+        math.nan if start is None else float(start), math.nan if end is None else float(end),
+        segment["text"].strip(), segment.get("speaker"), confidence, segment.get("source", source),
+    )
+
+
+def segment_to_record(segment: Segment) -> dict:
+    """Segment をJSONに書ける辞書にする（NaNの時刻は null）"""
+    record = segment._asdict()
+    for key in ("start", "end"):
+        if math.isnan(record[key]):
+            record[key] = None
+    return record
+
+
+# --- 既存のテキスト形式の読み込み ---
+
+def read_timestamped_text(path: str, source: Optional[str] = None) -> List[Segment]:
+    """`[hh:mm:ss.mmm --> hh:mm:ss.mmm] テキスト` 形式（transcribe_audio.py の出力）を読み込む"""
+    source = source or os.path.basename(path)
+    segments = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            match = TIMESTAMP_LINE_RE.match(line.rstrip("\n"))
+            if not match:
+                continue
+            h1, m1, s1, h2, m2, s2, text = match.groups()
+            start = int(h1) * 3600 + int(m1) * 60 + float(s1)
+            end = int(h2) * 3600 + int(m2) * 60 + float(s2)
+            segments.append(Segment(start, end, text.strip(), source=source))
+    return segments
+
+
+def read_plain_text(path: str, source: Optional[str] = None) -> List[Segment]:
+    """時刻のない段落ごとのテキスト（day3/data/LLM2024_day4.txt など）を1行1セグメントとして読み込む"""
+    source = source or os.path.basename(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return [Segment(math.nan, math.nan, line.strip(), source=source) for line in f if line.strip()]
+
+
+def read_slide_analysis(path: str, source: Optional[str] = None) -> List[Segment]:
+    """
+    `[スライドN - hh:mm:ss]` 形式の動画解析結果をスライドごとのセグメントとして読み込む
+    スライドの終了時刻は次のスライドの開始時刻とする
+    """
+    from video_windows import parse_slide_sections
+
+    source = source or os.path.basename(path)
+    with open(path, "r", encoding="utf-8") as f:
+        sections = parse_slide_sections(f.read())
+    segments = []
+    for i, section in enumerate(sections):
+        end = sections[i + 1].timestamp if i + 1 < len(sections) else section.timestamp
+        segments.append(Segment(float(section.timestamp), float(max(end, section.timestamp)), section.body,
+                                source=source))
+    return segments
+
+
+def read_jsonl(path: str) -> List[Segment]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [segment_from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+def read_parquet(path: str) -> List[Segment]:
+    import pyarrow.parquet as pq
+
+    return [segment_from_dict(record) for record in pq.read_table(path).to_pylist()]
+
+
+def read_transcript(path: str) -> "TranscriptStore":
+    """
+    拡張子と内容から形式を判定して読み込む
+    （.jsonl / .parquet / タイムコード付きテキスト / スライドごとの解析結果 / 段落ごとのテキスト）
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".jsonl":
+        return TranscriptStore(read_jsonl(path))
+    if extension == ".parquet":
+        return TranscriptStore(read_parquet(path))
+
+    from video_windows import SLIDE_HEADER_RE
+
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(4096)
+    first_line = next((line for line in head.splitlines() if line.strip()), "")
+    if TIMESTAMP_LINE_RE.match(first_line):
+        return TranscriptStore(read_timestamped_text(path))
+    if SLIDE_HEADER_RE.search(head):
+        return TranscriptStore(read_slide_analysis(path))
+    return TranscriptStore(read_plain_text(path))
+
+
+# --- メモリ上のストア ---
+
+class TranscriptStore:
+    """
+    セグメントを列ごとの配列で保持し、時刻の区間と本文で検索する
+    区間の検索は開始時刻の昇順に並べた配列と、終了時刻の累積最大値の二分探索で候補を絞る
+    Args:
+        segments: Segment の列（開始時刻の順に並べ替える。時刻のないものは元の順で末尾に置く）
+    """
+
+    def __init__(self, segments: Iterable[Segment] = ()):
+        segments = list(segments)
+        starts = np.array([s.start for s in segments], dtype=np.float64)
+        order = np.argsort(starts, kind="stable")
+        self.starts = starts[order]
+        self.ends = np.array([segments[i].end for i in order], dtype=np.float64)
+        self.texts = [segments[i].text for i in order]
+        self.speakers = [segments[i].speaker for i in order]
+        self.confidences = [segments[i].confidence for i in order]
+        self.sources = [segments[i].source for i in order]
+        # 時刻のあるセグメントの数と、終了時刻の累積最大値（区間の検索に使う）
+        self._timed = int(np.count_nonzero(~np.isnan(self.starts)))
+        self._max_end = np.maximum.accumulate(np.nan_to_num(self.ends[:self._timed], nan=-np.inf)) \
+            if self._timed else np.zeros(0)
+        self._joined = None
+        self._offsets = None
+
+    @classmethod
+    def from_dicts(cls, segments: Iterable[dict], source: Optional[str] = None) -> "TranscriptStore":
+        """Whisper形式のセグメントの辞書から作る"""
+        return cls(segment_from_dict(segment, source) for segment in segments)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, index: int) -> Segment:
+        return Segment(float(self.starts[index]), float(self.ends[index]), self.texts[index],
+                       self.speakers[index], self.confidences[index], self.sources[index])
+
+    def __iter__(self) -> Iterator[Segment]:
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def duration(self) -> float:
+        """最後のセグメントの終了時刻"""
+        return float(self._max_end[-1]) if self._timed else 0.0
+
+    def indices_between(self, start: float, end: float) -> np.ndarray:
+        """区間 [start, end) と重なるセグメントの番号"""
+        # 開始時刻が end より前で、終了時刻が start より後のもの
+        last = int(np.searchsorted(self.starts[:self._timed], end, side="left"))
+        first = int(np.searchsorted(self._max_end, start, side="left"))
+        if first >= last:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.arange(first, last)
+        ends = self.ends[first:last]
+        starts = self.starts[first:last]
+        # 長さ0のセグメント（スライドの最後など）は開始時刻が区間に含まれれば対象にする
+        return candidates[(ends > start) | ((ends == starts) & (starts >= start))]
+
+    def between(self, start: float, end: float) -> List[Segment]:
+        """区間 [start, end) と重なるセグメント"""
+        return [self[i] for i in self.indices_between(start, end)]
+
+    def at(self, time: float) -> Optional[Segment]:
+        """指定の時刻を含むセグメント（なければ None）"""
+        indices = self.indices_between(time, np.nextafter(time, np.inf))
+        return self[int(indices[0])] if len(indices) else None
+
+    def text_between(self, start: float, end: float, separator: str = "\n") -> str:
+        """区間 [start, end) と重なるセグメントの本文をつなげたもの"""
+        return separator.join(self.texts[i] for i in self.indices_between(start, end))
+
+    def search(self, query: str, regex: bool = False) -> List[Segment]:
+        """
+        本文に query を含むセグメントを返す
+        全セグメントの本文を1つの文字列につなげて検索し、見つかった位置からセグメントを求める
+        """
+        if self._joined is None:
+            self._joined = "\n".join(self.texts)
+            lengths = np.array([len(text) + 1 for text in self.texts], dtype=np.int64)
+            self._offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(lengths) else lengths
+        if regex:
+            positions = [m.start() for m in re.finditer(query, self._joined)]
+        else:
+            positions = []
+            position = self._joined.find(query)
+            while position != -1:
+                positions.append(position)
+                position = self._joined.find(query, position + 1)
+        indices = np.unique(np.searchsorted(self._offsets, positions, side="right") - 1)
+        return [self[int(i)] for i in indices]
+
+    def to_dicts(self) -> List[dict]:
+        return [segment_to_record(segment) for segment in self]
+
+    def save(self, path: str) -> str:
+        """拡張子（.jsonl / .parquet）に合わせて保存する"""
+        if path.lower().endswith(".parquet"):
+            write_parquet(self, path)
+        else:
+            write_jsonl(self, path)
+        return path
+
+
+# --- ファイルへの保存と区間の読み込み ---
+
+def write_jsonl(segments: Iterable[Segment], path: str) -> None:
+    """セグメントを1行1件のJSONLで保存し、索引を作る"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for segment in segments:
+            f.write(json.dumps(segment_to_record(segment), ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+    build_index(path)
+
+
+def append_jsonl(segments: Iterable[Segment], f) -> int:
+    """開いているファイル（バイナリ）にセグメントを追記し、書いたバイト数を返す"""
+    data = "".join(json.dumps(segment_to_record(s), ensure_ascii=False) + "\n" for s in segments).encode("utf-8")
+    f.write(data)
+    return len(data)
+
+
+def build_index(path: str) -> np.ndarray:
+    """
+    JSONLのセグメントストアの索引（時刻、終了時刻の累積最大値、バイト位置）を作って保存する
+    時刻のないセグメントは索引の末尾に置き、区間の検索では使わない
+    """
+    rows = []
+    with open(path, "rb") as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                start = math.nan if record.get("start") is None else record["start"]
+                end = math.nan if record.get("end") is None else record["end"]
+                rows.append((start, end, 0.0, offset, len(line)))
+            offset += len(line)
+    index = np.array(rows, dtype=INDEX_DTYPE)
+    index = index[np.argsort(index["start"], kind="stable")]
+    timed = ~np.isnan(index["start"])
+    index["max_end"][timed] = np.maximum.accumulate(np.nan_to_num(index["end"][timed], nan=-np.inf))
+    index["max_end"][~timed] = np.nan
+    tmp_path = path + ".idx.tmp.npy"
+    np.save(tmp_path, index)
+    os.replace(tmp_path, path + INDEX_SUFFIX)
+    return index
+
+
+def load_index(path: str) -> np.ndarray:
+    """索引を読み込む（ないか、ストアより古い場合は作り直す）"""
+    index_path = path + INDEX_SUFFIX
+    if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(path):
+        return build_index(path)
+    return np.load(index_path, mmap_mode="r")
+
+
+def read_range(path: str, start: float, end: float) -> List[Segment]:
+    """
+    保存したストアから区間 [start, end) と重なるセグメントだけを読み込む
+    JSONLでは索引から該当する行の位置を求めて読み、Parquetでは行グループの統計で読む範囲を絞る
+    """
+    if path.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path, filters=[("start", "<", end), ("end", ">=", start)])
+        segments = [segment_from_dict(record) for record in table.to_pylist()]
+        return [s for s in sorted(segments, key=lambda s: s.start) if s.end > start or s.end == s.start]
+
+    index = load_index(path)
+    timed = index[~np.isnan(index["start"])]
+    last = int(np.searchsorted(timed["start"], end, side="left"))
+    first = int(np.searchsorted(timed["max_end"], start, side="left"))
+    rows = timed[first:last]
+    rows = rows[(rows["end"] > start) | ((rows["end"] == rows["start"]) & (rows["start"] >= start))]
+    segments = []
+    with open(path, "rb") as f:
+        for row in rows:
+            f.seek(int(row["offset"]))
+            segments.append(segment_from_dict(json.loads(f.read(int(row["length"])))))
+    return segments
+
+
+def write_parquet(store: TranscriptStore, path: str, row_group_size: int = 1000) -> None:
+    """Parquetで保存する（pyarrow が必要）。行グループごとの時刻の統計で区間の読み込みを絞れる"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquetでの保存には pyarrow が必要です（pip install pyarrow）")
+    table = pa.table({
+        "start": pa.array(store.starts, pa.float64()),
+        "end": pa.array(store.ends, pa.float64()),
+        "text": pa.array(store.texts, pa.string()),
+        "speaker": pa.array(store.speakers, pa.string()),
+        "confidence": pa.array(store.confidences, pa.float64()),
+        "source": pa.array(store.sources, pa.string()),
+    })
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    pq.write_table(table, path, row_group_size=row_group_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文字起こしのセグメントストアの変換と検索")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="テキストの文字起こしをストア（.jsonl / .parquet）に変換する")
+    convert.add_argument("input", help="入力ファイル")
+    convert.add_argument("output", help="出力ファイル（.jsonl / .parquet）")
+
+    range_parser = subparsers.add_parser("range", help="時刻の区間のセグメントを表示する")
+    range_parser.add_argument("store", help="ストアのファイル")
+    range_parser.add_argument("start", help="開始時刻（hh:mm:ss または秒）")
+    range_parser.add_argument("end", help="終了時刻（hh:mm:ss または秒）")
+
+    search = subparsers.add_parser("search", help="本文を検索する")
+    search.add_argument("store", help="ストアまたはテキストの文字起こしのファイル")
+    search.add_argument("query", help="検索する文字列")
+    search.add_argument("--regex", action="store_true", help="正規表現として検索する")
+    args = parser.parse_args()
+
+    from transcribe_audio import format_timestamp
+
+    if args.command == "convert":
+        store = read_transcript(args.input)
+        store.save(args.output)
+        print(f"{len(store)}個のセグメントを保存しました: {args.output}")
+        return
+    if args.command == "range":
+        segments = read_range(args.store, parse_time(args.start), parse_time(args.end))
+    else:
+        segments = read_transcript(args.store).search(args.query, regex=args.regex)
+    for segment in segments:
+        timestamp = "" if math.isnan(segment.start) else \
+            f"[{format_timestamp(segment.start)} --> {format_timestamp(segment.end)}] "
+        print(f"{timestamp}{segment.text}")
+    print(f"==> {len(segments)}件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+動画ファイルのストリーミングアップロード
+
+Gemini File API のレジュマブルアップロードを使い、動画を固定サイズのバッファで
+ディスクから読みながら分割して送信する。ファイル全体をメモリに読み込まないため、
+動画のサイズが大きくてもメモリ使用量は一定に保たれる。
+
+使い方:
+    # アップロード処理のメモリ使用量を計測する（ローカルの代替サーバーを使用）
+    python video_upload.py --benchmark --sizes 64 256 1024
+"""
+import argparse
+import hashlib
+import json
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+UPLOAD_URL = "https://generativelanguage.googleapis.com/upload/v1beta/files"
+
+# 分割サイズはサーバーの要求する単位（256KiB）の倍数にする
+CHUNK_GRANULARITY = 256 * 1024
+DEFAULT_CHUNK_SIZE = 32 * CHUNK_GRANULARITY  # 8MiB
+
+# (HTTPステータス, レスポンスヘッダー, レスポンス本文)
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+class UploadError(Exception):
+    """アップロードに失敗した場合の例外"""
+
+
+class TransientUploadError(UploadError):
+    """サーバーの一時的なエラー（5xx・429）。受信済みの位置から再開できる"""
+
+
+def is_transient_status(status: int) -> bool:
+    """再開を試みるべきHTTPステータスか"""
+    return status == 429 or status >= 500
+
+
+class HttpTransport:
+    """urllib を使ったHTTP通信"""
+
+    def __init__(self, timeout: float = 300):
+        self.timeout = timeout
+
+    def request(self, method: str, url: str, headers: Dict[str, str], body=None) -> Response:
+        req = urllib.request.Request(url, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as res:
+                return res.status, {k.lower(): v for k, v in res.headers.items()}, res.read()
+        except urllib.error.HTTPError as e:
+            return e.code, {k.lower(): v for k, v in e.headers.items()}, e.read()
+
+
+class LocalUploadStandIn:
+    """
+    レジュマブルアップロードのプロトコルを実装したローカルの代替サーバー
+    受信したデータは保持せずハッシュだけを計算するため、テストやベンチマークで
+    大きなファイルを扱ってもメモリを消費しない
+    Args:
+        fail_after_chunks: 指定した数のチャンクを受信した後、1度だけ通信エラーを発生させる
+        fail_status: 指定すると、通信エラーの代わりにこのHTTPステータス（503 など）を返す
+        fail_queries: 受信済みバイト数の問い合わせで、最初に通信エラーを発生させる回数
+        fail_starts: アップロードの開始を、最初に 503 で拒否する回数
+    """
+
+    def __init__(self, fail_after_chunks: Optional[int] = None, fail_status: Optional[int] = None,
+                 fail_queries: int = 0, fail_starts: int = 0):
+        self.fail_after_chunks = fail_after_chunks
+        self.fail_status = fail_status
+        self.fail_queries = fail_queries
+        self.fail_starts = fail_starts
+        self.sessions = {}
+        self.chunks_received = 0
+        self.max_chunk_bytes = 0
+
+    def request(self, method: str, url: str, headers: Dict[str, str], body=None) -> Response:
+        headers = {k.lower(): v for k, v in headers.items()}
+        command = headers.get("x-goog-upload-command", "")
+
+        if command == "start":
+            if self.fail_starts > 0:
+                self.fail_starts -= 1
+                return 503, {}, b'{"error": "service unavailable"}'
+            session_id = f"session-{len(self.sessions) + 1}"
+            metadata = json.loads(body or b"{}").get("file", {})
+            self.sessions[session_id] = {
+                "size": int(headers["x-goog-upload-header-content-length"]),
+                "mime_type": headers["x-goog-upload-header-content-type"],
+                "display_name": metadata.get("display_name", ""),
+                "received": 0,
+                "sha256": hashlib.sha256(),
+            }
+            return 200, {
+                "x-goog-upload-url": f"local://upload/{session_id}",
+                "x-goog-upload-chunk-granularity": str(CHUNK_GRANULARITY),
+            }, b""
+
+        session_id = url.rsplit("/", 1)[-1]
+        session = self.sessions.get(session_id)
+        if session is None:
+            return 404, {}, b'{"error": "unknown upload session"}'
+
+        if command == "query":
+            if self.fail_queries > 0:
+                self.fail_queries -= 1
+                raise ConnectionError("模擬的な通信エラー")
+            return 200, {"x-goog-upload-status": "active",
+                         "x-goog-upload-size-received": str(session["received"])}, b""
+
+        if self.fail_after_chunks is not None and self.chunks_received >= self.fail_after_chunks:
+            self.fail_after_chunks = None
+            if self.fail_status is not None:
+                return self.fail_status, {}, b'{"error": "service unavailable"}'
+            raise ConnectionError("模擬的な通信エラー")
+
+        offset = int(headers["x-goog-upload-offset"])
+        if offset != session["received"]:
+            return 400, {}, b'{"error": "offset mismatch"}'
+        data = memoryview(body) if body is not None else memoryview(b"")
+        session["sha256"].update(data)
+        session["received"] += data.nbytes
+        self.chunks_received += 1
+        self.max_chunk_bytes = max(self.max_chunk_bytes, data.nbytes)
+
+        if "finalize" not in command:
+            return 200, {"x-goog-upload-status": "active"}, b""
+        if session["received"] != session["size"]:
+            return 400, {}, b'{"error": "size mismatch"}'
+        resource_body = {"file": {
+            "name": f"files/{session_id}",
+            "displayName": session["display_name"],
+            "mimeType": session["mime_type"],
+            "sizeBytes": str(session["size"]),
+            "sha256Hash": session["sha256"].hexdigest(),
+            "uri": f"local://files/{session_id}",
+            "state": "ACTIVE",
+        }}
+        return 200, {"x-goog-upload-status": "final"}, json.dumps(resource_body).encode("utf-8")
+
+
+class ResumableUploader:
+    """
+    レジュマブルアップロードでファイルを分割送信する
+    Args:
+        api_key: Google APIキー
+        transport: HTTP通信の実装（省略時は urllib を使用）
+        chunk_size: 1回に送信するバイト数（256KiBの倍数）
+        progress: 進捗を受け取るコールバック (送信済みバイト数, 全体のバイト数)
+        max_retries: 通信エラーやサーバーの一時的なエラー（5xx・429）の後に再開を試みる回数
+        retry_wait: 再開までの待ち時間の基準（秒）。試行ごとに倍にする
+    """
+
+    def __init__(self, api_key: str, transport=None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 progress: Optional[Callable[[int, int], None]] = None, max_retries: int = 5,
+                 retry_wait: float = 1.0):
+        if chunk_size % CHUNK_GRANULARITY:
+            raise ValueError(f"chunk_sizeは{CHUNK_GRANULARITY}の倍数で指定してください: {chunk_size}")
+        self.api_key = api_key
+        self.transport = transport or HttpTransport()
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.max_retries = max_retries
+        self.retry_wait = retry_wait
+
+    def _start(self, size: int, mime_type: str, display_name: str) -> str:
+        status, headers, body = self.transport.request(
+            "POST",
+            f"{UPLOAD_URL}?key={self.api_key}",
+            {
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(size),
+                "X-Goog-Upload-Header-Content-Type": mime_type,
+                "Content-Type": "application/json",
+            },
+            json.dumps({"file": {"display_name": display_name}}).encode("utf-8"),
+        )
+        if is_transient_status(status):
+            raise TransientUploadError(f"アップロードの開始に失敗しました: {status} {body[:200]!r}")
+        if status != 200 or "x-goog-upload-url" not in headers:
+            raise UploadError(f"アップロードの開始に失敗しました: {status} {body[:200]!r}")
+        return headers["x-goog-upload-url"]
+
+    def _query_offset(self, upload_url: str) -> int:
+        """サーバーが受信済みのバイト数を問い合わせる"""
+        status, headers, body = self.transport.request(
+            "POST", upload_url, {"X-Goog-Upload-Command": "query"}, b""
+        )
+        if is_transient_status(status):
+            raise TransientUploadError(f"アップロード状況の確認に失敗しました: {status} {body[:200]!r}")
+        if status != 200:
+            raise UploadError(f"アップロード状況の確認に失敗しました: {status} {body[:200]!r}")
+        return int(headers.get("x-goog-upload-size-received", "0"))
+
+    def _wait_before_retry(self, error: Exception, retries: int) -> int:
+        """再開までの待ち時間だけ待ち、再開の試行回数を返す（回数の上限を超えたら UploadError）"""
+        retries += 1
+        if retries > self.max_retries:
+            raise UploadError(f"アップロードを再開できませんでした: {error}") from error
+        wait = min(self.retry_wait * 2 ** (retries - 1), 30)
+        print(f"一時的なエラーが発生しました（{error}）。{wait:.0f}秒後に再開します...")
+        time.sleep(wait)
+        return retries
+
+    def upload(self, file_path: str, mime_type: str, display_name: Optional[str] = None) -> dict:
+        """
+        ファイルをアップロードする
+        Args:
+            file_path: アップロードするファイルのパス
+            mime_type: ファイルのMIMEタイプ
+            display_name: 表示名（省略時はファイル名）
+        Returns:
+            アップロードされたファイルの情報（name, uri, mimeType など）
+        """
+        size = os.path.getsize(file_path)
+        retries = 0
+        while True:
+            try:
+                upload_url = self._start(size, mime_type, display_name or Path(file_path).name)
+                break
+            except (OSError, ConnectionError, TransientUploadError) as e:
+                retries = self._wait_before_retry(e, retries)
+
+        # 同じバッファを使い回して読み込むため、メモリ使用量はchunk_size程度に収まる
+        buffer = bytearray(self.chunk_size)
+        view = memoryview(buffer)
+        offset = 0
+        retries = 0
+        resume = False
+        with open(file_path, "rb") as f:
+            while True:
+                if resume:
+                    # 再開の位置を問い合わせる（問い合わせ自体の失敗も再開の試行として数える）
+                    try:
+                        offset = self._query_offset(upload_url)
+                    except (OSError, ConnectionError, TransientUploadError) as e:
+                        retries = self._wait_before_retry(e, retries)
+                        continue
+                    resume = False
+                f.seek(offset)
+                length = f.readinto(buffer)
+                if length == 0 and offset < size:
+                    # アップロード中にファイルが短くなった（空のチャンクを送り続けないようにする）
+                    raise UploadError(f"アップロード中にファイルが変更されました（{offset}/{size}バイト）")
+                is_last = offset + length >= size
+                command = "upload, finalize" if is_last else "upload"
+                try:
+                    status, _, body = self.transport.request(
+                        "POST",
+                        upload_url,
+                        {
+                            "Content-Length": str(length),
+                            "X-Goog-Upload-Command": command,
+                            "X-Goog-Upload-Offset": str(offset),
+                        },
+                        view[:length],
+                    )
+                    if is_transient_status(status):
+                        raise TransientUploadError(f"サーバーの一時的なエラー: {status} {body[:200]!r}")
+                except (OSError, ConnectionError, TransientUploadError) as e:
+                    retries = self._wait_before_retry(e, retries)
+                    resume = True
+                    continue
+                if status != 200:
+                    raise UploadError(f"アップロードに失敗しました: {status} {body[:200]!r}")
+
+                offset += length
+                retries = 0
+                if self.progress:
+                    self.progress(offset, size)
+                if is_last:
+                    return json.loads(body)["file"]
+
+
+def print_progress(sent: int, total: int) -> None:
+    """アップロードの進捗を表示する"""
+    percent = sent / total * 100 if total else 100.0
+    print(f"\rアップロード中: {sent / 1024 ** 2:.1f}MB / {total / 1024 ** 2:.1f}MB ({percent:.1f}%)",
+          end="", flush=True)
+    if sent >= total:
+        print()
+
+
+def measure_peak_memory(fn: Callable[[], object]) -> Tuple[object, int, float]:
+    """
+    関数を実行し、実行中のPythonのメモリ確保量のピークを計測する
+    Returns:
+        (関数の戻り値, ピークのバイト数, 実行時間[秒])
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, peak, elapsed
+
+
+def benchmark(sizes_mb, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    """
+    ファイル全体を読み込む従来の方法と、分割アップロードのメモリ使用量を比較する
+    Args:
+        sizes_mb: 試す動画サイズ（MB）のリスト
+        chunk_size: 分割アップロードの1回の送信バイト数
+    """
+    def read_whole(path):
+        with open(path, "rb") as f:
+            return len(f.read())
+
+    print(f"{'サイズ':>8} | {'従来(一括読み込み)':>18} | {'分割アップロード':>16} | {'処理時間':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size_mb in sizes_mb:
+            path = os.path.join(tmp_dir, f"video_{size_mb}mb.mp4")
+            block = os.urandom(1024 * 1024)
+            with open(path, "wb") as f:
+                for _ in range(size_mb):
+                    f.write(block)
+
+            _, whole_peak, _ = measure_peak_memory(lambda: read_whole(path))
+            uploader = ResumableUploader("local", transport=LocalUploadStandIn(), chunk_size=chunk_size)
+            uploaded, stream_peak, elapsed = measure_peak_memory(
+                lambda: uploader.upload(path, "video/mp4")
+            )
+            assert int(uploaded["sizeBytes"]) == size_mb * 1024 * 1024
+            print(f"{size_mb:>6}MB | {whole_peak / 1024 ** 2:>16.1f}MB | "
+                  f"{stream_peak / 1024 ** 2:>14.1f}MB | {elapsed:>7.2f}s")
+            os.remove(path)
+
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"プロセスの最大常駐メモリ: {max_rss_mb:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="動画ファイルを分割してアップロードする")
+    parser.add_argument("--benchmark", action="store_true", help="メモリ使用量を計測する")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 256, 1024],
+                        help="ベンチマークで試す動画サイズ（MB）")
+    parser.add_argument("--chunk-mb", type=int, default=DEFAULT_CHUNK_SIZE // 1024 ** 2,
+                        help="1回に送信するサイズ（MB）")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.sizes, chunk_size=args.chunk_mb * 1024 ** 2)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
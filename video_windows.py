@@ -0,0 +1,245 @@
+"""
+時間窓に分割した動画の並列解析
+
+動画を一定の長さの時間窓（前後の窓と少し重ねる）に分割し、各窓を並列に解析してから、
+`[スライドN - hh:mm:ss]` 形式の結果を全体の時刻に補正して1つにまとめる。
+窓の境界で重複したスライドは1つにまとめる。
+
+使い方:
+    # 解析の代わりに一定時間待つだけの処理で、並列数ごとのスループットを計測する
+    python video_windows.py --benchmark --workers 1 2 4 8
+"""
+import argparse
+import difflib
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from ffmpeg_utils import cut_clip, make_synthetic_video, probe_media
+
+SLIDE_HEADER_RE = re.compile(r"\[スライド\s*(\d+)\s*[-－]\s*(\d{1,2}):(\d{2}):(\d{2})\]")
+
+# 境界のスライドを同じものとみなす内容の類似度
+DUPLICATE_SIMILARITY = 0.8
+
+
+class Window(NamedTuple):
+    """解析する時間窓"""
+    index: int
+    start: float
+    end: float
+
+
+class SlideSection(NamedTuple):
+    """解析結果の1スライド分"""
+    timestamp: float  # 動画全体での開始時刻（秒）
+    body: str  # 見出しを除いた本文
+
+
+def format_hms(seconds: float) -> str:
+    """秒数を hh:mm:ss 形式にする"""
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def plan_windows(duration: float, window_seconds: float, overlap_seconds: float) -> List[Window]:
+    """
+    動画を重なりのある時間窓に分割する
+    Args:
+        duration: 動画の長さ（秒）
+        window_seconds: 1つの窓の長さ（秒）
+        overlap_seconds: 前の窓と重ねる長さ（秒）
+    Returns:
+        時間窓のリスト
+    """
+    if window_seconds <= overlap_seconds:
+        raise ValueError("窓の長さは重なりより長くしてください")
+    windows = []
+    start = 0.0
+    while True:
+        end = min(start + window_seconds, duration)
+        windows.append(Window(len(windows), start, end))
+        if end >= duration:
+            return windows
+        start = end - overlap_seconds
+
+
+def parse_slide_sections(text: str, offset: float = 0.0) -> List[SlideSection]:
+    """
+    解析結果をスライドごとに分割する
+    Args:
+        text: `[スライドN - hh:mm:ss]` 形式の見出しを含む解析結果
+        offset: 時刻に加える秒数（時間窓の開始位置）
+    Returns:
+        スライドのリスト（見出しより前の前置きは含まない）
+    """
+    headers = list(SLIDE_HEADER_RE.finditer(text))
+    sections = []
+    for i, header in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        body = text[header.end():end].strip()
+        # スライド間の区切り線は結合時に付け直す
+        body = re.sub(r"\n-{3,}\s*$", "", body).strip()
+        _, hours, minutes, seconds = header.groups()
+        timestamp = int(hours) * 3600 + int(minutes) * 60 + int(seconds) + offset
+        sections.append(SlideSection(timestamp, body))
+    return sections
+
+
+def _slide_content(body: str) -> str:
+    """本文のうちスライドの内容の部分（重複判定に使う）"""
+    content = body.split("説明：", 1)[0]
+    return re.sub(r"\s+", "", content.replace("スライドの内容：", ""))
+
+
+def _is_duplicate(section: SlideSection, candidates: List[SlideSection]) -> bool:
+    content = _slide_content(section.body)
+    for candidate in candidates:
+        other = _slide_content(candidate.body)
+        if content == other or difflib.SequenceMatcher(None, content, other).ratio() >= DUPLICATE_SIMILARITY:
+            return True
+    return False
+
+
+def merge_window_results(results: List[Tuple[Window, str]]) -> List[SlideSection]:
+    """
+    時間窓ごとの解析結果を1つにまとめる
+    窓の重なり部分に現れたスライドは、前の窓で同じ内容のスライドがあれば除く
+    Args:
+        results: (時間窓, 解析結果のテキスト) のリスト
+    Returns:
+        時刻順に並んだスライドのリスト
+    """
+    merged: List[SlideSection] = []
+    previous_end = None
+    for window, text in sorted(results, key=lambda item: item[0].start):
+        sections = parse_slide_sections(text, offset=window.start)
+        if previous_end is not None:
+            # 前の窓の重なり部分とその直前に現れたスライドが重複の候補
+            overlap = previous_end - window.start
+            candidates = [s for s in merged if s.timestamp >= window.start - overlap]
+            deduplicated = []
+            for section in sections:
+                if section.timestamp < previous_end and _is_duplicate(section, candidates):
+                    continue
+                deduplicated.append(section)
+            sections = deduplicated
+        merged.extend(sections)
+        previous_end = window.end
+    return sorted(merged, key=lambda s: s.timestamp)
+
+
+def format_sections(sections: List[SlideSection], separator: str = "\n\n") -> str:
+    """スライドを `[スライドN - hh:mm:ss]` 形式で番号を振り直して出力する"""
+    return separator.join(
+        f"[スライド{i} - {format_hms(section.timestamp)}]\n{section.body}"
+        for i, section in enumerate(sections, start=1)
+    )
+
+
+def analyze_in_windows(video_path: str, analyze_window: Callable[[str], Optional[str]],
+                       window_seconds: float = 600, overlap_seconds: float = 30,
+                       max_workers: int = 4, separator: str = "\n\n") -> Optional[str]:
+    """
+    動画を時間窓に分割し、並列に解析して結果をまとめる
+    Args:
+        video_path: 動画ファイルのパス
+        analyze_window: 窓の動画ファイルのパスを受け取り、解析結果のテキストを返す関数（例外は失敗として扱う）
+        window_seconds: 1つの窓の長さ（秒）
+        overlap_seconds: 前の窓と重ねる長さ（秒）
+        max_workers: 同時に解析する窓の数
+        separator: 結合時のスライド間の区切り
+    Returns:
+        全体の時刻に補正したスライドごとの解析結果（解析に失敗した窓があれば None）
+    """
+    duration = probe_media(video_path)["duration"]
+    if not duration:
+        raise ValueError(f"動画の長さを取得できませんでした: {video_path}")
+    windows = plan_windows(duration, window_seconds, overlap_seconds)
+    print(f"動画を{len(windows)}個の時間窓に分割して解析します（同時実行数: {max_workers}）")
+
+    suffix = os.path.splitext(video_path)[1] or ".mp4"
+    with tempfile.TemporaryDirectory() as work_dir:
+        def run(window: Window) -> Tuple[Window, Optional[str]]:
+            start = time.perf_counter()
+            clip_path = os.path.join(work_dir, f"window_{window.index:03d}{suffix}")
+            try:
+                cut_clip(video_path, clip_path, window.start, window.end - window.start)
+                text = analyze_window(clip_path)
+            except Exception as e:
+                # 1つの窓の失敗で他の窓の解析を止めず、失敗した窓として扱う
+                print(f"警告: 時間窓{window.index + 1} ({format_hms(window.start)}-{format_hms(window.end)}) "
+                      f"の解析中にエラーが発生しました: {type(e).__name__}: {e}")
+                return window, None
+            finally:
+                if os.path.exists(clip_path):
+                    os.remove(clip_path)
+            print(f"時間窓{window.index + 1}/{len(windows)} "
+                  f"({format_hms(window.start)}-{format_hms(window.end)}) の解析が完了しました: "
+                  f"{time.perf_counter() - start:.1f}秒")
+            return window, text
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(run, windows))
+        elapsed = time.perf_counter() - start
+
+    failed = [window for window, text in results if not text]
+    for window in failed:
+        print(f"警告: 時間窓{window.index + 1} ({format_hms(window.start)}-{format_hms(window.end)}) "
+              "の解析結果がありません")
+    if failed:
+        # 一部の窓だけをまとめた結果は返さない（動画全体のキャッシュに残らないようにし、次回に失敗した窓だけをやり直す）
+        print(f"{len(failed)}/{len(windows)}個の時間窓の解析に失敗したため、結果をまとめません: {elapsed:.1f}秒")
+        return None
+    sections = merge_window_results(results)
+    print(f"全時間窓の解析が完了しました: {elapsed:.1f}秒, {len(sections)}スライド")
+    return format_sections(sections, separator=separator)
+
+
+def benchmark(worker_counts: List[int], video_seconds: int = 240, window_seconds: float = 60,
+              overlap_seconds: float = 10, latency: float = 1.0) -> None:
+    """
+    解析の代わりに一定時間待つ処理を使い、並列数ごとのスループットを計測する
+    Args:
+        worker_counts: 試す同時実行数のリスト
+        video_seconds: 合成する動画の長さ（秒）
+        window_seconds: 1つの窓の長さ（秒）
+        overlap_seconds: 前の窓と重ねる長さ（秒）
+        latency: 1つの窓の解析にかかる時間（秒）
+    """
+    def fake_analyze(clip_path: str) -> str:
+        clip_duration = probe_media(clip_path)["duration"]
+        time.sleep(latency)
+        return f"[スライド1 - 00:00:00]\nスライドの内容：\n* {os.path.basename(clip_path)}\n\n" \
+               f"説明：{clip_duration:.0f}秒の区間です。"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = make_synthetic_video(os.path.join(tmp_dir, "synthetic.mp4"), video_seconds)
+        windows = plan_windows(video_seconds, window_seconds, overlap_seconds)
+        print(f"合成動画: {video_seconds}秒, 時間窓: {len(windows)}個, 1窓あたりの解析時間: {latency}秒")
+        for workers in worker_counts:
+            start = time.perf_counter()
+            analyze_in_windows(video_path, fake_analyze, window_seconds, overlap_seconds, workers)
+            elapsed = time.perf_counter() - start
+            print(f"==> 同時実行数 {workers}: {elapsed:.2f}秒, {len(windows) / elapsed:.2f}窓/秒\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="時間窓に分割した動画の並列解析")
+    parser.add_argument("--benchmark", action="store_true", help="並列数ごとのスループットを計測する")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="ベンチマークで試す同時実行数")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.workers)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Whisperモデルの共有と文字起こしワーカー
+
+WhisperModelHolder は最初に使われたときに1回だけモデルを読み込み、以降は同じモデルを返す。
+モデルの大きさとデバイスは引数か環境変数（WHISPER_MODEL, WHISPER_DEVICE）で指定する。
+get_whisper_model() で同じ設定のモデルをプロセス内の全モジュールで共有する。
+
+文字起こしのバックエンドは BACKENDS から選ぶ（引数か環境変数 WHISPER_BACKEND）。
+    whisper          openai-whisper（既定）
+    whisper-int8     openai-whisper の線形層をint8に動的量子化したもの（CPUのみ、追加の依存なし）
+    faster-whisper   CTranslate2によるint8推論（pip install faster-whisper）
+どのバックエンドも whisper と同じ形式（text, segments）の結果を返す。
+
+TranscriptionWorker はモデルを読み込んだ子プロセスを起動したままにし、キュー経由で
+文字起こしのジョブを受け付ける。一括処理ではモデルの読み込みが最初の1回だけになる。
+
+使い方:
+    with TranscriptionWorker(model_name="small") as worker:
+        futures = [worker.submit(path) for path in audio_files]
+        for future in futures:
+            segments = future.result()
+"""
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_MODEL = os.getenv("WHISPER_MODEL", "base")
+DEFAULT_DEVICE = os.getenv("WHISPER_DEVICE") or None
+DEFAULT_BACKEND = os.getenv("WHISPER_BACKEND", "whisper")
+# ワーカープロセスから返すセグメントの項目（avg_logprob はセグメントストアの信頼度に使う）
+SEGMENT_KEYS = ("start", "end", "text", "avg_logprob")
+
+
+def load_whisper(model_name: str, device: Optional[str] = None):
+    """Whisperモデルを読み込む（Whisperを使わない処理で読み込みが必要にならないよう、ここでimportする）"""
+    import whisper
+    return whisper.load_model(model_name, device=device)
+
+
+def load_whisper_int8(model_name: str, device: Optional[str] = None):
+    """
+    Whisperモデルを読み込み、線形層をint8に動的量子化する
+    量子化した線形層はCPUでしか動かないため、CPU以外のデバイスはエラーにする
+    """
+    if device and not device.startswith("cpu"):
+        raise ValueError(f"whisper-int8 はCPUでのみ使えます: {device}")
+    import torch
+    import whisper
+    model = whisper.load_model(model_name, device="cpu")
+    # whisper の Linear は入力の型に重みを合わせるだけの nn.Linear のサブクラスで、
+    # 量子化の対象は型が一致するものに限られるため、fp32のCPU推論では同じ動作の nn.Linear に戻しておく
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class FasterWhisperModel:
+    """
+    faster-whisper のモデルを whisper と同じ呼び出し方・結果の形式で使うためのラッパー
+    Args:
+        model: faster_whisper.WhisperModel
+        device: 実行デバイス
+    """
+
+    # whisper の引数のうち、faster-whisper にそのまま渡せるもの
+    OPTIONS = ("language", "task", "initial_prompt", "beam_size", "best_of", "temperature",
+               "condition_on_previous_text", "word_timestamps", "no_speech_threshold")
+
+    def __init__(self, model, device: str = "cpu"):
+        self.model = model
+        self.device = device
+
+    def transcribe(self, audio, **options) -> dict:
+        """音声ファイルのパスか16kHzの音声データを文字起こしする（fp16, verbose などwhisper固有の引数は無視する）"""
+        kwargs = {key: value for key, value in options.items() if key in self.OPTIONS and value is not None}
+        segments, info = self.model.transcribe(audio, **kwargs)
+        segments = [{"id": i, "start": s.start, "end": s.end, "text": s.text, "avg_logprob": s.avg_logprob}
+                    for i, s in enumerate(segments)]
+        return {"text": "".join(s["text"] for s in segments), "segments": segments, "language": info.language}
+
+
+def load_faster_whisper(model_name: str, device: Optional[str] = None) -> FasterWhisperModel:
+    """faster-whisper のモデルをint8で読み込む（GPUでは重みをint8、計算をfloat16にする）"""
+    from faster_whisper import WhisperModel
+    device = device or "cpu"
+    compute_type = "int8" if device.startswith("cpu") else "int8_float16"
+    return FasterWhisperModel(WhisperModel(model_name, device=device, compute_type=compute_type), device)
+
+
+BACKENDS: Dict[str, Callable] = {
+    "whisper": load_whisper,
+    "whisper-int8": load_whisper_int8,
+    "faster-whisper": load_faster_whisper,
+}
+
+
+def get_loader(backend: Optional[str] = None) -> Callable:
+    """バックエンド名からモデルを読み込む関数を返す"""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"不明なバックエンドです: {backend}（{', '.join(BACKENDS)} から選んでください）")
+    return BACKENDS[backend]
+
+
+class WhisperModelHolder:
+    """
+    Whisperモデルを必要になったときに1回だけ読み込んで保持する
+    Args:
+        model_name: モデルの大きさ（tiny, base, small, medium, large など）
+        device: 実行デバイス（cpu, cuda など。省略時はWhisperが自動で選ぶ）
+        loader: モデルを読み込む関数 (model_name, device) -> モデル（省略時は backend から選ぶ）
+        backend: バックエンド名（省略時は環境変数 WHISPER_BACKEND、なければ whisper）
+    """
+
+    def __init__(self, model_name: Optional[str] = None, device: Optional[str] = None,
+                 loader: Optional[Callable] = None, backend: Optional[str] = None):
+        self.model_name = model_name or DEFAULT_MODEL
+        self.device = device or DEFAULT_DEVICE
+        self.loader = loader or get_loader(backend)
+        self.load_seconds: Optional[float] = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def get(self):
+        """モデルを返す（初回のみ読み込む）"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    print(f"Whisperモデルを読み込んでいます: {self.model_name}"
+                          + (f" ({self.device})" if self.device else ""))
+                    self._model = self.loader(self.model_name, self.device)
+                    self.load_seconds = time.perf_counter() - start
+        return self._model
+
+    def transcribe(self, audio_path: str, **options) -> dict:
+        """
+        文字起こしを行う
+        CPUではfp16が使えないため、指定がなければ無効にして警告を出さないようにする
+        """
+        model = self.get()
+        device = str(getattr(model, "device", self.device or ""))
+        if device.startswith("cpu"):
+            options.setdefault("fp16", False)
+        return model.transcribe(audio_path, **options)
+
+
+_holders: Dict[Tuple[str, Optional[str], str], WhisperModelHolder] = {}
+_holders_lock = threading.Lock()
+
+
+def get_model_holder(model_name: Optional[str] = None, device: Optional[str] = None,
+                     backend: Optional[str] = None) -> WhisperModelHolder:
+    """同じモデル・デバイス・バックエンドの組み合わせに対して、プロセス内で共有する WhisperModelHolder を返す"""
+    key = (model_name or DEFAULT_MODEL, device or DEFAULT_DEVICE, backend or DEFAULT_BACKEND)
+    with _holders_lock:
+        if key not in _holders:
+            _holders[key] = WhisperModelHolder(key[0], key[1], backend=key[2])
+        return _holders[key]
+
+
+def get_whisper_model(model_name: Optional[str] = None, device: Optional[str] = None,
+                      backend: Optional[str] = None):
+    """共有のWhisperモデルを返す（初回のみ読み込む）"""
+    return get_model_holder(model_name, device, backend).get()
+
+
+def _worker_main(model_name: str, device: Optional[str], loader: Callable,
+                 jobs: "multiprocessing.Queue", results: "multiprocessing.Queue") -> None:
+    """ワーカープロセスの本体。モデルを読み込んでからジョブを順に処理する"""
+    holder = WhisperModelHolder(model_name, device, loader)
+    try:
+        holder.get()
+    except Exception as e:
+        results.put(("load", False, f"{type(e).__name__}: {e}", 0.0))
+        return
+    results.put(("load", True, None, holder.load_seconds))
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, audio_path, options = job
+        start = time.perf_counter()
+        try:
+            result = holder.transcribe(audio_path, **options)
+            segments = [{key: s[key] for key in SEGMENT_KEYS if key in s} for s in result["segments"]]
+            results.put((job_id, True, segments, time.perf_counter() - start))
+        except Exception as e:
+            results.put((job_id, False, f"{type(e).__name__}: {e}", time.perf_counter() - start))
+
+
+class TranscriptionWorker:
+    """
+    モデルを読み込んだまま待機し、キューで受け取ったジョブを処理する文字起こしワーカープロセス
+    Args:
+        model_name: モデルの大きさ
+        device: 実行デバイス
+        loader: モデルを読み込む関数（子プロセスから呼べるモジュールレベルの関数。省略時は backend から選ぶ）
+        backend: バックエンド名
+        options: 全てのジョブで transcribe に渡す引数（language など）
+    """
+
+    def __init__(self, model_name: Optional[str] = None, device: Optional[str] = None,
+                 loader: Optional[Callable] = None, backend: Optional[str] = None, **options):
+        self.model_name = model_name or DEFAULT_MODEL
+        self.device = device or DEFAULT_DEVICE
+        loader = loader or get_loader(backend)
+        self.options = options
+        self.load_seconds: Optional[float] = None
+        self._jobs = multiprocessing.Queue()
+        self._results = multiprocessing.Queue()
+        self._pending: Dict[int, Future] = {}
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._ready = Future()
+        self._closed = False
+        self._error: Optional[Exception] = None
+        self._process = multiprocessing.Process(
+            target=_worker_main, name="whisper-worker", daemon=True,
+            args=(self.model_name, self.device, loader, self._jobs, self._results),
+        )
+        self._process.start()
+        self._reader = threading.Thread(target=self._read_results, name="whisper-results", daemon=True)
+        self._reader.start()
+
+    def _read_results(self) -> None:
+        """子プロセスからの結果を対応するFutureに渡す。子プロセスが異常終了したら待機中のジョブを失敗にする"""
+        while True:
+            try:
+                message = self._results.get(timeout=0.5)
+            except queue.Empty:
+                if self._process.is_alive():
+                    continue
+                # 終了の直前に子プロセスが書き込んだ結果を渡してから、残りのジョブを失敗にする
+                while True:
+                    try:
+                        message = self._results.get_nowait()
+                    except queue.Empty:
+                        break
+                    self._dispatch(*message)
+                self._fail_pending()
+                return
+            self._dispatch(*message)
+
+    def _dispatch(self, job_id, ok: bool, payload, elapsed: float) -> None:
+        """子プロセスからの1件の結果を、モデルの読み込み完了または対応するジョブのFutureに渡す"""
+        if job_id == "load":
+            if ok:
+                self.load_seconds = elapsed
+                self._ready.set_result(True)
+            else:
+                self._ready.set_exception(RuntimeError(f"モデルの読み込みに失敗しました: {payload}"))
+            return
+        with self._pending_lock:
+            future = self._pending.pop(job_id, None)
+        if future is None:
+            return
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(payload))
+
+    def _fail_pending(self) -> None:
+        """
+        子プロセスの終了を記録し、待機中のジョブを全て失敗にする。以降の submit もこの例外で失敗する
+        モデルの読み込みに失敗して終了した場合は、その例外をジョブにも渡す
+        """
+        with self._pending_lock:
+            if self._error is None:
+                load_error = self._ready.exception() if self._ready.done() else None
+                self._error = load_error or RuntimeError(
+                    f"文字起こしワーカーが終了しました（終了コード: {self._process.exitcode}）")
+            pending, self._pending = self._pending, {}
+        if not self._ready.done():
+            self._ready.set_exception(self._error)
+        for future in pending.values():
+            future.set_exception(self._error)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> float:
+        """モデルの読み込みが終わるまで待ち、読み込みにかかった秒数を返す"""
+        self._ready.result(timeout)
+        return self.load_seconds
+
+    def submit(self, audio_path: str, **options) -> "Future[List[dict]]":
+        """
+        文字起こしのジョブを追加する
+        Returns:
+            セグメント（start, end, text）のリストを返すFuture（ワーカーが異常終了していれば例外を設定したFuture）
+        """
+        if self._closed:
+            raise RuntimeError("ワーカーは終了しています")
+        future: Future = Future()
+        job_id = next(self._ids)
+        with self._pending_lock:
+            error = self._error
+            if error is None:
+                self._pending[job_id] = future
+        if error is not None:
+            future.set_exception(error)
+            return future
+        # 子プロセスが終了していても、結果を読むスレッドが終了を検知して待機中のジョブを失敗にする
+        # （読み込みの失敗を知らせる結果を先に受け取るため、その例外をジョブに渡せる）
+        self._jobs.put((job_id, audio_path, dict(self.options, **options)))
+        return future
+
+    def transcribe(self, audio_path: str, **options) -> List[dict]:
+        """ジョブを追加して結果を待つ"""
+        return self.submit(audio_path, **options).result()
+
+    def close(self, timeout: float = 30) -> None:
+        """残りのジョブを処理し終えてからワーカーを終了する"""
+        if self._closed:
+            return
+        self._closed = True
+        self._jobs.put(None)
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._reader.join()
+
+    def __enter__(self) -> "TranscriptionWorker":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()